@@ -4,7 +4,16 @@ from sqlalchemy.orm import Session
 from app.models.user import User
 from app.models.database import get_db
 from app.services.document import DocumentService
-from app.schemas.document import DocumentCreate, DocumentUpdate, DocumentPagination, DocumentResponse
+from app.services.document_import import DocumentImportService
+from app.schemas.document import (
+    DocumentCreate,
+    DocumentUpdate,
+    DocumentPagination,
+    DocumentResponse,
+    DocumentImportManifest,
+)
+from app.core.decorators import require_knowledge_base_permission
+from app.models.enums import PermissionType
 from app.services.auth import get_current_admin_user, get_current_user
 from app.schemas.document import DocumentType
 from datetime import datetime
@@ -65,6 +74,53 @@ async def upload_document(
         message="文档上传成功"
     )
 
+@router.post("/knowledge-bases/{kb_id}/documents/import", summary="上传压缩包批量导入文档")
+@require_knowledge_base_permission(PermissionType.EDITOR)
+async def import_documents_from_archive(
+    kb_id: int = Path(..., description="知识库ID"),
+    file: UploadFile = File(..., description="包含文档的 zip/tar 压缩包"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """上传压缩包批量导入文档
+
+    压缩包中支持的文件逐个写入存储并按哈希去重，批量创建文档后在后台提取内容。
+    立即返回导入任务，通过任务ID查询进度。
+    """
+    import_service = DocumentImportService(db)
+    job = await import_service.create_archive_job(kb_id, current_user.id, file)
+    return created_response(data=job, message="批量导入任务已创建")
+
+@router.post("/knowledge-bases/{kb_id}/documents/import/manifest", summary="按服务器路径清单批量导入文档")
+@require_knowledge_base_permission(PermissionType.EDITOR)
+async def import_documents_from_manifest(
+    *,
+    manifest: DocumentImportManifest,
+    kb_id: int = Path(..., description="知识库ID"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """按服务器本地路径清单批量导入文档
+
+    只允许导入 DOCUMENT_IMPORT_ALLOWED_DIRS 配置的目录下的文件，目录会递归导入。
+    """
+    import_service = DocumentImportService(db)
+    job = await import_service.create_manifest_job(kb_id, current_user.id, manifest.paths)
+    return created_response(data=job, message="批量导入任务已创建")
+
+@router.get("/knowledge-bases/{kb_id}/documents/import/{job_id}", summary="查询批量导入任务进度")
+@require_knowledge_base_permission(PermissionType.VIEWER)
+async def get_import_job(
+    kb_id: int = Path(..., description="知识库ID"),
+    job_id: str = Path(..., description="导入任务ID"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """查询批量导入任务进度"""
+    import_service = DocumentImportService(db)
+    job = await import_service.get_job(kb_id, job_id)
+    return success_response(data=job, message="获取导入任务进度成功")
+
 @router.get("/knowledge-bases/{kb_id}/documents")
 async def get_documents(
     kb_id: int = Path(..., description="知识库ID"),
@@ -3,8 +3,10 @@
 包含训练、队列管理等操作
 """
 
+import json
 import time
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.database import get_db
 from app.services.auth import get_current_user
@@ -14,6 +16,7 @@ from app.models.user import User
 from app.core.decorators import require_knowledge_base_permission
 from app.models.enums import PermissionType
 from app.core.logger import Logger
+from app.rag.training.training_progress import TrainingProgress
 
 router = APIRouter()
 
@@ -22,13 +25,19 @@ router = APIRouter()
 @require_knowledge_base_permission(PermissionType.EDITOR)
 async def train_knowledge_base(
     kb_id: int,
+    full_rebuild: bool = False,
+    priority: int = 0,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """训练知识库
 
+    默认增量训练，只处理新增或内容有变化的文档；修改分块配置或嵌入模型后应全量重建。
+
     Args:
         kb_id (int): 要训练的知识库ID
+        full_rebuild (bool): 是否清空索引后全量重建
+        priority (int): 训练优先级，数值越大越先调度
         current_user: 当前登录用户
         db (AsyncSession): 数据库会话对象
 
@@ -50,7 +59,7 @@ async def train_knowledge_base(
         method="POST",
         kb_id=kb_id,
         user_id=current_user.id,
-        params={"trace_id": trace_id}
+        params={"trace_id": trace_id, "full_rebuild": full_rebuild, "priority": priority}
     )
     
     try:
@@ -71,7 +80,7 @@ async def train_knowledge_base(
         )
         
         kb_service = KnowledgeBaseService(db)
-        result = await kb_service.train(kb_id, current_user.id)
+        result = await kb_service.train(kb_id, current_user.id, full_rebuild, priority)
         
         # 计算处理时间
         process_time = time.time() - start_time
@@ -140,6 +149,57 @@ async def train_knowledge_base(
         raise
 
 
+@router.post("/{kb_id}/train/estimate")
+@require_knowledge_base_permission(PermissionType.EDITOR)
+async def estimate_training(
+    kb_id: int,
+    full_rebuild: bool = False,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """创建训练成本和耗时的估算任务
+
+    估算在后台工作进程中按训练规则提取、分块并统计 token，检查可复用分块和向量缓存，
+    不调用向量化接口，用于在排队前评估大规模重训，安排到低峰时段执行。
+
+    Args:
+        kb_id (int): 知识库ID
+        full_rebuild (bool): 是否按全量重建估算
+        current_user: 当前登录用户
+        db (AsyncSession): 数据库会话对象
+
+    Returns:
+        APIResponse: 包含估算任务ID和状态的响应对象
+    """
+    kb_service = KnowledgeBaseService(db)
+    result = await kb_service.estimate_training(kb_id, full_rebuild)
+    return success_response(data=result)
+
+
+@router.get("/{kb_id}/train/estimate/{job_id}")
+@require_knowledge_base_permission(PermissionType.EDITOR)
+async def get_training_estimate(
+    kb_id: int,
+    job_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """获取训练估算任务的状态和结果
+
+    Args:
+        kb_id (int): 知识库ID
+        job_id (str): 估算任务ID
+        current_user: 当前登录用户
+        db (AsyncSession): 数据库会话对象
+
+    Returns:
+        APIResponse: 包含估算任务状态的响应对象，完成后 result 中为文档、分块、token、费用和耗时估算
+    """
+    kb_service = KnowledgeBaseService(db)
+    result = await kb_service.get_training_estimate(kb_id, job_id)
+    return success_response(data=result)
+
+
 @router.get("/training-queue/status")
 async def get_training_queue_status(
     current_user: User = Depends(get_current_user),
@@ -161,4 +221,61 @@ async def get_training_queue_status(
         
     except Exception as e:
         Logger.error(f"获取训练队列状态失败: {str(e)}")
-        raise 
\ No newline at end of file
+        raise 
+
+@router.get("/{kb_id}/training/progress")
+@require_knowledge_base_permission(PermissionType.VIEWER)
+async def get_training_progress(
+    kb_id: int,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """获取知识库最新的训练进度
+
+    Args:
+        kb_id (int): 知识库ID
+        current_user: 当前登录用户
+        db (AsyncSession): 数据库会话对象
+
+    Returns:
+        APIResponse: 最新进度事件，没有进度记录时为空
+    """
+    progress = await TrainingProgress.get_latest(kb_id)
+    return success_response(data=progress)
+
+
+@router.get("/{kb_id}/training/events")
+@require_knowledge_base_permission(PermissionType.VIEWER)
+async def stream_training_progress(
+    kb_id: int,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """以 Server-Sent Events 推送知识库训练进度
+
+    先推送最新进度，之后实时推送进度事件，训练完成或失败后结束；空闲时定期发送注释行保活。
+
+    Args:
+        kb_id (int): 知识库ID
+        current_user: 当前登录用户
+        db (AsyncSession): 数据库会话对象
+
+    Returns:
+        StreamingResponse: text/event-stream 响应
+    """
+    async def event_stream():
+        try:
+            async for event in TrainingProgress.subscribe(kb_id, heartbeat=15):
+                if event is None:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: progress\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+        except Exception as e:
+            Logger.error(f"推送知识库 {kb_id} 训练进度失败: {str(e)}")
+            yield f"event: error\ndata: {json.dumps({'message': str(e)}, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -65,7 +65,9 @@ async def query_knowledge_base(
             kb_id=kb_id,
             user_context=user_context,
             query=request.query,
-            top_k=request.top_k
+            top_k=request.top_k,
+            mmr_lambda=request.mmr_lambda,
+            mmr_top_k=request.mmr_top_k
         )
         
         return success_response(
@@ -2,6 +2,7 @@
 from fastapi import APIRouter
 from .client import router as client_router
 from .admin import router as admin_router
+from .training import router as training_router
 
 # 创建WebSocket总路由
 router = APIRouter()
@@ -10,4 +11,7 @@ router = APIRouter()
 router.include_router(client_router, prefix="/chat", tags=["ws-client-chat"])
 
 # 管理员聊天WebSocket路由
-router.include_router(admin_router, prefix="/chat/admin", tags=["ws-admin-chat"]) 
\ No newline at end of file
+router.include_router(admin_router, prefix="/chat/admin", tags=["ws-admin-chat"])
+
+# 管理员训练进度WebSocket路由
+router.include_router(training_router, prefix="/training", tags=["ws-admin-training"])
@@ -0,0 +1,52 @@
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.database import get_db
+from app.models.enums import PermissionType
+from app.services.knowledge_base import KnowledgeBaseService
+from app.rag.training.training_progress import TrainingProgress
+from app.core.logger import Logger
+
+# 创建管理员训练进度WebSocket路由
+router = APIRouter()
+
+@router.websocket("/{kb_id}")
+async def training_progress_websocket(
+    websocket: WebSocket,
+    kb_id: int,
+    admin_id: int,
+    db: AsyncSession = Depends(get_db)
+):
+    """训练进度WebSocket连接
+
+    连接后先推送最新进度，之后实时推送进度事件，训练完成或失败后由服务端关闭连接。
+    """
+    kb_service = KnowledgeBaseService(db)
+    if not await kb_service.check_permission(kb_id, admin_id, PermissionType.VIEWER):
+        Logger.warning(
+            "知识库权限验证失败，拒绝训练进度WebSocket连接",
+            kb_id=kb_id,
+            admin_id=admin_id
+        )
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    Logger.websocket_event(
+        event_type="训练进度WebSocket连接",
+        kb_id=kb_id,
+        admin_id=admin_id
+    )
+
+    try:
+        async for event in TrainingProgress.subscribe(kb_id, heartbeat=15):
+            if event is None:
+                await websocket.send_json({"type": "heartbeat"})
+                continue
+            await websocket.send_json({"type": "progress", "data": event})
+        await websocket.close()
+    except WebSocketDisconnect:
+        Logger.info(f"训练进度WebSocket断开: kb_id={kb_id}, admin_id={admin_id}")
+    except Exception as e:
+        Logger.error(f"推送知识库 {kb_id} 训练进度失败: {str(e)}")
+        await websocket.close(code=status.WS_1011_INTERNAL_ERROR)
@@ -20,12 +20,22 @@ class Settings(BaseSettings):
     REDIS_PORT: int = 6379
     REDIS_DB: int = 0
     REDIS_PASSWORD: Optional[str] = None
+    HUEY_REDIS_MAX_CONNECTIONS: int = 20  # huey 同步 Redis 连接池大小
+    HTTP_MAX_CONNECTIONS: int = 100  # 共享 HTTP 客户端最大连接数
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20  # 共享 HTTP 客户端保持的空闲连接数
     
     # 数据库配置
     DATABASE_URL: str = "sqlite:///./embed_ai.db"
 
     # 文件存储路径
     FILE_STORAGE_PATH: str = "storage/documents"
+    DOCUMENT_UPLOAD_MAX_SIZE_MB: int = 200  # 上传文件大小上限（MB），0 表示不限制
+    DOCUMENT_UPLOAD_CHUNK_SIZE: int = 1024 * 1024  # 上传文件分块写入的块大小（字节）
+    DOCUMENT_IMPORT_MAX_SIZE_MB: int = 10240  # 批量导入压缩包大小上限（MB），0 表示不限制
+    DOCUMENT_IMPORT_MAX_ENTRIES: int = 20000  # 单个批量导入任务最多导入的文件数
+    DOCUMENT_IMPORT_BATCH_SIZE: int = 100  # 批量导入时每批查重并创建的文档数
+    DOCUMENT_IMPORT_ALLOWED_DIRS: List[str] = []  # 允许按清单导入的服务器本地目录，为空时不允许清单导入
+    DOCUMENT_IMPORT_JOB_TTL: int = 86400  # 批量导入任务进度的保留时间（秒）
     
     # JWT配置
     SECRET_KEY: str = "123456"
@@ -41,16 +51,59 @@ class Settings(BaseSettings):
     DEFAULT_EMBEDDING_DIM: int = 1024
     
     # 训练配置
-    ENABLE_TRAINING_QUEUE: bool = True  # 是否启用训练队列（同一时间只允许一个知识库训练）
+    ENABLE_TRAINING_QUEUE: bool = True  # 已不再使用，训练统一由调度器按槽位派发
+    TRAINING_MAX_CONCURRENT_JOBS: int = 2  # 同时训练的知识库数（调度槽位数）
+    TRAINING_MAX_JOBS_PER_TENANT: int = 1  # 每个租户（知识库所有者）最多同时训练的知识库数，0 表示不限制
+    TRAINING_LEASE_TTL: int = 60  # 训练租约有效期（秒），工作进程退出后超过该时间视为卡死
+    TRAINING_HEARTBEAT_INTERVAL: int = 15  # 训练租约续期间隔（秒）
+    TRAINING_SCHEDULER_SCAN_LIMIT: int = 200  # 每次调度扫描的排队知识库数
+    TRAINING_QUEUE_BLOCK_TIMEOUT: int = 5  # 训练队列为空时工作进程阻塞等待入队通知的时间（秒）
+    TRAINING_MAX_RETRIES: int = 3  # 训练意外失败后的最大重试次数
+    TRAINING_RETRY_BASE_DELAY: int = 30  # 首次重试的等待时间（秒），之后按指数退避
+    TRAINING_RETRY_MAX_DELAY: int = 600  # 重试等待时间上限（秒）
+    TRAINING_PROGRESS_INTERVAL: float = 1.0  # 训练进度事件的最小发布间隔（秒）
+    TRAINING_PROGRESS_TTL: int = 3600  # 最新训练进度的保留时间（秒）
+    TRAINING_ESTIMATE_HISTORY_RUNS: int = 20  # 估算训练耗时时参考的最近训练次数
+    TRAINING_ESTIMATE_DEFAULT_TOKENS_PER_SECOND: int = 2000  # 没有历史训练记录时假定的向量化吞吐（token/秒）
+    TRAINING_ESTIMATE_JOB_TTL: int = 3600  # 训练估算任务结果的保留时间（秒）
     
     # RAG配置
     RAG_CHUNK_SIZE: int = 1000  # 文本分块大小
     RAG_CHUNK_OVERLAP: int = 200  # 文本分块重叠大小
     RAG_VECTOR_STORE_TYPE: str = "chroma"  # 默认向量存储类型
     RAG_BATCH_SIZE: int = 100  # 批处理大小
-    RAG_RERANK_MODEL: str = "bge-reranker-base"  # 重排序模型
+    RAG_RERANK_MODEL: str = "BAAI/bge-reranker-base"  # 重排序模型（本地交叉编码器名称或路径）
     RAG_DEFAULT_RETRIEVAL_METHOD: str = "hybrid_search"  # 默认检索方法
     RAG_USE_RERANK: bool = True  # 是否默认使用重排序
+    RAG_BM25_K1: float = 1.5  # 关键词检索BM25参数k1
+    RAG_BM25_B: float = 0.75  # 关键词检索BM25参数b
+    RAG_RERANK_EXECUTOR: str = "thread"  # 交叉编码器推理执行器：thread / process
+    RAG_RERANK_WORKERS: int = 1  # 交叉编码器推理工作线程/进程数
+    RAG_RERANK_BATCH_SIZE: int = 16  # 交叉编码器推理批大小
+    RAG_RERANK_MAX_CANDIDATES: int = 50  # 交叉编码器最大打分候选数
+    RAG_RERANK_MAX_LENGTH: int = 512  # 交叉编码器最大输入长度（token）
+    RAG_RERANK_DEVICE: Optional[str] = None  # 交叉编码器推理设备，None时自动选择
+    RAG_RERANK_CACHE_TTL: int = 86400  # 重排序分数缓存过期时间（秒）
+    RAG_TOKENIZER_WORKERS: int = 2  # 分词进程池工作进程数
+    RAG_TOKENIZER_BATCH_CHARS: int = 200000  # 分词子任务最大字符数
+    RAG_TOKENIZER_USER_DICT_DIR: str = "data/tokenizer_dicts"  # 知识库用户词典目录（kb_<id>.txt）
+    RAG_BULK_INSERT_BATCH_SIZE: int = 500  # 分块批量写入的每批行数
+    RAG_BULK_COMMIT_ROWS: int = 5000  # 分块批量写入时每写入多少行提交一次，0 表示不做中间提交
+    RAG_BULK_DELETE_BATCH_SIZE: int = 200  # 索引清理时每批删除的文档数
+    RAG_PIPELINE_EXTRACT_WORKERS: int = 2  # 摄取流水线同时提取的文档数
+    RAG_PIPELINE_SPLIT_WORKERS: int = 2  # 摄取流水线分块并发数
+    RAG_PIPELINE_EMBED_CONCURRENCY: int = 4  # 摄取流水线并发向量化请求数
+    RAG_PIPELINE_EMBED_BATCH_TOKENS: int = 8000  # 摄取流水线每个向量化请求的估算token上限
+    RAG_PIPELINE_WRITE_BATCH_DOCUMENTS: int = 8  # 摄取流水线每次批量写入合并的文档数
+    RAG_PIPELINE_QUEUE_SIZE: int = 16  # 摄取流水线阶段间队列容量（背压）
+    RAG_PIPELINE_CHECKPOINT_CHUNKS: int = 500  # 超大文档每向量化多少个分块提交一次检查点
+    RAG_PIPELINE_STREAM_MIN_FILE_SIZE: int = 20 * 1024 * 1024  # 不小于该大小（字节）的文件流式提取和分块，0 表示不启用
+    RAG_EXTRACT_WORKERS: int = 2  # 文档提取进程池工作进程数
+    RAG_EXTRACT_TIMEOUT: int = 300  # 单个提取任务的超时时间（秒）
+    RAG_EXTRACT_MEMORY_LIMIT_MB: int = 2048  # 提取工作进程的数据段大小上限（MB，RLIMIT_DATA），0 表示不限制
+    RAG_EXTRACT_PDF_PAGES_PER_TASK: int = 50  # PDF按页码范围并行提取时每个任务的页数，0 表示不拆分
+    RAG_EXTRACT_CACHE_DIR: str = "storage/extract_cache"  # 提取结果缓存目录
+    RAG_EXTRACT_CACHE_MAX_SIZE_MB: int = 2048  # 提取结果缓存总大小上限（MB），超出时淘汰最久未使用的缓存，0 表示不缓存
     
     # 提示词管理配置
     PROMPT_MAX_LENGTH: int = 50000  # 提示词最大长度（字符）
@@ -0,0 +1,42 @@
+import asyncio
+import weakref
+from typing import Optional
+
+import httpx
+
+from app.core.config import settings
+from app.core.logger import Logger
+
+
+class HttpClientManager:
+    """共享的异步 HTTP 客户端
+
+    进程内复用连接池，避免每次请求重新建立 TCP/TLS 连接。
+    httpx 客户端的连接绑定创建它的事件循环，因此按当前运行的事件循环分别创建客户端，
+    事件循环被回收后对应的客户端随之释放，在其他循环（如临时的 asyncio.run）中调用也不会复用失效的连接。
+    """
+    _clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+    @classmethod
+    def get_client(cls) -> httpx.AsyncClient:
+        """获取当前事件循环的共享客户端，首次调用或已关闭时创建"""
+        loop = asyncio.get_running_loop()
+        client = cls._clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=settings.HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                ),
+                timeout=60.0,
+            )
+            cls._clients[loop] = client
+        return client
+
+    @classmethod
+    async def close(cls) -> None:
+        """关闭当前事件循环的共享客户端"""
+        client: Optional[httpx.AsyncClient] = cls._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+            Logger.info("HTTP 客户端已关闭")
@@ -220,32 +220,247 @@ class RedisManager:
         return count <= max_requests
     
     # ========== 任务队列管理 ==========
+    # 训练队列：就绪（有序集合，分数为出队顺序）、处理中（分数为可见性超时的截止时间）、
+    # 延迟重试（分数为可重新出队的时间），以及重试次数哈希和用于阻塞唤醒的通知列表
+    TRAINING_QUEUE_KEY = "training_queue"
+    TRAINING_PROCESSING_KEY = "training_queue:processing"
+    TRAINING_DELAYED_KEY = "training_queue:delayed"
+    TRAINING_ATTEMPTS_KEY = "training_queue:attempts"
+    TRAINING_WAKEUP_KEY = "training_queue:wakeup"
+
+    # 不在处理中时加入就绪队列，并发送唤醒通知
+    _ENQUEUE_SCRIPT = """
+    if redis.call('ZSCORE', KEYS[2], ARGV[1]) then
+        return 0
+    end
+    redis.call('ZREM', KEYS[3], ARGV[1])
+    local added = redis.call('ZADD', KEYS[1], 'NX', ARGV[2], ARGV[1])
+    redis.call('LPUSH', KEYS[4], 1)
+    redis.call('LTRIM', KEYS[4], 0, 63)
+    return added
+    """
+
+    # 到期的延迟任务和可见性超时的处理中任务移回就绪队列，再原子地取出一个任务标记为处理中
+    _CLAIM_SCRIPT = """
+    local now = tonumber(ARGV[1])
+    for _, key in ipairs({KEYS[2], KEYS[3]}) do
+        local due = redis.call('ZRANGEBYSCORE', key, '-inf', now)
+        for _, member in ipairs(due) do
+            redis.call('ZREM', key, member)
+            redis.call('ZADD', KEYS[1], 'NX', now, member)
+        end
+    end
+    local popped = redis.call('ZPOPMIN', KEYS[1])
+    if #popped == 0 then
+        return false
+    end
+    redis.call('ZADD', KEYS[2], now + tonumber(ARGV[2]), popped[1])
+    return popped[1]
+    """
+
+    # 仍在处理中时延长可见性超时
+    _EXTEND_SCRIPT = """
+    if redis.call('ZSCORE', KEYS[1], ARGV[1]) then
+        redis.call('ZADD', KEYS[1], 'XX', ARGV[2], ARGV[1])
+        return 1
+    end
+    return 0
+    """
+
+    # 从处理中移到延迟队列，返回累计重试次数
+    _RETRY_SCRIPT = """
+    redis.call('ZREM', KEYS[1], ARGV[1])
+    local attempts = redis.call('HINCRBY', KEYS[3], ARGV[1], 1)
+    redis.call('ZADD', KEYS[2], ARGV[2], ARGV[1])
+    return attempts
+    """
+
     @classmethod
-    async def add_training_task(cls, kb_id: int) -> bool:
-        """添加知识库到训练队列"""
+    async def add_training_task(cls, kb_id: int, score: Optional[float] = None) -> bool:
+        """添加知识库到训练队列
+
+        Args:
+            kb_id: 知识库ID
+            score: 出队顺序，越小越先出队，默认为当前时间
+
+        Returns:
+            bool: 是否新加入（已在队列或处理中时返回False）
+        """
         redis = await cls.get_redis()
-        key = "training_queue"
-        score = datetime.now().timestamp()
-        return bool(await redis.zadd(key, {str(kb_id): score}))
-    
+        score = datetime.now().timestamp() if score is None else score
+        added = await redis.eval(
+            cls._ENQUEUE_SCRIPT,
+            4,
+            cls.TRAINING_QUEUE_KEY,
+            cls.TRAINING_PROCESSING_KEY,
+            cls.TRAINING_DELAYED_KEY,
+            cls.TRAINING_WAKEUP_KEY,
+            str(kb_id),
+            score,
+        )
+        return bool(added)
+
+    @classmethod
+    async def claim_training_task(cls, visibility_timeout: int) -> Optional[int]:
+        """原子地取出下一个待训练的知识库并标记为处理中
+
+        处理中的任务超过可见性超时仍未确认（工作进程退出）时，会在下一次取任务时重新入队。
+
+        Args:
+            visibility_timeout: 可见性超时（秒）
+
+        Returns:
+            Optional[int]: 知识库ID，队列为空时返回None
+        """
+        redis = await cls.get_redis()
+        result = await redis.eval(
+            cls._CLAIM_SCRIPT,
+            3,
+            cls.TRAINING_QUEUE_KEY,
+            cls.TRAINING_PROCESSING_KEY,
+            cls.TRAINING_DELAYED_KEY,
+            datetime.now().timestamp(),
+            visibility_timeout,
+        )
+        return int(result) if result else None
+
+    @classmethod
+    async def wait_training_task(cls, visibility_timeout: int, block_timeout: int) -> Optional[int]:
+        """取出下一个待训练的知识库，队列为空时阻塞等待入队通知
+
+        Args:
+            visibility_timeout: 可见性超时（秒）
+            block_timeout: 最长等待时间（秒）
+
+        Returns:
+            Optional[int]: 知识库ID，等待超时返回None
+        """
+        kb_id = await cls.claim_training_task(visibility_timeout)
+        if kb_id is not None:
+            return kb_id
+        redis = await cls.get_redis()
+        await redis.blpop(cls.TRAINING_WAKEUP_KEY, timeout=block_timeout)
+        return await cls.claim_training_task(visibility_timeout)
+
     @classmethod
     async def get_next_training_task(cls) -> Optional[int]:
-        """获取下一个待训练的知识库ID"""
+        """获取下一个待训练的知识库ID（原子出队，使用默认可见性超时）"""
+        return await cls.claim_training_task(settings.TRAINING_LEASE_TTL)
+
+    @classmethod
+    async def extend_training_task(cls, kb_id: int, visibility_timeout: int) -> bool:
+        """延长处理中任务的可见性超时
+
+        Args:
+            kb_id: 知识库ID
+            visibility_timeout: 从现在起的可见性超时（秒）
+
+        Returns:
+            bool: 任务是否仍在处理中
+        """
         redis = await cls.get_redis()
-        key = "training_queue"
-        result = await redis.zrange(key, 0, 0)
-        if result:
-            # 移除已获取的任务
-            await redis.zrem(key, result[0])
-            return int(result[0])
-        return None
-    
+        extended = await redis.eval(
+            cls._EXTEND_SCRIPT,
+            1,
+            cls.TRAINING_PROCESSING_KEY,
+            str(kb_id),
+            datetime.now().timestamp() + visibility_timeout,
+        )
+        return bool(extended)
+
+    @classmethod
+    async def ack_training_task(cls, kb_id: int) -> None:
+        """确认任务完成，移出处理中并清除重试次数"""
+        redis = await cls.get_redis()
+        pipe = redis.pipeline()
+        pipe.zrem(cls.TRAINING_PROCESSING_KEY, str(kb_id))
+        pipe.hdel(cls.TRAINING_ATTEMPTS_KEY, str(kb_id))
+        await pipe.execute()
+
+    @classmethod
+    async def release_training_task(cls, kb_id: int) -> None:
+        """放回未开始处理的任务（不计入重试次数）"""
+        redis = await cls.get_redis()
+        pipe = redis.pipeline()
+        pipe.zrem(cls.TRAINING_PROCESSING_KEY, str(kb_id))
+        pipe.zadd(cls.TRAINING_QUEUE_KEY, {str(kb_id): datetime.now().timestamp()}, nx=True)
+        await pipe.execute()
+
+    @classmethod
+    async def retry_training_task(cls, kb_id: int, delay: float) -> int:
+        """将失败的任务延迟后重新入队
+
+        Args:
+            kb_id: 知识库ID
+            delay: 延迟时间（秒）
+
+        Returns:
+            int: 累计重试次数
+        """
+        redis = await cls.get_redis()
+        attempts = await redis.eval(
+            cls._RETRY_SCRIPT,
+            3,
+            cls.TRAINING_PROCESSING_KEY,
+            cls.TRAINING_DELAYED_KEY,
+            cls.TRAINING_ATTEMPTS_KEY,
+            str(kb_id),
+            datetime.now().timestamp() + delay,
+        )
+        return int(attempts)
+
+    @classmethod
+    async def get_training_task_attempts(cls, kb_id: int) -> int:
+        """获取任务的累计重试次数"""
+        redis = await cls.get_redis()
+        return int(await redis.hget(cls.TRAINING_ATTEMPTS_KEY, str(kb_id)) or 0)
+
+    @classmethod
+    async def get_queued_training_tasks(cls, kb_ids: List[int]) -> List[int]:
+        """返回已在训练队列中（就绪、处理中或延迟重试）的知识库ID"""
+        if not kb_ids:
+            return []
+        redis = await cls.get_redis()
+        pipe = redis.pipeline()
+        for kb_id in kb_ids:
+            for key in (cls.TRAINING_QUEUE_KEY, cls.TRAINING_PROCESSING_KEY, cls.TRAINING_DELAYED_KEY):
+                pipe.zscore(key, str(kb_id))
+        scores = await pipe.execute()
+        return [
+            kb_id for i, kb_id in enumerate(kb_ids)
+            if any(score is not None for score in scores[i * 3:i * 3 + 3])
+        ]
+
+    @classmethod
+    async def get_training_queue_stats(cls) -> Dict[str, int]:
+        """获取训练队列统计：就绪、处理中、延迟重试，以及已可出队（到期或超时）的任务数"""
+        redis = await cls.get_redis()
+        now = datetime.now().timestamp()
+        pipe = redis.pipeline()
+        pipe.zcard(cls.TRAINING_QUEUE_KEY)
+        pipe.zcard(cls.TRAINING_PROCESSING_KEY)
+        pipe.zcard(cls.TRAINING_DELAYED_KEY)
+        pipe.zcount(cls.TRAINING_PROCESSING_KEY, "-inf", now)
+        pipe.zcount(cls.TRAINING_DELAYED_KEY, "-inf", now)
+        ready, processing, delayed, expired, due = await pipe.execute()
+        return {
+            "ready": ready,
+            "processing": processing,
+            "delayed": delayed,
+            "claimable": ready + expired + due,
+        }
+
     @classmethod
     async def clear_training_queue(cls) -> bool:
         """清空训练队列"""
         redis = await cls.get_redis()
-        key = "training_queue"
-        return bool(await redis.delete(key))
+        return bool(await redis.delete(
+            cls.TRAINING_QUEUE_KEY,
+            cls.TRAINING_PROCESSING_KEY,
+            cls.TRAINING_DELAYED_KEY,
+            cls.TRAINING_ATTEMPTS_KEY,
+            cls.TRAINING_WAKEUP_KEY,
+        ))
 
 # 全局Redis管理器实例
 redis_manager = RedisManager() 
\ No newline at end of file
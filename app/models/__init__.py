@@ -6,6 +6,8 @@ from .knowledge_base import KnowledgeBase
 from .document import Document, DocumentType
 from .document_chunk import DocumentChunk
 from .document_embedding import DocumentEmbedding
+from .keyword_index import KeywordPosting, KeywordIndexStats
+from .training_checkpoint import TrainingCheckpoint
 from .chat import Chat, ChatMessage
 from .llm_usage_log import LLMUsageLog
 from .analytics import SystemMetrics, UserActivityLog, KnowledgeBaseMetrics, APIMetrics
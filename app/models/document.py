@@ -128,6 +128,10 @@ class Document(Base):
     processing_error = Column(String(1024), nullable=True, comment='处理错误信息')
     processed_at = Column(DateTime, nullable=True, comment='处理完成时间')
     
+    # 增量训练
+    content_hash = Column(String(64), nullable=True, comment='最近一次索引时的文本内容哈希')
+    indexed_file_hash = Column(String(64), nullable=True, comment='最近一次索引时的文件哈希')
+    
     # 元数据
     doc_metadata = Column(JSON, nullable=True, comment='文档元数据，存储额外的文档信息')
     source_url = Column(String(512), nullable=True, comment='文档来源URL')
@@ -14,6 +14,9 @@ class DocumentChunk(Base):
     content = Column(Text, nullable=False, comment='分块内容')
     chunk_index = Column(Integer, nullable=False, comment='分块索引')
     chunk_metadata = Column(JSON, nullable=True, comment='分块元数据')
+    term_freqs = Column(JSON, nullable=True, comment='分块词项向量，格式为 {词项: 词频}')
+    term_count = Column(Integer, nullable=True, comment='分块词项总数')
+    content_hash = Column(String(64), nullable=True, index=True, comment='分块内容哈希，用于增量训练时复用分块')
     
     # 时间字段
     created_at = Column(DateTime, default=datetime.now, comment="创建时间")
@@ -0,0 +1,34 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index, UniqueConstraint
+from datetime import datetime
+
+from .database import Base
+
+class KeywordPosting(Base):
+    """关键词倒排表模型，每个知识库的每个词项在每个分块中一行"""
+    __tablename__ = "keyword_postings"
+    __table_args__ = (
+        UniqueConstraint('knowledge_base_id', 'term', 'chunk_id', name='uq_keyword_postings_kb_term_chunk'),
+        Index('ix_keyword_postings_kb_chunk', 'knowledge_base_id', 'chunk_id'),
+        {'comment': '关键词倒排表，存储词项到分块的倒排项'},
+    )
+
+    id = Column(Integer, primary_key=True, index=True, comment='倒排记录ID')
+    knowledge_base_id = Column(Integer, ForeignKey("knowledge_bases.id", ondelete="CASCADE"), nullable=False, comment='知识库ID')
+    term = Column(String, nullable=False, comment='词项')
+    chunk_id = Column(Integer, nullable=False, comment='分块ID')
+    term_freq = Column(Integer, nullable=False, comment='词项在分块中的词频')
+    chunk_length = Column(Integer, nullable=False, comment='分块词项总数')
+
+class KeywordIndexStats(Base):
+    """关键词索引统计模型，存储知识库级别的BM25统计信息"""
+    __tablename__ = "keyword_index_stats"
+    __table_args__ = {'comment': '关键词索引统计表，存储分块总数和总长度'}
+
+    id = Column(Integer, primary_key=True, index=True, comment='统计ID')
+    knowledge_base_id = Column(Integer, ForeignKey("knowledge_bases.id", ondelete="CASCADE"), nullable=False, unique=True, comment='知识库ID')
+    doc_count = Column(Integer, nullable=False, default=0, comment='已索引分块数')
+    total_length = Column(Integer, nullable=False, default=0, comment='已索引分块的词项总数')
+    generation = Column(Integer, nullable=False, default=0, comment='索引代数，每次索引变更递增，用于缓存失效')
+
+    # 时间字段
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now, comment="更新时间")
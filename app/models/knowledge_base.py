@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, JSON, ARRAY, DateTime, Enum
+from sqlalchemy import Column, Integer, String, ForeignKey, JSON, ARRAY, DateTime, Enum, Boolean
 from sqlalchemy.orm import relationship
 from sqlalchemy.orm import Session
 
@@ -39,6 +39,9 @@ class KnowledgeBase(Base):
     default_prompt_template_id = Column(Integer, ForeignKey("prompt_templates.id", ondelete="SET NULL"), nullable=True, comment='默认提示词模板ID')
     prompt_template_config = Column(JSON, nullable=True, comment='提示词模板配置，包含模板选择策略和变量映射')
     
+    # 检索相关字段
+    retrieval_config = Column(JSON, nullable=True, comment='检索配置，包含关键词检索后端等设置')
+    
     # 时间字段
     created_at = Column(DateTime, default=datetime.now, comment="创建时间")
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now, comment="更新时间")
@@ -49,6 +52,8 @@ class KnowledgeBase(Base):
     training_finished_at = Column(DateTime, nullable=True, comment='训练完成时间')
     training_error = Column(String, nullable=True, comment='训练错误信息')
     queued_at = Column(DateTime, nullable=True, comment='进入训练队列的时间')
+    training_priority = Column(Integer, nullable=False, default=0, comment='训练优先级，数值越大越先调度')
+    training_full_rebuild = Column(Boolean, nullable=False, default=False, comment='排队中的训练是否全量重建索引')
     
     # 关系定义
     owner = relationship("User", back_populates="owned_knowledge_bases", foreign_keys=[owner_id], passive_deletes=True)
@@ -64,7 +69,8 @@ class KnowledgeBase(Base):
     
     @property
     def can_train(self) -> bool:
-        return self.training_status in [TrainingStatus.INIT, TrainingStatus.FAILED]
+        # 已训练的知识库可再次（增量）训练
+        return self.training_status in [TrainingStatus.INIT, TrainingStatus.TRAINED, TrainingStatus.FAILED]
     
     @property
     def can_query(self) -> bool:
@@ -484,6 +490,50 @@ class KnowledgeBase(Base):
         strategy = self.get_template_selection_strategy()
         return strategy in ["dynamic", "user_choice"]
     
+    def get_retrieval_config(self) -> Dict[str, Any]:
+        """获取检索配置
+        
+        Returns:
+            Dict[str, Any]: 检索配置
+        """
+        return self.retrieval_config or {}
+    
+    def get_keyword_backend(self) -> str:
+        """获取关键词检索后端
+        
+        Returns:
+            str: 关键词检索后端 (inverted_index, fulltext)
+        """
+        config = self.get_retrieval_config()
+        return config.get("keyword_backend", "inverted_index")
+    
+    def get_rerank_cascade_config(self) -> Dict[str, Any]:
+        """获取级联重排序配置
+        
+        Returns:
+            Dict[str, Any]: 级联重排序配置 (enabled, top_m, margin_threshold)
+        """
+        config = self.get_retrieval_config().get("rerank_cascade", {})
+        return {
+            "enabled": config.get("enabled", False),
+            "top_m": config.get("top_m", 20),
+            "margin_threshold": config.get("margin_threshold"),
+        }
+    
+    def get_mmr_config(self) -> Dict[str, Any]:
+        """获取MMR多样化配置
+        
+        Returns:
+            Dict[str, Any]: MMR配置 (enabled, lambda, top_k, fetch_k)
+        """
+        config = self.get_retrieval_config().get("mmr", {})
+        return {
+            "enabled": config.get("enabled", False),
+            "lambda": config.get("lambda", 0.7),
+            "top_k": config.get("top_k"),
+            "fetch_k": config.get("fetch_k"),
+        }
+    
     def to_dict_with_prompt_config(self) -> Dict[str, Any]:
         """转换为字典，包含提示词配置信息
         
@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, UniqueConstraint
+from datetime import datetime
+
+from .database import Base
+
+class TrainingCheckpoint(Base):
+    """训练检查点模型，记录一次训练中每个文档已提交的进度"""
+    __tablename__ = "training_checkpoints"
+    __table_args__ = (
+        UniqueConstraint('knowledge_base_id', 'document_id', name='uq_training_checkpoints_kb_document'),
+        {'comment': '训练检查点表，训练中断后从已提交的检查点恢复'},
+    )
+
+    # 文档状态
+    STATUS_PARTIAL = "partial"
+    STATUS_COMPLETED = "completed"
+
+    id = Column(Integer, primary_key=True, index=True, comment='检查点ID')
+    knowledge_base_id = Column(Integer, ForeignKey("knowledge_bases.id", ondelete="CASCADE"), nullable=False, index=True, comment='知识库ID')
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"), nullable=False, comment='文档ID')
+    status = Column(String(20), nullable=False, comment='文档状态：partial 部分分块已提交，completed 已完成')
+    chunk_total = Column(Integer, nullable=False, default=0, comment='文档分块总数')
+    chunk_completed = Column(Integer, nullable=False, default=0, comment='已提交的分块数')
+
+    # 时间字段
+    created_at = Column(DateTime, default=datetime.now, comment="创建时间")
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now, comment="更新时间")
@@ -185,14 +185,25 @@ class ChromaVector(BaseVector):
             top_k = kwargs.get("top_k", 5)
             where = kwargs.get("where", {})
             
+            include_vectors = kwargs.get("include_vectors", False)
+            
+            include = ["documents", "metadatas", "distances"]
+            if include_vectors:
+                include.append("embeddings")
+            
             # 执行搜索
             results = self.collection.query(
                 query_embeddings=[query_vector],
                 n_results=top_k,
                 where=where,
-                include=["documents", "metadatas", "distances"]
+                include=include
             )
             
+            # 已存储的向量堆叠为矩阵，结果文档引用其行视图
+            vectors = None
+            if include_vectors and results.get("embeddings") is not None:
+                vectors = self._stack_vectors(results["embeddings"][0])
+            
             # 处理结果
             documents = []
             for i, (doc, metadata, distance) in enumerate(zip(
@@ -206,7 +217,8 @@ class ChromaVector(BaseVector):
                     metadata={
                         **metadata,
                         "score": 1.0 - distance  # 转换距离为相似度分数
-                    }
+                    },
+                    vector=vectors[i] if vectors is not None else None
                 )
                 documents.append(document)
                 
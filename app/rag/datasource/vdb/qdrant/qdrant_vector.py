@@ -201,25 +201,33 @@ class QdrantVector(BaseVector):
             # 获取参数
             top_k = kwargs.get("top_k", 5)
             filter_condition = kwargs.get("filter", None)
+            include_vectors = kwargs.get("include_vectors", False)
             
             # 执行搜索
             results = self.client.search(
                 collection_name=self.collection_name,
                 query_vector=query_vector,
                 limit=top_k,
-                query_filter=filter_condition
+                query_filter=filter_condition,
+                with_vectors=include_vectors
             )
             
+            # 已存储的向量堆叠为矩阵，结果文档引用其行视图
+            vectors = None
+            if include_vectors:
+                vectors = self._stack_vectors([result.vector for result in results])
+            
             # 处理结果
             documents = []
-            for result in results:
+            for i, result in enumerate(results):
                 # 创建文档对象
                 document = Document(
                     page_content=result.payload.get("text", ""),
                     metadata={
                         **{k: v for k, v in result.payload.items() if k != "text"},
                         "score": result.score
-                    }
+                    },
+                    vector=vectors[i] if vectors is not None else None
                 )
                 documents.append(document)
                 
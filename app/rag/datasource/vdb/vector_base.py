@@ -1,6 +1,8 @@
 """向量存储基类"""
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Sequence
+
+import numpy as np
 
 from app.rag.models.document import Document
 
@@ -86,7 +88,7 @@ class BaseVector(ABC):
         
         Args:
             query_vector: 查询向量
-            **kwargs: 其他参数
+            **kwargs: 其他参数，include_vectors=True 时返回结果携带已存储的向量（Document.vector）
             
         Returns:
             List[Document]: 搜索结果
@@ -147,6 +149,28 @@ class BaseVector(ABC):
             if text.metadata and "doc_id" in text.metadata
         ]
         
+    @staticmethod
+    def _stack_vectors(vectors: Sequence[Any]) -> Optional[np.ndarray]:
+        """将检索返回的向量堆叠为 float32 矩阵
+        
+        每个结果的 Document.vector 取矩阵的行视图，避免逐个复制。
+        
+        Args:
+            vectors: 向量列表
+            
+        Returns:
+            Optional[np.ndarray]: 向量矩阵，向量缺失或维度不一致时返回None
+        """
+        if vectors is None or len(vectors) == 0:
+            return None
+        if any(vector is None for vector in vectors):
+            return None
+        try:
+            matrix = np.asarray(vectors, dtype=np.float32)
+        except ValueError:
+            return None
+        return matrix if matrix.ndim == 2 else None
+        
     @property
     def collection_name(self) -> str:
         """获取集合名称
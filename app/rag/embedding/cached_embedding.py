@@ -6,6 +6,7 @@ import numpy as np
 import time
 from datetime import timedelta
 
+from app.core.http_client import HttpClientManager
 from app.core.logger import Logger
 from app.core.redis_manager import redis_manager
 from app.schemas.llm import LLMConfig
@@ -67,7 +68,7 @@ class CacheEmbedding(Embeddings):
         cache_check_start = time.time()
         for i, text in enumerate(texts):
             text_hash = self._generate_hash(text)
-            cache_key = f"embedding:doc:{self.provider}:{self.model}:{text_hash}"
+            cache_key = self.document_cache_key(self.model, text_hash, self.provider)
             
             # 尝试从缓存获取
             cached = await redis_manager.get(cache_key)
@@ -116,7 +117,7 @@ class CacheEmbedding(Embeddings):
                     
                     # 缓存结果
                     text_hash = self._generate_hash(texts[idx])
-                    cache_key = f"embedding:doc:{self.provider}:{self.model}:{text_hash}"
+                    cache_key = self.document_cache_key(self.model, text_hash, self.provider)
                     await redis_manager.set(
                         cache_key,
                         json.dumps(embedding),
@@ -304,8 +305,6 @@ class CacheEmbedding(Embeddings):
         )
         
         try:
-            import httpx
-            
             # 准备请求数据
             request_prep_start = time.time()
             headers = {
@@ -321,13 +320,14 @@ class CacheEmbedding(Embeddings):
             
             # 发送请求
             request_start = time.time()
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.api_base}/embeddings",
-                    headers=headers,
-                    json=data,
-                    timeout=60.0
-                )
+            # 复用进程内共享的连接池
+            client = HttpClientManager.get_client()
+            response = await client.post(
+                f"{self.api_base}/embeddings",
+                headers=headers,
+                json=data,
+                timeout=60.0
+            )
             request_time = time.time() - request_start
                 
             # 检查响应
@@ -364,20 +364,6 @@ class CacheEmbedding(Embeddings):
                 except Exception as e:
                     Logger.error(f"在_call_embedding_api中记录用量失败: {str(e)}")
 
-
-            # 记录用量
-            if "usage" in result and self.db:
-                try:
-                    usage = result["usage"]
-                    usage_service = UsageService(self.db)
-                    await usage_service.record_usage(
-                        model_name=self.model,
-                        prompt_tokens=usage.get("prompt_tokens", 0),
-                        completion_tokens=usage.get("completion_tokens", 0)
-                    )
-                except Exception as e:
-                    Logger.error(f"在_call_embedding_api中记录用量失败: {str(e)}")
-
             # 提取向量
             embeddings = []
             vector_norms = []
@@ -464,6 +450,20 @@ class CacheEmbedding(Embeddings):
             
             raise
             
+    @staticmethod
+    def document_cache_key(model: str, text_hash: str, provider: str = "embedding_service") -> str:
+        """生成文档向量缓存键
+        
+        Args:
+            model: 模型名称
+            text_hash: 文本哈希值（见 _generate_hash）
+            provider: 提供商名称
+            
+        Returns:
+            str: 缓存键
+        """
+        return f"embedding:doc:{provider}:{model}:{text_hash}"
+        
     def _generate_hash(self, text: str) -> str:
         """生成文本哈希值
         
@@ -1,6 +1,6 @@
 """Excel提取器，负责从Excel文件中提取内容"""
 import os
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import pandas as pd
 
 from app.core.logger import Logger
@@ -46,67 +46,21 @@ class ExcelExtractor(BaseExtractor):
             total_content_length = 0
             
             for i, sheet_name in enumerate(sheet_names):
-                sheet_start_time = time.time()
-                
                 Logger.debug(f"开始处理工作表 {i+1}/{len(sheet_names)}: {sheet_name}")
                 
-                # 读取工作表
-                read_start_time = time.time()
-                df = pd.read_excel(file_path, sheet_name=sheet_name)
-                read_time = time.time() - read_start_time
-                
-                # 将DataFrame转换为字符串
-                if not df.empty:
-                    convert_start_time = time.time()
-                    
-                    # 处理表头
-                    headers = df.columns.tolist()
-                    header_text = " | ".join([str(h) for h in headers])
-                    
-                    # 处理数据行
-                    rows_text = []
-                    for _, row in df.iterrows():
-                        row_text = " | ".join([str(cell) for cell in row.tolist()])
-                        rows_text.append(row_text)
-                        
-                    # 合并所有文本
-                    sheet_text = header_text + "\n" + "\n".join(rows_text)
-                    convert_time = time.time() - convert_start_time
-                    
-                    sheet_time = time.time() - sheet_start_time
-                    
-                    # 统计信息
-                    sheet_rows = len(df)
-                    sheet_columns = len(df.columns)
-                    sheet_content_length = len(sheet_text)
-                    
-                    total_rows += sheet_rows
-                    total_columns = max(total_columns, sheet_columns)  # 取最大列数
-                    total_content_length += sheet_content_length
-                    
-                    Logger.debug(f"工作表 {sheet_name} 处理完成:")
-                    Logger.debug(f"  - 行数: {sheet_rows}, 列数: {sheet_columns}")
-                    Logger.debug(f"  - 内容长度: {sheet_content_length}")
-                    Logger.debug(f"  - 读取耗时: {read_time:.3f}秒, 转换耗时: {convert_time:.3f}秒")
-                    
-                    # 添加到结果列表
-                    results.append({
-                        "text": sheet_text,
-                        "metadata": {
-                            "source_type": "excel",
-                            "file_path": file_path,
-                            "sheet_name": sheet_name,
-                            "sheet_index": i,
-                            "rows": sheet_rows,
-                            "columns": sheet_columns,
-                            "content_length": sheet_content_length,
-                            "read_time": read_time,
-                            "convert_time": convert_time,
-                            "total_time": sheet_time
-                        }
-                    })
-                else:
+                content = self.extract_sheet(file_path, sheet_name, i)
+                if content is None:
                     Logger.debug(f"工作表 {sheet_name} 为空，跳过")
+                    continue
+                    
+                # 统计信息
+                metadata = content["metadata"]
+                total_rows += metadata["rows"]
+                total_columns = max(total_columns, metadata["columns"])  # 取最大列数
+                total_content_length += metadata["content_length"]
+                
+                # 添加到结果列表
+                results.append(content)
                     
             # 计算总处理时间
             total_time = time.time() - start_time
@@ -156,4 +110,82 @@ class ExcelExtractor(BaseExtractor):
                 error=str(e)
             )
             
-            return []
\ No newline at end of file
+            return []
+
+    @staticmethod
+    def list_sheets(file_path: str) -> List[str]:
+        """获取Excel文件的工作表名称列表
+        
+        Args:
+            file_path: Excel文件路径
+            
+        Returns:
+            List[str]: 工作表名称列表
+        """
+        return pd.ExcelFile(file_path).sheet_names
+
+    def extract_sheet(self, file_path: str, sheet_name: str, sheet_index: int) -> Optional[Dict[str, Any]]:
+        """同步提取单个工作表的内容，供提取进程池按工作表逐个提取
+        
+        Args:
+            file_path: Excel文件路径
+            sheet_name: 工作表名称
+            sheet_index: 工作表序号
+            
+        Returns:
+            Optional[Dict[str, Any]]: 工作表的文本内容和元数据，空工作表返回None
+        """
+        import time
+        sheet_start_time = time.time()
+        
+        # 读取工作表
+        read_start_time = time.time()
+        df = pd.read_excel(file_path, sheet_name=sheet_name)
+        read_time = time.time() - read_start_time
+        
+        if df.empty:
+            return None
+            
+        # 将DataFrame转换为字符串
+        convert_start_time = time.time()
+        
+        # 处理表头
+        headers = df.columns.tolist()
+        header_text = " | ".join([str(h) for h in headers])
+        
+        # 处理数据行
+        rows_text = []
+        for _, row in df.iterrows():
+            row_text = " | ".join([str(cell) for cell in row.tolist()])
+            rows_text.append(row_text)
+            
+        # 合并所有文本
+        sheet_text = header_text + "\n" + "\n".join(rows_text)
+        convert_time = time.time() - convert_start_time
+        
+        sheet_time = time.time() - sheet_start_time
+        
+        sheet_rows = len(df)
+        sheet_columns = len(df.columns)
+        sheet_content_length = len(sheet_text)
+        
+        Logger.debug(f"工作表 {sheet_name} 处理完成:")
+        Logger.debug(f"  - 行数: {sheet_rows}, 列数: {sheet_columns}")
+        Logger.debug(f"  - 内容长度: {sheet_content_length}")
+        Logger.debug(f"  - 读取耗时: {read_time:.3f}秒, 转换耗时: {convert_time:.3f}秒")
+        
+        return {
+            "text": sheet_text,
+            "metadata": {
+                "source_type": "excel",
+                "file_path": file_path,
+                "sheet_name": sheet_name,
+                "sheet_index": sheet_index,
+                "rows": sheet_rows,
+                "columns": sheet_columns,
+                "content_length": sheet_content_length,
+                "read_time": read_time,
+                "convert_time": convert_time,
+                "total_time": sheet_time
+            }
+        }
@@ -0,0 +1,206 @@
+"""文档提取结果缓存"""
+import asyncio
+import gzip
+import json
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List
+
+from app.core.config import settings
+from app.core.logger import Logger
+
+# 缓存文件后缀
+_SUFFIX = ".jsonl.gz"
+# 写入临时文件后缀
+_TEMP_SUFFIX = ".tmp"
+# 超过该时间未修改的临时文件视为进程崩溃遗留，淘汰时删除（秒）
+_STALE_TEMP_AGE = 24 * 3600
+
+
+class ExtractCacheWriter:
+    """提取结果缓存写入器
+
+    逐段写入临时文件，全部写完后原子重命名为缓存文件；中途放弃时删除临时文件，
+    不会留下不完整的缓存。
+    """
+
+    def __init__(self, path: Path):
+        """初始化
+
+        Args:
+            path: 缓存文件路径
+        """
+        self.path = path
+        self.temp_path = path.with_name(f"{path.name}.{uuid.uuid4().hex}{_TEMP_SUFFIX}")
+        self.file = None
+        self.size = 0
+
+    def _write(self, block: List[Dict[str, Any]]) -> None:
+        if self.file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.file = gzip.open(self.temp_path, "wt", encoding="utf-8")
+        self.file.write(json.dumps(block, ensure_ascii=False, default=str) + "\n")
+
+    def _commit(self) -> None:
+        if self.file is None:
+            return
+        self.file.close()
+        self.file = None
+        os.replace(self.temp_path, self.path)
+        self.size = self.path.stat().st_size
+
+    def _discard(self) -> None:
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        try:
+            self.temp_path.unlink()
+        except FileNotFoundError:
+            pass
+
+    async def write(self, block: List[Dict[str, Any]]) -> None:
+        """写入一段提取结果"""
+        await asyncio.to_thread(self._write, block)
+
+    async def commit(self) -> None:
+        """完成写入并发布缓存文件，随后按容量上限淘汰最久未使用的缓存"""
+        await asyncio.to_thread(self._commit)
+        await asyncio.to_thread(ExtractCache.evict)
+
+    async def discard(self) -> None:
+        """放弃写入"""
+        await asyncio.to_thread(self._discard)
+
+
+class ExtractCache:
+    """文档提取结果缓存
+
+    按 (文件哈希, 提取器, 提取器版本) 缓存提取出的内容段，gzip 压缩的 JSON Lines 文件保存在
+    RAG_EXTRACT_CACHE_DIR，每行一段。重新处理或重新训练内容未变的文件时直接读取缓存，
+    不再重复解析 PDF、Office 等文件。提取器逻辑变化时递增其 version 使旧缓存失效。
+
+    缓存总大小超过 RAG_EXTRACT_CACHE_MAX_SIZE_MB 时按最近访问时间（文件修改时间，命中时刷新）淘汰。
+    """
+
+    @staticmethod
+    def is_enabled() -> bool:
+        """是否启用缓存"""
+        return settings.RAG_EXTRACT_CACHE_MAX_SIZE_MB > 0
+
+    @staticmethod
+    def directory() -> Path:
+        """缓存目录"""
+        return Path(settings.RAG_EXTRACT_CACHE_DIR)
+
+    @classmethod
+    def path(cls, file_hash: str, extractor_name: str, extractor_version: int) -> Path:
+        """缓存文件路径
+
+        Args:
+            file_hash: 文件 sha256
+            extractor_name: 提取器名称
+            extractor_version: 提取器版本
+
+        Returns:
+            Path: 缓存文件路径
+        """
+        return cls.directory() / f"{file_hash}_{extractor_name}_v{extractor_version}{_SUFFIX}"
+
+    @classmethod
+    def lookup(cls, path: Path) -> bool:
+        """缓存是否存在，命中时刷新访问时间"""
+        try:
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            Logger.warning(f"访问提取缓存失败: {path}, {str(e)}")
+            return False
+
+    @classmethod
+    async def iter_blocks(cls, path: Path) -> AsyncIterator[List[Dict[str, Any]]]:
+        """逐段读取缓存
+
+        缓存文件损坏时删除该文件并抛出异常，下次提取时重新生成。
+
+        Args:
+            path: 缓存文件路径
+
+        Yields:
+            List[Dict[str, Any]]: 一段的文本内容列表
+
+        Raises:
+            FileNotFoundError: 缓存文件在命中检查之后被淘汰，调用方应按未命中处理
+        """
+        file = None
+        try:
+            file = await asyncio.to_thread(gzip.open, path, "rt", encoding="utf-8")
+            while True:
+                line = await asyncio.to_thread(file.readline)
+                if not line:
+                    return
+                yield json.loads(line)
+        except FileNotFoundError:
+            raise
+        except (OSError, EOFError, ValueError) as e:
+            Logger.warning(f"提取缓存已损坏，删除: {path}, {str(e)}")
+            cls.remove(path)
+            raise
+        finally:
+            if file is not None:
+                file.close()
+
+    @classmethod
+    def open_writer(cls, path: Path) -> ExtractCacheWriter:
+        """创建缓存写入器"""
+        return ExtractCacheWriter(path)
+
+    @staticmethod
+    def remove(path: Path) -> None:
+        """删除缓存文件"""
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+    @classmethod
+    def evict(cls) -> None:
+        """删除进程崩溃遗留的临时文件，缓存总大小超过上限时删除最久未使用的缓存文件"""
+        limit = settings.RAG_EXTRACT_CACHE_MAX_SIZE_MB * 1024 * 1024
+        stale_before = time.time() - _STALE_TEMP_AGE
+        entries = []
+        total = 0
+        try:
+            for entry in os.scandir(cls.directory()):
+                if entry.name.endswith(_TEMP_SUFFIX):
+                    try:
+                        if entry.stat().st_mtime < stale_before:
+                            os.remove(entry.path)
+                    except FileNotFoundError:
+                        pass
+                    continue
+                if not entry.name.endswith(_SUFFIX):
+                    continue
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        except FileNotFoundError:
+            return
+        if total <= limit:
+            return
+
+        entries.sort()
+        removed = 0
+        for _, size, path in entries:
+            if total <= limit:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        Logger.info(f"提取缓存超出上限，已淘汰 {removed} 个缓存文件，剩余 {total / 1024 / 1024:.1f}MB")
@@ -0,0 +1,315 @@
+"""文档提取进程池"""
+import asyncio
+import multiprocessing
+import os
+import weakref
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.logger import Logger
+from app.rag.exceptions import DocumentProcessingException
+from app.rag.extractor.extract_cache import ExtractCache, ExtractCacheWriter
+
+# 进程内复用的提取处理器
+_processor = None
+
+
+def _get_processor():
+    """获取进程内复用的提取处理器"""
+    global _processor
+    if _processor is None:
+        from app.rag.extractor.extract_processor import ExtractProcessor
+
+        _processor = ExtractProcessor()
+    return _processor
+
+
+def _init_worker(memory_limit_mb: int) -> None:
+    """工作进程初始化：限制进程数据段大小，超出时提取抛出 MemoryError 而不是拖垮整机
+
+    使用 RLIMIT_DATA 而不是 RLIMIT_AS：地址空间包含共享库映射和线程栈等预留但未使用的虚拟内存，
+    按地址空间限制时即使实际占用很小也可能在加载依赖库时失败。
+    """
+    if memory_limit_mb <= 0:
+        return
+    try:
+        import resource
+
+        limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_DATA, (limit, limit))
+    except (ImportError, ValueError, OSError) as e:
+        Logger.warning(f"设置提取进程内存限制失败: {str(e)}")
+
+
+def _extract_contents(file_path: str) -> List[Dict[str, Any]]:
+    """在工作进程中用对应格式的提取器提取文件内容"""
+    # 提取器接口是协程，但内部都是同步调用，在工作进程中直接运行
+    return asyncio.run(_get_processor().get_extractor(file_path).extract(file_path))
+
+
+def _count_pdf_pages(file_path: str) -> int:
+    """在工作进程中获取PDF页数"""
+    from app.rag.extractor.pdf_extractor import PdfExtractor
+
+    return PdfExtractor.count_pages(file_path)
+
+
+def _extract_pdf_pages(file_path: str, start: int, end: int) -> List[Dict[str, Any]]:
+    """在工作进程中提取PDF指定页码范围的内容"""
+    from app.rag.extractor.pdf_extractor import PdfExtractor
+
+    return PdfExtractor().extract_pages(file_path, start, end)
+
+
+def _list_excel_sheets(file_path: str) -> List[str]:
+    """在工作进程中获取Excel工作表名称"""
+    from app.rag.extractor.excel_extractor import ExcelExtractor
+
+    return ExcelExtractor.list_sheets(file_path)
+
+
+def _extract_excel_sheet(file_path: str, sheet_name: str, sheet_index: int) -> List[Dict[str, Any]]:
+    """在工作进程中提取单个Excel工作表的内容"""
+    from app.rag.extractor.excel_extractor import ExcelExtractor
+
+    content = ExcelExtractor().extract_sheet(file_path, sheet_name, sheet_index)
+    return [content] if content else []
+
+
+class ExtractPool:
+    """文档提取进程池
+
+    PyMuPDF、python-docx、pandas、unstructured 等提取器都是同步实现，直接在事件循环中调用会阻塞
+    同一进程内的全部请求。提取统一提交到有界进程池执行：
+    - 同时提交的任务数不超过工作进程数，超时从开始执行时计算，不包含排队等待的时间；
+    - 超过 RAG_EXTRACT_TIMEOUT 的任务所在的进程池会被终止并重建（ProcessPoolExecutor 无法单独结束
+      一个任务），同一进程池中被连带中断的任务重新提交，不计入重试次数；工作进程自身异常退出时重试一次；
+    - 工作进程以 spawn 方式启动，不继承父进程已加载的模型（如 torch）和连接，
+      数据段大小限制为 RAG_EXTRACT_MEMORY_LIMIT_MB；
+    - PDF按 RAG_EXTRACT_PDF_PAGES_PER_TASK 页一段、Excel按工作表拆分为多个任务并行提取，
+      iter_contents 按顺序逐段产出，超大文件不必整体载入内存；
+    - 提供文件哈希时提取结果写入 ExtractCache，内容未变的文件再次提取时直接读取缓存。
+    """
+
+    _executor: Optional[ProcessPoolExecutor] = None
+    _slots: Optional[asyncio.Semaphore] = None
+    # 因任务超时被主动终止的进程池
+    _terminated: "weakref.WeakSet[ProcessPoolExecutor]" = weakref.WeakSet()
+
+    @classmethod
+    def get_executor(cls) -> ProcessPoolExecutor:
+        """获取进程池，首次调用或被终止后重新创建
+
+        Returns:
+            ProcessPoolExecutor: 进程池
+        """
+        if cls._executor is None:
+            cls._executor = ProcessPoolExecutor(
+                max_workers=settings.RAG_EXTRACT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(settings.RAG_EXTRACT_MEMORY_LIMIT_MB,),
+            )
+            Logger.info(f"提取进程池已启动: {settings.RAG_EXTRACT_WORKERS} 个工作进程")
+        return cls._executor
+
+    @classmethod
+    def shutdown(cls) -> None:
+        """关闭进程池"""
+        if cls._executor is not None:
+            cls._executor.shutdown(wait=False, cancel_futures=True)
+            cls._executor = None
+
+    @classmethod
+    def _terminate(cls, executor: ProcessPoolExecutor, timed_out: bool = False) -> None:
+        """终止进程池中的全部工作进程（用于结束超时任务）
+
+        Args:
+            executor: 进程池
+            timed_out: 是否因任务超时终止，此时被连带中断的任务重新提交时不计入重试次数
+        """
+        if timed_out:
+            cls._terminated.add(executor)
+        if cls._executor is executor:
+            cls._executor = None
+        # ProcessPoolExecutor 没有终止单个任务的接口，只能结束其工作进程
+        for process in list((getattr(executor, "_processes", None) or {}).values()):
+            process.kill()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    @classmethod
+    async def run(cls, func: Callable, *args: Any, timeout: Optional[float] = None) -> Any:
+        """在进程池中执行函数
+
+        Args:
+            func: 可在子进程中执行的模块级函数
+            *args: 函数参数
+            timeout: 超时时间（秒），默认 RAG_EXTRACT_TIMEOUT
+
+        Returns:
+            Any: 函数返回值
+
+        Raises:
+            DocumentProcessingException: 执行超时或工作进程异常退出
+        """
+        timeout = timeout or settings.RAG_EXTRACT_TIMEOUT
+        if cls._slots is None:
+            cls._slots = asyncio.Semaphore(settings.RAG_EXTRACT_WORKERS)
+
+        async with cls._slots:
+            crashes = 0
+            while True:
+                executor = cls.get_executor()
+                future = executor.submit(func, *args)
+                try:
+                    return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+                except asyncio.TimeoutError:
+                    Logger.warning(f"提取任务超时（{timeout}秒），终止提取进程池: {func.__name__}{args}")
+                    cls._terminate(executor, timed_out=True)
+                    raise DocumentProcessingException(message=f"提取超时（超过 {timeout} 秒）")
+                except BrokenProcessPool:
+                    if executor in cls._terminated:
+                        # 进程池因其他任务超时被终止，本任务没有出错，直接重新提交
+                        continue
+                    # 工作进程异常退出（如超出内存限制被系统结束）
+                    cls._terminate(executor)
+                    crashes += 1
+                    if crashes > 1:
+                        raise DocumentProcessingException(
+                            message="提取进程异常退出，文件可能过大或已损坏"
+                        )
+                except MemoryError:
+                    raise DocumentProcessingException(
+                        message=f"提取超出内存限制（{settings.RAG_EXTRACT_MEMORY_LIMIT_MB}MB）"
+                    )
+
+    @classmethod
+    async def extract_contents(
+        cls, file_path: str, file_hash: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """提取文件全部内容
+
+        Args:
+            file_path: 文件路径
+            file_hash: 文件 sha256，提供时使用提取结果缓存
+
+        Returns:
+            List[Dict[str, Any]]: 提取的文本内容列表，每个元素包含文本内容和元数据
+        """
+        return [
+            content
+            async for block in cls.iter_contents(file_path, file_hash)
+            for content in block
+        ]
+
+    @classmethod
+    async def iter_contents(
+        cls, file_path: str, file_hash: Optional[str] = None
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """按段提取文件内容，提供文件哈希时优先读取提取结果缓存，未命中时提取并写入缓存
+
+        Args:
+            file_path: 文件路径
+            file_hash: 文件 sha256
+
+        Yields:
+            List[Dict[str, Any]]: 一段的文本内容列表
+        """
+        if not file_hash or not ExtractCache.is_enabled():
+            async for block in cls._extract_blocks(file_path):
+                yield block
+            return
+
+        extractor = _get_processor().get_extractor(file_path)
+        cache_path = ExtractCache.path(file_hash, type(extractor).__name__, extractor.version)
+        if await asyncio.to_thread(ExtractCache.lookup, cache_path):
+            Logger.debug(f"提取缓存命中: {file_path} -> {cache_path.name}")
+            yielded = False
+            try:
+                async for block in ExtractCache.iter_blocks(cache_path):
+                    yielded = True
+                    yield block
+                return
+            except FileNotFoundError:
+                # 命中检查之后缓存被并发淘汰，按未命中重新提取
+                if yielded:
+                    raise
+                Logger.debug(f"提取缓存已被淘汰，重新提取: {file_path}")
+
+        writer: Optional[ExtractCacheWriter] = ExtractCache.open_writer(cache_path)
+        completed = False
+        try:
+            async for block in cls._extract_blocks(file_path):
+                try:
+                    if writer is not None:
+                        await writer.write(block)
+                except OSError as e:
+                    Logger.warning(f"写入提取缓存失败: {cache_path}, {str(e)}")
+                    await writer.discard()
+                    writer = None
+                yield block
+            completed = True
+        finally:
+            if writer is not None:
+                if completed:
+                    try:
+                        await writer.commit()
+                    except OSError as e:
+                        Logger.warning(f"保存提取缓存失败: {cache_path}, {str(e)}")
+                        await writer.discard()
+                else:
+                    # 提取失败或消费方提前结束，不保留不完整的缓存
+                    await writer.discard()
+
+    @classmethod
+    async def _extract_blocks(cls, file_path: str) -> AsyncIterator[List[Dict[str, Any]]]:
+        """按段提取文件内容：PDF每段为一个页码范围，Excel每段为一个工作表，其他格式只有一段
+
+        各段在进程池中并行提取，按文件中的顺序产出；最多预取 RAG_EXTRACT_WORKERS 段，
+        消费方处理得慢时提取随之暂停，内存占用与文件大小无关。
+
+        Args:
+            file_path: 文件路径
+
+        Yields:
+            List[Dict[str, Any]]: 一段的文本内容列表
+        """
+        if not os.path.exists(file_path):
+            raise DocumentProcessingException(message=f"文件不存在: {file_path}", file_path=file_path)
+
+        jobs: List[Tuple[Callable, tuple]] = []
+        suffix = Path(file_path).suffix.lower()
+        if suffix == ".pdf" and settings.RAG_EXTRACT_PDF_PAGES_PER_TASK > 0:
+            page_count = await cls.run(_count_pdf_pages, file_path)
+            step = settings.RAG_EXTRACT_PDF_PAGES_PER_TASK
+            jobs = [
+                (_extract_pdf_pages, (file_path, start, start + step))
+                for start in range(0, page_count, step)
+            ]
+        elif suffix in (".xlsx", ".xls"):
+            sheet_names = await cls.run(_list_excel_sheets, file_path)
+            jobs = [
+                (_extract_excel_sheet, (file_path, sheet_name, index))
+                for index, sheet_name in enumerate(sheet_names)
+            ]
+        else:
+            jobs = [(_extract_contents, (file_path,))]
+
+        pending: deque = deque()
+        try:
+            for func, args in jobs:
+                pending.append(asyncio.ensure_future(cls.run(func, *args)))
+                if len(pending) >= settings.RAG_EXTRACT_WORKERS:
+                    yield await pending.popleft()
+            while pending:
+                yield await pending.popleft()
+        finally:
+            # 消费方提前结束（出错或取消）时不再等待剩余的段
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
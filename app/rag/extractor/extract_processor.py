@@ -3,9 +3,11 @@ import os
 from pathlib import Path
 from typing import Dict, List, Any, Optional, Union
 import tempfile
+from datetime import datetime
 
 from app.core.logger import Logger
 from app.models.document import Document as DBDocument
+from app.rag.extractor.extract_pool import ExtractPool
 from app.rag.models.document import Document
 from app.rag.extractor.extractor_base import BaseExtractor
 from app.rag.extractor.text_extractor import TextExtractor
@@ -18,7 +20,10 @@ from app.rag.extractor.csv_extractor import CsvExtractor
 from app.rag.extractor.pptx_extractor import PptxExtractor
 
 class ExtractProcessor:
-    """文档处理器，负责处理多种格式的文档"""
+    """文档处理器，负责处理多种格式的文档
+    
+    文件提取在提取进程池（ExtractPool）中执行，不阻塞事件循环。
+    """
     
     def __init__(self):
         """初始化文档处理器"""
@@ -36,6 +41,41 @@ class ExtractProcessor:
             ".csv": CsvExtractor(),
             ".pptx": PptxExtractor(),
         }
+    
+    def get_extractor(self, file_path: str) -> BaseExtractor:
+        """按文件扩展名选择提取器，未知格式按纯文本处理
+        
+        Args:
+            file_path: 文件路径
+            
+        Returns:
+            BaseExtractor: 提取器
+        """
+        file_extension = Path(file_path).suffix.lower()
+        extractor = self.extractors.get(file_extension)
+        if not extractor:
+            Logger.warning(f"No extractor found for file extension: {file_extension}, using TextExtractor")
+            return TextExtractor()
+        Logger.debug(f"使用提取器: {extractor.__class__.__name__} for {file_extension}")
+        return extractor
+    
+    @staticmethod
+    def combine_contents(extracted_contents: List[Any]) -> str:
+        """合并提取器返回的内容列表为文本
+        
+        Args:
+            extracted_contents: 提取的文本内容列表
+            
+        Returns:
+            str: 合并后的文本
+        """
+        combined_content = ""
+        for content in extracted_contents:
+            if isinstance(content, dict) and "text" in content:
+                combined_content += content["text"] + "\n"
+            elif isinstance(content, str):
+                combined_content += content + "\n"
+        return combined_content.strip()
         
     async def process_document(self, document: DBDocument) -> List[Document]:
         """处理数据库中的文档
@@ -85,7 +125,9 @@ class ExtractProcessor:
                 file_path = document.doc_metadata["file_path"]
                 Logger.debug(f"处理文件类型文档: ID {document.id}, 文件路径: {file_path}")
                 
-                result = await self.process_file(file_path, document.id, document.title)
+                result = await self.process_file(
+                    file_path, document.id, document.title, file_hash=document.file_hash
+                )
                 
                 # 记录处理成功
                 process_time = time.time() - start_time
@@ -118,13 +160,16 @@ class ExtractProcessor:
             
             return []
             
-    async def process_file(self, file_path: str, document_id: int, title: str) -> List[Document]:
+    async def process_file(
+        self, file_path: str, document_id: int, title: str, file_hash: Optional[str] = None
+    ) -> List[Document]:
         """处理文件
         
         Args:
             file_path: 文件路径
             document_id: 文档ID
             title: 文档标题
+            file_hash: 文件 sha256，提供时优先读取提取结果缓存
             
         Returns:
             List[Document]: 处理后的文档对象列表
@@ -146,17 +191,9 @@ class ExtractProcessor:
                 Logger.error(f"File not found: {file_path}")
                 return []
             
-            # 选择合适的提取器
-            extractor = self.extractors.get(file_extension)
-            if not extractor:
-                Logger.warning(f"No extractor found for file extension: {file_extension}, using TextExtractor")
-                extractor = TextExtractor()
-            else:
-                Logger.debug(f"使用提取器: {extractor.__class__.__name__} for {file_extension}")
-                
-            # 提取文本内容
+            # 在提取进程池中提取文本内容（内容未变的文件读取提取结果缓存）
             extraction_start_time = time.time()
-            extracted_contents = await extractor.extract(file_path)
+            extracted_contents = await ExtractPool.extract_contents(file_path, file_hash)
             extraction_time = time.time() - extraction_start_time
             
             Logger.debug(f"文件提取完成: 耗时 {extraction_time:.3f}秒, 提取了 {len(extracted_contents)} 个内容块")
@@ -247,26 +284,13 @@ class ExtractProcessor:
                 Logger.error(f"File not found: {file_path}")
                 return ""
             
-            # 选择合适的提取器
-            extractor = self.extractors.get(file_extension)
-            if not extractor:
-                Logger.warning(f"No extractor found for file extension: {file_extension}, using TextExtractor")
-                extractor = TextExtractor()
-            else:
-                Logger.debug(f"使用提取器: {extractor.__class__.__name__} for {file_extension}")
-                
-            # 提取文本内容
+            # 在提取进程池中提取文本内容
             extraction_start_time = time.time()
-            extracted_contents = await extractor.extract(file_path)
+            extracted_contents = await ExtractPool.extract_contents(file_path)
             extraction_time = time.time() - extraction_start_time
             
             # 合并所有内容
-            combined_content = ""
-            for content in extracted_contents:
-                if isinstance(content, dict) and "text" in content:
-                    combined_content += content["text"] + "\n"
-                elif isinstance(content, str):
-                    combined_content += content + "\n"
+            combined_content = self.combine_contents(extracted_contents)
             
             # 计算总处理时间
             total_time = time.time() - start_time
@@ -283,7 +307,7 @@ class ExtractProcessor:
                 extraction_time=extraction_time
             )
             
-            return combined_content.strip()
+            return combined_content
             
         except Exception as e:
             # 计算处理时间
@@ -303,4 +327,46 @@ class ExtractProcessor:
                 error=str(e)
             )
             
-            return ""
\ No newline at end of file
+            return ""
+    
+    async def extract_and_save(self, document_id: int) -> bool:
+        """提取上传文档的文件内容并保存到文档记录（上传后在后台任务中执行）
+        
+        后台任务运行时请求的数据库会话可能已关闭，因此使用独立会话。
+        
+        Args:
+            document_id: 文档ID
+            
+        Returns:
+            bool: 是否提取成功
+        """
+        from sqlalchemy import select
+        from app.models.database import AsyncSessionLocal
+        
+        async with AsyncSessionLocal() as db:
+            document = (await db.execute(
+                select(DBDocument).filter(DBDocument.id == document_id)
+            )).scalar_one_or_none()
+            if not document or not document.storage_path:
+                Logger.warning(f"Document {document_id} not found or has no stored file, skip extraction")
+                return False
+            
+            succeeded = False
+            try:
+                content = self.combine_contents(await ExtractPool.extract_contents(
+                    document.storage_path, document.file_hash
+                ))
+                if not content:
+                    raise ValueError("提取内容为空")
+                document.content = content
+                document.processing_status = 'completed'
+                document.processing_error = None
+                document.processed_at = datetime.now()
+                succeeded = True
+                Logger.info(f"Document {document_id} extracted successfully, content length: {len(content)}")
+            except Exception as e:
+                document.processing_status = 'failed'
+                document.processing_error = f"内容提取失败: {str(e)}"[:1024]
+                Logger.error(f"Document {document_id} extraction failed: {str(e)}")
+            await db.commit()
+            return succeeded
@@ -8,6 +8,9 @@ class BaseExtractor(ABC):
     所有具体的文档提取器都应该继承这个基类
     """
     
+    # 提取逻辑变化（输出内容会不同）时递增，使提取结果缓存失效
+    version = 1
+    
     @abstractmethod
     async def extract(self, file_path: str) -> List[Dict[str, Any]]:
         """从文档中提取文本内容
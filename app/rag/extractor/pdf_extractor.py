@@ -40,41 +40,12 @@ class PdfExtractor(BaseExtractor):
             Logger.debug(f"PDF文件打开成功: 总页数 {total_pages}, 打开耗时: {open_time:.3f}秒")
             
             # 提取每一页的内容
-            results = []
-            total_text_length = 0
-            
-            for page_num, page in enumerate(doc):
-                page_start_time = time.time()
-                
-                # 提取文本
-                text = page.get_text()
-                page_text_length = len(text)
-                total_text_length += page_text_length
-                
-                page_time = time.time() - page_start_time
-                
-                # 记录页面处理进度
-                if page_num % 10 == 0 or page_num == total_pages - 1:  # 每10页或最后一页记录一次
-                    Logger.debug(f"PDF页面提取进度: {page_num + 1}/{total_pages}, 当前页文本长度: {page_text_length}")
-                
-                # 提取元数据
-                metadata = {
-                    "source_type": "pdf",
-                    "file_path": file_path,
-                    "page_number": page_num + 1,
-                    "total_pages": total_pages,
-                    "page_text_length": page_text_length,
-                    "page_extraction_time": page_time
-                }
-                
-                # 添加到结果列表
-                results.append({
-                    "text": text,
-                    "metadata": metadata
-                })
-                
-            # 关闭文档
-            doc.close()
+            try:
+                results = self._extract_pages(doc, file_path, 0, total_pages)
+            finally:
+                # 关闭文档
+                doc.close()
+            total_text_length = sum(len(result["text"]) for result in results)
             
             # 计算总处理时间
             total_time = time.time() - start_time
@@ -119,4 +90,65 @@ class PdfExtractor(BaseExtractor):
                 error=str(e)
             )
             
-            return []
\ No newline at end of file
+            return []
+
+    @staticmethod
+    def count_pages(file_path: str) -> int:
+        """获取PDF文件页数
+        
+        Args:
+            file_path: PDF文件路径
+            
+        Returns:
+            int: 页数
+        """
+        with fitz.open(file_path) as doc:
+            return len(doc)
+
+    def extract_pages(self, file_path: str, start: int, end: int) -> List[Dict[str, Any]]:
+        """同步提取PDF文件指定页码范围的内容，供提取进程池按页码范围并行提取
+        
+        Args:
+            file_path: PDF文件路径
+            start: 起始页序号（从0开始，包含）
+            end: 结束页序号（不包含）
+            
+        Returns:
+            List[Dict[str, Any]]: 提取的文本内容列表，每个元素对应一页
+        """
+        with fitz.open(file_path) as doc:
+            return self._extract_pages(doc, file_path, start, min(end, len(doc)))
+
+    @staticmethod
+    def _extract_pages(doc, file_path: str, start: int, end: int) -> List[Dict[str, Any]]:
+        """提取已打开PDF文档中指定页码范围的内容"""
+        import time
+
+        total_pages = len(doc)
+        results = []
+        for page_num in range(start, end):
+            page_start_time = time.time()
+            
+            # 提取文本
+            text = doc[page_num].get_text()
+            page_text_length = len(text)
+            
+            page_time = time.time() - page_start_time
+            
+            # 记录页面处理进度
+            if page_num % 10 == 0 or page_num == total_pages - 1:  # 每10页或最后一页记录一次
+                Logger.debug(f"PDF页面提取进度: {page_num + 1}/{total_pages}, 当前页文本长度: {page_text_length}")
+            
+            # 添加到结果列表
+            results.append({
+                "text": text,
+                "metadata": {
+                    "source_type": "pdf",
+                    "file_path": file_path,
+                    "page_number": page_num + 1,
+                    "total_pages": total_pages,
+                    "page_text_length": page_text_length,
+                    "page_extraction_time": page_time
+                }
+            })
+        return results
@@ -0,0 +1,226 @@
+"""分块与向量批量删除器"""
+import time
+from typing import List, Optional, Sequence
+
+from sqlalchemy import case, delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.logger import Logger
+from app.models.document import Document as DBDocument
+from app.models.document_chunk import DocumentChunk
+from app.models.document_embedding import DocumentEmbedding
+from app.models.knowledge_base import KnowledgeBase
+from app.rag.datasource.vdb.vector_base import BaseVector
+from app.rag.index_processor.index_cache import IndexCache
+from app.rag.keyword.bm25_index import BM25Index
+from app.rag.keyword.keyword_index_factory import KeywordIndexFactory
+
+
+class ChunkBulkDeleter:
+    """分块与向量批量删除器
+
+    按文档ID分批，每批执行一条 DELETE ... WHERE document_id IN (...) 删除分块，
+    向量行通过分块ID子查询一并删除（不依赖数据库的外键级联设置），
+    向量存储按批删除，每批提交一次以缩短写事务；全部完成后递增一次索引缓存代数。
+    commit 为False时不做任何提交，由调用方把删除与后续写入放在同一事务中提交；
+    此时向量存储不参与数据库事务，其删除推迟到调用方提交后执行 delete_pending_vectors。
+    """
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        knowledge_base: KnowledgeBase,
+        vector_store: Optional[BaseVector] = None,
+        batch_size: Optional[int] = None,
+        commit: bool = True,
+    ) -> None:
+        """
+        初始化
+
+        Args:
+            db: 数据库会话
+            knowledge_base: 知识库对象
+            vector_store: 向量存储，为None时不删除向量存储中的数据
+            batch_size: 每批删除的文档数（按分块删除时为分块数），默认读取配置
+            commit: 是否每批提交，为False时由调用方提交
+        """
+        self.db = db
+        self.knowledge_base = knowledge_base
+        self.vector_store = vector_store
+        self.batch_size = batch_size or settings.RAG_BULK_DELETE_BATCH_SIZE
+        self.commit = commit
+        # 不提交模式下待数据库提交后再删除的向量ID
+        self.pending_vector_ids: List[str] = []
+        self.deleted_chunks = 0
+        self.deleted_embeddings = 0
+        self.vector_store_duration = 0.0
+
+    async def delete_documents(self, document_ids: Sequence[int]) -> None:
+        """删除指定文档的分块、向量及其关键词索引项
+
+        Args:
+            document_ids: 文档ID列表
+        """
+        start_time = time.time()
+        keyword_index = KeywordIndexFactory.create_keyword_index(self.knowledge_base, self.db)
+        document_ids = [int(document_id) for document_id in document_ids]
+
+        for start in range(0, len(document_ids), self.batch_size):
+            await self._delete_batch(
+                keyword_index,
+                DocumentChunk.document_id.in_(document_ids[start:start + self.batch_size])
+            )
+
+        await IndexCache.bump_generation(self.knowledge_base.id)
+
+        Logger.rag_performance_metrics(
+            operation="chunk_bulk_delete",
+            duration=time.time() - start_time,
+            kb_id=self.knowledge_base.id,
+            document_count=len(document_ids),
+            deleted_chunks=self.deleted_chunks,
+            deleted_embeddings=self.deleted_embeddings,
+            batch_size=self.batch_size
+        )
+
+    async def delete_chunks(self, chunk_ids: Sequence[int]) -> None:
+        """删除指定分块、向量及其关键词索引项（增量训练中已消失的分块）
+
+        Args:
+            chunk_ids: 分块ID列表
+        """
+        start_time = time.time()
+        keyword_index = KeywordIndexFactory.create_keyword_index(self.knowledge_base, self.db)
+        chunk_ids = list(chunk_ids)
+
+        for start in range(0, len(chunk_ids), self.batch_size):
+            await self._delete_batch(
+                keyword_index,
+                DocumentChunk.id.in_(chunk_ids[start:start + self.batch_size])
+            )
+
+        await IndexCache.bump_generation(self.knowledge_base.id)
+
+        Logger.rag_performance_metrics(
+            operation="chunk_bulk_delete_chunks",
+            duration=time.time() - start_time,
+            kb_id=self.knowledge_base.id,
+            chunk_count=len(chunk_ids),
+            deleted_chunks=self.deleted_chunks,
+            deleted_embeddings=self.deleted_embeddings,
+            batch_size=self.batch_size
+        )
+
+    async def delete_all(self) -> None:
+        """删除知识库全部分块、向量，并清空关键词索引和向量存储
+
+        文档的已索引哈希与首批删除在同一事务中清空：删除中途中断或之后的训练中断时，
+        残留分块的文档不会因哈希仍与文件一致而被增量训练当作未变化跳过。
+        """
+        start_time = time.time()
+
+        if self.vector_store is not None:
+            vector_store_start_time = time.time()
+            await self.vector_store.delete()
+            self.vector_store_duration += time.time() - vector_store_start_time
+
+        await self.db.execute(
+            update(DBDocument)
+            .where(DBDocument.knowledge_base_id == self.knowledge_base.id)
+            .values(content_hash=None, indexed_file_hash=None)
+            .execution_options(synchronize_session=False)
+        )
+        keyword_index = KeywordIndexFactory.create_keyword_index(self.knowledge_base, self.db)
+        await keyword_index.clear(self.db, self.knowledge_base.id)
+
+        document_ids: List[int] = list((await self.db.execute(
+            select(DBDocument.id).where(DBDocument.knowledge_base_id == self.knowledge_base.id)
+        )).scalars().all())
+        for start in range(0, len(document_ids), self.batch_size):
+            await self._delete_rows(
+                DocumentChunk.document_id.in_(document_ids[start:start + self.batch_size])
+            )
+            if self.commit:
+                await self.db.commit()
+        # 没有文档时仍需提交关键词索引的清空
+        if self.commit:
+            await self.db.commit()
+
+        await IndexCache.bump_generation(self.knowledge_base.id)
+
+        Logger.rag_performance_metrics(
+            operation="chunk_bulk_delete_all",
+            duration=time.time() - start_time,
+            kb_id=self.knowledge_base.id,
+            document_count=len(document_ids),
+            deleted_chunks=self.deleted_chunks,
+            deleted_embeddings=self.deleted_embeddings,
+            batch_size=self.batch_size
+        )
+
+    async def _delete_batch(self, keyword_index, chunk_filter) -> None:
+        """删除一批分块：移除倒排项和向量存储数据后执行集合删除，按需提交"""
+        # 只读取移除倒排项和向量所需的列，旧数据缺失词项向量时才读取内容
+        rows = (await self.db.execute(
+            select(
+                DocumentChunk.id,
+                DocumentChunk.term_freqs,
+                DocumentChunk.term_count,
+                case(
+                    (DocumentChunk.term_freqs.is_(None), DocumentChunk.content),
+                    else_=None
+                ).label("content"),
+                DocumentChunk.chunk_metadata["doc_id"].as_string().label("vector_id"),
+            ).where(chunk_filter)
+        )).all()
+        if not rows:
+            return
+
+        await keyword_index.remove_chunks(
+            self.db,
+            self.knowledge_base.id,
+            [(row.id, BM25Index.chunk_term_vector(row, self.knowledge_base.id)[0]) for row in rows]
+        )
+
+        if self.vector_store is not None:
+            vector_ids = [row.vector_id for row in rows if row.vector_id]
+            if vector_ids and not self.commit:
+                self.pending_vector_ids.extend(vector_ids)
+            elif vector_ids:
+                vector_store_start_time = time.time()
+                await self.vector_store.delete_by_ids(vector_ids)
+                self.vector_store_duration += time.time() - vector_store_start_time
+
+        await self._delete_rows(chunk_filter)
+        if self.commit:
+            await self.db.commit()
+
+    async def delete_pending_vectors(self) -> None:
+        """调用方提交后删除推迟的向量存储数据（不提交模式）"""
+        vector_ids, self.pending_vector_ids = self.pending_vector_ids, []
+        if self.vector_store is None or not vector_ids:
+            return
+        vector_store_start_time = time.time()
+        await self.vector_store.delete_by_ids(vector_ids)
+        self.vector_store_duration += time.time() - vector_store_start_time
+
+    def discard_pending_vectors(self) -> None:
+        """调用方回滚后放弃推迟的向量删除（不提交模式）"""
+        self.pending_vector_ids = []
+
+    async def _delete_rows(self, chunk_filter) -> None:
+        """按分块条件删除向量行和分块行"""
+        chunk_ids = select(DocumentChunk.id).where(chunk_filter)
+        result = await self.db.execute(
+            delete(DocumentEmbedding)
+            .where(DocumentEmbedding.chunk_id.in_(chunk_ids))
+            .execution_options(synchronize_session=False)
+        )
+        self.deleted_embeddings += result.rowcount or 0
+        result = await self.db.execute(
+            delete(DocumentChunk)
+            .where(chunk_filter)
+            .execution_options(synchronize_session=False)
+        )
+        self.deleted_chunks += result.rowcount or 0
@@ -0,0 +1,195 @@
+"""分块与向量批量写入器"""
+import hashlib
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.logger import Logger
+from app.models.document_chunk import DocumentChunk
+from app.models.document_embedding import DocumentEmbedding
+from app.rag.models.document import Document
+
+# 不支持 RETURNING 的数据库上，单条多行 INSERT 的绑定参数上限（兼容旧版 SQLite 的 999）
+_MAX_BIND_PARAMS = 999
+
+
+def compute_content_hash(text: str) -> str:
+    """计算文本内容哈希
+
+    Args:
+        text: 文本
+
+    Returns:
+        str: SHA-256 十六进制摘要
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ChunkBulkWriter:
+    """分块与向量批量写入器
+
+    按批执行多行 INSERT：数据库支持按参数顺序返回的 RETURNING 时直接取回分块ID，
+    否则（旧版 SQLite）先按 max(id) 预分配ID再写入；同一批的向量行紧随分块行写入，
+    每写满 commit_rows 行提交一次。写入器不负责最终提交，调用方在完成后续步骤后提交。
+    """
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        embedding_model: Optional[str] = None,
+        batch_size: Optional[int] = None,
+        commit_rows: Optional[int] = None,
+    ) -> None:
+        """
+        初始化
+
+        Args:
+            db: 数据库会话
+            embedding_model: 嵌入模型名称，为None时不写入向量行
+            batch_size: 每批写入的分块数，默认读取配置
+            commit_rows: 每写入多少行提交一次，默认读取配置，0 表示不做中间提交
+        """
+        self.db = db
+        self.embedding_model = embedding_model
+        self.batch_size = batch_size or settings.RAG_BULK_INSERT_BATCH_SIZE
+        self.commit_rows = settings.RAG_BULK_COMMIT_ROWS if commit_rows is None else commit_rows
+        self.chunk_count = 0
+        self.embedding_count = 0
+        self.duration = 0.0
+        self._uncommitted_rows = 0
+
+    @property
+    def row_count(self) -> int:
+        """已写入的总行数（分块 + 向量）"""
+        return self.chunk_count + self.embedding_count
+
+    @property
+    def rows_per_second(self) -> float:
+        """写入吞吐（行/秒）"""
+        return self.row_count / self.duration if self.duration > 0 else 0.0
+
+    async def write(
+        self,
+        documents: Sequence[Document],
+        term_vectors: Optional[Sequence[Tuple[Dict[str, int], int]]] = None,
+    ) -> List[int]:
+        """批量写入分块及其向量
+
+        分块的文档ID、分块序号取自 metadata，写入后分块ID回填到 metadata["chunk_id"]；
+        文档携带向量且指定了嵌入模型时同时写入向量行。
+
+        Args:
+            documents: 分块文档列表
+            term_vectors: 与文档一一对应的 (词频, 词项总数)，为None时不写入词项向量
+
+        Returns:
+            List[int]: 与文档一一对应的分块ID
+        """
+        start_time = time.time()
+        use_returning = self._supports_returning()
+        chunk_ids: List[int] = []
+
+        for start in range(0, len(documents), self.batch_size):
+            batch = documents[start:start + self.batch_size]
+            batch_term_vectors = term_vectors[start:start + self.batch_size] if term_vectors else None
+            rows = [
+                self._chunk_row(document, batch_term_vectors[i] if batch_term_vectors else None)
+                for i, document in enumerate(batch)
+            ]
+
+            if use_returning:
+                batch_ids = await self._insert_returning(rows)
+            else:
+                batch_ids = await self._insert_preallocated(rows)
+
+            embedding_rows = []
+            for document, chunk_id in zip(batch, batch_ids):
+                document.metadata["chunk_id"] = chunk_id
+                if self.embedding_model and document.vector is not None:
+                    embedding_rows.append({
+                        "chunk_id": chunk_id,
+                        "embedding": self._to_list(document.vector),
+                        "model": self.embedding_model,
+                    })
+            if embedding_rows:
+                await self._insert_values(DocumentEmbedding, embedding_rows)
+
+            chunk_ids.extend(batch_ids)
+            self.chunk_count += len(rows)
+            self.embedding_count += len(embedding_rows)
+            self._uncommitted_rows += len(rows) + len(embedding_rows)
+
+            if self.commit_rows and self._uncommitted_rows >= self.commit_rows:
+                await self.db.commit()
+                self._uncommitted_rows = 0
+
+        duration = time.time() - start_time
+        self.duration += duration
+
+        Logger.rag_performance_metrics(
+            operation="chunk_bulk_write",
+            duration=duration,
+            chunk_count=len(chunk_ids),
+            embedding_count=self.embedding_count,
+            batch_size=self.batch_size,
+            use_returning=use_returning,
+            rows_per_second=self.rows_per_second
+        )
+
+        return chunk_ids
+
+    def _supports_returning(self) -> bool:
+        """数据库是否支持按参数顺序返回主键的批量 RETURNING"""
+        dialect = self.db.get_bind().dialect
+        return bool(getattr(dialect, "insert_executemany_returning_sort_by_parameter_order", False))
+
+    @staticmethod
+    def _chunk_row(
+        document: Document,
+        term_vector: Optional[Tuple[Dict[str, int], int]]
+    ) -> Dict[str, Any]:
+        """构造分块行"""
+        term_freqs, term_count = term_vector if term_vector else (None, None)
+        return {
+            "document_id": document.metadata.get("document_id"),
+            "content": document.page_content,
+            "chunk_index": document.metadata.get("chunk_index", 0),
+            "chunk_metadata": dict(document.metadata),
+            "term_freqs": term_freqs,
+            "term_count": term_count,
+            "content_hash": compute_content_hash(document.page_content),
+        }
+
+    @staticmethod
+    def _to_list(vector: Any) -> List[float]:
+        """向量转为可JSON序列化的列表"""
+        return vector.tolist() if hasattr(vector, "tolist") else list(vector)
+
+    async def _insert_returning(self, rows: List[Dict[str, Any]]) -> List[int]:
+        """多行 INSERT ... RETURNING，按参数顺序返回分块ID"""
+        result = await self.db.execute(
+            insert(DocumentChunk).returning(DocumentChunk.id, sort_by_parameter_order=True),
+            rows
+        )
+        return list(result.scalars().all())
+
+    async def _insert_preallocated(self, rows: List[Dict[str, Any]]) -> List[int]:
+        """预分配ID后多行 INSERT
+
+        SQLite 同一时刻只有一个写事务，预分配与写入在同一事务内完成。
+        """
+        max_id = (await self.db.execute(select(func.max(DocumentChunk.id)))).scalar() or 0
+        chunk_ids = list(range(max_id + 1, max_id + 1 + len(rows)))
+        for row, chunk_id in zip(rows, chunk_ids):
+            row["id"] = chunk_id
+        await self._insert_values(DocumentChunk, rows)
+        return chunk_ids
+
+    async def _insert_values(self, model: Any, rows: List[Dict[str, Any]]) -> None:
+        """单条多行 INSERT，按绑定参数上限拆分"""
+        rows_per_statement = max(1, _MAX_BIND_PARAMS // (len(rows[0]) + 2))
+        for start in range(0, len(rows), rows_per_statement):
+            await self.db.execute(insert(model).values(rows[start:start + rows_per_statement]))
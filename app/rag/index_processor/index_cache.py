@@ -10,14 +10,46 @@ from app.core.redis_manager import redis_manager
 class IndexCache:
     """索引缓存
     
-    缓存索引数据，避免重复计算
+    缓存索引数据，避免重复计算。缓存键携带知识库的缓存代数，
+    递增代数即可使该知识库的全部缓存失效，旧缓存随过期时间自然清除。
     """
     
+    @staticmethod
+    def _generation_key(kb_id: int) -> str:
+        """知识库缓存代数的键"""
+        return f"index:kb_{kb_id}:generation"
+    
+    @staticmethod
+    async def get_generation(kb_id: int) -> int:
+        """获取知识库的缓存代数
+        
+        Args:
+            kb_id: 知识库ID
+            
+        Returns:
+            int: 缓存代数，不存在时为0
+        """
+        value = await redis_manager.get(IndexCache._generation_key(kb_id))
+        return int(value) if value else 0
+    
+    @staticmethod
+    async def bump_generation(kb_id: int) -> None:
+        """递增知识库的缓存代数，使该知识库的全部索引缓存失效
+        
+        Args:
+            kb_id: 知识库ID
+        """
+        try:
+            await redis_manager.incr(IndexCache._generation_key(kb_id))
+        except Exception as e:
+            Logger.error(f"递增索引缓存代数失败: {str(e)}")
+    
     @staticmethod
     def _generate_cache_key(
         kb_id: int,
         index_type: str,
-        document_id: Optional[int] = None
+        document_id: Optional[int] = None,
+        generation: int = 0
     ) -> str:
         """生成缓存键
         
@@ -25,15 +57,16 @@ class IndexCache:
             kb_id: 知识库ID
             index_type: 索引类型
             document_id: 文档ID
+            generation: 知识库缓存代数
             
         Returns:
             str: 缓存键
         """
         # 构建缓存键
         if document_id:
-            return f"index:kb_{kb_id}:{index_type}:doc_{document_id}"
+            return f"index:kb_{kb_id}:g{generation}:{index_type}:doc_{document_id}"
         else:
-            return f"index:kb_{kb_id}:{index_type}"
+            return f"index:kb_{kb_id}:g{generation}:{index_type}"
     
     @staticmethod
     async def get_cached_index(
@@ -53,7 +86,8 @@ class IndexCache:
         """
         try:
             # 生成缓存键
-            cache_key = IndexCache._generate_cache_key(kb_id, index_type, document_id)
+            generation = await IndexCache.get_generation(kb_id)
+            cache_key = IndexCache._generate_cache_key(kb_id, index_type, document_id, generation)
             
             # 尝试从缓存获取
             cached = await redis_manager.get(cache_key)
@@ -85,7 +119,8 @@ class IndexCache:
         """
         try:
             # 生成缓存键
-            cache_key = IndexCache._generate_cache_key(kb_id, index_type, document_id)
+            generation = await IndexCache.get_generation(kb_id)
+            cache_key = IndexCache._generate_cache_key(kb_id, index_type, document_id, generation)
             
             # 缓存结果
             await redis_manager.set(
@@ -112,7 +147,8 @@ class IndexCache:
         """
         try:
             # 生成缓存键
-            cache_key = IndexCache._generate_cache_key(kb_id, index_type, document_id)
+            generation = await IndexCache.get_generation(kb_id)
+            cache_key = IndexCache._generate_cache_key(kb_id, index_type, document_id, generation)
             
             # 删除缓存
             await redis_manager.delete(cache_key)
@@ -127,16 +163,4 @@ class IndexCache:
         Args:
             kb_id: 知识库ID
         """
-        try:
-            # 生成缓存键模式
-            pattern = f"index:kb_{kb_id}:*"
-            
-            # 获取所有匹配的键
-            keys = await redis_manager.keys(pattern)
-            
-            # 删除所有匹配的键
-            if keys:
-                await redis_manager.delete(*keys)
-                
-        except Exception as e:
-            Logger.error(f"使知识库的所有索引缓存失效失败: {str(e)}")
\ No newline at end of file
+        await IndexCache.bump_generation(kb_id)
@@ -1,9 +1,6 @@
 """关键词索引处理器"""
 from typing import List, Dict, Any, Optional
 import uuid
-import jieba
-import re
-import time
 
 from sqlalchemy import select
 from sqlalchemy.orm import Session
@@ -14,11 +11,17 @@ from app.schemas.llm import LLMConfig
 from app.models.knowledge_base import KnowledgeBase
 from app.models.document import Document as DBDocument
 from app.models.document_chunk import DocumentChunk
+from app.models.document_embedding import DocumentEmbedding
 from app.rag.models.document import Document
 from app.rag.index_processor.index_processor_base import BaseIndexProcessor
+from app.rag.index_processor.chunk_bulk_writer import ChunkBulkWriter
+from app.rag.index_processor.chunk_bulk_deleter import ChunkBulkDeleter
 from app.rag.extractor.extract_processor import ExtractProcessor
 from app.rag.cleaner.clean_processor import TextCleaner
 from app.rag.splitter.fixed_text_splitter import FixedTextSplitter
+from app.rag.keyword.bm25_index import BM25Index
+from app.rag.keyword.keyword_index_factory import KeywordIndexFactory
+from app.rag.keyword.tokenizer_service import TokenizerService, get_document_term_vectors
 
 class KeywordIndexProcessor(BaseIndexProcessor):
     """关键词索引处理器
@@ -82,7 +85,7 @@ class KeywordIndexProcessor(BaseIndexProcessor):
         
         Args:
             documents: 文档对象列表
-            **kwargs: 其他参数
+            **kwargs: 其他参数，knowledge_base_id 用于加载知识库用户词典
             
         Returns:
             List[Document]: 转换后的文档对象列表
@@ -103,9 +106,6 @@ class KeywordIndexProcessor(BaseIndexProcessor):
                     doc_id = doc.metadata.get("doc_id") or str(uuid.uuid4())
                     chunk_id = f"{doc_id}_{i}"
                     
-                    # 提取关键词
-                    keywords = self._extract_keywords(chunk)
-                    
                     # 创建文档对象
                     transformed_doc = Document(
                         page_content=chunk,
@@ -113,11 +113,20 @@ class KeywordIndexProcessor(BaseIndexProcessor):
                             **doc.metadata,
                             "doc_id": chunk_id,
                             "chunk_index": i,
-                            "original_doc_id": doc_id,
-                            "keywords": keywords
+                            "original_doc_id": doc_id
                         }
                     )
                     transformed_documents.append(transformed_doc)
+            
+            # 批量分词交给分词进程池，避免阻塞事件循环
+            term_vectors = await TokenizerService.get_instance().term_vectors(
+                [doc.page_content for doc in transformed_documents],
+                kwargs.get("knowledge_base_id")
+            )
+            for doc, (term_freqs, term_count) in zip(transformed_documents, term_vectors):
+                doc.metadata["keywords"] = list(term_freqs)
+                doc.metadata["term_freqs"] = term_freqs
+                doc.metadata["term_count"] = term_count
                     
             return transformed_documents
             
@@ -125,86 +134,6 @@ class KeywordIndexProcessor(BaseIndexProcessor):
             Logger.error(f"转换文档失败: {str(e)}")
             return documents
             
-    def _extract_keywords(self, text: str) -> List[str]:
-        """提取关键词
-        
-        Args:
-            text: 文本内容
-            
-        Returns:
-            List[str]: 关键词列表
-        """
-        start_time = time.time()
-        
-        try:
-            # 使用jieba分词
-            segmentation_start = time.time()
-            words = list(jieba.cut_for_search(text))
-            segmentation_time = time.time() - segmentation_start
-            
-            # 过滤停用词和标点符号
-            filter_start = time.time()
-            filtered_words = []
-            for word in words:
-                # 过滤单个字符和标点符号
-                if len(word) > 1 and not re.match(r'[^\w\s]', word):
-                    filtered_words.append(word)
-            filter_time = time.time() - filter_start
-            
-            # 去重
-            unique_keywords = list(set(filtered_words))
-            
-            # 计算处理时间
-            total_time = time.time() - start_time
-            
-            # 记录关键词提取统计
-            Logger.debug(f"关键词提取完成:")
-            Logger.debug(f"  - 文本长度: {len(text)}")
-            Logger.debug(f"  - 原始词数: {len(words)}")
-            Logger.debug(f"  - 过滤后词数: {len(filtered_words)}")
-            Logger.debug(f"  - 唯一关键词数: {len(unique_keywords)}")
-            Logger.debug(f"  - 分词耗时: {segmentation_time:.3f}秒")
-            Logger.debug(f"  - 过滤耗时: {filter_time:.3f}秒")
-            Logger.debug(f"  - 总耗时: {total_time:.3f}秒")
-            
-            # 记录性能指标
-            Logger.rag_performance_metrics(
-                operation="keyword_extraction",
-                duration=total_time,
-                text_length=len(text),
-                original_word_count=len(words),
-                filtered_word_count=len(filtered_words),
-                unique_keyword_count=len(unique_keywords),
-                segmentation_time=segmentation_time,
-                filter_time=filter_time,
-                processing_speed=len(text) / total_time if total_time > 0 else 0
-            )
-                    
-            return unique_keywords
-            
-        except Exception as e:
-            # 计算处理时间
-            total_time = time.time() - start_time
-            
-            import traceback
-            error_info = traceback.format_exc()
-            
-            Logger.error(f"提取关键词失败:")
-            Logger.error(f"  - 文本长度: {len(text)}")
-            Logger.error(f"  - 错误信息: {str(e)}")
-            Logger.debug(f"堆栈跟踪:\n{error_info}")
-            
-            # 记录失败的性能指标
-            Logger.rag_performance_metrics(
-                operation="keyword_extraction_failed",
-                duration=total_time,
-                text_length=len(text),
-                error=str(e),
-                error_type=type(e).__name__
-            )
-            
-            return []
-            
     async def load(self, knowledge_base: KnowledgeBase, documents: List[Document], **kwargs) -> None:
         """加载文档到索引
         
@@ -219,16 +148,17 @@ class KeywordIndexProcessor(BaseIndexProcessor):
             if not db:
                 raise ValueError("缺少数据库会话")
                 
-            # 保存到数据库
-            for doc in documents:
-                # 创建文档分块
-                chunk = DocumentChunk(
-                    document_id=doc.metadata.get("document_id"),
-                    content=doc.page_content,
-                    chunk_index=doc.metadata.get("chunk_index", 0),
-                    metadata=doc.metadata
-                )
-                db.add(chunk)
+            # 分词一次，词项向量随分块持久化，供关键词索引和重排序复用
+            term_vectors = await get_document_term_vectors(documents, knowledge_base.id)
+                
+            # 批量写入分块，并增量更新倒排索引
+            chunk_ids = await ChunkBulkWriter(db).write(documents, term_vectors)
+            keyword_index = KeywordIndexFactory.create_keyword_index(knowledge_base, db)
+            await keyword_index.add_chunks(
+                db,
+                knowledge_base.id,
+                [(chunk_id, term_freqs) for chunk_id, (term_freqs, _) in zip(chunk_ids, term_vectors)]
+            )
                 
             # 提交事务
             await db.commit()
@@ -251,30 +181,12 @@ class KeywordIndexProcessor(BaseIndexProcessor):
             if not db:
                 raise ValueError("缺少数据库会话")
                 
+            # 按批执行集合删除，每批提交一次；缓存失效为一次代数递增
+            deleter = ChunkBulkDeleter(db, knowledge_base)
             if document_ids:
-                # 从数据库中删除
-                chunks = await db.execute(
-                    select(DocumentChunk).filter(
-                        DocumentChunk.document_id.in_(document_ids)
-                    )
-                )
-                for chunk in chunks.scalars().all():
-                    await db.delete(chunk)
+                await deleter.delete_documents(document_ids)
             else:
-                # 从数据库中删除
-                chunks = await db.execute(
-                    select(DocumentChunk).join(
-                        DBDocument,
-                        DocumentChunk.document_id == DBDocument.id
-                    ).filter(
-                        DBDocument.knowledge_base_id == knowledge_base.id
-                    )
-                )
-                for chunk in chunks.scalars().all():
-                    await db.delete(chunk)
-                    
-            # 提交事务
-            await db.commit()
+                await deleter.delete_all()
             
         except Exception as e:
             Logger.error(f"清理索引失败: {str(e)}")
@@ -304,75 +216,90 @@ class KeywordIndexProcessor(BaseIndexProcessor):
             if not db:
                 raise ValueError("缺少数据库会话")
                 
-            # 提取查询关键词
-            keywords = self._extract_keywords(query)
+            # 基于关键词索引进行BM25打分，先排序再截取top_k；
+            # 多取一些候选，用于过滤已软删除的文档
+            keyword_index = KeywordIndexFactory.create_keyword_index(knowledge_base, db)
+            ranked = await keyword_index.search(
+                db,
+                knowledge_base.id,
+                query,
+                top_k=top_k * 2
+            )
             
-            if not keywords:
+            if not ranked:
                 return []
                 
-            # 构建查询条件
-            conditions = []
-            for keyword in keywords:
-                conditions.append(f"content LIKE '%{keyword}%'")
-                
-            # 执行查询
-            query_str = f"""
-                SELECT id, document_id, content, chunk_index, metadata
-                FROM document_chunks
-                WHERE document_id IN (
-                    SELECT id FROM documents
-                    WHERE knowledge_base_id = {knowledge_base.id}
-                    AND is_deleted = FALSE
+            # 读取候选分块内容
+            result = await db.execute(
+                select(DocumentChunk).join(
+                    DBDocument,
+                    DocumentChunk.document_id == DBDocument.id
+                ).filter(
+                    DocumentChunk.id.in_([chunk_id for chunk_id, _ in ranked]),
+                    DBDocument.is_deleted == False
                 )
-                AND ({" OR ".join(conditions)})
-                LIMIT {top_k}
-            """
+            )
+            chunks = {chunk.id: chunk for chunk in result.scalars().all()}
             
-            result = await db.execute(query_str)
-            rows = result.fetchall()
+            # 分数按本次结果的最高分归一化到0-1之间，便于与向量检索分数融合
+            max_score = ranked[0][1] or 1.0
             
             # 处理结果
             documents = []
-            for row in rows:
+            for chunk_id, bm25_score in ranked:
+                chunk = chunks.get(chunk_id)
+                if chunk is None:
+                    continue
+                term_freqs, term_count = BM25Index.chunk_term_vector(chunk, knowledge_base.id)
                 doc = Document(
-                    page_content=row.content,
+                    page_content=chunk.content,
                     metadata={
-                        **row.metadata,
-                        "document_id": row.document_id,
-                        "chunk_id": row.id,
-                        "chunk_index": row.chunk_index,
-                        "score": self._calculate_score(row.content, keywords)
+                        **(chunk.chunk_metadata or {}),
+                        "document_id": chunk.document_id,
+                        "chunk_id": chunk.id,
+                        "chunk_index": chunk.chunk_index,
+                        "score": bm25_score / max_score,
+                        "bm25_score": bm25_score,
+                        "term_freqs": term_freqs,
+                        "term_count": term_count
                     }
                 )
                 documents.append(doc)
-                
-            # 按相关性排序
-            documents.sort(key=lambda x: x.metadata.get("score", 0), reverse=True)
+                if len(documents) >= top_k:
+                    break
             
-            return documents[:top_k]
+            # 需要向量时读取已存储的分块向量，避免重排序阶段重新向量化
+            if kwargs.get("include_vectors") and documents:
+                await self._attach_stored_vectors(db, knowledge_base, documents)
+                
+            return documents
             
         except Exception as e:
             Logger.error(f"检索文档失败: {str(e)}")
             return []
             
-    def _calculate_score(self, text: str, keywords: List[str]) -> float:
-        """计算相关性分数
+    async def _attach_stored_vectors(
+        self,
+        db: Session,
+        knowledge_base: KnowledgeBase,
+        documents: List[Document]
+    ) -> None:
+        """为检索结果附加已存储的分块向量
         
         Args:
-            text: 文本内容
-            keywords: 关键词列表
-            
-        Returns:
-            float: 相关性分数
+            db: 数据库会话
+            knowledge_base: 知识库对象
+            documents: 检索结果
         """
         try:
-            score = 0.0
-            for keyword in keywords:
-                count = text.count(keyword)
-                score += count * (len(keyword) / 10)  # 长关键词权重更高
-                
-            return min(score, 1.0)  # 归一化到0-1之间
-            
+            result = await db.execute(
+                select(DocumentEmbedding.chunk_id, DocumentEmbedding.embedding).filter(
+                    DocumentEmbedding.chunk_id.in_([doc.metadata["chunk_id"] for doc in documents]),
+                    DocumentEmbedding.model == knowledge_base.embedding_model
+                )
+            )
+            vectors = {chunk_id: embedding for chunk_id, embedding in result.all()}
+            for doc in documents:
+                doc.vector = vectors.get(doc.metadata["chunk_id"])
         except Exception as e:
-            Logger.error(f"计算相关性分数失败: {str(e)}")
-            return 0.0
\ No newline at end of file
+            Logger.warning(f"读取分块向量失败: {str(e)}")
@@ -14,10 +14,11 @@ from app.schemas.llm import LLMConfig
 from app.models.knowledge_base import KnowledgeBase
 from app.models.document import Document as DBDocument
 from app.models.document_chunk import DocumentChunk
-from app.models.document_embedding import DocumentEmbedding
 from app.rag.models.document import Document
 from app.rag.index_processor.index_processor_base import BaseIndexProcessor
 from app.rag.index_processor.index_cache import IndexCache
+from app.rag.index_processor.chunk_bulk_writer import ChunkBulkWriter
+from app.rag.index_processor.chunk_bulk_deleter import ChunkBulkDeleter
 from app.rag.extractor.extract_processor import ExtractProcessor
 from app.rag.cleaner.clean_processor import TextCleaner
 from app.rag.splitter.recursive_character_text_splitter import (
@@ -25,6 +26,8 @@ from app.rag.splitter.recursive_character_text_splitter import (
 )
 from app.rag.embedding.embedding_engine import EmbeddingEngine
 from app.rag.datasource.vdb.vector_factory import VectorFactory
+from app.rag.keyword.keyword_index_factory import KeywordIndexFactory
+from app.rag.keyword.tokenizer_service import get_document_term_vectors
 
 
 class StandardIndexProcessor(BaseIndexProcessor):
@@ -355,7 +358,7 @@ class StandardIndexProcessor(BaseIndexProcessor):
 
             # 创建向量化引擎
             embedding_start_time = time.time()
-            embedding_engine = EmbeddingEngine(llm_config)
+            embedding_engine = EmbeddingEngine(llm_config, db)
 
             # 向量化文档
             Logger.debug(f"开始向量化 {len(documents)} 个文档...")
@@ -366,6 +369,28 @@ class StandardIndexProcessor(BaseIndexProcessor):
 
             Logger.debug(f"向量化完成，耗时: {embedding_time:.2f}秒")
 
+            # 保存到数据库（先于向量存储，使向量存储元数据携带分块ID）
+            db_start_time = time.time()
+            Logger.debug(f"开始保存到数据库...")
+
+            # 分词一次，词项向量随分块持久化，供关键词索引和重排序复用
+            term_vectors = await get_document_term_vectors(vectorized_documents, knowledge_base.id)
+
+            # 批量写入分块及向量，分块ID回填到文档元数据
+            writer = ChunkBulkWriter(db, embedding_model=knowledge_base.embedding_model)
+            chunk_ids = await writer.write(vectorized_documents, term_vectors)
+            chunk_count = writer.chunk_count
+            embedding_count = writer.embedding_count
+
+            # 增量更新关键词索引，供混合检索的关键词通路使用
+            keyword_index = KeywordIndexFactory.create_keyword_index(knowledge_base, db)
+            await keyword_index.add_chunks(
+                db,
+                knowledge_base.id,
+                [(chunk_id, term_freqs) for chunk_id, (term_freqs, _) in zip(chunk_ids, term_vectors)],
+            )
+            db_time = time.time() - db_start_time
+
             # 创建向量存储
             vector_store_start_time = time.time()
             vector_store = VectorFactory.create_vector_store(knowledge_base, llm_config)
@@ -381,37 +406,8 @@ class StandardIndexProcessor(BaseIndexProcessor):
 
             Logger.debug(f"向量存储完成，耗时: {vector_store_time:.2f}秒")
 
-            # 保存到数据库
-            db_start_time = time.time()
-            Logger.debug(f"开始保存到数据库...")
-
-            chunk_count = 0
-            embedding_count = 0
-
-            for doc in vectorized_documents:
-                # 创建文档分块
-                chunk = DocumentChunk(
-                    document_id=doc.metadata.get("document_id"),
-                    content=doc.page_content,
-                    chunk_index=doc.metadata.get("chunk_index", 0),
-                    metadata=doc.metadata,
-                )
-                db.add(chunk)
-                await db.flush()
-                chunk_count += 1
-
-                # 创建文档向量
-                embedding = DocumentEmbedding(
-                    chunk_id=chunk.id,
-                    embedding=doc.vector,
-                    model=knowledge_base.embedding_model,
-                )
-                db.add(embedding)
-                embedding_count += 1
-
             # 提交事务
             await db.commit()
-            db_time = time.time() - db_start_time
 
             Logger.debug(f"数据库保存完成，耗时: {db_time:.2f}秒")
             Logger.debug(f"  - 创建分块数: {chunk_count}")
@@ -419,20 +415,8 @@ class StandardIndexProcessor(BaseIndexProcessor):
 
             # 使缓存失效
             cache_start_time = time.time()
-            document_id = (
-                documents[0].metadata.get("document_id") if documents else None
-            )
-            if document_id:
-                await IndexCache.invalidate_index(
-                    kb_id=knowledge_base.id,
-                    index_type="standard_retrieval",
-                    document_id=int(document_id),
-                )
-                Logger.debug(f"使文档 {document_id} 的缓存失效")
-            else:
-                # 如果没有文档ID，使所有缓存失效
-                await IndexCache.invalidate_all_indexes(knowledge_base.id)
-                Logger.debug(f"使知识库 {knowledge_base.id} 的所有缓存失效")
+            # 新增分块会改变检索结果，递增缓存代数使该知识库的检索缓存整体失效
+            await IndexCache.invalidate_all_indexes(knowledge_base.id)
 
             cache_time = time.time() - cache_start_time
 
@@ -448,6 +432,7 @@ class StandardIndexProcessor(BaseIndexProcessor):
             Logger.info(f"  - 向量化耗时: {embedding_time:.2f}秒")
             Logger.info(f"  - 向量存储耗时: {vector_store_time:.2f}秒")
             Logger.info(f"  - 数据库保存耗时: {db_time:.2f}秒")
+            Logger.info(f"  - 数据库写入速度: {writer.rows_per_second:.1f} 行/秒")
             Logger.info(f"  - 缓存清理耗时: {cache_time:.3f}秒")
             Logger.info(f"  - 总耗时: {total_time:.2f}秒")
             Logger.info(f"  - 处理速度: {len(documents)/total_time:.1f} 文档/秒")
@@ -466,6 +451,7 @@ class StandardIndexProcessor(BaseIndexProcessor):
                 embedding_time=embedding_time,
                 vector_store_time=vector_store_time,
                 database_time=db_time,
+                database_rows_per_second=writer.rows_per_second,
                 cache_time=cache_time,
                 processing_speed=len(documents) / total_time if total_time > 0 else 0,
                 vector_store_type=knowledge_base.vector_store_type
@@ -541,82 +527,30 @@ class StandardIndexProcessor(BaseIndexProcessor):
                 raise ValueError("缺少LLM配置")
 
             # 创建向量存储
-            vector_store_start_time = time.time()
             vector_store = VectorFactory.create_vector_store(knowledge_base, llm_config)
+            deleter = ChunkBulkDeleter(db, knowledge_base, vector_store)
 
-            deleted_chunks = 0
-            deleted_embeddings = 0
-
+            delete_start_time = time.time()
             if document_ids:
-                # 删除指定文档
-                Logger.debug(f"开始从向量存储删除指定文档...")
-                await vector_store.delete_by_ids(document_ids)
-                vector_store_time = time.time() - vector_store_start_time
-
-                # 从数据库中删除
-                db_start_time = time.time()
-                Logger.debug(f"开始从数据库删除相关记录...")
-
-                chunks = await db.execute(
-                    select(DocumentChunk).filter(
-                        DocumentChunk.document_id.in_(document_ids)
-                    )
-                )
-                for chunk in chunks.scalars().all():
-                    await db.delete(chunk)
-                    deleted_chunks += 1
-                    # 删除分块时，相关的向量也会被级联删除
-                    deleted_embeddings += 1
-
-                db_time = time.time() - db_start_time
-
-                # 使缓存失效
-                cache_start_time = time.time()
-                Logger.debug(f"开始清理相关缓存...")
-                for doc_id in document_ids:
-                    await IndexCache.invalidate_index(
-                        kb_id=knowledge_base.id,
-                        index_type="standard_retrieval",
-                        document_id=int(doc_id),
-                    )
-                cache_time = time.time() - cache_start_time
-
+                # 按批删除指定文档的分块、向量、倒排项和向量存储数据，每批提交一次
+                Logger.debug(f"开始批量删除指定文档的索引数据...")
+                await deleter.delete_documents(document_ids)
                 Logger.debug(f"指定文档索引清理完成:")
                 Logger.debug(f"  - 删除文档数: {len(document_ids)}")
-                Logger.debug(f"  - 删除分块数: {deleted_chunks}")
-                Logger.debug(f"  - 删除向量数: {deleted_embeddings}")
-
             else:
-                # 删除整个索引
-                Logger.debug(f"开始删除整个向量存储...")
-                await vector_store.delete()
-                vector_store_time = time.time() - vector_store_start_time
-
-                # 从数据库中删除
-                db_start_time = time.time()
-                Logger.debug(f"开始从数据库删除所有相关记录...")
-
-                chunks = await db.execute(
-                    select(DocumentChunk)
-                    .join(DBDocument, DocumentChunk.document_id == DBDocument.id)
-                    .filter(DBDocument.knowledge_base_id == knowledge_base.id)
-                )
-                for chunk in chunks.scalars().all():
-                    await db.delete(chunk)
-                    deleted_chunks += 1
-                    deleted_embeddings += 1
-
-                db_time = time.time() - db_start_time
-
-                # 使所有缓存失效
-                cache_start_time = time.time()
-                Logger.debug(f"开始清理所有缓存...")
-                await IndexCache.invalidate_all_indexes(knowledge_base.id)
-                cache_time = time.time() - cache_start_time
-
+                # 删除整个向量存储，并按批删除数据库记录、清空关键词索引
+                Logger.debug(f"开始删除整个索引...")
+                await deleter.delete_all()
                 Logger.debug(f"整个索引清理完成:")
-                Logger.debug(f"  - 删除分块数: {deleted_chunks}")
-                Logger.debug(f"  - 删除向量数: {deleted_embeddings}")
+
+            vector_store_time = deleter.vector_store_duration
+            db_time = time.time() - delete_start_time - vector_store_time
+            deleted_chunks = deleter.deleted_chunks
+            deleted_embeddings = deleter.deleted_embeddings
+            # 缓存失效已由删除器以一次代数递增完成
+            cache_time = 0.0
+            Logger.debug(f"  - 删除分块数: {deleted_chunks}")
+            Logger.debug(f"  - 删除向量数: {deleted_embeddings}")
 
             # 提交事务
             commit_start_time = time.time()
@@ -698,6 +632,7 @@ class StandardIndexProcessor(BaseIndexProcessor):
             List[Document]: 检索结果
         """
         start_time = time.time()
+        db: Session = kwargs.get("db")
 
         # 记录检索开始
         query_preview = query[:100] + "..." if len(query) > 100 else query
@@ -712,8 +647,9 @@ class StandardIndexProcessor(BaseIndexProcessor):
             # 检查是否使用缓存
             use_cache = kwargs.get("use_cache", True)
 
-            # 生成缓存键
-            cache_key = f"{query}_{top_k}"
+            # 生成缓存键（携带向量的结果单独缓存）
+            include_vectors = kwargs.get("include_vectors", False)
+            cache_key = f"{query}_{top_k}_vectors" if include_vectors else f"{query}_{top_k}"
             cache_hit = False
 
             # 检查缓存
@@ -771,7 +707,7 @@ class StandardIndexProcessor(BaseIndexProcessor):
 
             # 创建向量化引擎
             embedding_start_time = time.time()
-            embedding_engine = EmbeddingEngine(llm_config)
+            embedding_engine = EmbeddingEngine(llm_config, db)
 
             # 向量化查询
             Logger.debug(f"开始向量化查询...")
@@ -795,6 +731,10 @@ class StandardIndexProcessor(BaseIndexProcessor):
                 f"向量检索完成，耗时: {vector_search_time:.3f}秒，返回 {len(results)} 个结果"
             )
 
+            # 附加分块词项向量，供重排序直接使用
+            if db is not None and results:
+                await self._attach_term_vectors(db, results)
+
             # 缓存结果
             cache_store_time = 0
             if use_cache and results:
@@ -808,8 +748,11 @@ class StandardIndexProcessor(BaseIndexProcessor):
                         "page_content": doc.page_content,
                         "metadata": doc.metadata,
                     }
-                    if doc.vector:
-                        doc_dict["vector"] = doc.vector
+                    if doc.vector is not None:
+                        # 向量存储返回的 NumPy 行视图需转换为列表才能序列化
+                        doc_dict["vector"] = (
+                            doc.vector.tolist() if hasattr(doc.vector, "tolist") else doc.vector
+                        )
                     doc_data.append(doc_dict)
 
                 # 缓存
@@ -904,3 +847,46 @@ class StandardIndexProcessor(BaseIndexProcessor):
             )
 
             return []
+
+    async def _attach_term_vectors(self, db: Session, documents: List[Document]) -> None:
+        """为检索结果附加分块的词项向量
+
+        Args:
+            db: 数据库会话
+            documents: 检索结果
+        """
+        chunk_ids = [
+            doc.metadata.get("chunk_id")
+            for doc in documents
+            if doc.metadata.get("chunk_id") is not None
+            and "term_freqs" not in doc.metadata
+        ]
+        if not chunk_ids:
+            return
+
+        try:
+            result = await db.execute(
+                select(
+                    DocumentChunk.id,
+                    DocumentChunk.term_freqs,
+                    DocumentChunk.term_count,
+                ).filter(DocumentChunk.id.in_([int(i) for i in chunk_ids]))
+            )
+            term_vectors = {
+                row.id: (row.term_freqs, row.term_count)
+                for row in result.all()
+                if row.term_freqs is not None
+            }
+
+            for doc in documents:
+                chunk_id = doc.metadata.get("chunk_id")
+                if chunk_id is None or int(chunk_id) not in term_vectors:
+                    continue
+                term_freqs, term_count = term_vectors[int(chunk_id)]
+                doc.metadata["term_freqs"] = term_freqs
+                doc.metadata["term_count"] = (
+                    term_count if term_count is not None else sum(term_freqs.values())
+                )
+        except Exception as e:
+            # 词项向量只用于加速重排序，读取失败时不影响检索结果
+            Logger.warning(f"读取分块词项向量失败: {str(e)}")
@@ -4,5 +4,10 @@
 """
 
 from app.rag.keyword.jieba_keyword_handler import JiebaKeywordHandler
+from app.rag.keyword.bm25_index import BM25Index
+from app.rag.keyword.fulltext_index import FullTextIndex
+from app.rag.keyword.keyword_index_factory import KeywordIndexFactory
+from app.rag.keyword.corpus_stats import CorpusStats, CorpusStatsCache
+from app.rag.keyword.tokenizer_service import TokenizerService
 
-__all__ = ["JiebaKeywordHandler"] 
\ No newline at end of file
+__all__ = ["JiebaKeywordHandler", "BM25Index", "FullTextIndex", "KeywordIndexFactory", "CorpusStats", "CorpusStatsCache", "TokenizerService"] 
@@ -0,0 +1,219 @@
+"""关键词检索后端基准测试
+
+对比 LIKE 扫描、BM25倒排索引和数据库原生全文索引在大规模分块上的建索引耗时与查询延迟。
+
+用法:
+    python -m app.rag.keyword.benchmark --chunks 100000 --queries 200
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+import app.models  # noqa: F401  注册全部模型
+from app.models.database import Base
+from app.models.document import Document as DBDocument, DocumentType
+from app.models.document_chunk import DocumentChunk
+from app.rag.keyword.bm25_index import BM25Index
+from app.rag.keyword.fulltext_index import FullTextIndex
+from app.rag.keyword.tokenizer_service import TokenizerService
+
+# 合成语料使用的常用汉字
+_CHARSET = (
+    "的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后多定行学法所民得经"
+    "十三之进着等部度家电力里如水化高自二理起小物现实加量都两体制机当使点从业本去把性好应开它合还因由其些然前外天政四日那社义事平形相全表间样与关各重新线内数正心反你明看原又么利比或但质气第向道命此变条只没结解问意建月公无系军很情者最立代想已通并提直题党程展五果料象员革位入常文总次品式活设及管特件长求老头基资边流路级少图山统接知较将组见计别她手角期根论运农指几九区强放决西被干做必战先回则任取据处队南给色光门即保治北造百规热领七海口东导器压志世金增争济阶油思术极交受联什认六共权收证改清己美再采转更单风切打白教速花带安场身车例真务具万每目至达走积示议声报斗完类八离华名确才科张信马节话米整空元况今集温传土许步群广石记需段研界拉林律叫且究观越织装影算低持音众书布复容儿须际商非验连断深难近矿千周委素技备半办青省列习响约支般史感劳便团往酸历市克何除消构府称太准精值号率族维划选标写存候毛亲快效斯院查江型眼王按格养易置派层片始却专状育厂京识适属圆包火住调满县局照参红细引听该铁价严"
+)
+
+
+def _build_vocabulary(size: int, rng: random.Random) -> List[str]:
+    """生成合成词表"""
+    vocabulary = set()
+    while len(vocabulary) < size:
+        length = rng.choice((2, 2, 2, 3, 4))
+        vocabulary.add("".join(rng.choice(_CHARSET) for _ in range(length)))
+    return list(vocabulary)
+
+
+def _build_corpus(
+    chunk_count: int,
+    words_per_chunk: int,
+    vocabulary: List[str],
+    rng: random.Random
+) -> List[str]:
+    """按 Zipf 分布生成合成分块"""
+    weights = [1.0 / (rank + 1) for rank in range(len(vocabulary))]
+    corpus = []
+    for _ in range(chunk_count):
+        words = rng.choices(vocabulary, weights=weights, k=words_per_chunk)
+        corpus.append("，".join("".join(words[i:i + 8]) for i in range(0, len(words), 8)) + "。")
+    return corpus
+
+
+async def _like_search(db: AsyncSession, kb_id: int, query: str, top_k: int) -> List[Tuple[int, float]]:
+    """旧版 LIKE 扫描检索（先 LIMIT 后排序）"""
+    keywords = list(set(BM25Index.tokenize(query)))
+    if not keywords:
+        return []
+    conditions = " OR ".join(f"content LIKE :kw{i}" for i in range(len(keywords)))
+    params: Dict[str, object] = {f"kw{i}": f"%{kw}%" for i, kw in enumerate(keywords)}
+    params.update({"kb_id": kb_id, "top_k": top_k})
+    result = await db.execute(
+        text(
+            "SELECT id, content FROM document_chunks WHERE document_id IN ("
+            "SELECT id FROM documents WHERE knowledge_base_id = :kb_id AND is_deleted = 0) "
+            f"AND ({conditions}) LIMIT :top_k"
+        ),
+        params
+    )
+    rows = result.fetchall()
+    scored = []
+    for row in rows:
+        score = sum(row.content.count(kw) * (len(kw) / 10) for kw in keywords)
+        scored.append((row.id, min(score, 1.0)))
+    scored.sort(key=lambda item: item[1], reverse=True)
+    return scored
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    """计算百分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(int(round(percent / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+async def run_benchmark(
+    chunk_count: int,
+    query_count: int,
+    top_k: int,
+    batch_size: int,
+    db_path: str,
+    seed: int
+) -> None:
+    """执行基准测试
+
+    Args:
+        chunk_count: 分块数量
+        query_count: 查询数量
+        top_k: 每次查询返回结果数
+        batch_size: 写入批大小
+        db_path: SQLite 数据库文件路径
+        seed: 随机种子
+    """
+    rng = random.Random(seed)
+    vocabulary = _build_vocabulary(20000, rng)
+    corpus = _build_corpus(chunk_count, 200, vocabulary, rng)
+    queries = [
+        "".join(rng.choices(vocabulary[:2000], k=rng.randint(2, 4)))
+        for _ in range(query_count)
+    ]
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+    session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    kb_id = 1
+    backends = {
+        "inverted_index": BM25Index(),
+        "fulltext": FullTextIndex(),
+    }
+    build_times: Dict[str, float] = {}
+
+    async with session_factory() as db:
+        document = DBDocument(title="benchmark", doc_type=DocumentType.TEXT, knowledge_base_id=kb_id)
+        db.add(document)
+        await db.flush()
+
+        # 分词（与 load 一致，经分词进程池只做一次，各后端复用词项向量）
+        tokenizer = TokenizerService.get_instance()
+        start = time.time()
+        term_vectors = await tokenizer.term_vectors(corpus)
+        tokenize_time = time.time() - start
+        tokenizer_metrics = tokenizer.get_metrics()
+        tokenizer.shutdown()
+
+        # 写入分块
+        start = time.time()
+        chunk_rows: List[Tuple[int, Dict[str, int]]] = []
+        for offset in range(0, chunk_count, batch_size):
+            chunks = [
+                DocumentChunk(
+                    document_id=document.id,
+                    content=content,
+                    chunk_index=offset + i,
+                    term_freqs=term_vectors[offset + i][0],
+                    term_count=term_vectors[offset + i][1]
+                )
+                for i, content in enumerate(corpus[offset:offset + batch_size])
+            ]
+            db.add_all(chunks)
+            await db.flush()
+            chunk_rows.extend((chunk.id, chunk.term_freqs) for chunk in chunks)
+            await db.commit()
+        build_times["like"] = time.time() - start
+
+        # 构建各后端索引
+        for name, index in backends.items():
+            start = time.time()
+            for offset in range(0, len(chunk_rows), batch_size):
+                await index.add_chunks(db, kb_id, chunk_rows[offset:offset + batch_size])
+                await db.commit()
+            build_times[name] = time.time() - start
+
+        # 查询
+        latencies: Dict[str, List[float]] = {"like": []}
+        latencies.update({name: [] for name in backends})
+        hits: Dict[str, int] = {name: 0 for name in latencies}
+        for query in queries:
+            start = time.time()
+            results = await _like_search(db, kb_id, query, top_k)
+            latencies["like"].append(time.time() - start)
+            hits["like"] += len(results)
+            for name, index in backends.items():
+                start = time.time()
+                results = await index.search(db, kb_id, query, top_k)
+                latencies[name].append(time.time() - start)
+                hits[name] += len(results)
+
+    await engine.dispose()
+
+    print(f"分块数: {chunk_count}, 查询数: {query_count}, top_k: {top_k}, 分词耗时: {tokenize_time:.2f}s "
+          f"({tokenizer_metrics['chars_per_second']:.0f} 字符/秒, {tokenizer_metrics['max_workers']} 进程)")
+    print(f"{'后端':<16}{'建索引(s)':>12}{'平均(ms)':>12}{'P50(ms)':>12}{'P95(ms)':>12}{'平均命中':>10}")
+    for name, values in latencies.items():
+        print(
+            f"{name:<16}{build_times[name]:>12.2f}"
+            f"{statistics.mean(values) * 1000:>12.2f}"
+            f"{_percentile(values, 50) * 1000:>12.2f}"
+            f"{_percentile(values, 95) * 1000:>12.2f}"
+            f"{hits[name] / max(len(queries), 1):>10.1f}"
+        )
+
+
+def main() -> None:
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="关键词检索后端基准测试")
+    parser.add_argument("--chunks", type=int, default=100000, help="分块数量")
+    parser.add_argument("--queries", type=int, default=200, help="查询数量")
+    parser.add_argument("--top-k", type=int, default=10, help="每次查询返回结果数")
+    parser.add_argument("--batch-size", type=int, default=1000, help="写入批大小")
+    parser.add_argument("--db", type=str, default=None, help="SQLite 数据库文件路径（默认临时文件）")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    args = parser.parse_args()
+
+    db_path = args.db or os.path.join(tempfile.mkdtemp(), "keyword_benchmark.db")
+    asyncio.run(run_benchmark(args.chunks, args.queries, args.top_k, args.batch_size, db_path, args.seed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+"""基于倒排表的BM25关键词索引"""
+import heapq
+import time
+from collections import Counter
+from operator import itemgetter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import case, delete, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.logger import Logger
+from app.models.keyword_index import KeywordPosting, KeywordIndexStats
+from app.rag.keyword.corpus_stats import CorpusStatsCache
+from app.rag.keyword import tokenizer_service
+
+# 单次 IN 查询的最大词项数，避免超出数据库绑定参数上限
+_TERM_BATCH_SIZE = 500
+
+# 单条多行 INSERT 的最大倒排行数（每行5个绑定参数，兼容旧版 SQLite 的 999 上限）
+_ROW_BATCH_SIZE = 190
+
+
+class BM25Index:
+    """BM25倒排索引
+
+    倒排项按 (知识库, 词项, 分块) 每行一条持久化在 keyword_postings 表中，同时记录
+    词频和分块长度，检索时只需读取查询词项对应的行即可完成 BM25 打分；
+    增删分块只插入或删除对应行，统计信息以原子 UPDATE 维护，不需要读改写。
+    """
+
+    def __init__(self, k1: Optional[float] = None, b: Optional[float] = None):
+        """初始化BM25索引
+
+        Args:
+            k1: 词频饱和参数，默认读取配置
+            b: 长度归一化参数，默认读取配置
+        """
+        self.k1 = settings.RAG_BM25_K1 if k1 is None else k1
+        self.b = settings.RAG_BM25_B if b is None else b
+
+    @staticmethod
+    def tokenize(text: str, kb_id: Optional[int] = None) -> List[str]:
+        """分词（保留重复词项，用于统计词频）
+
+        在当前进程内同步执行，适用于查询等短文本；批量分块请使用 TokenizerService。
+
+        Args:
+            text: 文本内容
+            kb_id: 知识库ID，用于加载知识库用户词典
+
+        Returns:
+            List[str]: 词项列表
+        """
+        return tokenizer_service.tokenize(text, kb_id)
+
+    @classmethod
+    def term_vector(cls, text: str, kb_id: Optional[int] = None) -> Tuple[Dict[str, int], int]:
+        """计算文本的词项向量
+
+        Args:
+            text: 文本内容
+            kb_id: 知识库ID
+
+        Returns:
+            Tuple[Dict[str, int], int]: (词项到词频的映射, 词项总数)
+        """
+        tokens = cls.tokenize(text, kb_id)
+        return dict(Counter(tokens)), len(tokens)
+
+    @classmethod
+    def chunk_term_vector(cls, chunk, kb_id: Optional[int] = None) -> Tuple[Dict[str, int], int]:
+        """读取分块已持久化的词项向量，旧数据缺失时重新分词
+
+        Args:
+            chunk: 数据库分块对象
+            kb_id: 知识库ID，重新分词时用于加载知识库用户词典
+
+        Returns:
+            Tuple[Dict[str, int], int]: (词项到词频的映射, 词项总数)
+        """
+        if chunk.term_freqs is not None:
+            term_count = chunk.term_count
+            if term_count is None:
+                term_count = sum(chunk.term_freqs.values())
+            return chunk.term_freqs, term_count
+        return cls.term_vector(chunk.content, kb_id)
+
+    async def add_chunks(
+        self,
+        db: AsyncSession,
+        kb_id: int,
+        chunks: Sequence[Tuple[int, Dict[str, int]]]
+    ) -> None:
+        """将分块加入倒排索引（不提交事务）
+
+        每个 (词项, 分块) 写入一行，只插入新行，不读取或改写已有倒排项。
+
+        Args:
+            db: 数据库会话
+            kb_id: 知识库ID
+            chunks: (分块ID, 词项向量) 列表
+        """
+        if not chunks:
+            return
+
+        start_time = time.time()
+
+        rows = []
+        total_length = 0
+        for chunk_id, term_freqs in chunks:
+            length = sum(term_freqs.values())
+            total_length += length
+            for term, tf in term_freqs.items():
+                rows.append({
+                    "knowledge_base_id": kb_id,
+                    "term": term,
+                    "chunk_id": int(chunk_id),
+                    "term_freq": tf,
+                    "chunk_length": length,
+                })
+
+        for i in range(0, len(rows), _ROW_BATCH_SIZE):
+            await db.execute(insert(KeywordPosting).values(rows[i:i + _ROW_BATCH_SIZE]))
+
+        await self.update_stats(db, kb_id, len(chunks), total_length)
+
+        Logger.rag_performance_metrics(
+            operation="bm25_index_add",
+            duration=time.time() - start_time,
+            kb_id=kb_id,
+            chunk_count=len(chunks),
+            posting_count=len(rows),
+            token_count=total_length
+        )
+
+    async def remove_chunks(
+        self,
+        db: AsyncSession,
+        kb_id: int,
+        chunks: Sequence[Tuple[int, Dict[str, int]]]
+    ) -> None:
+        """从倒排索引中移除分块（不提交事务）
+
+        Args:
+            db: 数据库会话
+            kb_id: 知识库ID
+            chunks: (分块ID, 词项向量) 列表
+        """
+        if not chunks:
+            return
+
+        start_time = time.time()
+
+        chunk_ids = [int(chunk_id) for chunk_id, _ in chunks]
+        removed_length = sum(sum(term_freqs.values()) for _, term_freqs in chunks)
+        removed_postings = 0
+        for i in range(0, len(chunk_ids), _TERM_BATCH_SIZE):
+            result = await db.execute(
+                delete(KeywordPosting)
+                .where(
+                    KeywordPosting.knowledge_base_id == kb_id,
+                    KeywordPosting.chunk_id.in_(chunk_ids[i:i + _TERM_BATCH_SIZE])
+                )
+                .execution_options(synchronize_session=False)
+            )
+            removed_postings += result.rowcount or 0
+
+        await self.update_stats(db, kb_id, -len(chunks), -removed_length)
+
+        Logger.rag_performance_metrics(
+            operation="bm25_index_remove",
+            duration=time.time() - start_time,
+            kb_id=kb_id,
+            chunk_count=len(chunks),
+            posting_count=removed_postings
+        )
+
+    async def clear(self, db: AsyncSession, kb_id: int) -> None:
+        """清空知识库的倒排索引（不提交事务）
+
+        Args:
+            db: 数据库会话
+            kb_id: 知识库ID
+        """
+        await db.execute(
+            delete(KeywordPosting)
+            .where(KeywordPosting.knowledge_base_id == kb_id)
+            .execution_options(synchronize_session=False)
+        )
+        # 保留统计行并递增代数，使其他进程中的缓存失效
+        await self.update_stats(db, kb_id, reset=True)
+
+    async def search(
+        self,
+        db: AsyncSession,
+        kb_id: int,
+        query: str,
+        top_k: int = 5
+    ) -> List[Tuple[int, float]]:
+        """BM25检索
+
+        Args:
+            db: 数据库会话
+            kb_id: 知识库ID
+            query: 查询文本
+            top_k: 返回结果数量
+
+        Returns:
+            List[Tuple[int, float]]: 按分数降序排列的 (分块ID, BM25分数) 列表
+        """
+        start_time = time.time()
+
+        query_terms = set(self.tokenize(query, kb_id))
+        if not query_terms or top_k <= 0:
+            return []
+
+        # 语料统计（分块数、平均长度、文档频率）走进程内缓存
+        stats = await CorpusStatsCache.get_stats(db, kb_id, query_terms)
+        if stats is None or stats.doc_count == 0:
+            return []
+
+        avg_length = stats.avg_length
+        k1, b = self.k1, self.b
+
+        scores: Dict[int, float] = {}
+        matched_terms = set()
+        terms = list(query_terms)
+        for i in range(0, len(terms), _TERM_BATCH_SIZE):
+            result = await db.execute(
+                select(
+                    KeywordPosting.term,
+                    KeywordPosting.chunk_id,
+                    KeywordPosting.term_freq,
+                    KeywordPosting.chunk_length
+                ).where(
+                    KeywordPosting.knowledge_base_id == kb_id,
+                    KeywordPosting.term.in_(terms[i:i + _TERM_BATCH_SIZE])
+                )
+            )
+            for term, chunk_id, tf, length in result.all():
+                matched_terms.add(term)
+                norm = k1 * (1 - b + b * length / avg_length) if avg_length else k1
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + stats.idf(term) * tf * (k1 + 1) / (tf + norm)
+        if not scores:
+            return []
+
+        top_results = heapq.nlargest(top_k, scores.items(), key=itemgetter(1))
+
+        Logger.rag_performance_metrics(
+            operation="bm25_index_search",
+            duration=time.time() - start_time,
+            kb_id=kb_id,
+            query_term_count=len(query_terms),
+            matched_term_count=len(matched_terms),
+            candidate_count=len(scores),
+            top_k=top_k
+        )
+
+        return [(int(chunk_id), score) for chunk_id, score in top_results]
+
+    @staticmethod
+    async def update_stats(
+        db: AsyncSession,
+        kb_id: int,
+        doc_delta: int = 0,
+        length_delta: int = 0,
+        reset: bool = False
+    ) -> None:
+        """原子更新索引统计并递增索引代数（不提交事务）
+
+        以 UPDATE ... SET col = col + delta 在数据库中完成增减，并发写入不会互相覆盖；
+        同时使本进程内的语料统计缓存失效。
+
+        Args:
+            db: 数据库会话
+            kb_id: 知识库ID
+            doc_delta: 分块数增量
+            length_delta: 词项总数增量
+            reset: 是否将分块数和词项总数清零
+        """
+        exists = (await db.execute(
+            select(KeywordIndexStats.id).where(KeywordIndexStats.knowledge_base_id == kb_id)
+        )).first()
+        if exists is None:
+            db.add(KeywordIndexStats(knowledge_base_id=kb_id, doc_count=0, total_length=0, generation=0))
+            await db.flush()
+
+        if reset:
+            values = {"doc_count": 0, "total_length": 0}
+        else:
+            doc_count = KeywordIndexStats.doc_count + doc_delta
+            total_length = KeywordIndexStats.total_length + length_delta
+            values = {
+                "doc_count": case((doc_count < 0, 0), else_=doc_count),
+                "total_length": case((total_length < 0, 0), else_=total_length),
+            }
+        await db.execute(
+            update(KeywordIndexStats)
+            .where(KeywordIndexStats.knowledge_base_id == kb_id)
+            .values(generation=KeywordIndexStats.generation + 1, **values)
+            .execution_options(synchronize_session=False)
+        )
+        CorpusStatsCache.invalidate(kb_id)
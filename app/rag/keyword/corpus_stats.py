@@ -0,0 +1,133 @@
+"""知识库语料统计缓存"""
+import math
+import time
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.logger import Logger
+from app.models.keyword_index import KeywordPosting, KeywordIndexStats
+
+# 单次 IN 查询的最大词项数
+_TERM_BATCH_SIZE = 500
+
+# 每个知识库在内存中缓存的最大词项数，超过后整体重建
+_MAX_CACHED_TERMS = 50000
+
+
+class CorpusStats:
+    """知识库语料统计
+
+    包含已索引分块数、平均分块长度和按需加载的词项文档频率
+    """
+
+    def __init__(self, kb_id: int, generation: int, doc_count: int, total_length: int):
+        """初始化语料统计
+
+        Args:
+            kb_id: 知识库ID
+            generation: 索引代数，索引每次变更都会递增
+            doc_count: 已索引分块数
+            total_length: 已索引分块的词项总数
+        """
+        self.kb_id = kb_id
+        self.generation = generation
+        self.doc_count = doc_count
+        self.avg_length = total_length / doc_count if doc_count else 0.0
+        self.doc_freqs: Dict[str, int] = {}
+
+    def idf(self, term: str) -> float:
+        """计算词项的BM25 IDF
+
+        Args:
+            term: 词项
+
+        Returns:
+            float: IDF值
+        """
+        df = self.doc_freqs.get(term, 0)
+        return math.log(1 + (self.doc_count - df + 0.5) / (df + 0.5))
+
+
+class CorpusStatsCache:
+    """语料统计进程内缓存
+
+    每次读取只查询一行索引统计来比对代数，代数变化时丢弃该知识库的缓存；
+    词项文档频率按查询词项增量加载，读取开销与查询词项数成正比。
+    """
+
+    _entries: Dict[int, CorpusStats] = {}
+
+    @classmethod
+    async def get_stats(
+        cls,
+        db: AsyncSession,
+        kb_id: int,
+        terms: Iterable[str] = ()
+    ) -> Optional[CorpusStats]:
+        """获取知识库语料统计，并确保给定词项的文档频率已加载
+
+        Args:
+            db: 数据库会话
+            kb_id: 知识库ID
+            terms: 需要文档频率的词项
+
+        Returns:
+            Optional[CorpusStats]: 语料统计，知识库尚未建立倒排索引时返回None
+        """
+        start_time = time.time()
+
+        row = (await db.execute(
+            select(
+                KeywordIndexStats.generation,
+                KeywordIndexStats.doc_count,
+                KeywordIndexStats.total_length
+            ).where(KeywordIndexStats.knowledge_base_id == kb_id)
+        )).first()
+        if row is None:
+            cls._entries.pop(kb_id, None)
+            return None
+
+        stats = cls._entries.get(kb_id)
+        cache_hit = stats is not None and stats.generation == row.generation
+        if not cache_hit or len(stats.doc_freqs) > _MAX_CACHED_TERMS:
+            stats = CorpusStats(kb_id, row.generation, row.doc_count, row.total_length)
+            cls._entries[kb_id] = stats
+
+        missing = [term for term in set(terms) if term not in stats.doc_freqs]
+        for i in range(0, len(missing), _TERM_BATCH_SIZE):
+            batch = missing[i:i + _TERM_BATCH_SIZE]
+            result = await db.execute(
+                select(KeywordPosting.term, func.count()).where(
+                    KeywordPosting.knowledge_base_id == kb_id,
+                    KeywordPosting.term.in_(batch)
+                ).group_by(KeywordPosting.term)
+            )
+            found = {term: doc_freq for term, doc_freq in result.all()}
+            for term in batch:
+                # 未出现的词项也缓存为0，避免重复查询
+                stats.doc_freqs[term] = found.get(term, 0)
+
+        Logger.rag_performance_metrics(
+            operation="corpus_stats_lookup",
+            duration=time.time() - start_time,
+            kb_id=kb_id,
+            generation=stats.generation,
+            cache_hit=cache_hit,
+            loaded_term_count=len(missing)
+        )
+
+        return stats
+
+    @classmethod
+    def invalidate(cls, kb_id: Optional[int] = None) -> None:
+        """使本进程内的语料统计缓存失效
+
+        Args:
+            kb_id: 知识库ID，为None时清空全部
+        """
+        if kb_id is None:
+            cls._entries.clear()
+        else:
+            cls._entries.pop(kb_id, None)
@@ -0,0 +1,277 @@
+"""基于数据库原生全文检索的关键词索引"""
+import time
+from typing import Dict, List, Sequence, Tuple
+
+from sqlalchemy import text, bindparam
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.logger import Logger
+from app.rag.exceptions import IndexingException
+from app.rag.keyword.bm25_index import BM25Index
+
+# 支持的数据库方言
+SUPPORTED_DIALECTS = ("sqlite", "postgresql")
+
+
+class FullTextIndex:
+    """数据库原生全文索引
+
+    分块在写入前先用jieba分词并以空格拼接，再交给数据库的全文引擎建立索引：
+    - SQLite：每个知识库一张 FTS5 虚拟表（rowid 即分块ID），按 bm25() 排序
+    - PostgreSQL：共享的 tsvector 表 + GIN 索引，按 ts_rank_cd() 排序
+    分块数、词项总数和索引代数与倒排索引共用 keyword_index_stats，索引变更时同样递增代数。
+    """
+
+    # 已完成建表的 PostgreSQL 进程级标记
+    _pg_schema_ready = False
+
+    @staticmethod
+    def get_dialect(db: AsyncSession) -> str:
+        """获取会话对应的数据库方言
+
+        Args:
+            db: 数据库会话
+
+        Returns:
+            str: 方言名称
+        """
+        return db.get_bind().dialect.name
+
+    @classmethod
+    def supports(cls, db: AsyncSession) -> bool:
+        """判断当前数据库是否支持全文索引后端
+
+        Args:
+            db: 数据库会话
+
+        Returns:
+            bool: 是否支持
+        """
+        return cls.get_dialect(db) in SUPPORTED_DIALECTS
+
+    @staticmethod
+    def _fts_table(kb_id: int) -> str:
+        """SQLite FTS5 表名"""
+        return f"keyword_fts_kb_{int(kb_id)}"
+
+    @staticmethod
+    def _join_terms(term_freqs: Dict[str, int]) -> str:
+        """将词项向量展开并以空格拼接，作为全文引擎的输入"""
+        return " ".join(" ".join([term] * tf) for term, tf in term_freqs.items())
+
+    async def add_chunks(
+        self,
+        db: AsyncSession,
+        kb_id: int,
+        chunks: Sequence[Tuple[int, Dict[str, int]]]
+    ) -> None:
+        """将分块写入全文索引（不提交事务）
+
+        Args:
+            db: 数据库会话
+            kb_id: 知识库ID
+            chunks: (分块ID, 词项向量) 列表
+        """
+        if not chunks:
+            return
+
+        start_time = time.time()
+        dialect = self.get_dialect(db)
+        rows = [
+            {"chunk_id": chunk_id, "kb_id": kb_id, "terms": self._join_terms(term_freqs)}
+            for chunk_id, term_freqs in chunks
+        ]
+
+        if dialect == "sqlite":
+            table = self._fts_table(kb_id)
+            await db.execute(text(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5(terms)"
+            ))
+            await db.execute(
+                text(f"INSERT OR REPLACE INTO {table} (rowid, terms) VALUES (:chunk_id, :terms)"),
+                rows
+            )
+        elif dialect == "postgresql":
+            await self._ensure_pg_schema(db)
+            await db.execute(
+                text(
+                    "INSERT INTO keyword_fts (chunk_id, knowledge_base_id, terms) "
+                    "VALUES (:chunk_id, :kb_id, to_tsvector('simple', :terms)) "
+                    "ON CONFLICT (chunk_id) DO UPDATE SET terms = EXCLUDED.terms"
+                ),
+                rows
+            )
+        else:
+            raise IndexingException(
+                f"数据库 {dialect} 不支持全文索引",
+                knowledge_base_id=kb_id,
+                index_type="fulltext"
+            )
+
+        await BM25Index.update_stats(
+            db, kb_id, len(chunks), sum(sum(term_freqs.values()) for _, term_freqs in chunks)
+        )
+
+        Logger.rag_performance_metrics(
+            operation="fulltext_index_add",
+            duration=time.time() - start_time,
+            kb_id=kb_id,
+            dialect=dialect,
+            chunk_count=len(rows)
+        )
+
+    async def remove_chunks(
+        self,
+        db: AsyncSession,
+        kb_id: int,
+        chunks: Sequence[Tuple[int, Dict[str, int]]]
+    ) -> None:
+        """从全文索引中移除分块（不提交事务）
+
+        Args:
+            db: 数据库会话
+            kb_id: 知识库ID
+            chunks: (分块ID, 词项向量) 列表
+        """
+        if not chunks:
+            return
+
+        dialect = self.get_dialect(db)
+        chunk_ids = [chunk_id for chunk_id, _ in chunks]
+
+        if dialect == "sqlite":
+            if not await self._sqlite_table_exists(db, kb_id):
+                return
+            statement = text(
+                f"DELETE FROM {self._fts_table(kb_id)} WHERE rowid IN :chunk_ids"
+            )
+        else:
+            await self._ensure_pg_schema(db)
+            statement = text("DELETE FROM keyword_fts WHERE chunk_id IN :chunk_ids")
+
+        await db.execute(
+            statement.bindparams(bindparam("chunk_ids", expanding=True)),
+            {"chunk_ids": chunk_ids}
+        )
+        await BM25Index.update_stats(
+            db, kb_id, -len(chunks), -sum(sum(term_freqs.values()) for _, term_freqs in chunks)
+        )
+
+    async def clear(self, db: AsyncSession, kb_id: int) -> None:
+        """清空知识库的全文索引（不提交事务）
+
+        Args:
+            db: 数据库会话
+            kb_id: 知识库ID
+        """
+        dialect = self.get_dialect(db)
+        if dialect == "sqlite":
+            await db.execute(text(f"DROP TABLE IF EXISTS {self._fts_table(kb_id)}"))
+        elif dialect == "postgresql":
+            await self._ensure_pg_schema(db)
+            await db.execute(
+                text("DELETE FROM keyword_fts WHERE knowledge_base_id = :kb_id"),
+                {"kb_id": kb_id}
+            )
+        # 保留统计行并递增代数，使检索缓存失效
+        await BM25Index.update_stats(db, kb_id, reset=True)
+
+    async def search(
+        self,
+        db: AsyncSession,
+        kb_id: int,
+        query: str,
+        top_k: int = 5
+    ) -> List[Tuple[int, float]]:
+        """全文检索
+
+        Args:
+            db: 数据库会话
+            kb_id: 知识库ID
+            query: 查询文本
+            top_k: 返回结果数量
+
+        Returns:
+            List[Tuple[int, float]]: 按分数降序排列的 (分块ID, 分数) 列表
+        """
+        start_time = time.time()
+
+        query_terms = sorted(set(BM25Index.tokenize(query, kb_id)))
+        if not query_terms or top_k <= 0:
+            return []
+
+        dialect = self.get_dialect(db)
+        if dialect == "sqlite":
+            if not await self._sqlite_table_exists(db, kb_id):
+                return []
+            table = self._fts_table(kb_id)
+            # FTS5 的 bm25() 越小越相关，取负数作为分数
+            match = " OR ".join('"' + term.replace('"', '""') + '"' for term in query_terms)
+            result = await db.execute(
+                text(
+                    f"SELECT rowid AS chunk_id, -bm25({table}) AS score FROM {table} "
+                    f"WHERE {table} MATCH :match ORDER BY bm25({table}) LIMIT :top_k"
+                ),
+                {"match": match, "top_k": top_k}
+            )
+        else:
+            await self._ensure_pg_schema(db)
+            tsquery = " | ".join(
+                "'" + term.replace("\\", "\\\\").replace("'", "''") + "'"
+                for term in query_terms
+            )
+            # 归一化参数 1：分数除以 1 + log(文档长度)
+            result = await db.execute(
+                text(
+                    "SELECT chunk_id, ts_rank_cd(terms, q, 1) AS score "
+                    "FROM keyword_fts, to_tsquery('simple', :tsquery) q "
+                    "WHERE knowledge_base_id = :kb_id AND terms @@ q "
+                    "ORDER BY score DESC LIMIT :top_k"
+                ),
+                {"tsquery": tsquery, "kb_id": kb_id, "top_k": top_k}
+            )
+
+        ranked = [(int(row.chunk_id), float(row.score)) for row in result.fetchall()]
+
+        Logger.rag_performance_metrics(
+            operation="fulltext_index_search",
+            duration=time.time() - start_time,
+            kb_id=kb_id,
+            dialect=dialect,
+            query_term_count=len(query_terms),
+            result_count=len(ranked),
+            top_k=top_k
+        )
+
+        return ranked
+
+    async def _sqlite_table_exists(self, db: AsyncSession, kb_id: int) -> bool:
+        """检查知识库的 FTS5 表是否存在"""
+        result = await db.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {"name": self._fts_table(kb_id)}
+        )
+        return result.first() is not None
+
+    async def _ensure_pg_schema(self, db: AsyncSession) -> None:
+        """确保 PostgreSQL 全文索引表及 GIN 索引存在
+
+        建表在独立连接的事务中执行并提交，不受调用方事务回滚影响，提交成功后才设置进程级标记。
+        """
+        if FullTextIndex._pg_schema_ready:
+            return
+
+        async with db.bind.begin() as conn:
+            await conn.execute(text(
+                "CREATE TABLE IF NOT EXISTS keyword_fts ("
+                "chunk_id INTEGER PRIMARY KEY REFERENCES document_chunks(id) ON DELETE CASCADE, "
+                "knowledge_base_id INTEGER NOT NULL, "
+                "terms TSVECTOR NOT NULL)"
+            ))
+            await conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_keyword_fts_terms ON keyword_fts USING GIN (terms)"
+            ))
+            await conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_keyword_fts_kb ON keyword_fts (knowledge_base_id)"
+            ))
+        FullTextIndex._pg_schema_ready = True
@@ -0,0 +1,38 @@
+"""关键词索引工厂"""
+from typing import Union
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.logger import Logger
+from app.models.knowledge_base import KnowledgeBase
+from app.rag.keyword.bm25_index import BM25Index
+from app.rag.keyword.fulltext_index import FullTextIndex
+
+class KeywordIndexFactory:
+    """关键词索引工厂
+
+    根据知识库的检索配置选择关键词索引后端
+    """
+
+    @staticmethod
+    def create_keyword_index(
+        knowledge_base: KnowledgeBase,
+        db: AsyncSession
+    ) -> Union[BM25Index, FullTextIndex]:
+        """创建关键词索引
+
+        Args:
+            knowledge_base: 知识库对象
+            db: 数据库会话
+
+        Returns:
+            Union[BM25Index, FullTextIndex]: 关键词索引后端
+        """
+        if knowledge_base.get_keyword_backend() == "fulltext":
+            if FullTextIndex.supports(db):
+                return FullTextIndex()
+            Logger.warning(
+                f"知识库 {knowledge_base.id} 配置了全文索引后端，"
+                f"但数据库 {FullTextIndex.get_dialect(db)} 不支持，回退到倒排索引"
+            )
+        return BM25Index()
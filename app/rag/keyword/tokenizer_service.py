@@ -0,0 +1,297 @@
+"""基于进程池的jieba分词服务"""
+import asyncio
+import logging
+import os
+import re
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import jieba
+
+from app.core.config import settings
+from app.core.logger import Logger
+
+_PUNCTUATION_PATTERN = re.compile(r'[^\w\s]')
+
+# 分词器缓存：知识库ID -> (用户词典修改时间, 分词器)，主进程与工作进程各自持有一份
+_TOKENIZERS: Dict[int, Tuple[float, jieba.Tokenizer]] = {}
+
+
+def get_user_dict_path(kb_id: int) -> str:
+    """获取知识库用户词典路径
+
+    Args:
+        kb_id: 知识库ID
+
+    Returns:
+        str: 用户词典文件路径
+    """
+    return os.path.join(settings.RAG_TOKENIZER_USER_DICT_DIR, f"kb_{int(kb_id)}.txt")
+
+
+def get_tokenizer(kb_id: Optional[int] = None) -> jieba.Tokenizer:
+    """获取知识库对应的分词器
+
+    没有用户词典的知识库共用jieba默认分词器；有用户词典时按词典修改时间缓存独立分词器。
+
+    Args:
+        kb_id: 知识库ID
+
+    Returns:
+        jieba.Tokenizer: 分词器
+    """
+    if kb_id is None:
+        return jieba.dt
+
+    path = get_user_dict_path(kb_id)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        _TOKENIZERS.pop(kb_id, None)
+        return jieba.dt
+
+    cached = _TOKENIZERS.get(kb_id)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    tokenizer = jieba.Tokenizer()
+    tokenizer.initialize()
+    tokenizer.load_userdict(path)
+    _TOKENIZERS[kb_id] = (mtime, tokenizer)
+    return tokenizer
+
+
+def tokenize(text: str, kb_id: Optional[int] = None) -> List[str]:
+    """分词（保留重复词项，过滤单字和标点）
+
+    Args:
+        text: 文本内容
+        kb_id: 知识库ID，用于加载知识库用户词典
+
+    Returns:
+        List[str]: 词项列表
+    """
+    if not text:
+        return []
+
+    tokens = []
+    for word in get_tokenizer(kb_id).cut_for_search(text):
+        word = word.strip().lower()
+        if len(word) > 1 and not _PUNCTUATION_PATTERN.match(word):
+            tokens.append(word)
+    return tokens
+
+
+def _init_worker() -> None:
+    """工作进程初始化：预加载默认词典"""
+    jieba.setLogLevel(logging.WARNING)
+    jieba.initialize()
+
+
+def _term_vector_batch(texts: Sequence[str], kb_id: Optional[int]) -> List[Tuple[Dict[str, int], int]]:
+    """在工作进程中计算一批文本的词项向量
+
+    直接返回词频映射，跨进程只传输每个文本的去重词项及词频。
+
+    Args:
+        texts: 文本列表
+        kb_id: 知识库ID
+
+    Returns:
+        List[Tuple[Dict[str, int], int]]: 每个文本的 (词项到词频的映射, 词项总数)
+    """
+    vectors = []
+    for text in texts:
+        tokens = tokenize(text, kb_id)
+        vectors.append((dict(Counter(tokens)), len(tokens)))
+    return vectors
+
+
+class TokenizerService:
+    """分词服务
+
+    使用预热词典的进程池执行jieba分词，避免CPU密集的分词阻塞事件循环；
+    提供批量接口，工作进程直接返回每个文本的词项向量。
+    """
+
+    _instance: Optional["TokenizerService"] = None
+
+    def __init__(self, max_workers: Optional[int] = None, batch_chars: Optional[int] = None):
+        """初始化分词服务
+
+        Args:
+            max_workers: 工作进程数，默认读取配置
+            batch_chars: 单个子任务的最大字符数，默认读取配置
+        """
+        self.max_workers = max_workers or settings.RAG_TOKENIZER_WORKERS
+        self.batch_chars = batch_chars or settings.RAG_TOKENIZER_BATCH_CHARS
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._metrics = {
+            "batch_count": 0,
+            "text_count": 0,
+            "char_count": 0,
+            "token_count": 0,
+            "total_time": 0.0,
+            "fallback_count": 0,
+        }
+
+    @classmethod
+    def get_instance(cls) -> "TokenizerService":
+        """获取进程内单例
+
+        Returns:
+            TokenizerService: 分词服务实例
+        """
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """延迟创建进程池"""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_init_worker
+            )
+            Logger.info(f"分词进程池已启动: {self.max_workers} 个工作进程")
+        return self._executor
+
+    def _split_batches(self, texts: Sequence[str]) -> List[Tuple[int, int]]:
+        """按字符数把文本切分为子任务区间"""
+        ranges = []
+        start = 0
+        chars = 0
+        for i, text in enumerate(texts):
+            chars += len(text)
+            if chars >= self.batch_chars:
+                ranges.append((start, i + 1))
+                start, chars = i + 1, 0
+        if start < len(texts):
+            ranges.append((start, len(texts)))
+        return ranges
+
+    async def term_vectors(
+        self,
+        texts: Sequence[str],
+        kb_id: Optional[int] = None
+    ) -> List[Tuple[Dict[str, int], int]]:
+        """批量计算词项向量
+
+        Args:
+            texts: 文本列表
+            kb_id: 知识库ID，用于加载知识库用户词典
+
+        Returns:
+            List[Tuple[Dict[str, int], int]]: 每个文本的 (词项到词频的映射, 词项总数)
+        """
+        if not texts:
+            return []
+
+        start_time = time.time()
+        loop = asyncio.get_running_loop()
+        ranges = self._split_batches(texts)
+
+        try:
+            executor = self._get_executor()
+            batch_results = await asyncio.gather(*[
+                loop.run_in_executor(executor, _term_vector_batch, list(texts[a:b]), kb_id)
+                for a, b in ranges
+            ])
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool):
+                # 工作进程异常退出后进程池不可再用，丢弃后下次调用重新创建
+                self._reset_executor()
+            # 进程池不可用时回退到线程中执行，保证索引流程不中断
+            Logger.warning(f"分词进程池执行失败，回退到线程执行: {str(e)}")
+            self._metrics["fallback_count"] += 1
+            batch_results = await asyncio.gather(*[
+                loop.run_in_executor(None, _term_vector_batch, list(texts[a:b]), kb_id)
+                for a, b in ranges
+            ])
+
+        vectors = [vector for batch in batch_results for vector in batch]
+        token_count = sum(term_count for _, term_count in vectors)
+
+        duration = time.time() - start_time
+        char_count = sum(len(text) for text in texts)
+        self._metrics["batch_count"] += 1
+        self._metrics["text_count"] += len(texts)
+        self._metrics["char_count"] += char_count
+        self._metrics["token_count"] += token_count
+        self._metrics["total_time"] += duration
+
+        Logger.rag_performance_metrics(
+            operation="tokenizer_batch",
+            duration=duration,
+            kb_id=kb_id,
+            text_count=len(texts),
+            char_count=char_count,
+            token_count=token_count,
+            sub_batch_count=len(ranges),
+            chars_per_second=char_count / duration if duration > 0 else 0
+        )
+
+        return vectors
+
+    def get_metrics(self) -> Dict[str, float]:
+        """获取吞吐量指标
+
+        Returns:
+            Dict[str, float]: 累计指标
+        """
+        metrics = dict(self._metrics)
+        total_time = metrics["total_time"]
+        metrics["chars_per_second"] = metrics["char_count"] / total_time if total_time > 0 else 0.0
+        metrics["tokens_per_second"] = metrics["token_count"] / total_time if total_time > 0 else 0.0
+        metrics["max_workers"] = self.max_workers
+        return metrics
+
+    def _reset_executor(self) -> None:
+        """丢弃当前进程池（不等待），下次调用时重新创建"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def shutdown(self) -> None:
+        """关闭进程池"""
+        self._reset_executor()
+
+
+async def get_document_term_vectors(
+    documents: Sequence,
+    kb_id: Optional[int] = None
+) -> List[Tuple[Dict[str, int], int]]:
+    """获取文档的词项向量
+
+    transform 阶段已计算的词项向量从元数据中取出（不随分块元数据重复保存），
+    其余文档合并为一批交给分词服务。
+
+    Args:
+        documents: 文档对象列表
+        kb_id: 知识库ID
+
+    Returns:
+        List[Tuple[Dict[str, int], int]]: 与文档一一对应的 (词项到词频的映射, 词项总数)
+    """
+    vectors: List[Optional[Tuple[Dict[str, int], int]]] = []
+    pending = []
+    for i, doc in enumerate(documents):
+        term_freqs = doc.metadata.pop("term_freqs", None)
+        term_count = doc.metadata.pop("term_count", None)
+        if term_freqs is None:
+            vectors.append(None)
+            pending.append(i)
+        else:
+            vectors.append((term_freqs, term_count if term_count is not None else sum(term_freqs.values())))
+
+    if pending:
+        computed = await TokenizerService.get_instance().term_vectors(
+            [documents[i].page_content for i in pending],
+            kb_id
+        )
+        for i, vector in zip(pending, computed):
+            vectors[i] = vector
+    return vectors
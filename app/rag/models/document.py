@@ -1,5 +1,5 @@
 """文档模型，用于表示处理后的文档"""
-from typing import Dict, List, Optional, Any
+from typing import Dict, Optional, Any
 from pydantic import BaseModel, Field
 
 class Document(BaseModel):
@@ -7,7 +7,8 @@ class Document(BaseModel):
     
     page_content: str = Field(..., description="文档内容")
     metadata: Dict[str, Any] = Field(default_factory=dict, description="文档元数据")
-    vector: Optional[List[float]] = Field(default=None, description="文档向量")
+    # 向量存储返回的向量为 NumPy 数组（检索结果矩阵的行视图），其余来源为列表
+    vector: Optional[Any] = Field(default=None, description="文档向量")
     
     def __str__(self) -> str:
         """字符串表示"""
@@ -6,6 +6,8 @@
 
 from app.rag.rerank.rerank_base import BaseRerankRunner
 from app.rag.rerank.rerank_model import RerankModelRunner
+from app.rag.rerank.cross_encoder_rerank import CrossEncoderRerankRunner
+from app.rag.rerank.cascade_rerank import CascadeRerankRunner
 from app.rag.rerank.weight_rerank import WeightRerankRunner
 from app.rag.rerank.rerank_factory import RerankRunnerFactory
 from app.rag.rerank.rerank_type import RerankMode
@@ -14,6 +16,8 @@ from app.rag.rerank.entity.weight import Weights, VectorSetting, KeywordSetting
 __all__ = [
     "BaseRerankRunner",
     "RerankModelRunner", 
+    "CrossEncoderRerankRunner",
+    "CascadeRerankRunner",
     "WeightRerankRunner",
     "RerankRunnerFactory",
     "RerankMode",
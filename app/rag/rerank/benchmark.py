@@ -0,0 +1,144 @@
+"""重排序模式基准测试
+
+在带标注的评测集上对比加权分数重排序与本地交叉编码器重排序的质量（MRR、nDCG@k）和延迟，
+交叉编码器分别统计冷缓存和热缓存（重复查询命中分数缓存）两轮。
+
+评测集为 JSONL，每行一个查询：
+    {"query": "...", "passages": [{"text": "...", "relevant": 1}, ...]}
+
+用法:
+    python -m app.rag.rerank.benchmark --dataset eval.jsonl --top-k 5
+"""
+import argparse
+import asyncio
+import json
+import math
+import statistics
+import time
+from typing import Dict, List
+
+from app.core.config import settings
+from app.models.database import AsyncSessionLocal
+from app.rag.embedding.embedding_engine import EmbeddingEngine
+from app.rag.models.document import Document
+from app.rag.rerank.cross_encoder_rerank import CrossEncoderRerankRunner
+from app.rag.rerank.rerank_base import BaseRerankRunner
+from app.rag.rerank.rerank_factory import RerankRunnerFactory
+from app.rag.rerank.rerank_type import RerankMode
+
+
+def _load_dataset(path: str) -> List[Dict]:
+    """读取评测集"""
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _build_documents(item: Dict, query_index: int) -> List[Document]:
+    """为一个查询构造候选文档，分块ID在整个评测集内唯一"""
+    return [
+        Document(
+            page_content=passage["text"],
+            metadata={
+                "doc_id": f"q{query_index}_p{i}",
+                "chunk_id": query_index * 100000 + i,
+                "relevant": int(passage.get("relevant", 0))
+            }
+        )
+        for i, passage in enumerate(item["passages"])
+    ]
+
+
+def _reciprocal_rank(documents: List[Document]) -> float:
+    """首个相关文档排名的倒数"""
+    for rank, document in enumerate(documents, start=1):
+        if document.metadata.get("relevant"):
+            return 1.0 / rank
+    return 0.0
+
+
+def _ndcg(documents: List[Document], relevant_count: int, k: int) -> float:
+    """nDCG@k（二值相关性）"""
+    dcg = sum(
+        1.0 / math.log2(rank + 1)
+        for rank, document in enumerate(documents[:k], start=1)
+        if document.metadata.get("relevant")
+    )
+    ideal = sum(1.0 / math.log2(rank + 1) for rank in range(1, min(relevant_count, k) + 1))
+    return dcg / ideal if ideal else 0.0
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    """计算百分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(int(round(percent / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+async def _evaluate(runner: BaseRerankRunner, dataset: List[Dict], top_k: int) -> Dict[str, float]:
+    """用给定的重排序器跑一遍评测集"""
+    reciprocal_ranks, ndcgs, latencies = [], [], []
+    for query_index, item in enumerate(dataset):
+        documents = _build_documents(item, query_index)
+        relevant_count = sum(document.metadata["relevant"] for document in documents)
+        start = time.time()
+        ranked = await runner.run(item["query"], documents, top_n=top_k, user_id="benchmark")
+        latencies.append(time.time() - start)
+        reciprocal_ranks.append(_reciprocal_rank(ranked))
+        ndcgs.append(_ndcg(ranked, relevant_count, top_k))
+    return {
+        "mrr": statistics.mean(reciprocal_ranks) if reciprocal_ranks else 0.0,
+        "ndcg": statistics.mean(ndcgs) if ndcgs else 0.0,
+        "mean": statistics.mean(latencies) if latencies else 0.0,
+        "p50": _percentile(latencies, 50),
+        "p95": _percentile(latencies, 95),
+    }
+
+
+async def run_benchmark(dataset_path: str, top_k: int) -> None:
+    """执行基准测试
+
+    Args:
+        dataset_path: 评测集路径
+        top_k: 评估的截断位置
+    """
+    dataset = _load_dataset(dataset_path)
+    results: Dict[str, Dict[str, float]] = {}
+
+    async with AsyncSessionLocal() as db:
+        llm_config = settings.DEFAULT_LLM_CONFIG
+        weighted_runner = RerankRunnerFactory.create_rerank_runner(
+            rerank_mode=RerankMode.WEIGHTED_SCORE,
+            user_id="benchmark",
+            embedding_engine=EmbeddingEngine(llm_config, db),
+        )
+        results[RerankMode.WEIGHTED_SCORE.value] = await _evaluate(weighted_runner, dataset, top_k)
+
+        cross_encoder_runner = CrossEncoderRerankRunner()
+        results["cross_encoder_cold"] = await _evaluate(cross_encoder_runner, dataset, top_k)
+        results["cross_encoder_warm"] = await _evaluate(cross_encoder_runner, dataset, top_k)
+        CrossEncoderRerankRunner.shutdown()
+
+    print(f"查询数: {len(dataset)}, top_k: {top_k}, 交叉编码器: {settings.RAG_RERANK_MODEL}")
+    print(f"{'模式':<22}{'MRR':>8}{f'nDCG@{top_k}':>10}{'平均(ms)':>12}{'P50(ms)':>12}{'P95(ms)':>12}")
+    for name, metrics in results.items():
+        print(
+            f"{name:<22}{metrics['mrr']:>8.3f}{metrics['ndcg']:>10.3f}"
+            f"{metrics['mean'] * 1000:>12.2f}"
+            f"{metrics['p50'] * 1000:>12.2f}"
+            f"{metrics['p95'] * 1000:>12.2f}"
+        )
+
+
+def main() -> None:
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="重排序模式基准测试")
+    parser.add_argument("--dataset", type=str, required=True, help="评测集 JSONL 路径")
+    parser.add_argument("--top-k", type=int, default=5, help="评估的截断位置")
+    args = parser.parse_args()
+    asyncio.run(run_benchmark(args.dataset, args.top_k))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""级联重排序器"""
+import time
+from typing import Dict, List, Optional
+
+from app.core.logger import Logger
+from app.rag.models.document import Document
+from app.rag.rerank.rerank_base import BaseRerankRunner
+
+
+class CascadeRerankRunner(BaseRerankRunner):
+    """级联重排序器
+
+    第一阶段只使用检索阶段已有的分数（向量相似度、BM25 或混合分数）排序并截取前 M 个候选，
+    不做任何向量化；第二阶段（模型重排序）只处理这 M 个候选。若检索分数中第一名的领先幅度
+    已超过阈值，则直接返回检索结果，不再执行模型阶段。各阶段耗时记录在 last_timing 中。
+    """
+
+    def __init__(
+        self,
+        model_runner: BaseRerankRunner,
+        top_m: int = 20,
+        margin_threshold: Optional[float] = None,
+    ) -> None:
+        """
+        初始化
+
+        Args:
+            model_runner: 模型阶段重排序器
+            top_m: 第一阶段保留的候选数
+            margin_threshold: 提前结束的相对领先幅度阈值，为None时不提前结束
+        """
+        self.model_runner = model_runner
+        self.top_m = top_m
+        self.margin_threshold = margin_threshold
+        self.last_timing: Optional[Dict[str, object]] = None
+
+    @staticmethod
+    def _top_margin(documents: List[Document]) -> Optional[float]:
+        """第一名相对第二名的领先幅度：(s1 - s2) / s1
+
+        各阶段的分数量纲不同，使用相对幅度使同一阈值适用于所有阶段。
+        """
+        if len(documents) < 2:
+            return None
+        first = documents[0].metadata.get("score")
+        second = documents[1].metadata.get("score")
+        if first is None or second is None or first <= 0:
+            return None
+        return (first - second) / first
+
+    def _should_stop(self, documents: List[Document]) -> bool:
+        """判断领先幅度是否已足够，可以提前结束"""
+        if self.margin_threshold is None:
+            return False
+        margin = self._top_margin(documents)
+        return margin is not None and margin >= self.margin_threshold
+
+    async def run(
+        self,
+        query: str,
+        documents: List[Document],
+        score_threshold: Optional[float] = None,
+        top_n: Optional[int] = None,
+        user_id: Optional[str] = None,
+    ) -> List[Document]:
+        """
+        运行级联重排序
+
+        Args:
+            query: 查询文本
+            documents: 待重排序的文档列表
+            score_threshold: 分数阈值，作用于最终返回结果所用的分数
+            top_n: 返回的最大文档数量
+            user_id: 用户ID（如果需要）
+
+        Returns:
+            重排序后的文档列表
+        """
+        start_time = time.time()
+        timing: Dict[str, object] = {
+            "candidate_count": len(documents),
+            "top_m": self.top_m,
+            "retrieval_stage_duration": 0.0,
+            "model_stage_duration": 0.0,
+            "stopped_after": None,
+        }
+
+        # 第一阶段：按检索分数排序并截取前 M 个候选
+        retrieval_start_time = time.time()
+        candidates = sorted(
+            documents, key=lambda document: document.metadata.get("score", 0.0), reverse=True
+        )[:self.top_m]
+        timing["retrieval_stage_duration"] = time.time() - retrieval_start_time
+
+        if self._should_stop(candidates):
+            # 检索分数已足够区分，跳过模型阶段
+            timing["stopped_after"] = "retrieval"
+            results = [
+                document for document in candidates
+                if score_threshold is None or document.metadata.get("score", 0.0) >= score_threshold
+            ]
+            results = results[:top_n] if top_n else results
+        else:
+            # 第二阶段：模型重排序只处理前 M 个候选
+            model_start_time = time.time()
+            results = await self.model_runner.run(
+                query=query,
+                documents=candidates,
+                score_threshold=score_threshold,
+                top_n=top_n,
+                user_id=user_id
+            )
+            timing["model_stage_duration"] = time.time() - model_start_time
+
+        total_duration = time.time() - start_time
+        timing["total_duration"] = total_duration
+        self.last_timing = timing
+
+        Logger.rag_performance_metrics(
+            operation="cascade_rerank",
+            duration=total_duration,
+            user_id=user_id,
+            candidate_count=len(documents),
+            top_m=self.top_m,
+            retrieval_stage_duration=timing["retrieval_stage_duration"],
+            model_stage_duration=timing["model_stage_duration"],
+            stopped_after=timing["stopped_after"],
+            documents_returned=len(results)
+        )
+
+        return results
@@ -0,0 +1,341 @@
+"""本地交叉编码器重排序器"""
+import asyncio
+import hashlib
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.logger import Logger
+from app.core.redis_manager import RedisManager
+from app.models.keyword_index import KeywordIndexStats
+from app.rag.exceptions import RerankException
+from app.rag.models.document import Document
+from app.rag.rerank.rerank_base import BaseRerankRunner
+from app.rag.rerank.rerank_type import RerankMode
+
+# 已加载的模型：(模型名称, 最大长度, 设备) -> 模型，线程池共享一份，进程池每个进程一份
+_MODELS: Dict[Tuple[str, int, Optional[str]], Any] = {}
+
+
+def _load_model(model_name: str, max_length: int, device: Optional[str]) -> Any:
+    """加载交叉编码器模型（按进程缓存）
+
+    Args:
+        model_name: 模型名称或本地路径
+        max_length: 最大输入长度（token）
+        device: 推理设备，None时自动选择
+
+    Returns:
+        Any: CrossEncoder 模型
+    """
+    key = (model_name, max_length, device)
+    model = _MODELS.get(key)
+    if model is None:
+        try:
+            from sentence_transformers import CrossEncoder
+        except ImportError as e:
+            raise RerankException(
+                "本地交叉编码器重排序需要安装 sentence-transformers",
+                rerank_mode=RerankMode.RERANKING_MODEL
+            ) from e
+        model = CrossEncoder(model_name, max_length=max_length, device=device)
+        _MODELS[key] = model
+    return model
+
+
+def _predict_scores(
+    model_name: str,
+    query: str,
+    passages: Sequence[str],
+    batch_size: int,
+    max_length: int,
+    device: Optional[str]
+) -> List[float]:
+    """对 (查询, 段落) 对打分
+
+    按段落长度排序后分批，使同一批内的长度接近，减少填充带来的无效计算；
+    单标签模型（bge-reranker 等）的 predict 已应用 Sigmoid，分数直接使用，按输入顺序返回。
+
+    Args:
+        model_name: 模型名称
+        query: 查询文本
+        passages: 段落列表
+        batch_size: 批大小
+        max_length: 最大输入长度
+        device: 推理设备
+
+    Returns:
+        List[float]: 与段落一一对应的分数
+    """
+    model = _load_model(model_name, max_length, device)
+    order = sorted(range(len(passages)), key=lambda i: len(passages[i]))
+    scores = [0.0] * len(passages)
+    for start in range(0, len(order), batch_size):
+        indices = order[start:start + batch_size]
+        batch_scores = model.predict(
+            [(query, passages[i]) for i in indices],
+            batch_size=len(indices),
+            show_progress_bar=False,
+            convert_to_numpy=True
+        )
+        for i, score in zip(indices, batch_scores):
+            scores[i] = float(score)
+    return scores
+
+
+class CrossEncoderRerankRunner(BaseRerankRunner):
+    """本地交叉编码器重排序器
+
+    在线程池或进程池中运行交叉编码器，候选数量超过上限时只对检索排名靠前的候选打分；
+    分数按 (模型, 查询哈希, 分块ID, 索引代数) 缓存在 Redis 中，重复查询无需再次推理。
+    """
+
+    _executor: Optional[Executor] = None
+
+    def __init__(
+        self,
+        model_name: Optional[str] = None,
+        db: Optional[Any] = None,
+        knowledge_base_id: Optional[int] = None,
+        max_candidates: Optional[int] = None,
+        batch_size: Optional[int] = None,
+    ) -> None:
+        """
+        初始化
+
+        Args:
+            model_name: 模型名称或本地路径，默认读取配置
+            db: 数据库会话（用于读取索引代数）
+            knowledge_base_id: 知识库ID
+            max_candidates: 参与打分的最大候选数，默认读取配置
+            batch_size: 推理批大小，默认读取配置
+        """
+        self.model_name = model_name or settings.RAG_RERANK_MODEL
+        self.db = db
+        self.knowledge_base_id = knowledge_base_id
+        self.max_candidates = max_candidates or settings.RAG_RERANK_MAX_CANDIDATES
+        self.batch_size = batch_size or settings.RAG_RERANK_BATCH_SIZE
+        self.max_length = settings.RAG_RERANK_MAX_LENGTH
+        self.device = settings.RAG_RERANK_DEVICE
+
+    @classmethod
+    def get_executor(cls) -> Executor:
+        """获取共享的推理执行器
+
+        Returns:
+            Executor: 线程池或进程池
+        """
+        if cls._executor is None:
+            if settings.RAG_RERANK_EXECUTOR == "process":
+                cls._executor = ProcessPoolExecutor(max_workers=settings.RAG_RERANK_WORKERS)
+            else:
+                cls._executor = ThreadPoolExecutor(
+                    max_workers=settings.RAG_RERANK_WORKERS,
+                    thread_name_prefix="cross-encoder"
+                )
+        return cls._executor
+
+    @classmethod
+    def shutdown(cls) -> None:
+        """关闭推理执行器"""
+        if cls._executor is not None:
+            cls._executor.shutdown(wait=False, cancel_futures=True)
+            cls._executor = None
+
+    async def run(
+        self,
+        query: str,
+        documents: List[Document],
+        score_threshold: Optional[float] = None,
+        top_n: Optional[int] = None,
+        user_id: Optional[str] = None,
+    ) -> List[Document]:
+        """
+        运行重排序
+
+        Args:
+            query: 查询文本
+            documents: 待重排序的文档列表（按检索分数排序）
+            score_threshold: 分数阈值，低于此分数的文档将被过滤
+            top_n: 返回的最大文档数量
+            user_id: 用户ID（如果需要）
+
+        Returns:
+            重排序后的文档列表
+        """
+        start_time = time.time()
+
+        # 去重并截取候选
+        candidates = []
+        seen_ids = set()
+        for document in documents:
+            doc_id = document.metadata.get("doc_id") or document.metadata.get("chunk_id")
+            if doc_id is not None:
+                if doc_id in seen_ids:
+                    continue
+                seen_ids.add(doc_id)
+            candidates.append(document)
+        truncated_count = max(len(candidates) - self.max_candidates, 0)
+        candidates = candidates[:self.max_candidates]
+
+        if not candidates:
+            return []
+
+        # 读取缓存分数
+        cache_start_time = time.time()
+        cache_key = await self._cache_key(query)
+        cached_scores = await self._get_cached_scores(cache_key, candidates)
+        cache_duration = time.time() - cache_start_time
+
+        # 只对未命中缓存的候选推理
+        missing = [i for i, score in enumerate(cached_scores) if score is None]
+        model_duration = 0.0
+        if missing:
+            model_start_time = time.time()
+            try:
+                loop = asyncio.get_running_loop()
+                scores = await loop.run_in_executor(
+                    self.get_executor(),
+                    _predict_scores,
+                    self.model_name,
+                    query,
+                    [candidates[i].page_content for i in missing],
+                    self.batch_size,
+                    self.max_length,
+                    self.device
+                )
+            except RerankException:
+                raise
+            except Exception as e:
+                Logger.error(f"交叉编码器推理失败: {str(e)}", extra={
+                    "user_id": user_id,
+                    "model_name": self.model_name,
+                    "candidate_count": len(missing),
+                    "error_type": type(e).__name__
+                })
+                raise RerankException(
+                    message=f"交叉编码器推理失败: {str(e)}",
+                    rerank_mode=RerankMode.RERANKING_MODEL
+                )
+            model_duration = time.time() - model_start_time
+
+            for i, score in zip(missing, scores):
+                cached_scores[i] = score
+            await self._store_scores(cache_key, [candidates[i] for i in missing], scores)
+
+        # 过滤并排序
+        rerank_documents = []
+        filtered_count = 0
+        for document, score in zip(candidates, cached_scores):
+            if score_threshold is not None and score < score_threshold:
+                filtered_count += 1
+                continue
+            document.metadata["score"] = score
+            document.metadata["rerank_score"] = score
+            rerank_documents.append(document)
+        rerank_documents.sort(key=lambda x: x.metadata["score"], reverse=True)
+        final_documents = rerank_documents[:top_n] if top_n else rerank_documents
+
+        total_duration = time.time() - start_time
+
+        Logger.info("交叉编码器重排序完成", extra={
+            "user_id": user_id,
+            "model_name": self.model_name,
+            "candidate_count": len(candidates),
+            "truncated_count": truncated_count,
+            "cache_hit_count": len(candidates) - len(missing),
+            "inferred_count": len(missing),
+            "filtered_count": filtered_count,
+            "final_count": len(final_documents)
+        })
+
+        Logger.rag_performance_metrics(
+            operation="cross_encoder_rerank",
+            duration=total_duration,
+            user_id=user_id,
+            model_name=self.model_name,
+            kb_id=self.knowledge_base_id,
+            cache_duration=cache_duration,
+            model_duration=model_duration,
+            documents_processed=len(candidates),
+            documents_truncated=truncated_count,
+            cache_hits=len(candidates) - len(missing),
+            documents_inferred=len(missing),
+            documents_filtered=filtered_count,
+            documents_returned=len(final_documents)
+        )
+
+        return final_documents
+
+    async def _get_generation(self) -> int:
+        """读取知识库的索引代数，索引变更后缓存分数自然失效"""
+        if self.db is None or self.knowledge_base_id is None:
+            return 0
+        try:
+            result = await self.db.execute(
+                select(KeywordIndexStats.generation).where(
+                    KeywordIndexStats.knowledge_base_id == self.knowledge_base_id
+                )
+            )
+            return result.scalar_one_or_none() or 0
+        except Exception as e:
+            Logger.warning(f"读取索引代数失败: {str(e)}")
+            return 0
+
+    async def _cache_key(self, query: str) -> str:
+        """生成缓存键：同一 (模型, 知识库, 索引代数, 查询) 的分数存放在一个哈希中，字段为分块ID"""
+        generation = await self._get_generation()
+        query_hash = hashlib.sha256(query.encode("utf-8")).hexdigest()[:32]
+        model_hash = hashlib.md5(self.model_name.encode("utf-8")).hexdigest()[:12]
+        return f"rerank:ce:{model_hash}:{self.knowledge_base_id}:{generation}:{query_hash}"
+
+    @staticmethod
+    def _chunk_field(document: Document) -> Optional[str]:
+        """缓存字段：分块ID，缺失时不缓存"""
+        chunk_id = document.metadata.get("chunk_id")
+        return str(chunk_id) if chunk_id is not None else None
+
+    async def _get_cached_scores(
+        self,
+        cache_key: str,
+        documents: List[Document]
+    ) -> List[Optional[float]]:
+        """批量读取缓存分数"""
+        fields = [self._chunk_field(document) for document in documents]
+        scores: List[Optional[float]] = [None] * len(documents)
+        lookup = [(i, field) for i, field in enumerate(fields) if field is not None]
+        if not lookup:
+            return scores
+        try:
+            redis = await RedisManager.get_redis()
+            values = await redis.hmget(cache_key, [field for _, field in lookup])
+            for (i, _), value in zip(lookup, values):
+                if value is not None:
+                    scores[i] = float(value)
+        except Exception as e:
+            Logger.warning(f"读取重排序分数缓存失败: {str(e)}")
+        return scores
+
+    async def _store_scores(
+        self,
+        cache_key: str,
+        documents: List[Document],
+        scores: List[float]
+    ) -> None:
+        """写入缓存分数"""
+        mapping = {}
+        for document, score in zip(documents, scores):
+            field = self._chunk_field(document)
+            if field is not None:
+                mapping[field] = repr(score)
+        if not mapping:
+            return
+        try:
+            redis = await RedisManager.get_redis()
+            await redis.hset(cache_key, mapping=mapping)
+            await redis.expire(cache_key, settings.RAG_RERANK_CACHE_TTL)
+        except Exception as e:
+            Logger.warning(f"写入重排序分数缓存失败: {str(e)}")
@@ -2,9 +2,12 @@
 
 from typing import Any, Optional, Dict
 
+from app.core.config import settings
 from app.core.logger import Logger
 from app.rag.rerank.rerank_base import BaseRerankRunner
 from app.rag.rerank.rerank_model import RerankModelRunner
+from app.rag.rerank.cross_encoder_rerank import CrossEncoderRerankRunner
+from app.rag.rerank.cascade_rerank import CascadeRerankRunner
 from app.rag.rerank.weight_rerank import WeightRerankRunner
 from app.rag.rerank.rerank_type import RerankMode
 from app.rag.rerank.entity.weight import Weights, VectorSetting, KeywordSetting
@@ -42,6 +45,8 @@ class RerankRunnerFactory:
         model_instance: Optional[Any] = None,
         weights: Optional[Weights] = None,
         embedding_engine: Optional[CacheEmbedding] = None,
+        db: Optional[Any] = None,
+        knowledge_base_id: Optional[int] = None,
     ) -> BaseRerankRunner:
         """
         创建重排序运行器
@@ -49,9 +54,11 @@ class RerankRunnerFactory:
         Args:
             rerank_mode: 重排序模式
             user_id: 用户ID
-            model_instance: 模型实例（用于模型重排序）
+            model_instance: 模型实例（用于模型重排序，未提供时使用本地交叉编码器）
             weights: 权重配置（用于加权重排序）
             embedding_engine: 向量引擎（用于加权重排序）
+            db: 数据库会话（用于读取语料统计和索引代数）
+            knowledge_base_id: 知识库ID（用于读取语料统计和索引代数）
 
         Returns:
             重排序运行器
@@ -70,11 +77,19 @@ class RerankRunnerFactory:
         try:
             if rerank_mode == RerankMode.RERANKING_MODEL:
                 if not model_instance:
-                    Logger.error(
-                        "模型重排序需要提供模型实例",
-                        extra={"rerank_mode": rerank_mode, "user_id": user_id},
+                    # 未提供外部模型实例时使用本地交叉编码器
+                    Logger.info(
+                        "创建本地交叉编码器重排序运行器",
+                        extra={
+                            "rerank_mode": rerank_mode,
+                            "user_id": user_id,
+                            "model_name": settings.RAG_RERANK_MODEL,
+                        },
+                    )
+                    return CrossEncoderRerankRunner(
+                        db=db,
+                        knowledge_base_id=knowledge_base_id,
                     )
-                    raise ValueError("模型重排序需要提供模型实例")
 
                 Logger.info(
                     "创建模型重排序运行器",
@@ -135,7 +150,13 @@ class RerankRunnerFactory:
                         "embedding_engine_type": type(embedding_engine).__name__,
                     },
                 )
-                return WeightRerankRunner(user_id, weights, embedding_engine)
+                return WeightRerankRunner(
+                    user_id,
+                    weights,
+                    embedding_engine,
+                    db=db,
+                    knowledge_base_id=knowledge_base_id,
+                )
             else:
                 Logger.error(
                     f"不支持的重排序模式",
@@ -160,3 +181,47 @@ class RerankRunnerFactory:
                 },
             )
             raise
+
+    @staticmethod
+    def create_cascade_rerank_runner(
+        user_id: Optional[str],
+        cascade_config: Dict[str, Any],
+        model_instance: Optional[Any] = None,
+        db: Optional[Any] = None,
+        knowledge_base_id: Optional[int] = None,
+    ) -> BaseRerankRunner:
+        """
+        创建级联重排序运行器：检索分数作为第一阶段，模型重排序作为第二阶段
+
+        Args:
+            user_id: 用户ID
+            cascade_config: 级联配置（top_m, margin_threshold）
+            model_instance: 模型实例，未提供时使用本地交叉编码器
+            db: 数据库会话
+            knowledge_base_id: 知识库ID
+
+        Returns:
+            重排序运行器
+        """
+        model_runner = RerankRunnerFactory.create_rerank_runner(
+            rerank_mode=RerankMode.RERANKING_MODEL,
+            user_id=user_id,
+            model_instance=model_instance,
+            db=db,
+            knowledge_base_id=knowledge_base_id,
+        )
+
+        Logger.info(
+            "创建级联重排序运行器",
+            extra={
+                "user_id": user_id,
+                "top_m": cascade_config.get("top_m"),
+                "margin_threshold": cascade_config.get("margin_threshold"),
+                "model_runner_type": type(model_runner).__name__,
+            },
+        )
+        return CascadeRerankRunner(
+            model_runner,
+            top_m=cascade_config.get("top_m", 20),
+            margin_threshold=cascade_config.get("margin_threshold"),
+        )
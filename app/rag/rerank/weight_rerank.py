@@ -8,27 +8,8 @@ import numpy as np
 from app.rag.models.document import Document
 from app.rag.rerank.rerank_base import BaseRerankRunner
 from app.rag.rerank.entity.weight import Weights, VectorSetting
-try:
-    from app.rag.keyword.jieba_keyword_handler import JiebaKeywordHandler
-except ImportError:
-    # 如果jieba不可用，使用简单的关键词提取器
-    import re
-    from typing import Set
-    
-    class JiebaKeywordHandler:
-        def extract_keywords(self, text: str, stopwords: Optional[Set[str]] = None) -> List[str]:
-            if not text:
-                return []
-            # 简单分词
-            words = re.findall(r'[\u4e00-\u9fff]+|[a-zA-Z]+', text)
-            default_stopwords = {'的', '是', '在', '了', '和', '与', '或', '但', '而', '也', '都', '很', '更', '最'}
-            if stopwords:
-                default_stopwords.update(stopwords)
-            keywords = []
-            for word in words:
-                if word not in default_stopwords and len(word) > 1:
-                    keywords.append(word.lower())
-            return keywords
+from app.rag.keyword.bm25_index import BM25Index
+from app.rag.keyword.corpus_stats import CorpusStatsCache
 from app.rag.embedding.cached_embedding import CacheEmbedding
 from app.core.logger import Logger
 
@@ -36,7 +17,14 @@ from app.core.logger import Logger
 class WeightRerankRunner(BaseRerankRunner):
     """加权重排序器"""
     
-    def __init__(self, user_id: str, weights: Weights, embedding_engine: CacheEmbedding) -> None:
+    def __init__(
+        self,
+        user_id: str,
+        weights: Weights,
+        embedding_engine: CacheEmbedding,
+        db: Optional[Any] = None,
+        knowledge_base_id: Optional[int] = None,
+    ) -> None:
         """
         初始化
         
@@ -44,11 +32,14 @@ class WeightRerankRunner(BaseRerankRunner):
             user_id: 用户ID
             weights: 重排序权重
             embedding_engine: 向量引擎
+            db: 数据库会话（用于读取知识库语料统计）
+            knowledge_base_id: 知识库ID（用于读取知识库语料统计）
         """
         self.user_id = user_id
         self.weights = weights
         self.embedding_engine = embedding_engine
-        self.keyword_handler = JiebaKeywordHandler()
+        self.db = db
+        self.knowledge_base_id = knowledge_base_id
     
     async def run(
         self,
@@ -111,16 +102,20 @@ class WeightRerankRunner(BaseRerankRunner):
         try:
             # 计算关键词分数
             keyword_start_time = time.time()
-            keyword_scores = self._calculate_keyword_score(query, documents)
+            query_keywords = BM25Index.tokenize(query, self.knowledge_base_id)
+            corpus_stats = await self._load_corpus_stats(query_keywords)
+            keyword_scores = self._calculate_keyword_score(
+                query, documents, query_keywords=query_keywords, corpus_stats=corpus_stats
+            )
             keyword_duration = time.time() - keyword_start_time
             
             Logger.info("关键词分数计算完成", extra={
                 "user_id": self.user_id,
                 "duration": keyword_duration,
                 "document_count": len(documents),
-                "avg_keyword_score": sum(keyword_scores) / len(keyword_scores) if keyword_scores else 0,
-                "max_keyword_score": max(keyword_scores) if keyword_scores else 0,
-                "min_keyword_score": min(keyword_scores) if keyword_scores else 0
+                "avg_keyword_score": float(keyword_scores.mean()) if len(keyword_scores) else 0,
+                "max_keyword_score": float(keyword_scores.max()) if len(keyword_scores) else 0,
+                "min_keyword_score": float(keyword_scores.min()) if len(keyword_scores) else 0
             })
             
             # 计算向量相似度分数
@@ -132,9 +127,9 @@ class WeightRerankRunner(BaseRerankRunner):
                 "user_id": self.user_id,
                 "duration": vector_duration,
                 "document_count": len(documents),
-                "avg_vector_score": sum(vector_scores) / len(vector_scores) if vector_scores else 0,
-                "max_vector_score": max(vector_scores) if vector_scores else 0,
-                "min_vector_score": min(vector_scores) if vector_scores else 0
+                "avg_vector_score": float(vector_scores.mean()) if len(vector_scores) else 0,
+                "max_vector_score": float(vector_scores.max()) if len(vector_scores) else 0,
+                "min_vector_score": float(vector_scores.min()) if len(vector_scores) else 0
             })
             
         except Exception as e:
@@ -147,30 +142,30 @@ class WeightRerankRunner(BaseRerankRunner):
             # 如果计算失败，返回原始文档
             return documents[:top_n] if top_n else documents
         
-        # 组合分数
-        rerank_documents = []
-        filtered_count = 0
+        # 组合分数（向量化计算加权分数、阈值过滤和排序）
+        scores = (
+            self.weights.vector_setting.vector_weight * vector_scores
+            + self.weights.keyword_setting.keyword_weight * keyword_scores
+        )
         
-        for document, keyword_score, vector_score in zip(documents, keyword_scores, vector_scores):
-            # 计算加权分数
-            score = (
-                self.weights.vector_setting.vector_weight * vector_score
-                + self.weights.keyword_setting.keyword_weight * keyword_score
-            )
-            
-            # 过滤低分文档
-            if score_threshold and score < score_threshold:
-                filtered_count += 1
-                continue
-                
-            # 更新文档分数
-            document.metadata["score"] = score
-            document.metadata["keyword_score"] = keyword_score
-            document.metadata["vector_score"] = vector_score
-            rerank_documents.append(document)
+        # 过滤低分文档
+        if score_threshold:
+            kept_indices = np.flatnonzero(scores >= score_threshold)
+        else:
+            kept_indices = np.arange(len(documents))
+        filtered_count = len(documents) - len(kept_indices)
+        
+        # 按分数降序排序（稳定排序，同分保持原顺序）
+        ranked_indices = kept_indices[np.argsort(-scores[kept_indices], kind="stable")]
         
-        # 按分数排序
-        rerank_documents.sort(key=lambda x: x.metadata.get("score", 0.0), reverse=True)
+        # 更新文档分数
+        rerank_documents = []
+        for index in ranked_indices:
+            document = documents[index]
+            document.metadata["score"] = float(scores[index])
+            document.metadata["keyword_score"] = float(keyword_scores[index])
+            document.metadata["vector_score"] = float(vector_scores[index])
+            rerank_documents.append(document)
         
         # 应用top_n限制
         final_documents = rerank_documents[:top_n] if top_n else rerank_documents
@@ -206,19 +201,53 @@ class WeightRerankRunner(BaseRerankRunner):
         # 返回结果
         return final_documents
     
-    def _calculate_keyword_score(self, query: str, documents: List[Document]) -> List[float]:
+    async def _load_corpus_stats(self, query_keywords: List[str]):
+        """
+        读取知识库级别的语料统计
+        
+        Args:
+            query_keywords: 查询关键词
+            
+        Returns:
+            语料统计，无法读取时返回None（回退为候选集统计）
+        """
+        if self.db is None or self.knowledge_base_id is None:
+            return None
+        
+        try:
+            stats = await CorpusStatsCache.get_stats(self.db, self.knowledge_base_id, query_keywords)
+            if stats is None or stats.doc_count == 0:
+                return None
+            return stats
+        except Exception as e:
+            Logger.warning(f"读取知识库语料统计失败，使用候选集统计: {str(e)}", extra={
+                "user_id": self.user_id,
+                "knowledge_base_id": self.knowledge_base_id
+            })
+            return None
+    
+    def _calculate_keyword_score(
+        self,
+        query: str,
+        documents: List[Document],
+        query_keywords: Optional[List[str]] = None,
+        corpus_stats: Optional[Any] = None,
+    ) -> np.ndarray:
         """
         计算关键词分数（BM25算法）
         
         Args:
             query: 查询文本
             documents: 文档列表
+            query_keywords: 已提取的查询关键词
+            corpus_stats: 知识库语料统计，为None时使用候选集统计
             
         Returns:
-            关键词分数列表
+            np.ndarray: 关键词分数数组
         """
-        # 提取查询关键词
-        query_keywords = self.keyword_handler.extract_keywords(query, None)
+        # 提取查询关键词（只对查询分词）
+        if query_keywords is None:
+            query_keywords = BM25Index.tokenize(query, self.knowledge_base_id)
         
         Logger.debug("提取查询关键词", extra={
             "user_id": self.user_id,
@@ -227,21 +256,32 @@ class WeightRerankRunner(BaseRerankRunner):
             "keyword_count": len(query_keywords)
         })
         
-        # 提取文档关键词
-        documents_keywords = []
-        total_doc_keywords = 0
+        # 读取文档词项向量：优先使用索引阶段持久化并随检索结果携带的词项向量
+        documents_term_freqs = []
+        documents_lengths = []
+        stored_vector_count = 0
         
         for document in documents:
-            document_keywords = self.keyword_handler.extract_keywords(document.page_content, None)
-            document.metadata["keywords"] = document_keywords
-            documents_keywords.append(document_keywords)
-            total_doc_keywords += len(document_keywords)
-        
-        Logger.debug("提取文档关键词完成", extra={
+            term_freqs = document.metadata.get("term_freqs")
+            if term_freqs is not None:
+                stored_vector_count += 1
+                doc_length = document.metadata.get("term_count")
+                if doc_length is None:
+                    doc_length = sum(term_freqs.values())
+            else:
+                # 旧数据没有词项向量时回退为现场分词
+                document_keywords = BM25Index.tokenize(document.page_content, self.knowledge_base_id)
+                term_freqs = Counter(document_keywords)
+                doc_length = len(document_keywords)
+            documents_term_freqs.append(term_freqs)
+            documents_lengths.append(doc_length)
+        
+        Logger.debug("读取文档词项向量完成", extra={
             "user_id": self.user_id,
             "document_count": len(documents),
-            "total_keywords": total_doc_keywords,
-            "avg_keywords_per_doc": total_doc_keywords / len(documents) if documents else 0
+            "stored_vector_count": stored_vector_count,
+            "tokenized_count": len(documents) - stored_vector_count,
+            "avg_doc_length": sum(documents_lengths) / len(documents) if documents else 0
         })
         
         # 统计查询关键词频率(TF)
@@ -250,22 +290,23 @@ class WeightRerankRunner(BaseRerankRunner):
         # 文档总数
         total_documents = len(documents)
         
-        # 计算所有文档关键词的IDF
-        all_keywords = set()
-        for document_keywords in documents_keywords:
-            all_keywords.update(document_keywords)
-        
-        # 计算关键词IDF
+        # 计算查询关键词的IDF（只需要查询词项）
         keyword_idf = {}
-        for keyword in all_keywords:
-            # 计算包含该关键词的文档数
-            doc_count_containing_keyword = sum(1 for doc_keywords in documents_keywords if keyword in doc_keywords)
-            # IDF公式
-            keyword_idf[keyword] = math.log((1 + total_documents) / (1 + doc_count_containing_keyword)) + 1
+        if corpus_stats is not None:
+            # 使用知识库级别的文档频率
+            for keyword in query_keyword_counts:
+                keyword_idf[keyword] = corpus_stats.idf(keyword)
+        else:
+            for keyword in query_keyword_counts:
+                # 计算包含该关键词的文档数
+                doc_count_containing_keyword = sum(1 for term_freqs in documents_term_freqs if keyword in term_freqs)
+                # IDF公式
+                keyword_idf[keyword] = math.log((1 + total_documents) / (1 + doc_count_containing_keyword)) + 1
         
         Logger.debug("IDF计算完成", extra={
             "user_id": self.user_id,
-            "unique_keywords": len(all_keywords),
+            "idf_source": "corpus" if corpus_stats is not None else "candidates",
+            "unique_keywords": len(keyword_idf),
             "avg_idf": sum(keyword_idf.values()) / len(keyword_idf) if keyword_idf else 0,
             "max_idf": max(keyword_idf.values()) if keyword_idf else 0,
             "min_idf": min(keyword_idf.values()) if keyword_idf else 0
@@ -276,7 +317,10 @@ class WeightRerankRunner(BaseRerankRunner):
         b = self.weights.keyword_setting.b
         
         # 计算平均文档长度
-        avg_doc_length = sum(len(doc_keywords) for doc_keywords in documents_keywords) / total_documents if total_documents > 0 else 0
+        if corpus_stats is not None:
+            avg_doc_length = corpus_stats.avg_length
+        else:
+            avg_doc_length = sum(documents_lengths) / total_documents if total_documents > 0 else 0
         
         Logger.debug("BM25参数", extra={
             "user_id": self.user_id,
@@ -286,124 +330,107 @@ class WeightRerankRunner(BaseRerankRunner):
             "total_documents": total_documents
         })
         
-        # 计算每个文档的分数
-        scores = []
-        matched_keywords_stats = []
+        # 构建 文档 × 查询词项 的词频矩阵，一次计算全部文档的BM25分数
+        terms = list(query_keyword_counts)
+        if not terms or not documents:
+            return np.zeros(len(documents))
         
-        for doc_idx, doc_keywords in enumerate(documents_keywords):
-            score = 0.0
-            doc_length = len(doc_keywords)
-            matched_keywords = 0
-            
-            # 统计文档关键词频率
-            doc_keyword_counts = Counter(doc_keywords)
-            
-            # 计算每个查询关键词的分数
-            for query_keyword, query_count in query_keyword_counts.items():
-                if query_keyword in doc_keyword_counts:
-                    matched_keywords += 1
-                    # 文档中关键词出现次数
-                    doc_count = doc_keyword_counts[query_keyword]
-                    
-                    # 获取IDF
-                    idf = keyword_idf.get(query_keyword, 0.0)
-                    
-                    # BM25公式
-                    numerator = doc_count * (k1 + 1)
-                    denominator = doc_count + k1 * (1 - b + b * doc_length / avg_doc_length if avg_doc_length > 0 else 1)
-                    keyword_score = idf * numerator / denominator
-                    score += keyword_score
-            
-            scores.append(score)
-            matched_keywords_stats.append(matched_keywords)
+        tf = np.array(
+            [[term_freqs.get(term, 0) for term in terms] for term_freqs in documents_term_freqs],
+            dtype=np.float64
+        )
+        lengths = np.asarray(documents_lengths, dtype=np.float64)
+        idf = np.array([keyword_idf.get(term, 0.0) for term in terms])
+        
+        if avg_doc_length > 0:
+            norm = k1 * (1 - b + b * lengths / avg_doc_length)
+        else:
+            norm = np.full(len(documents), k1)
+        
+        # BM25公式：未命中的词项 tf 为0，贡献为0
+        denominator = tf + norm[:, None]
+        term_scores = np.divide(tf * (k1 + 1), denominator, out=np.zeros_like(tf), where=denominator > 0)
+        scores = term_scores @ idf
+        matched_keywords_stats = (tf > 0).sum(axis=1)
         
         Logger.debug("BM25分数计算完成", extra={
             "user_id": self.user_id,
-            "avg_score": sum(scores) / len(scores) if scores else 0,
-            "max_score": max(scores) if scores else 0,
-            "min_score": min(scores) if scores else 0,
-            "avg_matched_keywords": sum(matched_keywords_stats) / len(matched_keywords_stats) if matched_keywords_stats else 0,
+            "avg_score": float(scores.mean()),
+            "max_score": float(scores.max()),
+            "min_score": float(scores.min()),
+            "avg_matched_keywords": float(matched_keywords_stats.mean()),
             "total_query_keywords": len(query_keywords)
         })
         
         return scores
     
-    async def _calculate_vector_similarity(self, query: str, documents: List[Document], vector_setting: VectorSetting) -> List[float]:
+    async def _calculate_vector_similarity(self, query: str, documents: List[Document], vector_setting: VectorSetting) -> np.ndarray:
         """
         计算向量相似度
         
+        没有向量的文档合并为一次批量向量化调用，全部文档向量堆叠成矩阵后
+        通过一次矩阵-向量乘法得到余弦相似度。
+        
         Args:
             query: 查询文本
             documents: 文档列表
             vector_setting: 向量设置
             
         Returns:
-            向量相似度列表
+            np.ndarray: 向量相似度数组
         """
-        # 计算余弦相似度
-        def cosine_similarity(vec1, vec2):
-            # 确保向量不为空
-            if not vec1 or not vec2:
-                return 0.0
-                
-            # 转换为numpy数组
-            vec1 = np.array(vec1)
-            vec2 = np.array(vec2)
-            
-            # 计算余弦相似度
-            dot_product = np.dot(vec1, vec2)
-            norm_vec1 = np.linalg.norm(vec1)
-            norm_vec2 = np.linalg.norm(vec2)
-            
-            # 避免除零错误
-            if norm_vec1 == 0 or norm_vec2 == 0:
-                return 0.0
-                
-            return dot_product / (norm_vec1 * norm_vec2)
-        
         # 获取查询向量
         Logger.debug("开始计算查询向量", extra={
             "user_id": self.user_id,
             "query_length": len(query)
         })
         
-        query_vector = await self.embedding_engine.embed_query(query)
+        query_vector = np.asarray(await self.embedding_engine.embed_query(query) or [], dtype=np.float32)
+        query_norm = float(np.linalg.norm(query_vector)) if query_vector.size else 0.0
         
         Logger.debug("查询向量计算完成", extra={
             "user_id": self.user_id,
-            "vector_dimension": len(query_vector) if query_vector else 0,
-            "vector_norm": np.linalg.norm(query_vector) if query_vector else 0
+            "vector_dimension": len(query_vector),
+            "vector_norm": query_norm
         })
         
-        # 计算每个文档的相似度
-        scores = []
-        documents_with_vectors = 0
-        documents_need_embedding = 0
+        if not documents or query_norm == 0:
+            return np.zeros(len(documents))
         
-        for doc_idx, document in enumerate(documents):
-            # 如果文档已有向量，直接使用
-            if document.vector:
-                document_vector = document.vector
-                documents_with_vectors += 1
-            else:
-                # 否则，计算文档向量
-                documents_need_embedding += 1
-                document_vectors = await self.embedding_engine.embed_documents([document.page_content])
-                document_vector = document_vectors[0] if document_vectors else None
-                document.vector = document_vector
-            
-            # 计算相似度
-            similarity = cosine_similarity(query_vector, document_vector)
-            scores.append(similarity)
+        # 批量向量化没有向量的文档
+        missing_indices = [i for i, document in enumerate(documents) if document.vector is None or len(document.vector) == 0]
+        if missing_indices:
+            document_vectors = await self.embedding_engine.embed_documents(
+                [documents[i].page_content for i in missing_indices]
+            )
+            for i, document_vector in zip(missing_indices, document_vectors):
+                documents[i].vector = document_vector
+        
+        # 堆叠文档向量，维度不一致或缺失的行保持为零向量（相似度为0）
+        dimension = len(query_vector)
+        matrix = np.zeros((len(documents), dimension), dtype=np.float32)
+        for i, document in enumerate(documents):
+            if document.vector is not None and len(document.vector) == dimension:
+                matrix[i] = document.vector
+        
+        # 余弦相似度 = (D · q) / (|D| * |q|)
+        norms = np.linalg.norm(matrix, axis=1) * query_norm
+        dot_products = matrix @ query_vector
+        scores = np.divide(
+            dot_products,
+            norms,
+            out=np.zeros(len(documents), dtype=np.float32),
+            where=norms > 0
+        ).astype(np.float64)
         
         Logger.debug("向量相似度计算完成", extra={
             "user_id": self.user_id,
             "total_documents": len(documents),
-            "documents_with_vectors": documents_with_vectors,
-            "documents_need_embedding": documents_need_embedding,
-            "avg_similarity": sum(scores) / len(scores) if scores else 0,
-            "max_similarity": max(scores) if scores else 0,
-            "min_similarity": min(scores) if scores else 0
+            "documents_with_vectors": len(documents) - len(missing_indices),
+            "documents_need_embedding": len(missing_indices),
+            "avg_similarity": float(scores.mean()),
+            "max_similarity": float(scores.max()),
+            "min_similarity": float(scores.min())
         })
         
-        return scores 
\ No newline at end of file
+        return scores
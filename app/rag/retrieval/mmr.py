@@ -0,0 +1,114 @@
+"""最大边际相关性（MMR）多样化"""
+import time
+from typing import List, Optional
+
+import numpy as np
+
+from app.core.logger import Logger
+from app.rag.models.document import Document
+
+
+def mmr_select(
+    vectors: np.ndarray,
+    relevance: np.ndarray,
+    lambda_mult: float,
+    top_k: int
+) -> List[int]:
+    """MMR 选择
+
+    每一步选择 λ·相关性 − (1−λ)·与已选集合的最大相似度 最大的候选，
+    并用新选中候选与全部候选的相似度增量更新最大相似度，总开销 O(k·n·d)。
+
+    Args:
+        vectors: 候选向量矩阵 (n, d)，零向量的候选不参与相似度惩罚
+        relevance: 候选相关性分数 (n,)，应与余弦相似度处于同一量纲（0-1）
+        lambda_mult: 相关性权重，1 表示只看相关性，0 表示只看多样性
+        top_k: 选择数量
+
+    Returns:
+        List[int]: 按选择顺序排列的候选下标
+    """
+    n = len(relevance)
+    top_k = min(top_k, n)
+    if top_k <= 0:
+        return []
+
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    normalized = np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+    max_similarity = np.zeros(n, dtype=np.float64)
+    available = np.ones(n, dtype=bool)
+    selected: List[int] = []
+
+    for _ in range(top_k):
+        mmr_scores = lambda_mult * relevance - (1 - lambda_mult) * max_similarity
+        mmr_scores[~available] = -np.inf
+        index = int(np.argmax(mmr_scores))
+        selected.append(index)
+        available[index] = False
+        np.maximum(max_similarity, normalized @ normalized[index], out=max_similarity)
+
+    return selected
+
+
+def diversify(
+    documents: List[Document],
+    lambda_mult: float,
+    top_k: int
+) -> List[Document]:
+    """对重排序后的文档执行 MMR 多样化
+
+    相关性取文档当前分数并按最小-最大归一化到 0-1，相似度使用文档携带的向量；
+    缺少向量的文档按零向量处理（不受多样性惩罚）。
+
+    Args:
+        documents: 按分数排序的文档列表
+        lambda_mult: 相关性权重
+        top_k: 返回数量
+
+    Returns:
+        List[Document]: 多样化后的文档列表
+    """
+    if len(documents) <= 1:
+        return documents[:top_k]
+
+    start_time = time.time()
+
+    dimension = _vector_dimension(documents)
+    if dimension is None:
+        return documents[:top_k]
+
+    vectors = np.zeros((len(documents), dimension), dtype=np.float32)
+    for i, document in enumerate(documents):
+        if document.vector is not None and len(document.vector) == dimension:
+            vectors[i] = document.vector
+
+    scores = np.array([document.metadata.get("score", 0.0) for document in documents], dtype=np.float64)
+    score_range = scores.max() - scores.min()
+    relevance = (scores - scores.min()) / score_range if score_range > 0 else np.ones(len(documents))
+
+    selected = mmr_select(vectors, relevance, lambda_mult, top_k)
+    results = []
+    for rank, index in enumerate(selected):
+        document = documents[index]
+        document.metadata["mmr_rank"] = rank
+        results.append(document)
+
+    Logger.rag_performance_metrics(
+        operation="mmr_diversify",
+        duration=time.time() - start_time,
+        candidate_count=len(documents),
+        selected_count=len(results),
+        lambda_mult=lambda_mult,
+        reordered_count=sum(1 for rank, index in enumerate(selected) if rank != index)
+    )
+
+    return results
+
+
+def _vector_dimension(documents: List[Document]) -> Optional[int]:
+    """取第一个携带向量的文档的向量维度"""
+    for document in documents:
+        if document.vector is not None and len(document.vector) > 0:
+            return len(document.vector)
+    return None
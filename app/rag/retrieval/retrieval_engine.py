@@ -8,9 +8,11 @@ from app.schemas.llm import LLMConfig
 from app.models.knowledge_base import KnowledgeBase
 from app.rag.models.document import Document
 from app.rag.retrieval.retrieval_methods import RetrievalMethod
+from app.rag.retrieval.mmr import diversify
 from app.rag.embedding.embedding_engine import EmbeddingEngine
 from app.rag.index_processor.index_processor_factory import IndexProcessorFactory
 from app.rag.rerank.rerank_factory import RerankRunnerFactory
+from app.rag.rerank.cascade_rerank import CascadeRerankRunner
 from app.rag.rerank.rerank_type import RerankMode
 from app.rag.rerank.entity.weight import Weights, VectorSetting, KeywordSetting
 from app.rag.exceptions import RetrievalException, RerankException, EmbeddingException
@@ -296,7 +298,9 @@ class RetrievalEngine:
         query: str,
         documents: List[Document],
         top_k: int = 5,
-        score_threshold: Optional[float] = None
+        score_threshold: Optional[float] = None,
+        knowledge_base: Optional[KnowledgeBase] = None,
+        search_metadata: Optional[Dict[str, Any]] = None
     ) -> List[Document]:
         """重排序结果
         
@@ -305,6 +309,8 @@ class RetrievalEngine:
             documents: 检索结果
             top_k: 返回结果数量
             score_threshold: 分数阈值
+            knowledge_base: 知识库对象（用于读取知识库级别的语料统计和级联重排序配置）
+            search_metadata: 检索元数据，级联重排序时写入各阶段耗时（rerank_cascade）
             
         Returns:
             List[Document]: 重排序后的结果
@@ -319,15 +325,27 @@ class RetrievalEngine:
                 model_provider=self.llm_config.embeddings.model_provider
             )
             
-            # 创建重排序运行器
+            # 创建重排序运行器；知识库启用级联时先按检索分数剪枝，再对前 M 个候选执行模型重排序
+            cascade_config = knowledge_base.get_rerank_cascade_config() if knowledge_base else None
             try:
-                rerank_runner = RerankRunnerFactory.create_rerank_runner(
-                    rerank_mode=self.rerank_mode,
-                    user_id=self.user_id,
-                    model_instance=self.rerank_model_instance,
-                    weights=weights,
-                    embedding_engine=self.embedding_engine
-                )
+                if cascade_config and cascade_config["enabled"]:
+                    rerank_runner = RerankRunnerFactory.create_cascade_rerank_runner(
+                        user_id=self.user_id,
+                        cascade_config=cascade_config,
+                        model_instance=self.rerank_model_instance,
+                        db=self.db,
+                        knowledge_base_id=knowledge_base.id
+                    )
+                else:
+                    rerank_runner = RerankRunnerFactory.create_rerank_runner(
+                        rerank_mode=self.rerank_mode,
+                        user_id=self.user_id,
+                        model_instance=self.rerank_model_instance,
+                        weights=weights,
+                        embedding_engine=self.embedding_engine,
+                        db=self.db,
+                        knowledge_base_id=knowledge_base.id if knowledge_base else None
+                    )
             except Exception as e:
                 Logger.error(f"创建重排序运行器失败: {str(e)}")
                 raise RerankException(
@@ -344,6 +362,8 @@ class RetrievalEngine:
                     top_n=top_k,
                     user_id=self.user_id
                 )
+                if search_metadata is not None and isinstance(rerank_runner, CascadeRerankRunner):
+                    search_metadata["rerank_cascade"] = rerank_runner.last_timing
                 
                 return reranked_documents
             except Exception as e:
@@ -371,6 +391,9 @@ class RetrievalEngine:
         rerank_mode: str = RerankMode.WEIGHTED_SCORE,
         rerank_model_instance: Optional[Any] = None,
         user_id: Optional[str] = None,
+        mmr_lambda: Optional[float] = None,
+        mmr_top_k: Optional[int] = None,
+        search_metadata: Optional[Dict[str, Any]] = None,
         **kwargs
     ) -> List[Document]:
         """搜索
@@ -384,6 +407,9 @@ class RetrievalEngine:
             rerank_mode: 重排序模式
             rerank_model_instance: 重排序模型实例
             user_id: 用户ID
+            mmr_lambda: MMR相关性权重，提供时对本次请求启用MMR（覆盖知识库配置）
+            mmr_top_k: MMR选择数量（覆盖知识库配置）
+            search_metadata: 检索元数据，由调用方传入字典，检索过程中写入重排序阶段耗时等信息
             **kwargs: 其他参数
             
         Returns:
@@ -393,17 +419,37 @@ class RetrievalEngine:
             # 配置重排序
             self.configure_rerank(use_rerank, rerank_mode, rerank_model_instance, user_id)
             
+            # MMR 配置：请求参数优先于知识库配置
+            mmr_config = knowledge_base.get_mmr_config()
+            use_mmr = mmr_lambda is not None or mmr_config["enabled"]
+            final_top_k = top_k
+            candidate_top_k = top_k
+            if use_mmr:
+                mmr_lambda = mmr_config["lambda"] if mmr_lambda is None else mmr_lambda
+                final_top_k = mmr_top_k or mmr_config["top_k"] or top_k
+                # 多取一些候选供 MMR 挑选
+                candidate_top_k = max(top_k, mmr_config["fetch_k"] or final_top_k * 3)
+            
+            # 加权重排序和 MMR 需要候选向量，直接取向量存储中已有的向量，避免重新向量化；
+            # 级联重排序第一阶段只用检索分数，不需要向量
+            if use_mmr or (
+                use_rerank
+                and rerank_mode == RerankMode.WEIGHTED_SCORE
+                and not knowledge_base.get_rerank_cascade_config()["enabled"]
+            ):
+                kwargs.setdefault("include_vectors", True)
+            
             # 根据检索方法选择检索函数
             try:
                 if method == RetrievalMethod.SEMANTIC_SEARCH:
-                    results = await self.semantic_search(knowledge_base, query, top_k, **kwargs)
+                    results = await self.semantic_search(knowledge_base, query, candidate_top_k, **kwargs)
                 elif method == RetrievalMethod.KEYWORD_SEARCH:
-                    results = await self.keyword_search(knowledge_base, query, top_k, **kwargs)
+                    results = await self.keyword_search(knowledge_base, query, candidate_top_k, **kwargs)
                 elif method == RetrievalMethod.HYBRID_SEARCH:
-                    results = await self.hybrid_search(knowledge_base, query, top_k, **kwargs)
+                    results = await self.hybrid_search(knowledge_base, query, candidate_top_k, **kwargs)
                 else:
                     Logger.warning(f"未知的检索方法: {method}，使用语义搜索")
-                    results = await self.semantic_search(knowledge_base, query, top_k, **kwargs)
+                    results = await self.semantic_search(knowledge_base, query, candidate_top_k, **kwargs)
             except RetrievalException as e:
                 Logger.error(f"检索失败: {e.message}")
                 # 如果检索失败，返回空结果
@@ -412,11 +458,22 @@ class RetrievalEngine:
             # 如果启用重排序，执行重排序
             if self.use_rerank and results:
                 try:
-                    results = await self.rerank_results(query, results, top_k, kwargs.get("score_threshold"))
+                    results = await self.rerank_results(
+                        query,
+                        results,
+                        candidate_top_k,
+                        kwargs.get("score_threshold"),
+                        knowledge_base=knowledge_base,
+                        search_metadata=search_metadata
+                    )
                 except RerankException as e:
                     Logger.warning(f"重排序失败: {e.message}，使用原始结果")
                     # 如果重排序失败，使用原始结果
-                    results = results[:top_k]
+                    results = results[:candidate_top_k]
+            
+            # MMR 多样化：避免返回同一文档中几乎相同的相邻分块
+            if use_mmr and results:
+                results = diversify(results, mmr_lambda, final_top_k)
                 
             return results
                 
@@ -16,6 +16,9 @@ from app.rag.retrieval.retrieval_engine import RetrievalEngine
 from app.rag.rerank.rerank_type import RerankMode
 from app.rag.retrieval.query_cache import QueryCache
 
+# 仅供检索/重排序内部使用、不返回给调用方的元数据字段
+INTERNAL_METADATA_KEYS = ("term_freqs", "term_count")
+
 class RetrievalService:
     """检索服务
     
@@ -76,6 +79,10 @@ class RetrievalService:
         """
         start_time = time.time()
         
+        # 查询缓存键不包含请求级 MMR 参数，携带这些参数的请求不读写缓存
+        if kwargs.get("mmr_lambda") is not None or kwargs.get("mmr_top_k") is not None:
+            use_cache = False
+        
         # 记录查询参数和配置
         query_preview = query[:100] + "..." if len(query) > 100 else query
         Logger.info(f"开始检索查询:")
@@ -472,6 +479,21 @@ class RetrievalService:
             
             return []
             
+    @staticmethod
+    def _public_metadata(doc: Document) -> Dict[str, Any]:
+        """返回给调用方的分块元数据，去掉仅供检索内部使用的键
+
+        Args:
+            doc: 检索结果
+
+        Returns:
+            Dict[str, Any]: 元数据副本
+        """
+        metadata = getattr(doc, "metadata", None)
+        if not isinstance(metadata, dict):
+            return {}
+        return {k: v for k, v in metadata.items() if k not in INTERNAL_METADATA_KEYS}
+
     async def _format_results(self, results: List[Document]) -> List[Dict[str, Any]]:
         """格式化检索结果
         
@@ -522,7 +544,7 @@ class RetrievalService:
                     result = {
                         "content": doc.page_content,
                         "score": doc.metadata.get("score", 0.0),
-                        "metadata": doc.metadata
+                        "metadata": self._public_metadata(doc)
                     }
                     
                     if document:
@@ -549,7 +571,7 @@ class RetrievalService:
                         simplified_result = {
                             "content": doc.page_content if hasattr(doc, 'page_content') else str(doc),
                             "score": doc.metadata.get("score", 0.0) if hasattr(doc, 'metadata') and isinstance(doc.metadata, dict) else 0.0,
-                            "metadata": doc.metadata if hasattr(doc, 'metadata') and isinstance(doc.metadata, dict) else {}
+                            "metadata": self._public_metadata(doc)
                         }
                         formatted_results.append(simplified_result)
                     except Exception as fallback_error:
@@ -619,7 +641,7 @@ class RetrievalService:
                     simplified_results.append({
                         "content": doc.page_content if hasattr(doc, 'page_content') else str(doc),
                         "score": doc.metadata.get("score", 0.0) if hasattr(doc, 'metadata') and isinstance(doc.metadata, dict) else 0.0,
-                        "metadata": doc.metadata if hasattr(doc, 'metadata') and isinstance(doc.metadata, dict) else {}
+                        "metadata": self._public_metadata(doc)
                     })
                 except Exception as format_error:
                     Logger.warning(f"简化格式化第 {i+1} 个结果失败: {str(format_error)}")
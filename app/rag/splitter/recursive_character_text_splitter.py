@@ -1,6 +1,7 @@
 """递归字符文本分块器"""
+import asyncio
 import re
-from typing import List, Any, Dict, Optional, Callable
+from typing import List, Any, AsyncIterable, AsyncIterator, Dict, Optional, Callable, Tuple
 
 from app.core.logger import Logger
 from app.rag.splitter.text_splitter import TextSplitter
@@ -179,6 +180,115 @@ class RecursiveCharacterTextSplitter(TextSplitter):
             
             raise
         
+    async def split_text_stream(self, blocks: AsyncIterable[str]) -> AsyncIterator[str]:
+        """流式分块：逐段读入文本，逐个产出分块，结果与对全文调用 split_text 完全相同
+        
+        顶层按最高优先级分隔符切分，每个片段（以分隔符结束）只有在后面出现下一个分隔符后才算完整；
+        完整片段按 _split_text 的顺序处理：过长片段递归分块，连续的短片段贪心合并。合并结果中只有最后一块
+        还可能因后续片段而改变，保留的是组成它的原始片段（含重叠部分）和末尾未完整的文本，
+        而不是已产出的分块，下一轮从同一合并状态继续，分块边界和重叠都不受分段边界影响。
+        
+        内存占用只与单段文本、单个片段和分块大小有关；全文出现最高优先级分隔符之前无法确定顶层分隔符，
+        这部分文本会先缓存，全文都没有该分隔符时整体分块。分块在线程中执行，不阻塞事件循环。
+        
+        Args:
+            blocks: 按顺序产出文本段的异步迭代器
+            
+        Yields:
+            str: 文本块
+        """
+        buffer = ""
+        pending: List[str] = []
+        separator: Optional[str] = None
+        async for block in blocks:
+            if not block:
+                continue
+            buffer += block
+            if separator is None:
+                first = self._separators[0]
+                if first != "" and not re.search(first, buffer):
+                    continue
+                separator = first
+            chunks, buffer, pending = await asyncio.to_thread(
+                self._split_stream_step, buffer, pending, separator, False
+            )
+            for chunk in chunks:
+                yield chunk
+        
+        if separator is None:
+            chunks = await asyncio.to_thread(self._split_text, buffer, self._separators) if buffer else []
+        else:
+            chunks, _, _ = await asyncio.to_thread(
+                self._split_stream_step, buffer, pending, separator, True
+            )
+        for chunk in chunks:
+            yield chunk
+        
+    def _split_stream_step(
+        self, buffer: str, pending: List[str], separator: str, final: bool
+    ) -> Tuple[List[str], str, List[str]]:
+        """流式分块的一轮：处理缓存中已完整的片段
+        
+        Args:
+            buffer: 尚未切分的文本
+            pending: 尚未产出的合并状态（最后一块的组成片段）
+            separator: 顶层分隔符（最高优先级分隔符）
+            final: 是否已读完全部文本
+            
+        Returns:
+            Tuple[List[str], str, List[str]]: 可以产出的分块、剩余未完整的文本、新的合并状态
+        """
+        if final or separator == "":
+            finished, buffer = buffer, ""
+        else:
+            # 最后一个分隔符之后的文本可能在下一段中延续，留到下一轮
+            pattern = re.escape(separator) if self._keep_separator else separator
+            cut = 0
+            for match in re.finditer(pattern, buffer):
+                if match.end() < len(buffer):
+                    cut = match.end()
+            finished, buffer = buffer[:cut], buffer[cut:]
+        
+        new_separators = self._separators[1:] if separator != "" else []
+        merge_separator = "" if self._keep_separator else separator
+        chunks: List[str] = []
+        for split in _split_text_with_regex(finished, separator, self._keep_separator):
+            if self._length_function(split) < self._chunk_size:
+                pending.append(split)
+                continue
+            if pending:
+                chunks.extend(self._merge_splits(
+                    pending, merge_separator, [self._length_function(item) for item in pending]
+                ))
+                pending = []
+            if not new_separators:
+                chunks.append(split)
+            else:
+                chunks.extend(self._split_text(split, new_separators))
+        
+        if pending:
+            docs = self._merge_splits(
+                pending, merge_separator, [self._length_function(item) for item in pending]
+            )
+            if final:
+                chunks.extend(docs)
+                pending = []
+            elif docs:
+                # 最后一块由合并状态中的末尾若干片段组成，之前的分块不会再变化
+                chunks.extend(docs[:-1])
+                pending = self._trailing_splits(pending, docs[-1], merge_separator)
+        return chunks, buffer, pending
+        
+    @staticmethod
+    def _trailing_splits(splits: List[str], doc: str, separator: str) -> List[str]:
+        """找出拼接后等于 doc 的末尾片段"""
+        length = -len(separator)
+        for start in range(len(splits) - 1, -1, -1):
+            length += len(splits[start]) + len(separator)
+            if length >= len(doc):
+                return splits[start:]
+        return splits
+        
     def _split_text(self, text: str, separators: List[str]) -> List[str]:
         """递归分割文本
         
@@ -4,11 +4,20 @@
 负责管理知识库的训练流程
 """
 
+from app.rag.training.ingestion_pipeline import IngestionPipeline
+from app.rag.training.training_estimator import TrainingEstimator
 from app.rag.training.training_manager import RAGTrainingManager, TrainingResult
+from app.rag.training.training_progress import TrainingProgress
+from app.rag.training.training_scheduler import TrainingLease, TrainingScheduler
 from app.rag.training.training_status import TrainingStatus
 
 __all__ = [
+    "IngestionPipeline",
     "RAGTrainingManager",
+    "TrainingEstimator",
+    "TrainingLease",
+    "TrainingProgress",
     "TrainingResult",
+    "TrainingScheduler",
     "TrainingStatus"
 ]
\ No newline at end of file
@@ -0,0 +1,1050 @@
+"""分阶段并发摄取流水线"""
+import asyncio
+import hashlib
+import os
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, delete, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.logger import Logger
+from app.models.database import AsyncSessionLocal
+from app.models.document import Document
+from app.models.document_chunk import DocumentChunk
+from app.models.document_embedding import DocumentEmbedding
+from app.models.knowledge_base import KnowledgeBase
+from app.models.training_checkpoint import TrainingCheckpoint
+from app.rag.datasource.vdb.vector_factory import VectorFactory
+from app.rag.embedding.embedding_engine import EmbeddingEngine
+from app.rag.exceptions import (
+    DocumentProcessingException,
+    EmbeddingException,
+    IndexingException,
+    RAGException,
+)
+from app.rag.extractor.extract_pool import ExtractPool
+from app.rag.extractor.extract_processor import ExtractProcessor
+from app.rag.index_processor.chunk_bulk_deleter import ChunkBulkDeleter
+from app.rag.index_processor.chunk_bulk_writer import ChunkBulkWriter, compute_content_hash
+from app.rag.index_processor.index_cache import IndexCache
+from app.rag.keyword.keyword_index_factory import KeywordIndexFactory
+from app.rag.keyword.tokenizer_service import get_document_term_vectors
+from app.rag.models.document import Document as RAGDocument
+from app.rag.training.training_progress import STAGE_INGESTING, TrainingProgress
+from app.rag.splitter.recursive_character_text_splitter import (
+    RecursiveCharacterTextSplitter,
+)
+from app.schemas.llm import LLMConfig
+
+# 阶段结束标记
+_DONE = object()
+
+
+class _Checkpoint:
+    """写入队列中的检查点请求：提交超大文档中已完成向量化的分块"""
+
+    def __init__(self, item: "PipelineItem"):
+        self.item = item
+
+def _estimate_tokens(text: str) -> int:
+    """估算文本的 token 数
+
+    按 UTF-8 字节数 / 3 估算：中文每字约 1 个 token，英文约 4 个字符 1 个 token，
+    英文会被略微高估，保证批次不超过模型的输入上限。
+    """
+    return max(1, len(text.encode("utf-8")) // 3)
+
+
+class StageMetrics:
+    """流水线阶段统计"""
+
+    def __init__(self, name: str, concurrency: int):
+        """初始化阶段统计
+
+        Args:
+            name: 阶段名称
+            concurrency: 阶段并发数
+        """
+        self.name = name
+        self.concurrency = concurrency
+        self.item_count = 0
+        self.unit_count = 0
+        self.busy_duration = 0.0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def record(self, items: int, units: int, duration: float) -> None:
+        """记录一次处理
+
+        Args:
+            items: 完成的文档数
+            units: 处理的单位数（字符、分块或行）
+            duration: 处理耗时（秒）
+        """
+        if self.started_at is None:
+            self.started_at = time.time() - duration
+        self.finished_at = time.time()
+        self.item_count += items
+        self.unit_count += units
+        self.busy_duration += duration
+
+    @property
+    def wall_duration(self) -> float:
+        """阶段从首次处理开始到最后一次处理结束的耗时"""
+        if self.started_at is None or self.finished_at is None:
+            return 0.0
+        return self.finished_at - self.started_at
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典"""
+        wall_duration = self.wall_duration
+        return {
+            "concurrency": self.concurrency,
+            "items": self.item_count,
+            "units": self.unit_count,
+            "busy_duration": self.busy_duration,
+            "wall_duration": wall_duration,
+            "items_per_second": self.item_count / wall_duration if wall_duration > 0 else 0.0,
+            "units_per_second": self.unit_count / wall_duration if wall_duration > 0 else 0.0,
+        }
+
+
+class PipelineItem:
+    """在流水线各阶段间传递的文档"""
+
+    def __init__(self, position: int, document: Document):
+        """初始化
+
+        Args:
+            position: 文档在本次训练中的序号
+            document: 数据库文档对象
+        """
+        self.position = position
+        # 快照文档字段：写入失败回滚会使 ORM 对象过期，异步会话中不能再惰性加载
+        self.document_id = document.id
+        self.title = document.title
+        self.content = document.content
+        self.storage_path = document.storage_path
+        self.doc_type = document.doc_type
+        self.file_hash = document.file_hash
+        self.indexed_file_hash = document.indexed_file_hash
+        self.indexed_content_hash = document.content_hash
+
+        self.text = ""
+        self.content_hash: Optional[str] = None
+        # 已提交检查点的分块文本和向量会被释放（置为None）
+        self.chunks: List[Optional[str]] = []
+        self.embeddings: List[Optional[List[float]]] = []
+        self.remaining = 0
+        self.error: Optional[RAGException] = None
+        self.failed = False
+        self.started_at = time.time()
+
+        # 检查点：已提交的分块序号，以及上次检查点后新完成向量化的分块数
+        self.written: set = set()
+        self.checkpoint_pending = 0
+
+        # 超大文件在向量化阶段边提取边分块，分块产出完毕前为True
+        self.streaming = False
+
+        # 增量训练
+        self.unchanged = False
+        self.diff = False
+        self.reused: Dict[int, Any] = {}
+        self.vanished: List[int] = []
+
+
+class IngestionPipeline:
+    """分阶段并发摄取流水线
+
+    提取（进程池）→ 分块 → 按 token 预算跨文档组批的并发向量化 → 批量写入，
+    各阶段之间以有界队列连接：下游处理不过来时上游在 put 上等待，形成背压。
+    写入阶段固定为单个消费者，因为倒排索引按读-改-写方式更新，但每次会合并多个文档批量写入。
+    每个写入批次是一个数据库事务：旧分块的删除、新分块与向量行、倒排项、文档哈希和训练检查点一起提交，
+    写入器和删除器都不做中间提交。向量存储不在事务内，回滚时尽力删除本批新增的向量，
+    旧向量的删除推迟到提交之后。超大文档每完成 RAG_PIPELINE_CHECKPOINT_CHUNKS 个分块的
+    向量化就提交一次，中断后重新训练时已提交的分块按内容哈希复用。
+
+    不小于 RAG_PIPELINE_STREAM_MIN_FILE_SIZE 的文件不经过提取和分块阶段，在向量化阶段按页码范围或
+    工作表逐段提取、流式分块，分块直接进入向量化批次，配合检查点提交后释放已写入的分块，内存占用与文件大小无关。
+
+    增量模式下，文件哈希或文本哈希与上次索引时一致的文档直接跳过；内容有变化的文档按分块内容哈希
+    与已有分块比对，复用未变化分块的行和向量，只向量化新增分块，只删除已消失的分块及其向量。
+    """
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        knowledge_base: KnowledgeBase,
+        llm_config: LLMConfig,
+        incremental: bool = True,
+        progress: Optional[TrainingProgress] = None,
+    ):
+        """初始化流水线
+
+        Args:
+            db: 数据库会话（仅写入阶段使用）
+            knowledge_base: 知识库对象
+            llm_config: LLM配置
+            incremental: 是否增量处理，为False时替换每个文档的全部分块
+            progress: 训练进度发布器，为None时不发布进度
+        """
+        self.db = db
+        self.knowledge_base = knowledge_base
+        self.llm_config = llm_config
+        self.incremental = incremental
+        self.progress = progress
+
+        self.extract_workers = settings.RAG_PIPELINE_EXTRACT_WORKERS
+        self.split_workers = settings.RAG_PIPELINE_SPLIT_WORKERS
+        self.embed_concurrency = settings.RAG_PIPELINE_EMBED_CONCURRENCY
+        self.embed_batch_tokens = settings.RAG_PIPELINE_EMBED_BATCH_TOKENS
+        self.embed_batch_size = settings.RAG_BATCH_SIZE
+        self.write_batch_documents = settings.RAG_PIPELINE_WRITE_BATCH_DOCUMENTS
+        self.queue_size = settings.RAG_PIPELINE_QUEUE_SIZE
+        self.checkpoint_chunks = settings.RAG_PIPELINE_CHECKPOINT_CHUNKS
+
+        self.text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=settings.RAG_CHUNK_SIZE, chunk_overlap=settings.RAG_CHUNK_OVERLAP
+        )
+        self.keyword_index = KeywordIndexFactory.create_keyword_index(knowledge_base, db)
+        self.vector_store = VectorFactory.create_vector_store(knowledge_base, llm_config)
+        self.writer = ChunkBulkWriter(
+            db,
+            embedding_model=knowledge_base.embedding_model or llm_config.embeddings.model,
+            commit_rows=0,
+        )
+        self.deleter = ChunkBulkDeleter(db, knowledge_base, self.vector_store, commit=False)
+        # 当前事务中新增的向量ID，以及事务开始时写入器的计数，回滚时用于撤销
+        self.pending_vector_ids: List[str] = []
+        self.writer_counts = (0, 0)
+        # 增量模式下各文档已有的分块：文档ID -> {分块ID: 分块行}
+        self.existing_chunks: Dict[int, Dict[int, Any]] = {}
+        # 上次训练中断时只提交了部分分块的文档
+        self.partial_ids: set = set()
+
+        self.metrics = {
+            "extract": StageMetrics("extract", self.extract_workers),
+            "split": StageMetrics("split", self.split_workers),
+            "embed": StageMetrics("embed", self.embed_concurrency),
+            "write": StageMetrics("write", 1),
+        }
+        self.total_count = 0
+        self.document_count = 0
+        self.chunk_count = 0
+        self.embedding_count = 0
+        self.skipped_count = 0
+        self.reused_chunk_count = 0
+        # 进度统计：已分块的分块数、已完成向量化（含复用）的分块数和新向量化的估算 token 数
+        self.split_chunk_count = 0
+        self.embedded_chunk_count = 0
+        self.embedded_token_count = 0
+        self.failed_documents: List[Dict[str, Any]] = []
+
+    def get_stage_metrics(self) -> Dict[str, Dict[str, Any]]:
+        """获取各阶段吞吐统计
+
+        Returns:
+            Dict[str, Dict[str, Any]]: 阶段名称到统计信息的映射
+        """
+        return {name: metrics.to_dict() for name, metrics in self.metrics.items()}
+
+    async def report_progress(self, stage: Optional[str] = None) -> None:
+        """发布当前进度（按发布器的间隔节流）
+
+        Args:
+            stage: 新阶段，为None时保持当前阶段
+        """
+        if self.progress is None:
+            return
+        await self.progress.update(
+            stage=stage,
+            documents_total=(
+                self.total_count + self.skipped_count + self.progress.state["documents_resumed"]
+            ),
+            documents_done=self.document_count,
+            documents_failed=len(self.failed_documents),
+            documents_skipped=self.skipped_count,
+            chunks_total=self.split_chunk_count,
+            chunks_embedded=self.embedded_chunk_count,
+            tokens_embedded=self.embedded_token_count,
+        )
+
+    async def run(self, documents: List[Document]) -> None:
+        """运行流水线，处理结果记录在实例属性中
+
+        Args:
+            documents: 待处理的文档列表
+        """
+        start_time = time.time()
+        items = [PipelineItem(position, document) for position, document in enumerate(documents)]
+
+        if self.incremental:
+            await self._load_existing_chunks([item.document_id for item in items])
+            await self._load_partial_documents()
+            pending, skipped = [], []
+            for item in items:
+                if self._is_unchanged(item):
+                    skipped.append(item)
+                    self.existing_chunks.pop(item.document_id, None)
+                else:
+                    pending.append(item)
+            self.skipped_count = len(skipped)
+            if skipped:
+                await self._save_checkpoints(skipped, TrainingCheckpoint.STATUS_COMPLETED)
+                await self.db.commit()
+            items = pending
+            Logger.info(f"增量训练: 跳过 {self.skipped_count} 个未变化文档，待处理 {len(items)} 个文档")
+        self.total_count = len(items)
+        await self.report_progress(STAGE_INGESTING)
+
+        extract_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        split_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        embed_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        write_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+
+        async def produce():
+            for position, item in enumerate(items):
+                item.position = position
+                await extract_queue.put(item)
+            for _ in range(self.extract_workers):
+                await extract_queue.put(_DONE)
+
+        tasks = [
+            asyncio.create_task(produce()),
+            asyncio.create_task(self._run_stage(
+                extract_queue, split_queue, self._extract, self.extract_workers, self.split_workers
+            )),
+            asyncio.create_task(self._run_stage(
+                split_queue, embed_queue, self._split, self.split_workers, 1
+            )),
+            asyncio.create_task(self._embed_stage(embed_queue, write_queue)),
+            asyncio.create_task(self._write_stage(write_queue)),
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+        stage_metrics = self.get_stage_metrics()
+        for name, metrics in stage_metrics.items():
+            Logger.rag_performance_metrics(
+                operation=f"ingestion_stage_{name}",
+                duration=metrics["wall_duration"],
+                kb_id=self.knowledge_base.id,
+                **metrics
+            )
+        Logger.rag_performance_metrics(
+            operation="ingestion_pipeline",
+            duration=time.time() - start_time,
+            kb_id=self.knowledge_base.id,
+            document_count=self.document_count,
+            failed_count=len(self.failed_documents),
+            skipped_count=self.skipped_count,
+            chunk_count=self.chunk_count,
+            reused_chunk_count=self.reused_chunk_count,
+            rows_per_second=self.writer.rows_per_second
+        )
+
+    async def _load_existing_chunks(self, document_ids: List[int]) -> None:
+        """读取文档已有分块的ID、序号、内容哈希，以及是否已有当前嵌入模型的向量"""
+        for start in range(0, len(document_ids), settings.RAG_BULK_DELETE_BATCH_SIZE):
+            batch = document_ids[start:start + settings.RAG_BULK_DELETE_BATCH_SIZE]
+            rows = (await self.db.execute(
+                select(
+                    DocumentChunk.id,
+                    DocumentChunk.document_id,
+                    DocumentChunk.chunk_index,
+                    DocumentChunk.content_hash,
+                    DocumentEmbedding.id.label("embedding_id"),
+                ).outerjoin(
+                    DocumentEmbedding,
+                    and_(
+                        DocumentEmbedding.chunk_id == DocumentChunk.id,
+                        DocumentEmbedding.model == self.writer.embedding_model,
+                    ),
+                ).where(DocumentChunk.document_id.in_(batch))
+            )).all()
+            for row in rows:
+                self.existing_chunks.setdefault(row.document_id, {})[row.id] = row
+
+    async def _load_partial_documents(self) -> None:
+        """读取上次训练中断时只有部分完成检查点的文档"""
+        self.partial_ids = set((await self.db.execute(
+            select(TrainingCheckpoint.document_id).where(
+                TrainingCheckpoint.knowledge_base_id == self.knowledge_base.id,
+                TrainingCheckpoint.status == TrainingCheckpoint.STATUS_PARTIAL,
+            )
+        )).scalars().all())
+
+    def _is_fully_embedded(self, document_id: int) -> bool:
+        """文档已有分块且每个分块都有当前嵌入模型的向量（切换嵌入模型后需重新向量化）
+
+        只有部分完成检查点的文档缺少尾部分块，已有分块的向量齐全也不算完整。
+        """
+        if document_id in self.partial_ids:
+            return False
+        existing = self.existing_chunks.get(document_id)
+        if not existing:
+            return False
+        if not self.writer.embedding_model:
+            return True
+        return all(row.embedding_id is not None for row in existing.values())
+
+    def _is_unchanged(self, item: PipelineItem) -> bool:
+        """提取前判断文档是否未变化：有文件时比较文件哈希，否则比较文本哈希
+
+        已有分块缺少当前嵌入模型的向量时不视为未变化，由差异写入补齐向量。
+        """
+        if not self._is_fully_embedded(item.document_id):
+            return False
+        if item.file_hash:
+            return item.file_hash == item.indexed_file_hash
+        return bool(item.content) and compute_content_hash(item.content) == item.indexed_content_hash
+
+    def _diff_chunks(self, item: PipelineItem) -> None:
+        """按内容哈希将新分块与已有分块配对
+
+        已有当前模型向量且内容哈希相同的分块被复用，其余已有分块视为已消失。
+        """
+        existing = self.existing_chunks.pop(item.document_id, None)
+        if not existing:
+            return
+        item.diff = True
+        available: Dict[str, List[Any]] = {}
+        for row in existing.values():
+            if row.embedding_id is not None and row.content_hash:
+                available.setdefault(row.content_hash, []).append(row)
+            else:
+                item.vanished.append(row.id)
+        for index, chunk in enumerate(item.chunks):
+            rows = available.get(compute_content_hash(chunk))
+            if rows:
+                item.reused[index] = rows.pop()
+        item.vanished.extend(row.id for rows in available.values() for row in rows)
+
+    async def _run_stage(
+        self,
+        in_queue: asyncio.Queue,
+        out_queue: asyncio.Queue,
+        handler,
+        concurrency: int,
+        downstream_workers: int,
+    ) -> None:
+        """以固定并发运行一个逐文档处理的阶段
+
+        Args:
+            in_queue: 输入队列
+            out_queue: 输出队列
+            handler: 处理函数，失败时抛出 RAGException
+            concurrency: 并发数
+            downstream_workers: 下游消费者数量（决定发送的结束标记数）
+        """
+        async def worker():
+            while True:
+                item = await in_queue.get()
+                if item is _DONE:
+                    return
+                try:
+                    await handler(item)
+                except RAGException as e:
+                    self._fail(item, e)
+                    continue
+                await out_queue.put(item)
+
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        for _ in range(downstream_workers):
+            await out_queue.put(_DONE)
+
+    async def _extract(self, item: PipelineItem) -> None:
+        """提取阶段：已提取的内容优先，否则在进程池中提取存储文件"""
+        Logger.rag_document_start(
+            kb_id=self.knowledge_base.id,
+            document_id=item.document_id,
+            document_title=item.title,
+            progress={"current": item.position + 1, "total": self.total_count},
+        )
+        if not item.content and self._should_stream(item.storage_path):
+            # 超大文件在向量化阶段边提取边分块
+            item.streaming = True
+            return
+        start_time = time.time()
+        Logger.rag_extraction_start(
+            document_id=item.document_id,
+            file_path=item.storage_path or "database",
+            file_type=item.doc_type or "unknown",
+        )
+        try:
+            if item.content:
+                text = item.content
+            elif item.storage_path:
+                text = ExtractProcessor.combine_contents(
+                    await ExtractPool.extract_contents(item.storage_path, item.file_hash)
+                )
+            else:
+                text = ""
+        except Exception as e:
+            raise DocumentProcessingException(
+                message=f"提取文档内容失败: {str(e)}",
+                document_id=item.document_id,
+                file_path=item.storage_path,
+            )
+        if not text:
+            raise DocumentProcessingException(
+                message=f"文档 {item.document_id} 提取内容为空",
+                document_id=item.document_id,
+                file_path=item.storage_path,
+            )
+
+        duration = time.time() - start_time
+        item.text = text
+        item.content_hash = compute_content_hash(text)
+        # 文件有变化但提取出的文本未变化（如只改了文件元数据），无需重新分块和向量化
+        if (
+            self.incremental
+            and self._is_fully_embedded(item.document_id)
+            and item.content_hash == item.indexed_content_hash
+        ):
+            item.unchanged = True
+            item.text = ""
+            self.existing_chunks.pop(item.document_id, None)
+        self.metrics["extract"].record(1, len(text), duration)
+        Logger.rag_extraction_success(
+            document_id=item.document_id,
+            content_length=len(text),
+            extraction_time=duration,
+        )
+
+    def _should_stream(self, storage_path: Optional[str]) -> bool:
+        """文件是否足够大，需要流式提取和分块"""
+        threshold = settings.RAG_PIPELINE_STREAM_MIN_FILE_SIZE
+        if threshold <= 0 or not storage_path:
+            return False
+        try:
+            return os.path.getsize(storage_path) >= threshold
+        except OSError:
+            return False
+
+    async def _split(self, item: PipelineItem) -> None:
+        """分块阶段：在线程中分块，避免长文档阻塞事件循环"""
+        if item.unchanged or item.streaming:
+            return
+        start_time = time.time()
+        Logger.rag_chunking_start(
+            document_id=item.document_id,
+            content_length=len(item.text),
+            chunk_size=settings.RAG_CHUNK_SIZE,
+        )
+        try:
+            chunks = await asyncio.to_thread(self.text_splitter.split_text, item.text)
+        except Exception as e:
+            raise DocumentProcessingException(
+                message=f"分块文本失败: {str(e)}",
+                document_id=item.document_id,
+                file_path=item.storage_path,
+            )
+        if not chunks:
+            raise DocumentProcessingException(
+                message=f"文档 {item.document_id} 分块为空",
+                document_id=item.document_id,
+                file_path=item.storage_path,
+            )
+
+        item.chunks = chunks
+        item.text = ""
+        self.split_chunk_count += len(chunks)
+        if self.incremental:
+            self._diff_chunks(item)
+        duration = time.time() - start_time
+        self.metrics["split"].record(1, len(chunks), duration)
+        Logger.rag_chunking_success(
+            document_id=item.document_id,
+            chunk_count=len(chunks),
+            chunking_time=duration,
+        )
+
+    async def _embed_stage(self, in_queue: asyncio.Queue, out_queue: asyncio.Queue) -> None:
+        """向量化阶段：跨文档按 token 预算组批，并发请求数受信号量限制
+
+        并发请求已满时批次分发会等待，组批协程随之停止从上游取数据，背压传递到前面的阶段。
+
+        Args:
+            in_queue: 输入队列
+            out_queue: 输出队列
+        """
+        semaphore = asyncio.Semaphore(self.embed_concurrency)
+        tasks = set()
+        batch: List[Tuple[PipelineItem, int]] = []
+        batch_tokens = 0
+
+        async def dispatch():
+            nonlocal batch, batch_tokens
+            if not batch:
+                return
+            entries, batch, batch_tokens = batch, [], 0
+            await semaphore.acquire()
+            task = asyncio.create_task(self._embed_batch(entries, out_queue, semaphore))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        async def add(item: PipelineItem, index: int):
+            nonlocal batch_tokens
+            tokens = _estimate_tokens(item.chunks[index])
+            if batch and (
+                batch_tokens + tokens > self.embed_batch_tokens
+                or len(batch) >= self.embed_batch_size
+            ):
+                await dispatch()
+            batch.append((item, index))
+            batch_tokens += tokens
+
+        while True:
+            item = await in_queue.get()
+            if item is _DONE:
+                break
+            if item.streaming:
+                await self._stream_chunks(item, add, out_queue)
+            else:
+                item.embeddings = [None] * len(item.chunks)
+                pending = [index for index in range(len(item.chunks)) if index not in item.reused]
+                item.remaining = len(pending)
+                self.embedded_chunk_count += len(item.reused)
+                if not pending:
+                    # 未变化的文档或全部分块均被复用，直接送往写入阶段
+                    await out_queue.put(item)
+                for index in pending:
+                    await add(item, index)
+            # 上游暂时没有数据时不再等待凑批
+            if in_queue.empty():
+                await dispatch()
+
+        await dispatch()
+        if tasks:
+            await asyncio.gather(*list(tasks))
+        await out_queue.put(_DONE)
+
+    async def _stream_chunks(self, item: PipelineItem, add, out_queue: asyncio.Queue) -> None:
+        """逐段提取超大文件并流式分块，分块产出后立即加入向量化批次
+
+        批次并发已满时 add 会等待，提取和分块随之暂停。内容哈希按提取出的原始分段计算，
+        与非流式提取的哈希不可比，因此不做“文本未变化”的整体跳过，未变化的分块仍按内容哈希复用。
+
+        Args:
+            item: 文档
+            add: 把分块加入向量化批次的协程函数
+            out_queue: 写入阶段的输入队列
+        """
+        start_time = time.time()
+        Logger.rag_extraction_start(
+            document_id=item.document_id,
+            file_path=item.storage_path,
+            file_type=item.doc_type or "unknown",
+        )
+        available: Dict[str, List[Any]] = {}
+        existing = self.existing_chunks.pop(item.document_id, None) if self.incremental else None
+        if existing:
+            item.diff = True
+            for row in existing.values():
+                if row.embedding_id is not None and row.content_hash:
+                    available.setdefault(row.content_hash, []).append(row)
+                else:
+                    item.vanished.append(row.id)
+
+        hasher = hashlib.sha256()
+        text_length = 0
+
+        async def blocks():
+            nonlocal text_length
+            async for contents in ExtractPool.iter_contents(item.storage_path, item.file_hash):
+                text = "".join(content["text"] + "\n" for content in contents)
+                hasher.update(text.encode("utf-8"))
+                text_length += len(text)
+                yield text
+
+        try:
+            async for chunk in self.text_splitter.split_text_stream(blocks()):
+                index = len(item.chunks)
+                item.chunks.append(chunk)
+                item.embeddings.append(None)
+                self.split_chunk_count += 1
+                rows = available.get(compute_content_hash(chunk))
+                if rows:
+                    item.reused[index] = rows.pop()
+                    item.chunks[index] = None
+                    self.embedded_chunk_count += 1
+                else:
+                    item.remaining += 1
+                    await add(item, index)
+            if not item.chunks:
+                raise ValueError("提取内容为空")
+        except Exception as e:
+            item.error = item.error or DocumentProcessingException(
+                message=f"流式提取文档内容失败: {str(e)}",
+                document_id=item.document_id,
+                file_path=item.storage_path,
+            )
+        finally:
+            item.streaming = False
+
+        item.content_hash = hasher.hexdigest()
+        item.vanished.extend(row.id for rows in available.values() for row in rows)
+        duration = time.time() - start_time
+        self.metrics["extract"].record(1, text_length, duration)
+        self.metrics["split"].record(1, len(item.chunks), duration)
+        Logger.rag_chunking_success(
+            document_id=item.document_id,
+            chunk_count=len(item.chunks),
+            chunking_time=duration,
+        )
+        # 最后一批分块已完成向量化（或全部被复用）时，由这里把文档送往写入阶段
+        if item.remaining == 0:
+            if item.error is not None:
+                self._fail(item, item.error)
+            else:
+                await out_queue.put(item)
+
+    async def _embed_batch(
+        self,
+        entries: List[Tuple[PipelineItem, int]],
+        out_queue: asyncio.Queue,
+        semaphore: asyncio.Semaphore,
+    ) -> None:
+        """向量化一个批次，并把全部分块完成向量化的文档送往写入阶段
+
+        每个请求使用独立的数据库会话记录用量，避免与写入阶段共用会话。
+        """
+        try:
+            start_time = time.time()
+            texts = [item.chunks[index] for item, index in entries]
+            error: Optional[EmbeddingException] = None
+            try:
+                async with AsyncSessionLocal() as session:
+                    vectors = await EmbeddingEngine(self.llm_config, session).embed_documents(texts)
+                if len(vectors) != len(texts):
+                    raise EmbeddingException(
+                        message=f"向量化结果数量 ({len(vectors)}) 与分块数量 ({len(texts)}) 不一致",
+                        model_name=self.llm_config.embeddings.model,
+                    )
+            except EmbeddingException as e:
+                error, vectors = e, [None] * len(texts)
+            except Exception as e:
+                error = EmbeddingException(
+                    message=f"向量化分块失败: {str(e)}",
+                    model_name=self.llm_config.embeddings.model,
+                )
+                vectors = [None] * len(texts)
+
+            completed = []
+            checkpoints = []
+            for (item, index), vector in zip(entries, vectors):
+                item.embeddings[index] = vector
+                if error is not None and item.error is None:
+                    item.error = error
+                item.remaining -= 1
+                item.checkpoint_pending += 1
+                if item.remaining == 0 and not item.streaming:
+                    completed.append(item)
+                elif (
+                    item.checkpoint_pending >= self.checkpoint_chunks
+                    and item.error is None
+                    and item not in checkpoints
+                ):
+                    item.checkpoint_pending = 0
+                    checkpoints.append(item)
+            self.metrics["embed"].record(len(completed), len(texts), time.time() - start_time)
+            if error is None:
+                self.embedded_chunk_count += len(texts)
+                self.embedded_token_count += sum(_estimate_tokens(text) for text in texts)
+            await self.report_progress()
+
+            for item in checkpoints:
+                await out_queue.put(_Checkpoint(item))
+
+            for item in completed:
+                if item.error is not None:
+                    self._fail(item, item.error)
+                    continue
+                Logger.rag_embedding_success(
+                    document_id=item.document_id,
+                    embedding_count=len(item.embeddings) - len(item.reused),
+                    embedding_time=time.time() - item.started_at,
+                    model=self.llm_config.embeddings.model,
+                )
+                await out_queue.put(item)
+        finally:
+            semaphore.release()
+
+    async def _write_stage(self, in_queue: asyncio.Queue) -> None:
+        """写入阶段：合并队列中已就绪的文档批量写入，检查点请求按到达顺序单独处理
+
+        Args:
+            in_queue: 输入队列
+        """
+        finished = False
+        while not finished:
+            entry = await in_queue.get()
+            if entry is _DONE:
+                break
+            if isinstance(entry, _Checkpoint):
+                await self._write_checkpoint(entry.item)
+                continue
+            batch = [entry]
+            checkpoint = None
+            while len(batch) < self.write_batch_documents and not in_queue.empty():
+                next_entry = in_queue.get_nowait()
+                if next_entry is _DONE:
+                    finished = True
+                    break
+                if isinstance(next_entry, _Checkpoint):
+                    checkpoint = next_entry
+                    break
+                batch.append(next_entry)
+            await self._write_batch(batch)
+            if checkpoint is not None:
+                await self._write_checkpoint(checkpoint.item)
+
+    async def _write_checkpoint(self, item: PipelineItem) -> None:
+        """提交超大文档中已完成向量化、尚未提交的分块，并记录部分完成的检查点"""
+        if item.failed or (item.remaining == 0 and not item.streaming):
+            # 文档已失败，或已全部完成向量化、将由完整写入处理
+            return
+        start_time = time.time()
+        rows_before = self.writer.row_count
+        indices = [
+            index for index, vector in enumerate(item.embeddings)
+            if vector is not None and index not in item.reused and index not in item.written
+        ]
+        if not indices:
+            return
+        try:
+            if not item.diff:
+                # 首次提交前清理旧分块，之后该文档按增量方式写入，不再整体清理
+                await self.deleter.delete_documents([item.document_id])
+            await self._insert_chunks(self._chunk_documents(item, indices))
+            await self._save_checkpoints(
+                [item], TrainingCheckpoint.STATUS_PARTIAL, len(item.written) + len(indices) + len(item.reused)
+            )
+            await self._commit()
+        except Exception as e:
+            await self._rollback_batch([item], e)
+            return
+
+        item.diff = True
+        item.written.update(indices)
+        # 已提交的分块不再需要，释放文本和向量
+        for index in indices:
+            item.chunks[index] = None
+            item.embeddings[index] = None
+        await IndexCache.invalidate_all_indexes(self.knowledge_base.id)
+        self.metrics["write"].record(0, self.writer.row_count - rows_before, time.time() - start_time)
+        Logger.info(
+            f"文档 {item.document_id} 检查点: 已提交 {len(item.written) + len(item.reused)}/{len(item.chunks)} 个分块"
+        )
+
+    def _chunk_documents(self, item: PipelineItem, indices: List[int]) -> List[RAGDocument]:
+        """构造指定序号分块的写入文档"""
+        return [
+            RAGDocument(
+                page_content=item.chunks[chunk_index],
+                metadata={
+                    "doc_id": f"{uuid.uuid4()}_{chunk_index}",
+                    "document_id": item.document_id,
+                    "knowledge_base_id": self.knowledge_base.id,
+                    "chunk_index": chunk_index,
+                    "title": item.title,
+                },
+                vector=item.embeddings[chunk_index],
+            )
+            for chunk_index in indices
+        ]
+
+    async def _insert_chunks(self, chunk_documents: List[RAGDocument]) -> None:
+        """批量写入分块、向量、倒排项和向量存储数据（不提交）"""
+        if not chunk_documents:
+            return
+        term_vectors = await get_document_term_vectors(chunk_documents, self.knowledge_base.id)
+        chunk_ids = await self.writer.write(chunk_documents, term_vectors)
+        self.pending_vector_ids.extend(document.metadata["doc_id"] for document in chunk_documents)
+        await self.keyword_index.add_chunks(
+            self.db,
+            self.knowledge_base.id,
+            [(chunk_id, term_freqs) for chunk_id, (term_freqs, _) in zip(chunk_ids, term_vectors)],
+        )
+        await self.vector_store.add_texts(
+            chunk_documents,
+            [document.vector for document in chunk_documents],
+            duplicate_check=True,
+        )
+
+    async def _save_checkpoints(
+        self, items: List[PipelineItem], status: str, chunk_completed: Optional[int] = None
+    ) -> None:
+        """写入文档检查点（不提交），已有的检查点被替换"""
+        if not items:
+            return
+        document_ids = [item.document_id for item in items]
+        await self.db.execute(
+            delete(TrainingCheckpoint)
+            .where(
+                TrainingCheckpoint.knowledge_base_id == self.knowledge_base.id,
+                TrainingCheckpoint.document_id.in_(document_ids),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        await self.db.execute(
+            insert(TrainingCheckpoint),
+            [
+                {
+                    "knowledge_base_id": self.knowledge_base.id,
+                    "document_id": item.document_id,
+                    "status": status,
+                    "chunk_total": len(item.chunks),
+                    "chunk_completed": len(item.chunks) if chunk_completed is None else chunk_completed,
+                }
+                for item in items
+            ],
+        )
+
+    async def _commit(self) -> None:
+        """提交当前写入事务，随后删除推迟的旧向量"""
+        await self.db.commit()
+        self.pending_vector_ids = []
+        self.writer_counts = (self.writer.chunk_count, self.writer.embedding_count)
+        await self.deleter.delete_pending_vectors()
+
+    async def _rollback_batch(self, batch: List[PipelineItem], e: Exception) -> None:
+        """写入失败时回滚并将文档记为失败
+
+        数据库中本批的删除和写入全部撤销；向量存储中本批新增的向量尽力删除，
+        推迟的旧向量删除被放弃，写入器计数恢复到事务开始时。
+        """
+        await self.db.rollback()
+        self.deleter.discard_pending_vectors()
+        self.writer.chunk_count, self.writer.embedding_count = self.writer_counts
+        vector_ids, self.pending_vector_ids = self.pending_vector_ids, []
+        if vector_ids:
+            try:
+                await self.vector_store.delete_by_ids(vector_ids)
+            except Exception as delete_error:
+                Logger.warning(f"回滚后删除本批新增向量失败: {str(delete_error)}")
+        # 回滚会使知识库对象过期，重新加载以免后续访问属性时触发惰性加载
+        await self.db.refresh(self.knowledge_base)
+        error = IndexingException(
+            message=f"存储分块和向量失败: {str(e)}",
+            knowledge_base_id=self.knowledge_base.id,
+            index_type=self.knowledge_base.indexing_technique,
+        )
+        for item in batch:
+            self._fail(item, error)
+
+    async def _write_batch(self, batch: List[PipelineItem]) -> None:
+        """批量写入一批文档
+
+        全量处理的文档先清理旧分块；增量处理的文档只删除已消失的分块、更新被复用分块的序号。
+        随后批量写入新分块、向量、倒排项和向量存储数据，并记录文档的索引哈希。
+        """
+        batch = [item for item in batch if not item.failed]
+        if not batch:
+            return
+        start_time = time.time()
+        rows_before = self.writer.row_count
+        try:
+            replaced_ids = [item.document_id for item in batch if not item.diff and not item.unchanged]
+            if replaced_ids:
+                await self.deleter.delete_documents(replaced_ids)
+            vanished_ids = [chunk_id for item in batch for chunk_id in item.vanished]
+            if vanished_ids:
+                await self.deleter.delete_chunks(vanished_ids)
+
+            # 被复用分块的位置变化时只更新序号
+            moved = [
+                {"id": row.id, "chunk_index": chunk_index}
+                for item in batch
+                for chunk_index, row in item.reused.items()
+                if row.chunk_index != chunk_index
+            ]
+            if moved:
+                await self.db.execute(update(DocumentChunk), moved)
+
+            chunk_documents = [
+                document
+                for item in batch
+                for document in self._chunk_documents(
+                    item,
+                    [
+                        index for index in range(len(item.chunks))
+                        if index not in item.reused and index not in item.written
+                    ],
+                )
+            ]
+            await self._insert_chunks(chunk_documents)
+
+            await self.db.execute(
+                update(Document),
+                [
+                    {
+                        "id": item.document_id,
+                        "content_hash": item.content_hash,
+                        "indexed_file_hash": item.file_hash,
+                    }
+                    for item in batch
+                ],
+            )
+            await self._save_checkpoints(batch, TrainingCheckpoint.STATUS_COMPLETED)
+            await self._commit()
+            if moved or chunk_documents:
+                await IndexCache.invalidate_all_indexes(self.knowledge_base.id)
+        except Exception as e:
+            await self._rollback_batch(batch, e)
+            return
+
+        self.metrics["write"].record(
+            len(batch), self.writer.row_count - rows_before, time.time() - start_time
+        )
+        for item in batch:
+            if item.unchanged:
+                self.skipped_count += 1
+                continue
+            self.document_count += 1
+            self.chunk_count += len(item.chunks)
+            self.embedding_count += len(item.chunks) - len(item.reused)
+            self.reused_chunk_count += len(item.reused)
+            Logger.rag_performance_metrics(
+                operation="document_processing",
+                duration=time.time() - item.started_at,
+                kb_id=self.knowledge_base.id,
+                document_id=item.document_id,
+                chunk_count=len(item.chunks),
+                embedding_count=len(item.chunks) - len(item.reused),
+                reused_chunk_count=len(item.reused),
+                vanished_chunk_count=len(item.vanished),
+            )
+        await self.report_progress()
+
+    def _fail(self, item: PipelineItem, error: RAGException) -> None:
+        """记录文档处理失败"""
+        item.failed = True
+        process_time = time.time() - item.started_at
+        stage = error.__class__.__name__
+        Logger.rag_document_error(
+            kb_id=self.knowledge_base.id,
+            document_id=item.document_id,
+            stage=stage,
+            error=error.message,
+            progress={"current": item.position + 1, "total": self.total_count},
+        )
+        self.failed_documents.append(
+            {
+                "document_id": item.document_id,
+                "title": item.title,
+                "error": error.message,
+                "details": error.details,
+                "stage": stage,
+                "process_time": process_time,
+            }
+        )
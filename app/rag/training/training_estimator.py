@@ -0,0 +1,456 @@
+"""训练成本与耗时估算（试运行）"""
+import asyncio
+import hashlib
+import json
+import time
+import uuid
+from collections import Counter
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import and_, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.logger import Logger
+from app.core.redis_manager import redis_manager
+from app.models.document import Document
+from app.models.document_chunk import DocumentChunk
+from app.models.document_embedding import DocumentEmbedding
+from app.models.knowledge_base import KnowledgeBase
+from app.models.llm_usage_log import LLMUsageLog
+from app.models.training_checkpoint import TrainingCheckpoint
+from app.rag.embedding.cached_embedding import CacheEmbedding
+from app.rag.exceptions import TrainingException
+from app.rag.extractor.extract_pool import ExtractPool
+from app.rag.extractor.extract_processor import ExtractProcessor
+from app.rag.index_processor.chunk_bulk_writer import compute_content_hash
+from app.rag.splitter.recursive_character_text_splitter import (
+    RecursiveCharacterTextSplitter,
+)
+from app.rag.training.ingestion_pipeline import PipelineItem, _estimate_tokens
+from app.schemas.llm import LLMConfig
+from app.utils.cost_calculator import cost_calculator
+
+
+def _analyze_text(
+    text: str, chunk_size: int, chunk_overlap: int
+) -> Tuple[str, List[Tuple[str, str, int]]]:
+    """在工作进程中分块文本，只返回哈希和 token 数，不把分块文本传回主进程
+
+    Args:
+        text: 文档文本
+        chunk_size: 分块大小
+        chunk_overlap: 分块重叠大小
+
+    Returns:
+        Tuple[str, List[Tuple[str, str, int]]]: 文本内容哈希，以及每个分块的
+            (内容哈希, 向量缓存哈希, 估算 token 数)
+    """
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    chunks = [
+        (compute_content_hash(chunk), hashlib.md5(chunk.encode()).hexdigest(), _estimate_tokens(chunk))
+        for chunk in splitter.split_text(text)
+    ]
+    return compute_content_hash(text), chunks
+
+
+class TrainingEstimateJob:
+    """训练估算后台任务状态
+
+    估算需要提取并分块整个知识库，在 huey 工作进程中执行；状态和结果保存在 Redis 中，
+    保留 TRAINING_ESTIMATE_JOB_TTL 秒。
+    """
+
+    STATUS_PENDING = "pending"
+    STATUS_RUNNING = "running"
+    STATUS_COMPLETED = "completed"
+    STATUS_FAILED = "failed"
+
+    def __init__(self, kb_id: int, full_rebuild: bool = False):
+        """初始化
+
+        Args:
+            kb_id: 知识库ID
+            full_rebuild: 是否按全量重建估算
+        """
+        self.job_id = uuid.uuid4().hex
+        self.state: Dict[str, Any] = {
+            "job_id": self.job_id,
+            "knowledge_base_id": kb_id,
+            "full_rebuild": full_rebuild,
+            "status": self.STATUS_PENDING,
+            "result": None,
+            "error": None,
+            "created_at": time.time(),
+            "finished_at": None,
+        }
+
+    @staticmethod
+    def key(job_id: str) -> str:
+        """任务状态键"""
+        return f"training_estimate:{job_id}"
+
+    async def save(self) -> None:
+        """保存任务状态"""
+        redis = await redis_manager.get_redis()
+        await redis.set(
+            self.key(self.job_id),
+            json.dumps(self.state, ensure_ascii=False, default=str),
+            ex=settings.TRAINING_ESTIMATE_JOB_TTL,
+        )
+
+    @classmethod
+    async def get(cls, job_id: str) -> Optional[Dict[str, Any]]:
+        """获取任务状态，不存在或已过期时返回None"""
+        payload = await redis_manager.get(cls.key(job_id))
+        return json.loads(payload) if payload else None
+
+    @classmethod
+    async def load(cls, job_id: str) -> Optional["TrainingEstimateJob"]:
+        """从 Redis 恢复任务，不存在或已过期时返回None"""
+        state = await cls.get(job_id)
+        if state is None:
+            return None
+        job = cls(state["knowledge_base_id"], state["full_rebuild"])
+        job.job_id = job_id
+        job.state = state
+        return job
+
+    async def run(self, db: AsyncSession) -> None:
+        """执行估算并保存结果
+
+        Args:
+            db: 数据库会话
+        """
+        self.state["status"] = self.STATUS_RUNNING
+        await self.save()
+        try:
+            self.state["result"] = await TrainingEstimator(db).estimate(
+                self.state["knowledge_base_id"], full_rebuild=self.state["full_rebuild"]
+            )
+            self.state["status"] = self.STATUS_COMPLETED
+        except Exception as e:
+            Logger.error(f"训练估算任务 {self.job_id} 失败: {str(e)}")
+            self.state["status"] = self.STATUS_FAILED
+            self.state["error"] = e.message if isinstance(e, TrainingException) else str(e)
+        self.state["finished_at"] = time.time()
+        await self.save()
+
+
+class TrainingEstimator:
+    """训练成本与耗时估算器
+
+    按训练时相同的规则试运行一次：跳过未变化和已从检查点完成的文档，在提取进程池中提取并分块
+    其余文档（已提取的内容不再提取），估算每个分块的 token 数；能按内容哈希复用已有向量的分块，
+    以及命中向量缓存的分块不计费。费用按模型定价计算，没有定价时按 llm_usage_logs 中该模型的
+    历史单价；耗时按最近训练的历史吞吐估算。整个过程不调用向量化接口，也不写入数据库。
+    """
+
+    def __init__(self, db: AsyncSession):
+        """初始化估算器
+
+        Args:
+            db: 数据库会话
+        """
+        self.db = db
+
+    async def estimate(self, kb_id: int, full_rebuild: bool = False) -> Dict[str, Any]:
+        """估算知识库训练的成本和耗时
+
+        Args:
+            kb_id: 知识库ID
+            full_rebuild: 是否按全量重建估算
+
+        Returns:
+            Dict[str, Any]: 文档、分块、token、费用和耗时估算
+        """
+        start_time = time.time()
+        knowledge_base = (
+            await self.db.execute(select(KnowledgeBase).filter(KnowledgeBase.id == kb_id))
+        ).scalar_one_or_none()
+        if not knowledge_base:
+            raise TrainingException(f"知识库 {kb_id} 不存在", knowledge_base_id=kb_id)
+
+        llm_config = LLMConfig.model_validate(knowledge_base.llm_config)
+        embedding_model = knowledge_base.embedding_model or llm_config.embeddings.model
+        documents = (
+            await self.db.execute(
+                select(Document).filter(
+                    Document.knowledge_base_id == kb_id,
+                    Document.is_deleted == False,
+                )
+            )
+        ).scalars().all()
+        items = [PipelineItem(position, document) for position, document in enumerate(documents)]
+
+        resumed_count = 0
+        existing: Dict[int, Counter] = {}
+        embedded_ids: Set[int] = set()
+        if not full_rebuild:
+            resumed_ids = set(
+                (
+                    await self.db.execute(
+                        select(TrainingCheckpoint.document_id).filter(
+                            TrainingCheckpoint.knowledge_base_id == kb_id,
+                            TrainingCheckpoint.status == TrainingCheckpoint.STATUS_COMPLETED,
+                        )
+                    )
+                ).scalars().all()
+            )
+            resumed_count = sum(1 for item in items if item.document_id in resumed_ids)
+            items = [item for item in items if item.document_id not in resumed_ids]
+            existing, embedded_ids = await self._load_reusable_hashes(
+                [item.document_id for item in items], embedding_model
+            )
+
+        skipped_count = 0
+        pending = []
+        for item in items:
+            if item.document_id in embedded_ids and (
+                item.file_hash == item.indexed_file_hash if item.file_hash
+                else bool(item.content) and compute_content_hash(item.content) == item.indexed_content_hash
+            ):
+                skipped_count += 1
+            else:
+                pending.append(item)
+
+        # 与训练流水线相同的提取并发，同一时刻最多只有这么多份文档文本在内存中
+        semaphore = asyncio.Semaphore(max(1, settings.RAG_EXTRACT_WORKERS))
+
+        async def analyze(item: PipelineItem):
+            async with semaphore:
+                return await self._analyze(item)
+
+        extract_start = time.time()
+        analyses = await asyncio.gather(*[analyze(item) for item in pending])
+        extract_seconds = time.time() - extract_start
+
+        failed_documents = []
+        process_count = chunk_count = reused_count = 0
+        token_count = 0
+        candidates: List[Tuple[str, int]] = []
+        for item, (analysis, error) in zip(pending, analyses):
+            if error is not None:
+                failed_documents.append(
+                    {"document_id": item.document_id, "title": item.title, "error": error}
+                )
+                continue
+            content_hash, chunks = analysis
+            available = existing.get(item.document_id)
+            if item.document_id in embedded_ids and content_hash == item.indexed_content_hash:
+                skipped_count += 1
+                continue
+            process_count += 1
+            for chunk_hash, cache_hash, tokens in chunks:
+                chunk_count += 1
+                token_count += tokens
+                if available and available[chunk_hash] > 0:
+                    available[chunk_hash] -= 1
+                    reused_count += 1
+                else:
+                    candidates.append((cache_hash, tokens))
+
+        cached = await self._check_embedding_cache(
+            embedding_model, [cache_hash for cache_hash, _ in candidates]
+        )
+        cached_count = sum(cached)
+        billable_tokens = sum(tokens for (_, tokens), hit in zip(candidates, cached) if not hit)
+
+        cost, cost_source = await self._estimate_cost(embedding_model, billable_tokens)
+        tokens_per_second, throughput_source = await self._historical_throughput(embedding_model)
+        embed_seconds = billable_tokens / tokens_per_second if tokens_per_second > 0 else 0.0
+
+        result = {
+            "kb_id": kb_id,
+            "embedding_model": embedding_model,
+            "full_rebuild": full_rebuild,
+            "documents": {
+                "total": len(documents),
+                "resumed": resumed_count,
+                "skipped": skipped_count,
+                "to_process": process_count,
+                "failed": len(failed_documents),
+            },
+            "chunks": {
+                "total": chunk_count,
+                "reused": reused_count,
+                "cached": cached_count,
+                "to_embed": len(candidates) - cached_count,
+            },
+            "tokens": {
+                "total": token_count,
+                "to_embed": billable_tokens,
+            },
+            "cost": {
+                "estimated": cost,
+                "source": cost_source,
+            },
+            "duration": {
+                # 提取与向量化在流水线中并行，总耗时取两者中的较大值
+                "estimated_seconds": max(extract_seconds, embed_seconds),
+                "extract_seconds": extract_seconds,
+                "embed_seconds": embed_seconds,
+                "tokens_per_second": tokens_per_second,
+                "source": throughput_source,
+            },
+            "failed_documents": failed_documents,
+        }
+        Logger.rag_performance_metrics(
+            operation="training_estimate",
+            duration=time.time() - start_time,
+            kb_id=kb_id,
+            document_count=process_count,
+            chunk_count=chunk_count,
+            billable_tokens=billable_tokens,
+            estimated_cost=cost,
+            estimated_seconds=result["duration"]["estimated_seconds"],
+        )
+        return result
+
+    async def _analyze(
+        self, item: PipelineItem
+    ) -> Tuple[Optional[Tuple[str, List[Tuple[str, str, int]]]], Optional[str]]:
+        """在提取进程池中提取并分块单个文档
+
+        Returns:
+            Tuple: (分析结果, 错误信息)，失败时分析结果为None
+        """
+        try:
+            text = item.content
+            if not text and item.storage_path:
+                text = ExtractProcessor.combine_contents(
+                    await ExtractPool.extract_contents(item.storage_path, item.file_hash)
+                )
+            if not text:
+                return None, "提取内容为空"
+            analysis = await ExtractPool.run(
+                _analyze_text, text, settings.RAG_CHUNK_SIZE, settings.RAG_CHUNK_OVERLAP
+            )
+            return analysis, None
+        except Exception as e:
+            return None, f"提取或分块失败: {str(e)}"
+
+    async def _load_reusable_hashes(
+        self, document_ids: List[int], embedding_model: str
+    ) -> Tuple[Dict[int, Counter], Set[int]]:
+        """读取文档已有分块中带当前模型向量的内容哈希
+
+        Returns:
+            Tuple[Dict[int, Counter], Set[int]]: 文档ID到可复用分块内容哈希计数的映射（没有分块的文档不在其中），
+                以及全部分块都有当前模型向量的文档ID集合
+        """
+        existing: Dict[int, Counter] = {}
+        missing_ids: Set[int] = set()
+        for start in range(0, len(document_ids), settings.RAG_BULK_DELETE_BATCH_SIZE):
+            batch = document_ids[start:start + settings.RAG_BULK_DELETE_BATCH_SIZE]
+            rows = (
+                await self.db.execute(
+                    select(
+                        DocumentChunk.document_id,
+                        DocumentChunk.content_hash,
+                        DocumentEmbedding.id.label("embedding_id"),
+                    )
+                    .outerjoin(
+                        DocumentEmbedding,
+                        and_(
+                            DocumentEmbedding.chunk_id == DocumentChunk.id,
+                            DocumentEmbedding.model == embedding_model,
+                        ),
+                    )
+                    .where(DocumentChunk.document_id.in_(batch))
+                )
+            ).all()
+            for row in rows:
+                hashes = existing.setdefault(row.document_id, Counter())
+                if row.embedding_id is not None and row.content_hash:
+                    hashes[row.content_hash] += 1
+                if row.embedding_id is None:
+                    missing_ids.add(row.document_id)
+        return existing, set(existing) - missing_ids
+
+    async def _check_embedding_cache(self, embedding_model: str, text_hashes: List[str]) -> List[bool]:
+        """批量检查分块是否命中向量缓存，Redis 不可用时视为全部未命中"""
+        if not text_hashes:
+            return []
+        try:
+            redis = await redis_manager.get_redis()
+            hits: List[bool] = []
+            batch_size = settings.RAG_BULK_DELETE_BATCH_SIZE
+            for start in range(0, len(text_hashes), batch_size):
+                async with redis.pipeline(transaction=False) as pipe:
+                    for text_hash in text_hashes[start:start + batch_size]:
+                        pipe.exists(CacheEmbedding.document_cache_key(embedding_model, text_hash))
+                    hits.extend(bool(exists) for exists in await pipe.execute())
+            return hits
+        except Exception as e:
+            Logger.warning(f"检查向量缓存失败，按全部未命中估算: {str(e)}")
+            return [False] * len(text_hashes)
+
+    async def _estimate_cost(self, embedding_model: str, tokens: int) -> Tuple[float, str]:
+        """估算向量化费用：优先按模型定价，没有定价时按历史单价
+
+        Returns:
+            Tuple[float, str]: (费用, 来源：pricing/history/unknown)
+        """
+        if embedding_model in cost_calculator.pricing:
+            return cost_calculator.calculate_cost(embedding_model, tokens, 0), "pricing"
+        total_cost, total_tokens = (
+            await self.db.execute(
+                select(func.sum(LLMUsageLog.cost), func.sum(LLMUsageLog.total_tokens)).filter(
+                    LLMUsageLog.model_name == embedding_model
+                )
+            )
+        ).one()
+        if total_tokens:
+            return tokens * (total_cost or 0.0) / total_tokens, "history"
+        return 0.0, "unknown"
+
+    async def _historical_throughput(self, embedding_model: str) -> Tuple[float, str]:
+        """按最近完成的训练估算向量化吞吐（token/秒）
+
+        统计使用同一嵌入模型、最近完成训练的知识库在训练期间记录的 token 用量与训练耗时之比，
+        训练耗时包含提取、写入等阶段，得到的是端到端吞吐。没有历史记录时使用默认值。
+
+        Returns:
+            Tuple[float, str]: (吞吐, 来源：history/default)
+        """
+        runs = (
+            select(
+                KnowledgeBase.id,
+                KnowledgeBase.training_started_at,
+                KnowledgeBase.training_finished_at,
+            )
+            .filter(
+                KnowledgeBase.training_started_at.isnot(None),
+                KnowledgeBase.training_finished_at > KnowledgeBase.training_started_at,
+            )
+            .order_by(KnowledgeBase.training_finished_at.desc())
+            .limit(settings.TRAINING_ESTIMATE_HISTORY_RUNS)
+            .subquery()
+        )
+        rows = (
+            await self.db.execute(
+                select(
+                    runs.c.training_started_at,
+                    runs.c.training_finished_at,
+                    func.sum(LLMUsageLog.total_tokens).label("tokens"),
+                )
+                .join(
+                    LLMUsageLog,
+                    and_(
+                        LLMUsageLog.knowledge_base_id == runs.c.id,
+                        LLMUsageLog.model_name == embedding_model,
+                        LLMUsageLog.created_at >= runs.c.training_started_at,
+                        LLMUsageLog.created_at <= runs.c.training_finished_at,
+                    ),
+                )
+                .group_by(runs.c.id, runs.c.training_started_at, runs.c.training_finished_at)
+            )
+        ).all()
+        total_tokens = sum(row.tokens or 0 for row in rows)
+        total_seconds = sum(
+            (row.training_finished_at - row.training_started_at).total_seconds() for row in rows
+        )
+        if total_tokens > 0 and total_seconds > 0:
+            return total_tokens / total_seconds, "history"
+        return float(settings.TRAINING_ESTIMATE_DEFAULT_TOKENS_PER_SECOND), "default"
@@ -1,31 +1,57 @@
 """RAG训练管理器"""
 
+import asyncio
 from datetime import datetime
 from typing import List, Dict, Any, Optional, Tuple
 
-from sqlalchemy import select, and_, or_, desc
+from sqlalchemy import select, and_, or_, desc, delete, func
+from sqlalchemy.exc import InterfaceError, OperationalError, TimeoutError as PoolTimeoutError
 from sqlalchemy.orm import Session
 
+from app.core.context import set_context
 from app.core.logger import Logger
 from app.models.knowledge_base import KnowledgeBase
 from app.models.document import Document
-from app.models.document_chunk import DocumentChunk
-from app.models.document_embedding import DocumentEmbedding
 from app.models.enums import TrainingStatus
-from app.rag.extractor.extract_processor import ExtractProcessor
-from app.rag.splitter.text_splitter import TextSplitter
-from app.rag.embedding.embedding_engine import EmbeddingEngine
-from app.rag.datasource.vdb.vector_factory import VectorStoreFactory
+from app.models.training_checkpoint import TrainingCheckpoint
+from app.rag.exceptions import EmbeddingException, IndexingException, TrainingException
 from app.rag.index_processor.index_processor_factory import IndexProcessorFactory
-from app.rag.exceptions import (
-    DocumentProcessingException,
-    EmbeddingException,
-    IndexingException,
-    TrainingException,
+from app.rag.training.ingestion_pipeline import IngestionPipeline
+from app.rag.training.training_progress import (
+    STAGE_CLEANING,
+    STAGE_COMPLETED,
+    STAGE_FAILED,
+    STAGE_PREPARING,
+    STAGE_QUEUED,
+    TrainingProgress,
 )
+from app.rag.training.training_scheduler import TrainingScheduler
 from app.schemas.llm import LLMConfig
 
 
+# 可重试的文档失败阶段：向量化接口和写入事务的失败通常是暂时的，文件本身的提取失败重试也不会成功
+_TRANSIENT_STAGES = (EmbeddingException.__name__, IndexingException.__name__)
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """是否为重试可能成功的暂时性错误（向量化接口、数据库连接或超时）
+
+    Args:
+        error: 异常
+
+    Returns:
+        bool: 是否可重试
+    """
+    return isinstance(error, (
+        EmbeddingException,
+        OperationalError,
+        InterfaceError,
+        PoolTimeoutError,
+        ConnectionError,
+        asyncio.TimeoutError,
+    ))
+
+
 class TrainingResult:
     """训练结果"""
 
@@ -36,6 +62,13 @@ class TrainingResult:
         chunk_count: int = 0,
         embedding_count: int = 0,
         error_message: Optional[str] = None,
+        rows_written: int = 0,
+        write_duration: float = 0.0,
+        stage_metrics: Optional[Dict[str, Dict[str, Any]]] = None,
+        skipped_count: int = 0,
+        reused_chunk_count: int = 0,
+        resumed_count: int = 0,
+        retryable: bool = False,
     ):
         """初始化训练结果
 
@@ -45,12 +78,31 @@ class TrainingResult:
             chunk_count: 生成的分块数量
             embedding_count: 生成的向量数量
             error_message: 错误信息
+            rows_written: 写入数据库的分块和向量行数
+            write_duration: 数据库批量写入耗时（秒）
+            stage_metrics: 摄取流水线各阶段的吞吐统计
+            skipped_count: 增量训练中未变化而跳过的文档数量
+            reused_chunk_count: 增量训练中复用的分块数量
+            resumed_count: 从上次中断的检查点恢复、本次无需处理的文档数量
+            retryable: 失败是否由暂时性错误导致，为True时训练任务按指数退避重试
         """
         self.success = success
         self.document_count = document_count
         self.chunk_count = chunk_count
         self.embedding_count = embedding_count
         self.error_message = error_message
+        self.rows_written = rows_written
+        self.write_duration = write_duration
+        self.stage_metrics = stage_metrics or {}
+        self.skipped_count = skipped_count
+        self.reused_chunk_count = reused_chunk_count
+        self.resumed_count = resumed_count
+        self.retryable = retryable
+
+    @property
+    def rows_per_second(self) -> float:
+        """数据库写入吞吐（行/秒）"""
+        return self.rows_written / self.write_duration if self.write_duration > 0 else 0.0
 
 
 class RAGTrainingManager:
@@ -66,17 +118,25 @@ class RAGTrainingManager:
             db: 数据库会话
         """
         self.db = db
-        self.extract_processor = ExtractProcessor()
 
-    async def train(self, kb_id: int) -> TrainingResult:
+    async def train(self, kb_id: int, full_rebuild: bool = False) -> TrainingResult:
         """训练知识库
 
+        默认增量训练：跳过上次索引后未变化的文档，清理已删除文档的分块。
+        上次训练中断时从已提交的检查点恢复，已完成的文档不再处理；全量重建会丢弃检查点，
+        清空索引提交后即清除知识库的全量重建标记，之后的重试按增量训练从检查点继续。
+        训练进度通过 TrainingProgress 实时发布。
+
         Args:
             kb_id: 知识库ID
+            full_rebuild: 是否清空知识库索引后全量重建
 
         Returns:
             TrainingResult: 训练结果
         """
+        # 向量化用量按知识库记录，训练成本估算据此统计历史吞吐
+        set_context(kb_id=kb_id)
+        progress = TrainingProgress(kb_id)
         try:
             # 获取知识库
             knowledge_base = (
@@ -92,12 +152,16 @@ class RAGTrainingManager:
 
             # 更新知识库状态为训练中
             await self.update_training_status(kb_id, TrainingStatus.TRAINING)
+            await progress.update(stage=STAGE_PREPARING, message="准备训练")
 
-            # 获取知识库文档
+            # 获取知识库未删除的文档
             documents = (
                 (
                     await self.db.execute(
-                        select(Document).filter(Document.knowledge_base_id == kb_id)
+                        select(Document).filter(
+                            Document.knowledge_base_id == kb_id,
+                            Document.is_deleted == False,
+                        )
                     )
                 )
                 .scalars()
@@ -105,6 +169,7 @@ class RAGTrainingManager:
             )
 
             if not documents:
+                await progress.update(stage=STAGE_FAILED, message=f"知识库 {kb_id} 没有文档")
                 return TrainingResult(
                     success=False, error_message=f"知识库 {kb_id} 没有文档"
                 )
@@ -112,18 +177,72 @@ class RAGTrainingManager:
             # 创建LLM配置
             llm_config = LLMConfig.model_validate(knowledge_base.llm_config)
 
+            index_processor = IndexProcessorFactory.create_index_processor(knowledge_base)
+            resumed_ids = set()
+            await progress.update(stage=STAGE_CLEANING)
+            if full_rebuild:
+                # 全量重建：丢弃检查点，清空知识库索引，所有文档重新处理
+                await self.clear_checkpoints(kb_id)
+                await index_processor.clean(
+                    knowledge_base, None, db=self.db, llm_config=llm_config
+                )
+                # 清空已提交后清除全量重建标记，重试或中断后重新排队时从检查点恢复，不再重复清空
+                knowledge_base.training_full_rebuild = False
+                await self.db.commit()
+            else:
+                # 从上次中断的检查点恢复
+                resumed_ids = set(
+                    (
+                        await self.db.execute(
+                            select(TrainingCheckpoint.document_id).filter(
+                                TrainingCheckpoint.knowledge_base_id == kb_id,
+                                TrainingCheckpoint.status == TrainingCheckpoint.STATUS_COMPLETED,
+                            )
+                        )
+                    ).scalars().all()
+                )
+                if resumed_ids:
+                    Logger.info(
+                        f"知识库 {kb_id} 从检查点恢复训练: 已完成 {len(resumed_ids)} 个文档，"
+                        f"剩余 {len(documents) - len(resumed_ids)} 个文档"
+                    )
+                    documents = [
+                        document for document in documents if document.id not in resumed_ids
+                    ]
+
+                # 增量训练：清理已删除文档残留的分块
+                deleted_ids = (
+                    await self.db.execute(
+                        select(Document.id).filter(
+                            Document.knowledge_base_id == kb_id,
+                            Document.is_deleted == True,
+                        )
+                    )
+                ).scalars().all()
+                if deleted_ids:
+                    await index_processor.clean(
+                        knowledge_base, list(deleted_ids), db=self.db, llm_config=llm_config
+                    )
+
             # 处理文档
             result = await self._process_documents(
-                knowledge_base, documents, llm_config
+                knowledge_base,
+                documents,
+                llm_config,
+                incremental=not full_rebuild,
+                resumed_count=len(resumed_ids),
+                progress=progress,
             )
 
             # 更新知识库状态为已训练
             if result.success:
                 await self.update_training_status(kb_id, TrainingStatus.TRAINED)
+                await progress.update(stage=STAGE_COMPLETED, message="训练完成")
             else:
                 await self.update_training_status(
                     kb_id, TrainingStatus.FAILED, result.error_message
                 )
+                await progress.update(stage=STAGE_FAILED, message=result.error_message)
 
             return result
 
@@ -131,20 +250,31 @@ class RAGTrainingManager:
             Logger.error(f"训练知识库 {kb_id} 失败: {str(e)}")
             # 更新知识库状态为训练失败
             await self.update_training_status(kb_id, TrainingStatus.FAILED, str(e))
-            return TrainingResult(success=False, error_message=f"训练失败: {str(e)}")
+            await progress.update(stage=STAGE_FAILED, message=f"训练失败: {str(e)}")
+            return TrainingResult(
+                success=False, error_message=f"训练失败: {str(e)}", retryable=is_transient_error(e)
+            )
 
     async def _process_documents(
         self,
         knowledge_base: KnowledgeBase,
         documents: List[Document],
         llm_config: LLMConfig,
+        incremental: bool = True,
+        resumed_count: int = 0,
+        progress: Optional[TrainingProgress] = None,
     ) -> TrainingResult:
         """处理文档
 
+        流水线运行结束后清除检查点；运行中断（进程退出或异常）时保留，供下次训练恢复。
+
         Args:
             knowledge_base: 知识库对象
-            documents: 文档列表
+            documents: 文档列表（不含从检查点恢复的文档）
             llm_config: LLM配置
+            incremental: 是否增量处理
+            resumed_count: 从检查点恢复的文档数量
+            progress: 训练进度发布器
 
         Returns:
             TrainingResult: 处理结果
@@ -156,6 +286,7 @@ class RAGTrainingManager:
         document_count = 0
         chunk_count = 0
         embedding_count = 0
+        skipped_count = 0
         failed_documents = []
 
         # 记录文档处理开始
@@ -167,7 +298,7 @@ class RAGTrainingManager:
                     llm_config.model_dump() if hasattr(llm_config, "model_dump") else {}
                 ),
                 "embedding_model": (
-                    llm_config.embeddings.model_name
+                    llm_config.embeddings.model
                     if hasattr(llm_config, "embeddings")
                     else "unknown"
                 ),
@@ -175,377 +306,29 @@ class RAGTrainingManager:
         )
 
         try:
-            # 从配置中获取分块参数
-            from app.core.config import settings
-
-            chunk_size = getattr(settings, "RAG_CHUNK_SIZE", 1000)
-            chunk_overlap = getattr(settings, "RAG_CHUNK_OVERLAP", 200)
-
-            # 创建文本分块器
-            text_splitter = TextSplitter(
-                chunk_size=chunk_size, chunk_overlap=chunk_overlap
+            # 提取、分块、向量化和写入分阶段并发执行
+            if progress is not None:
+                progress.state["documents_resumed"] = resumed_count
+            pipeline = IngestionPipeline(
+                self.db, knowledge_base, llm_config, incremental=incremental, progress=progress
             )
+            await pipeline.run(documents)
+            await self.clear_checkpoints(knowledge_base.id)
 
-            # 创建向量引擎
-            embedding_engine = EmbeddingEngine(llm_config)
-
-            # 创建向量存储
-            vector_store_type = knowledge_base.vector_store_type or getattr(
-                settings, "RAG_VECTOR_STORE_TYPE", "chroma"
-            )
-            vector_store = VectorStoreFactory.create_vector_store(
-                vector_store_type=vector_store_type,
-                collection_name=f"kb_{knowledge_base.id}",
-                embedding_engine=embedding_engine,
-            )
-
-            # 创建索引处理器
-            index_processor = IndexProcessorFactory.create_index_processor(
-                knowledge_base
-            )
-
-            # 处理每个文档
-            for i, document in enumerate(documents):
-                doc_start_time = time.time()
-
-                try:
-                    # 记录单个文档处理开始
-                    Logger.rag_document_start(
-                        kb_id=knowledge_base.id,
-                        document_id=document.id,
-                        document_title=document.title,
-                        progress={"current": i + 1, "total": len(documents)},
-                    )
-
-                    Logger.info(f"开始处理文档 {document.id}: {document.title}")
-
-                    # 提取文档内容
-                    extraction_start_time = time.time()
-
-                    # 记录文档提取开始
-                    Logger.rag_extraction_start(
-                        document_id=document.id,
-                        file_path=document.file_path,
-                        file_type=document.file_type or "unknown",
-                    )
-
-                    try:
-                        extracted_content = await self.extract_processor.extract(
-                            document.file_path
-                        )
-
-                        if not extracted_content:
-                            raise DocumentProcessingException(
-                                message=f"文档 {document.id} 提取内容为空",
-                                document_id=document.id,
-                                file_path=document.file_path,
-                            )
-
-                        # 记录文档提取成功
-                        Logger.rag_extraction_success(
-                            document_id=document.id,
-                            content_length=len(extracted_content),
-                            extraction_time=time.time() - extraction_start_time,
-                        )
-
-                    except Exception as e:
-                        raise DocumentProcessingException(
-                            message=f"提取文档内容失败: {str(e)}",
-                            document_id=document.id,
-                            file_path=document.file_path,
-                        )
-
-                    # 分块文本
-                    chunking_start_time = time.time()
-
-                    # 记录文本分块开始
-                    Logger.rag_chunking_start(
-                        document_id=document.id,
-                        content_length=len(extracted_content),
-                        chunk_size=chunk_size,
-                    )
-
-                    try:
-                        chunks = text_splitter.split_text(extracted_content)
-
-                        if not chunks:
-                            raise DocumentProcessingException(
-                                message=f"文档 {document.id} 分块为空",
-                                document_id=document.id,
-                                file_path=document.file_path,
-                            )
-
-                        # 记录文本分块成功
-                        Logger.rag_chunking_success(
-                            document_id=document.id,
-                            chunk_count=len(chunks),
-                            chunking_time=time.time() - chunking_start_time,
-                        )
-
-                    except Exception as e:
-                        if not isinstance(e, DocumentProcessingException):
-                            raise DocumentProcessingException(
-                                message=f"分块文本失败: {str(e)}",
-                                document_id=document.id,
-                                file_path=document.file_path,
-                            )
-                        raise
-
-                    # 删除现有分块
-                    try:
-                        await self.db.execute(
-                            f"DELETE FROM document_chunks WHERE document_id = {document.id}"
-                        )
-                    except Exception as e:
-                        raise IndexingException(
-                            message=f"删除现有分块失败: {str(e)}",
-                            knowledge_base_id=knowledge_base.id,
-                        )
-
-                    # 创建新分块
-                    db_chunks = []
-                    try:
-                        for i, chunk_text in enumerate(chunks):
-                            chunk = DocumentChunk(
-                                document_id=document.id,
-                                content=chunk_text,
-                                chunk_index=i,
-                                chunk_metadata={},
-                            )
-                            self.db.add(chunk)
-                            chunk_count += 1
-
-                        # 提交分块
-                        await self.db.commit()
-
-                        # 获取新创建的分块
-                        db_chunks = (
-                            (
-                                await self.db.execute(
-                                    select(DocumentChunk).filter(
-                                        DocumentChunk.document_id == document.id
-                                    )
-                                )
-                            )
-                            .scalars()
-                            .all()
-                        )
-                    except Exception as e:
-                        await self.db.rollback()
-                        raise IndexingException(
-                            message=f"创建分块失败: {str(e)}",
-                            knowledge_base_id=knowledge_base.id,
-                        )
-
-                    # 向量化分块（批处理）
-                    embedding_start_time = time.time()
-
-                    try:
-                        chunk_texts = [chunk.content for chunk in db_chunks]
-
-                        # 从配置中获取批处理大小
-                        from app.core.config import settings
-
-                        batch_size = getattr(settings, "RAG_BATCH_SIZE", 100)
-
-                        # 记录向量化开始
-                        Logger.rag_embedding_start(
-                            document_id=document.id,
-                            chunk_count=len(chunk_texts),
-                            model=(
-                                llm_config.embeddings.model_name
-                                if hasattr(llm_config, "embeddings")
-                                else "unknown"
-                            ),
-                            batch_size=batch_size,
-                        )
-
-                        # 批量向量化
-                        all_embeddings = []
-                        total_batches = (
-                            len(chunk_texts) + batch_size - 1
-                        ) // batch_size
-
-                        for i in range(0, len(chunk_texts), batch_size):
-                            batch_num = i // batch_size + 1
-                            batch_texts = chunk_texts[i : i + batch_size]
-
-                            # 记录批处理开始
-                            Logger.rag_embedding_batch(
-                                batch_num=batch_num,
-                                total_batches=total_batches,
-                                batch_size=len(batch_texts),
-                                model=(
-                                    llm_config.embeddings.model_name
-                                    if hasattr(llm_config, "embeddings")
-                                    else "unknown"
-                                ),
-                            )
-
-                            batch_embeddings = await embedding_engine.embed_documents(
-                                batch_texts
-                            )
-                            all_embeddings.extend(batch_embeddings)
-                            Logger.info(f"向量化批次 {batch_num}/{total_batches} 完成")
-
-                        embeddings = all_embeddings
-
-                        if len(embeddings) != len(chunk_texts):
-                            raise EmbeddingException(
-                                message=f"向量化结果数量 ({len(embeddings)}) 与分块数量 ({len(chunk_texts)}) 不一致",
-                                model_name=(
-                                    llm_config.embeddings.model_name
-                                    if hasattr(llm_config, "embeddings")
-                                    else "unknown"
-                                ),
-                            )
-
-                        # 记录向量化成功
-                        Logger.rag_embedding_success(
-                            document_id=document.id,
-                            embedding_count=len(embeddings),
-                            embedding_time=time.time() - embedding_start_time,
-                            model=(
-                                llm_config.embeddings.model_name
-                                if hasattr(llm_config, "embeddings")
-                                else "unknown"
-                            ),
-                        )
-
-                    except Exception as e:
-                        if not isinstance(e, EmbeddingException):
-                            raise EmbeddingException(
-                                message=f"向量化分块失败: {str(e)}",
-                                model_name=(
-                                    llm_config.embeddings.model_name
-                                    if hasattr(llm_config, "embeddings")
-                                    else "unknown"
-                                ),
-                            )
-                        raise
-
-                    # 批量存储向量
-                    try:
-                        embedding_objects = []
-                        for chunk, embedding in zip(db_chunks, embeddings):
-                            # 创建向量记录
-                            doc_embedding = DocumentEmbedding(
-                                chunk_id=chunk.id,
-                                embedding=embedding,
-                                model=llm_config.embeddings.model_name,
-                            )
-                            embedding_objects.append(doc_embedding)
-                            embedding_count += 1
-
-                        # 批量添加
-                        self.db.add_all(embedding_objects)
-
-                        # 提交向量
-                        await self.db.commit()
-                    except Exception as e:
-                        await self.db.rollback()
-                        raise IndexingException(
-                            message=f"存储向量失败: {str(e)}",
-                            knowledge_base_id=knowledge_base.id,
-                        )
-
-                    # 构建索引
-                    try:
-                        await index_processor.build_index(
-                            knowledge_base, document, db_chunks, embeddings
-                        )
-                    except Exception as e:
-                        raise IndexingException(
-                            message=f"构建索引失败: {str(e)}",
-                            knowledge_base_id=knowledge_base.id,
-                            index_type=getattr(index_processor, "index_type", None),
-                        )
-
-                    document_count += 1
-
-                    # 计算单个文档处理时间
-                    doc_process_time = time.time() - doc_start_time
-
-                    # 记录文档处理成功
-                    Logger.info(
-                        f"文档 {document.id} 处理完成，生成了 {len(db_chunks)} 个分块和 {len(embeddings)} 个向量"
-                    )
-
-                    # 记录性能指标
-                    Logger.rag_performance_metrics(
-                        operation="document_processing",
-                        duration=doc_process_time,
-                        kb_id=knowledge_base.id,
-                        document_id=document.id,
-                        chunk_count=len(db_chunks),
-                        embedding_count=len(embeddings),
-                    )
-
-                except (
-                    DocumentProcessingException,
-                    EmbeddingException,
-                    IndexingException,
-                ) as e:
-                    # 计算处理时间
-                    doc_process_time = time.time() - doc_start_time
-
-                    # 记录文档处理错误
-                    Logger.rag_document_error(
-                        kb_id=knowledge_base.id,
-                        document_id=document.id,
-                        stage=e.__class__.__name__,
-                        error=e.message,
-                        progress={"current": i + 1, "total": len(documents)},
-                    )
-
-                    Logger.error(f"处理文档 {document.id} 失败: {e.message}")
-                    failed_documents.append(
-                        {
-                            "document_id": document.id,
-                            "title": document.title,
-                            "error": e.message,
-                            "details": getattr(e, "details", {}),
-                            "stage": e.__class__.__name__,
-                            "process_time": doc_process_time,
-                        }
-                    )
-                    # 回滚事务
-                    await self.db.rollback()
-                    # 继续处理其他文档
-                    continue
-                except Exception as e:
-                    # 计算处理时间
-                    doc_process_time = time.time() - doc_start_time
-
-                    # 记录文档处理错误
-                    Logger.rag_document_error(
-                        kb_id=knowledge_base.id,
-                        document_id=document.id,
-                        stage="unknown_error",
-                        error=str(e),
-                        progress={"current": i + 1, "total": len(documents)},
-                    )
-
-                    Logger.error(f"处理文档 {document.id} 时发生未知错误: {str(e)}")
-                    failed_documents.append(
-                        {
-                            "document_id": document.id,
-                            "title": document.title,
-                            "error": str(e),
-                            "stage": "unknown_error",
-                            "process_time": doc_process_time,
-                        }
-                    )
-                    # 回滚事务
-                    await self.db.rollback()
-                    # 继续处理其他文档
-                    continue
+            document_count = pipeline.document_count
+            chunk_count = pipeline.chunk_count
+            embedding_count = pipeline.embedding_count
+            skipped_count = pipeline.skipped_count
+            failed_documents = pipeline.failed_documents
+            chunk_writer = pipeline.writer
+            stage_metrics = pipeline.get_stage_metrics()
 
             # 计算总处理时间
             total_process_time = time.time() - start_time
 
             # 返回处理结果
-            if document_count > 0:
+            # 增量训练中全部文档未变化，或均已在中断前完成，也视为成功
+            if document_count + skipped_count + resumed_count > 0:
                 # 记录训练完成（成功）
                 Logger.rag_training_complete(
                     kb_id=knowledge_base.id,
@@ -555,10 +338,16 @@ class RAGTrainingManager:
                         "document_count": document_count,
                         "chunk_count": chunk_count,
                         "embedding_count": embedding_count,
+                        "skipped_count": skipped_count,
+                        "reused_chunk_count": pipeline.reused_chunk_count,
+                        "resumed_count": resumed_count,
                         "failed_count": len(failed_documents),
                         "success_rate": (
-                            document_count / len(documents) if documents else 0
+                            (document_count + skipped_count + resumed_count)
+                            / (len(documents) + resumed_count)
                         ),
+                        "rows_per_second": chunk_writer.rows_per_second,
+                        "stage_metrics": stage_metrics,
                     },
                 )
 
@@ -570,6 +359,11 @@ class RAGTrainingManager:
                     document_count=document_count,
                     chunk_count=chunk_count,
                     embedding_count=embedding_count,
+                    skipped_count=skipped_count,
+                    reused_chunk_count=pipeline.reused_chunk_count,
+                    resumed_count=resumed_count,
+                    write_duration=chunk_writer.duration,
+                    rows_per_second=chunk_writer.rows_per_second,
                 )
 
                 return TrainingResult(
@@ -582,6 +376,12 @@ class RAGTrainingManager:
                         if failed_documents
                         else None
                     ),
+                    rows_written=chunk_writer.row_count,
+                    write_duration=chunk_writer.duration,
+                    stage_metrics=stage_metrics,
+                    skipped_count=skipped_count,
+                    reused_chunk_count=pipeline.reused_chunk_count,
+                    resumed_count=resumed_count,
                 )
             else:
                 # 记录训练完成（失败）
@@ -608,6 +408,10 @@ class RAGTrainingManager:
                     chunk_count=0,
                     embedding_count=0,
                     error_message=f"所有文档处理失败: {failed_documents[0]['error'] if failed_documents else '未知错误'}",
+                    stage_metrics=stage_metrics,
+                    retryable=bool(failed_documents) and all(
+                        failed["stage"] in _TRANSIENT_STAGES for failed in failed_documents
+                    ),
                 )
 
         except Exception as e:
@@ -635,6 +439,7 @@ class RAGTrainingManager:
                 chunk_count=chunk_count,
                 embedding_count=embedding_count,
                 error_message=f"处理文档失败: {str(e)}",
+                retryable=is_transient_error(e),
             )
 
     async def update_training_status(
@@ -703,7 +508,9 @@ class RAGTrainingManager:
             # 更新状态为排队中
             knowledge_base.training_status = TrainingStatus.QUEUED
             knowledge_base.training_error = None
+            knowledge_base.queued_at = datetime.now()
             await self.db.commit()
+            await TrainingProgress(kb_id).update(stage=STAGE_QUEUED, message="已加入训练队列")
 
             Logger.info(f"知识库 {kb_id} 已添加到训练队列")
             return True
@@ -720,33 +527,9 @@ class RAGTrainingManager:
             Optional[int]: 下一个要训练的知识库ID，如果没有则返回None
         """
         try:
-            # 检查是否有正在训练的知识库
-            training_kb = (
-                await self.db.execute(
-                    select(KnowledgeBase).filter(
-                        KnowledgeBase.training_status == TrainingStatus.TRAINING
-                    )
-                )
-            ).scalar_one_or_none()
-
-            if training_kb:
-                Logger.info(f"知识库 {training_kb.id} 正在训练中，不处理队列")
-                return None
-
-            # 查找状态为QUEUED的知识库
-            queued_kb = (
-                await self.db.execute(
-                    select(KnowledgeBase)
-                    .filter(KnowledgeBase.training_status == TrainingStatus.QUEUED)
-                    .order_by(desc(KnowledgeBase.updated_at))
-                    .limit(1)
-                )
-            ).scalar_one_or_none()
-
-            if queued_kb:
-                return queued_kb.id
-
-            return None
+            # 并发与公平性由调度器控制，有训练中的知识库时仍可能有空闲槽位
+            candidates = await TrainingScheduler(self.db).select_candidates(1)
+            return candidates[0] if candidates else None
 
         except Exception as e:
             Logger.error(f"检查训练队列失败: {str(e)}")
@@ -760,13 +543,17 @@ class RAGTrainingManager:
         """
         try:
             # 获取正在训练的知识库
-            training_kb = (
-                await self.db.execute(
-                    select(KnowledgeBase).filter(
-                        KnowledgeBase.training_status == TrainingStatus.TRAINING
+            training_kbs = (
+                (
+                    await self.db.execute(
+                        select(KnowledgeBase)
+                        .filter(KnowledgeBase.training_status == TrainingStatus.TRAINING)
+                        .order_by(KnowledgeBase.training_started_at)
                     )
                 )
-            ).scalar_one_or_none()
+                .scalars()
+                .all()
+            )
 
             # 获取排队中的知识库
             queued_kbs = (
@@ -774,7 +561,10 @@ class RAGTrainingManager:
                     await self.db.execute(
                         select(KnowledgeBase)
                         .filter(KnowledgeBase.training_status == TrainingStatus.QUEUED)
-                        .order_by(desc(KnowledgeBase.updated_at))
+                        .order_by(
+                            desc(KnowledgeBase.training_priority),
+                            func.coalesce(KnowledgeBase.queued_at, KnowledgeBase.updated_at),
+                        )
                     )
                 )
                 .scalars()
@@ -784,24 +574,125 @@ class RAGTrainingManager:
             # 构建队列状态信息
             queue_status = {
                 "training": None,
+                "running": [],
                 "queue": [],
                 "queue_length": len(queued_kbs),
+                "scheduler": await TrainingScheduler(self.db).get_status(),
             }
 
-            if training_kb:
-                queue_status["training"] = {
-                    "id": training_kb.id,
-                    "name": training_kb.name,
-                    "started_at": training_kb.training_started_at,
-                }
+            for kb in training_kbs:
+                queue_status["running"].append(
+                    {
+                        "id": kb.id,
+                        "name": kb.name,
+                        "owner_id": kb.owner_id,
+                        "started_at": kb.training_started_at,
+                    }
+                )
+            # 兼容单槽位时的字段，取最早开始训练的知识库
+            if queue_status["running"]:
+                queue_status["training"] = queue_status["running"][0]
 
             for kb in queued_kbs:
                 queue_status["queue"].append(
-                    {"id": kb.id, "name": kb.name, "queued_at": kb.updated_at}
+                    {
+                        "id": kb.id,
+                        "name": kb.name,
+                        "owner_id": kb.owner_id,
+                        "priority": kb.training_priority,
+                        "queued_at": kb.queued_at or kb.updated_at,
+                    }
                 )
 
+            queue_status["resumable"] = await self.get_resumable_jobs()
+
             return queue_status
 
         except Exception as e:
             Logger.error(f"获取训练队列状态失败: {str(e)}")
-            return {"training": None, "queue": [], "queue_length": 0, "error": str(e)}
+            return {
+                "training": None,
+                "running": [],
+                "queue": [],
+                "queue_length": 0,
+                "resumable": [],
+                "error": str(e),
+            }
+
+    async def get_resumable_jobs(self) -> List[Dict[str, Any]]:
+        """获取有未清除检查点（上次训练未正常结束）的知识库
+
+        Returns:
+            List[Dict[str, Any]]: 每个知识库的已完成、部分完成和剩余文档数
+        """
+        rows = (
+            await self.db.execute(
+                select(
+                    TrainingCheckpoint.knowledge_base_id,
+                    func.count(TrainingCheckpoint.id)
+                    .filter(TrainingCheckpoint.status == TrainingCheckpoint.STATUS_COMPLETED)
+                    .label("completed"),
+                    func.count(TrainingCheckpoint.id)
+                    .filter(TrainingCheckpoint.status == TrainingCheckpoint.STATUS_PARTIAL)
+                    .label("partial"),
+                    func.max(TrainingCheckpoint.updated_at).label("last_checkpoint_at"),
+                ).group_by(TrainingCheckpoint.knowledge_base_id)
+            )
+        ).all()
+        if not rows:
+            return []
+
+        kb_ids = [row.knowledge_base_id for row in rows]
+        knowledge_bases = {
+            kb.id: kb
+            for kb in (
+                await self.db.execute(
+                    select(KnowledgeBase).filter(KnowledgeBase.id.in_(kb_ids))
+                )
+            ).scalars().all()
+        }
+        document_counts = dict(
+            (
+                await self.db.execute(
+                    select(Document.knowledge_base_id, func.count(Document.id))
+                    .filter(
+                        Document.knowledge_base_id.in_(kb_ids),
+                        Document.is_deleted == False,
+                    )
+                    .group_by(Document.knowledge_base_id)
+                )
+            ).all()
+        )
+
+        jobs = []
+        for row in rows:
+            kb = knowledge_bases.get(row.knowledge_base_id)
+            if not kb:
+                continue
+            total = document_counts.get(row.knowledge_base_id, 0)
+            jobs.append(
+                {
+                    "id": kb.id,
+                    "name": kb.name,
+                    "training_status": kb.training_status,
+                    "total_documents": total,
+                    "completed_documents": row.completed,
+                    "partial_documents": row.partial,
+                    "remaining_documents": max(total - row.completed, 0),
+                    "last_checkpoint_at": row.last_checkpoint_at,
+                }
+            )
+        return jobs
+
+    async def clear_checkpoints(self, kb_id: int) -> None:
+        """清除知识库的训练检查点
+
+        Args:
+            kb_id: 知识库ID
+        """
+        await self.db.execute(
+            delete(TrainingCheckpoint)
+            .where(TrainingCheckpoint.knowledge_base_id == kb_id)
+            .execution_options(synchronize_session=False)
+        )
+        await self.db.commit()
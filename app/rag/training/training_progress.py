@@ -0,0 +1,183 @@
+"""训练进度发布与订阅"""
+import asyncio
+import json
+import time
+from typing import Any, AsyncIterator, Dict, Optional
+
+from app.core.config import settings
+from app.core.logger import Logger
+from app.core.redis_manager import redis_manager
+
+# 训练阶段
+STAGE_QUEUED = "queued"
+STAGE_PREPARING = "preparing"
+STAGE_CLEANING = "cleaning"
+STAGE_INGESTING = "ingesting"
+STAGE_COMPLETED = "completed"
+STAGE_FAILED = "failed"
+
+TERMINAL_STAGES = (STAGE_COMPLETED, STAGE_FAILED)
+
+
+class TrainingProgress:
+    """训练进度发布器
+
+    通过 Redis 发布订阅推送进度事件，同时保存最新一条事件，新订阅者连接后可立即拿到当前进度。
+    摄取过程中的事件按 TRAINING_PROGRESS_INTERVAL 节流，阶段切换和结束事件总是发布。
+    发布失败只记录警告，不影响训练。
+    """
+
+    def __init__(self, kb_id: int):
+        """初始化
+
+        Args:
+            kb_id: 知识库ID
+        """
+        self.kb_id = kb_id
+        self.interval = settings.TRAINING_PROGRESS_INTERVAL
+        self.started_at = time.time()
+        self.stage = STAGE_PREPARING
+        self.last_published_at = 0.0
+        self.state: Dict[str, Any] = {
+            "documents_total": 0,
+            "documents_done": 0,
+            "documents_failed": 0,
+            "documents_skipped": 0,
+            "documents_resumed": 0,
+            "chunks_total": 0,
+            "chunks_embedded": 0,
+            "tokens_embedded": 0,
+        }
+
+    @staticmethod
+    def channel(kb_id: int) -> str:
+        """进度事件频道"""
+        return f"training:progress:kb_{kb_id}"
+
+    @staticmethod
+    def latest_key(kb_id: int) -> str:
+        """最新进度事件键"""
+        return f"training:progress:kb_{kb_id}:latest"
+
+    def build_event(self, message: Optional[str] = None) -> Dict[str, Any]:
+        """根据当前状态构造进度事件，计算吞吐和预计剩余时间
+
+        Args:
+            message: 附加说明
+
+        Returns:
+            Dict[str, Any]: 进度事件
+        """
+        elapsed = time.time() - self.started_at
+        state = self.state
+        # 跳过的文档和从检查点恢复的文档不经过处理，不计入处理速率
+        processed = state["documents_done"] + state["documents_failed"]
+        remaining = max(
+            state["documents_total"] - processed - state["documents_skipped"] - state["documents_resumed"], 0
+        )
+        documents_per_second = processed / elapsed if elapsed > 0 else 0.0
+        eta = None
+        if self.stage in TERMINAL_STAGES:
+            eta = 0.0
+        elif documents_per_second > 0:
+            eta = remaining / documents_per_second
+        return {
+            "kb_id": self.kb_id,
+            "stage": self.stage,
+            **state,
+            "tokens_per_second": state["tokens_embedded"] / elapsed if elapsed > 0 else 0.0,
+            "documents_per_second": documents_per_second,
+            "elapsed_seconds": elapsed,
+            "eta_seconds": eta,
+            "message": message,
+            "timestamp": time.time(),
+        }
+
+    async def update(
+        self, stage: Optional[str] = None, message: Optional[str] = None, **state: Any
+    ) -> None:
+        """更新进度并发布
+
+        Args:
+            stage: 新阶段，为None时保持当前阶段
+            message: 附加说明
+            **state: 要更新的计数
+        """
+        self.state.update(state)
+        force = stage is not None and stage != self.stage
+        if stage is not None:
+            self.stage = stage
+        now = time.time()
+        if not force and message is None and now - self.last_published_at < self.interval:
+            return
+        self.last_published_at = now
+        await self.publish(self.build_event(message))
+
+    async def publish(self, event: Dict[str, Any]) -> None:
+        """发布进度事件"""
+        try:
+            payload = json.dumps(event, ensure_ascii=False, default=str)
+            redis = await redis_manager.get_redis()
+            await redis.set(self.latest_key(self.kb_id), payload, ex=settings.TRAINING_PROGRESS_TTL)
+            await redis.publish(self.channel(self.kb_id), payload)
+        except Exception as e:
+            Logger.warning(f"发布知识库 {self.kb_id} 训练进度失败: {str(e)}")
+
+    @classmethod
+    async def get_latest(cls, kb_id: int) -> Optional[Dict[str, Any]]:
+        """获取最新进度事件
+
+        Args:
+            kb_id: 知识库ID
+
+        Returns:
+            Optional[Dict[str, Any]]: 没有进度记录时返回None
+        """
+        payload = await redis_manager.get(cls.latest_key(kb_id))
+        return json.loads(payload) if payload else None
+
+    @classmethod
+    async def subscribe(
+        cls, kb_id: int, heartbeat: Optional[float] = None
+    ) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """订阅进度事件
+
+        先产出最新进度（如有），之后产出实时事件，训练结束事件产出后停止；
+        指定 heartbeat 时，超过该时间没有事件会产出 None，供调用方发送保活消息。
+
+        Args:
+            kb_id: 知识库ID
+            heartbeat: 保活间隔（秒）
+
+        Yields:
+            Optional[Dict[str, Any]]: 进度事件，或表示保活的 None
+        """
+        redis = await redis_manager.get_redis()
+        pubsub = redis.pubsub()
+        # 先订阅再读取最新进度，避免两者之间发布的事件丢失
+        await pubsub.subscribe(cls.channel(kb_id))
+        try:
+            latest = await cls.get_latest(kb_id)
+            if latest is not None:
+                yield latest
+                if latest.get("stage") in TERMINAL_STAGES:
+                    return
+
+            last_event_at = time.time()
+            while True:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message is None:
+                    if heartbeat is not None and time.time() - last_event_at >= heartbeat:
+                        last_event_at = time.time()
+                        yield None
+                    # get_message 在没有消息时可能立即返回
+                    await asyncio.sleep(0.1)
+                    continue
+                last_event_at = time.time()
+                event = json.loads(message["data"])
+                yield event
+                if event.get("stage") in TERMINAL_STAGES:
+                    return
+        finally:
+            await pubsub.unsubscribe(cls.channel(kb_id))
+            await pubsub.close()
@@ -0,0 +1,327 @@
+"""训练调度器"""
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Dict, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.logger import Logger
+from app.core.redis_manager import redis_manager
+from app.models.enums import TrainingStatus
+from app.models.knowledge_base import KnowledgeBase
+from app.rag.exceptions import TrainingException
+from app.rag.training.training_progress import STAGE_QUEUED, TrainingProgress
+
+# 租约丢失时 TrainingException 的阶段名
+LEASE_STAGE = "lease"
+
+# 值与令牌一致时续期，返回是否成功
+_RENEW_SCRIPT = """
+local renewed = 0
+for i, key in ipairs(KEYS) do
+    if redis.call('GET', key) == ARGV[1] then
+        redis.call('EXPIRE', key, ARGV[2])
+        renewed = renewed + 1
+    end
+end
+return renewed
+"""
+
+# 值与令牌一致时删除
+_RELEASE_SCRIPT = """
+for i, key in ipairs(KEYS) do
+    if redis.call('GET', key) == ARGV[1] then
+        redis.call('DEL', key)
+    end
+end
+return 1
+"""
+
+
+class TrainingLease:
+    """训练租约
+
+    同时持有一个并发槽位和知识库互斥锁，两者的值都是本次训练的令牌；
+    训练期间按心跳间隔续期，同时延长训练队列中该任务的可见性超时，进程退出后租约到期自动释放，
+    队列任务随之重新可出队。
+    """
+
+    def __init__(self, kb_id: int, slot: int, token: str):
+        """初始化
+
+        Args:
+            kb_id: 知识库ID
+            slot: 槽位序号
+            token: 租约令牌
+        """
+        self.kb_id = kb_id
+        self.slot = slot
+        self.token = token
+
+    @property
+    def keys(self) -> List[str]:
+        """租约占用的 Redis 键"""
+        return [TrainingScheduler.slot_key(self.slot), TrainingScheduler.lease_key(self.kb_id)]
+
+    async def heartbeat(self) -> bool:
+        """续期租约
+
+        Returns:
+            bool: 槽位和知识库锁是否都仍由本租约持有
+        """
+        redis = await redis_manager.get_redis()
+        renewed = await redis.eval(
+            _RENEW_SCRIPT, len(self.keys), *self.keys, self.token, settings.TRAINING_LEASE_TTL
+        )
+        await redis_manager.extend_training_task(self.kb_id, settings.TRAINING_LEASE_TTL)
+        return int(renewed) == len(self.keys)
+
+    async def release(self) -> None:
+        """释放租约（只删除仍由本租约持有的键）"""
+        try:
+            redis = await redis_manager.get_redis()
+            await redis.eval(_RELEASE_SCRIPT, len(self.keys), *self.keys, self.token)
+        except Exception as e:
+            Logger.warning(f"释放知识库 {self.kb_id} 的训练租约失败: {str(e)}")
+
+    async def run(self, coro: Awaitable[Any]) -> Any:
+        """在租约保护下运行训练，定期续期；租约丢失时取消训练
+
+        Args:
+            coro: 训练协程
+
+        Returns:
+            Any: 训练协程的返回值
+        """
+        task = asyncio.ensure_future(coro)
+        try:
+            while True:
+                done, _ = await asyncio.wait({task}, timeout=settings.TRAINING_HEARTBEAT_INTERVAL)
+                if done:
+                    return task.result()
+                try:
+                    alive = await self.heartbeat()
+                except Exception as e:
+                    # Redis 暂时不可用时继续训练，租约到期前仍有重试机会
+                    Logger.warning(f"知识库 {self.kb_id} 训练租约续期失败: {str(e)}")
+                    continue
+                if not alive:
+                    raise TrainingException(
+                        f"知识库 {self.kb_id} 的训练租约已丢失，停止训练",
+                        knowledge_base_id=self.kb_id,
+                        stage=LEASE_STAGE,
+                    )
+        finally:
+            if not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+
+
+class TrainingScheduler:
+    """训练调度器
+
+    最多同时训练 TRAINING_MAX_CONCURRENT_JOBS 个知识库，每个租户（知识库所有者）最多占用
+    TRAINING_MAX_JOBS_PER_TENANT 个槽位。排队的知识库按优先级、租户当前占用的槽位数、
+    入队时间依次排序，保证大租户不会长期占满所有槽位。
+    训练中的知识库租约到期（工作进程退出或卡死）后被重新排队，从检查点恢复。
+    """
+
+    def __init__(self, db: AsyncSession):
+        """初始化调度器
+
+        Args:
+            db: 数据库会话
+        """
+        self.db = db
+        self.max_jobs = settings.TRAINING_MAX_CONCURRENT_JOBS
+        self.max_jobs_per_tenant = settings.TRAINING_MAX_JOBS_PER_TENANT
+
+    @staticmethod
+    def lease_key(kb_id: int) -> str:
+        """知识库互斥锁键"""
+        return f"training:lease:kb_{kb_id}"
+
+    @staticmethod
+    def slot_key(slot: int) -> str:
+        """并发槽位键"""
+        return f"training:slot:{slot}"
+
+    async def enqueue(self, kb_id: int, full_rebuild: bool = False, priority: int = 0) -> None:
+        """将知识库加入训练队列
+
+        Args:
+            kb_id: 知识库ID
+            full_rebuild: 是否全量重建索引
+            priority: 优先级，数值越大越先训练
+        """
+        knowledge_base = (
+            await self.db.execute(select(KnowledgeBase).filter(KnowledgeBase.id == kb_id))
+        ).scalar_one_or_none()
+        if not knowledge_base:
+            raise TrainingException(f"知识库 {kb_id} 不存在", knowledge_base_id=kb_id)
+
+        knowledge_base.training_status = TrainingStatus.QUEUED
+        knowledge_base.training_error = None
+        knowledge_base.queued_at = datetime.now()
+        knowledge_base.training_full_rebuild = full_rebuild
+        knowledge_base.training_priority = priority
+        await self.db.commit()
+        # 覆盖上一次训练留下的最新进度（可能是已完成事件），避免新订阅者立即收到结束事件
+        await TrainingProgress(kb_id).update(stage=STAGE_QUEUED, message="已加入训练队列")
+        Logger.info(f"知识库 {kb_id} 已加入训练队列，优先级 {priority}，全量重建: {full_rebuild}")
+
+    async def dispatch(self) -> List[int]:
+        """恢复卡死的训练后，为空闲槽位选出要训练的知识库并按公平顺序放入 Redis 训练队列
+
+        已在队列中等待出队的任务同样占用空闲槽位名额，避免一次放入超过槽位数的任务。
+
+        Returns:
+            List[int]: 本次放入队列的知识库ID列表
+        """
+        await self.recover_stale_jobs()
+
+        redis = await redis_manager.get_redis()
+        busy = await redis.exists(*[self.slot_key(slot) for slot in range(self.max_jobs)])
+        stats = await redis_manager.get_training_queue_stats()
+        free = self.max_jobs - busy - stats["ready"]
+        if free <= 0:
+            return []
+
+        dispatched = []
+        now = datetime.now().timestamp()
+        for order, kb_id in enumerate(await self.select_candidates(free)):
+            if await redis_manager.add_training_task(kb_id, score=now + order * 0.001):
+                dispatched.append(kb_id)
+        if dispatched:
+            Logger.info(f"派发训练任务: {dispatched}，空闲槽位 {free}")
+        return dispatched
+
+    async def select_candidates(self, limit: int) -> List[int]:
+        """按优先级、租户公平份额和入队时间选出下一批要训练的知识库
+
+        Args:
+            limit: 最多选出的数量
+
+        Returns:
+            List[int]: 知识库ID列表
+        """
+        running = dict(
+            (
+                await self.db.execute(
+                    select(KnowledgeBase.owner_id, func.count(KnowledgeBase.id))
+                    .filter(KnowledgeBase.training_status == TrainingStatus.TRAINING)
+                    .group_by(KnowledgeBase.owner_id)
+                )
+            ).all()
+        )
+        queued = (
+            await self.db.execute(
+                select(
+                    KnowledgeBase.id,
+                    KnowledgeBase.owner_id,
+                    KnowledgeBase.training_priority,
+                    func.coalesce(KnowledgeBase.queued_at, KnowledgeBase.updated_at).label("queued_at"),
+                )
+                .filter(KnowledgeBase.training_status == TrainingStatus.QUEUED)
+                .order_by(KnowledgeBase.training_priority.desc(), "queued_at")
+                .limit(settings.TRAINING_SCHEDULER_SCAN_LIMIT)
+            )
+        ).all()
+
+        # 已在 Redis 队列中（等待出队、处理中或等待重试）的知识库不再参与选择，但计入租户占用
+        in_queue = set(await redis_manager.get_queued_training_tasks([row.id for row in queued]))
+        candidates = []
+        for row in queued:
+            if row.id in in_queue:
+                running[row.owner_id] = running.get(row.owner_id, 0) + 1
+            else:
+                candidates.append(row)
+
+        selected = []
+        while candidates and len(selected) < limit:
+            eligible = [
+                row for row in candidates
+                if self.max_jobs_per_tenant <= 0 or running.get(row.owner_id, 0) < self.max_jobs_per_tenant
+            ]
+            if not eligible:
+                break
+            row = min(
+                eligible,
+                key=lambda row: (-(row.training_priority or 0), running.get(row.owner_id, 0), row.queued_at),
+            )
+            candidates.remove(row)
+            selected.append(row.id)
+            running[row.owner_id] = running.get(row.owner_id, 0) + 1
+        return selected
+
+    async def acquire(self, kb_id: int) -> Optional[TrainingLease]:
+        """取得训练租约：先占用一个空闲槽位，再取得知识库互斥锁
+
+        Args:
+            kb_id: 知识库ID
+
+        Returns:
+            Optional[TrainingLease]: 没有空闲槽位或知识库正在其他进程中训练时返回None
+        """
+        redis = await redis_manager.get_redis()
+        token = uuid.uuid4().hex
+        for slot in range(self.max_jobs):
+            if await redis.set(self.slot_key(slot), token, nx=True, ex=settings.TRAINING_LEASE_TTL):
+                break
+        else:
+            return None
+
+        lease = TrainingLease(kb_id, slot, token)
+        if not await redis.set(self.lease_key(kb_id), token, nx=True, ex=settings.TRAINING_LEASE_TTL):
+            await lease.release()
+            return None
+        return lease
+
+    async def recover_stale_jobs(self) -> List[int]:
+        """将租约已到期的训练中知识库重新排队
+
+        状态为训练中但没有租约，且开始训练已超过一个租约有效期的知识库，视为工作进程已退出。
+
+        Returns:
+            List[int]: 重新排队的知识库ID列表
+        """
+        redis = await redis_manager.get_redis()
+        threshold = datetime.now() - timedelta(seconds=settings.TRAINING_LEASE_TTL)
+        training_kbs = (
+            await self.db.execute(
+                select(KnowledgeBase).filter(KnowledgeBase.training_status == TrainingStatus.TRAINING)
+            )
+        ).scalars().all()
+
+        recovered = []
+        for kb in training_kbs:
+            if kb.training_started_at and kb.training_started_at > threshold:
+                continue
+            if await redis.exists(self.lease_key(kb.id)):
+                continue
+            kb.training_status = TrainingStatus.QUEUED
+            kb.training_error = "训练中断（租约到期），已重新排队，将从检查点恢复"
+            recovered.append(kb.id)
+
+        if recovered:
+            await self.db.commit()
+            Logger.warning(f"检测到租约到期的训练任务，已重新排队: {recovered}")
+        return recovered
+
+    async def get_status(self) -> Dict[str, Any]:
+        """获取调度器槽位和训练队列状态
+
+        Returns:
+            Dict[str, Any]: 槽位数、占用数、每租户上限和队列统计
+        """
+        redis = await redis_manager.get_redis()
+        busy = await redis.exists(*[self.slot_key(slot) for slot in range(self.max_jobs)])
+        return {
+            "max_jobs": self.max_jobs,
+            "busy_slots": busy,
+            "max_jobs_per_tenant": self.max_jobs_per_tenant,
+            "queue": await redis_manager.get_training_queue_stats(),
+        }
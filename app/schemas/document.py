@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import List, Optional
 from pydantic import Field
 from datetime import datetime
 from .base import CustomBaseModel
@@ -61,4 +61,11 @@ class DocumentPagination(CustomBaseModel):
     total: int = Field(..., description="总记录数")
     page: int = Field(..., description="当前页码")
     page_size: int = Field(..., description="每页记录数")
-    items: list[DocumentResponse] = Field(..., description="文档列表")
\ No newline at end of file
+    items: list[DocumentResponse] = Field(..., description="文档列表")
+
+class DocumentImportManifest(CustomBaseModel):
+    """批量导入清单模型
+
+    列出要导入的服务器本地文件或目录，目录会递归导入
+    """
+    paths: List[str] = Field(..., min_length=1, description="服务器本地文件或目录路径")
@@ -1,4 +1,4 @@
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Literal
 from pydantic import Field, BaseModel, ConfigDict
 from .base import CustomBaseModel
 from datetime import datetime
@@ -38,19 +38,52 @@ class KnowledgeBaseCreate(BaseModel):
         }
     )
 
+class RerankCascadeConfig(BaseModel):
+    """级联重排序配置"""
+    enabled: bool = False
+    top_m: int = Field(20, gt=0, description="第一阶段保留的候选数")
+    margin_threshold: Optional[float] = Field(None, ge=0, description="提前结束的相对领先幅度阈值")
+
+
+class MMRConfig(BaseModel):
+    """MMR多样化配置"""
+    enabled: bool = False
+    lambda_: float = Field(0.7, ge=0, le=1, alias="lambda", description="相关性权重")
+    top_k: Optional[int] = Field(None, gt=0, description="MMR选择数量")
+    fetch_k: Optional[int] = Field(None, gt=0, description="MMR候选数量")
+
+    model_config = ConfigDict(populate_by_name=True)
+
+
+class RetrievalConfig(BaseModel):
+    """检索配置
+
+    更新时只合并请求中出现的字段，未出现的字段保留原值；字段显式设为 null 时移除该项配置。
+    """
+    keyword_backend: Optional[Literal["inverted_index", "fulltext"]] = None
+    rerank_cascade: Optional[RerankCascadeConfig] = None
+    mmr: Optional[MMRConfig] = None
+
+
 class KnowledgeBaseUpdate(BaseModel):
-    """更新知识库请求"""
+    """更新知识库请求
+
+    修改 retrieval_config.keyword_backend 会清空原后端的关键词索引，已训练的知识库随后全量重建。
+    """
     name: Optional[str] = None
     domain: Optional[str] = None
     example_queries: Optional[List[str]] = None
     entity_types: Optional[List[str]] = None
     llm_config: Optional[LLMConfig] = None
+    retrieval_config: Optional[RetrievalConfig] = None
 
 
 class QueryRequest(BaseModel):
     """查询请求"""
     query: str
     top_k: int = 5
+    mmr_lambda: Optional[float] = Field(None, ge=0, le=1, description="MMR相关性权重，提供时启用MMR多样化")
+    mmr_top_k: Optional[int] = Field(None, gt=0, description="MMR选择数量")
 
 class QueryResponse(BaseModel):
     """查询响应"""
@@ -80,6 +113,7 @@ class KnowledgeBase(CustomBaseModel):
     example_queries: List[str]
     entity_types: List[str]
     llm_config: Optional[LLMConfig]
+    retrieval_config: Optional[Dict[str, Any]] = None
     working_dir: Optional[str]
     created_at: Optional[datetime]
     updated_at: Optional[datetime]
@@ -8,11 +8,12 @@ from sqlalchemy.orm import Session
 from app.core.config import settings
 from datetime import datetime
 from sqlalchemy import select, and_
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 import os
 import hashlib
 import shutil
 import asyncio
+import uuid
 from pathlib import Path as FilePath
 from fastapi import UploadFile, HTTPException, status
 from sqlalchemy.orm import Session
@@ -21,7 +22,7 @@ from datetime import datetime
 
 from app.core.config import settings
 from app.core.logger import Logger
-from app.models.document import Document, DocumentType, ProcessingStatus
+from app.models.document import Document, DocumentType
 from app.models.knowledge_base import KnowledgeBase, PermissionType
 from app.rag.extractor.extract_processor import ExtractProcessor
 from app.schemas.document import DocumentCreate, DocumentUpdate
@@ -131,21 +132,21 @@ class DocumentService:
             )
 
         # 重置状态并触发处理
-        doc.processing_status = ProcessingStatus.PROCESSING
+        doc.processing_status = 'processing'
         doc.content = None
-        doc.error_message = None
+        doc.processing_error = None
         doc.word_count = 0
         self.db.add(doc)
         await self.db.commit()
         await self.db.refresh(doc)
 
         try:
-            extractor = ExtractProcessor(self.db)
+            extractor = ExtractProcessor()
             asyncio.create_task(extractor.extract_and_save(doc.id))
             Logger.info(f"Queued reprocessing task for document {doc.id}")
         except Exception as e:
-            doc.processing_status = ProcessingStatus.FAILED
-            doc.error_message = f"Failed to trigger reprocessing: {str(e)}"
+            doc.processing_status = 'failed'
+            doc.processing_error = f"Failed to trigger reprocessing: {str(e)}"
             self.db.add(doc)
             await self.db.commit()
             Logger.error(f"Failed to queue reprocessing for document {doc.id}: {str(e)}")
@@ -303,150 +304,128 @@ class DocumentService:
                 detail=f"文档删除失败: {str(e)}"
             )
 
-    async def create_from_upload(
-        self, kb_id: int, user_id: int, file: UploadFile
-    ) -> Document:
-        """从上传的文件创建新文档"""
-        storage_path = FilePath(settings.FILE_STORAGE_PATH)
-        os.makedirs(storage_path, exist_ok=True)
+    async def receive_upload(
+        self, file: UploadFile, directory: FilePath, max_size_mb: Optional[int] = None
+    ) -> Tuple[FilePath, str, int]:
+        """将上传文件分块写入临时文件，同时增量计算 sha256 并在超出大小上限时立即中止
 
-        contents = await file.read()
-        file_hash = hashlib.sha256(contents).hexdigest()
+        读取的是框架已落盘的上传临时文件，每次只有一个分块在内存中；写盘和哈希计算在线程中执行，
+        不阻塞事件循环。
 
-        existing_doc = (
-            await self.db.execute(
-                select(Document).filter(
-                    and_(
-                        Document.knowledge_base_id == kb_id,
-                        Document.file_hash == file_hash,
-                        Document.is_deleted == False,
-                    )
-                )
-            )
-        ).scalar_one_or_none()
-
-        if existing_doc:
-            raise HTTPException(status_code=409, detail="相同的文件已存在")
-
-        file_location = storage_path / f"{file_hash}_{file.filename}"
-        with open(file_location, "wb") as f:
-            f.write(contents)
+        Args:
+            file: 上传的文件
+            directory: 临时文件所在目录（与最终存储路径同一目录，保证可以原子重命名）
+            max_size_mb: 大小上限（MB），默认 DOCUMENT_UPLOAD_MAX_SIZE_MB，0 表示不限制
 
-        file_extension = FilePath(file.filename).suffix
-        doc_type = DocumentType.from_extension(file_extension)
+        Returns:
+            Tuple[FilePath, str, int]: (临时文件路径, 文件哈希, 文件大小)
 
-        db_document = Document(
-            title=file.filename,
-            doc_type=doc_type,
-            knowledge_base_id=kb_id,
-            created_by_id=user_id,
-            file_name=file.filename,
-            file_size=len(contents),
-            file_hash=file_hash,
-            mime_type=file.content_type,
-            storage_path=str(file_location),
-            processing_status=ProcessingStatus.PROCESSING,
+        Raises:
+            HTTPException: 文件超过大小上限时抛出 413
+        """
+        if max_size_mb is None:
+            max_size_mb = settings.DOCUMENT_UPLOAD_MAX_SIZE_MB
+        max_size = max_size_mb * 1024 * 1024
+        too_large = HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"文件 '{file.filename}' 超过大小上限 {max_size_mb}MB",
         )
-        self.db.add(db_document)
-        await self.db.commit()
-        await self.db.refresh(db_document)
+        if max_size > 0 and file.size is not None and file.size > max_size:
+            raise too_large
 
+        def write_chunk(handle, chunk: bytes) -> None:
+            hasher.update(chunk)
+            handle.write(chunk)
+
+        temp_path = directory / f".upload_{uuid.uuid4().hex}.tmp"
+        hasher = hashlib.sha256()
+        file_size = 0
+        handle = await asyncio.to_thread(open, temp_path, "wb")
         try:
-            extractor = ExtractProcessor(self.db)
-            asyncio.create_task(extractor.extract_and_save(db_document.id))
-            Logger.info(f"Queued extraction task for document {db_document.id}")
-        except Exception as e:
-            db_document.processing_status = ProcessingStatus.FAILED
-            db_document.error_message = f"Failed to trigger extraction: {str(e)}"
-            self.db.add(db_document)
-            await self.db.commit()
-            Logger.error(
-                f"Failed to queue extraction for document {db_document.id}: {str(e)}"
-            )
+            while True:
+                chunk = await file.read(settings.DOCUMENT_UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                file_size += len(chunk)
+                if max_size > 0 and file_size > max_size:
+                    raise too_large
+                await asyncio.to_thread(write_chunk, handle, chunk)
+            await asyncio.to_thread(handle.close)
+        except BaseException:
+            await asyncio.to_thread(handle.close)
+            await asyncio.to_thread(temp_path.unlink, True)
+            raise
+        return temp_path, hasher.hexdigest(), file_size
 
-        return db_document
-        """从上传的文件创建新文档"""
-        # 确保存储目录存在
+    async def create_from_upload(
+        self, kb_id: int, user_id: int, file: UploadFile
+    ) -> Document:
+        """从上传的文件创建新文档
+
+        文件流式写入临时文件并增量计算哈希，查重通过后原子重命名为按内容寻址的存储路径，
+        内容提取在后台任务中执行。
+        """
         storage_path = FilePath(settings.FILE_STORAGE_PATH)
         os.makedirs(storage_path, exist_ok=True)
 
-        # 读取文件内容并计算哈希
-        contents = await file.read()
-        file_hash = hashlib.sha256(contents).hexdigest()
-
-        # 检查知识库中是否已存在相同的文件
-        existing_doc = (await self.db.execute(
-            select(Document).filter(
-                and_(
-                    Document.knowledge_base_id == kb_id,
-                    Document.file_hash == file_hash,
-                    Document.is_deleted == False
+        temp_path, file_hash, file_size = await self.receive_upload(file, storage_path)
+        try:
+            existing_doc = (
+                await self.db.execute(
+                    select(Document).filter(
+                        and_(
+                            Document.knowledge_base_id == kb_id,
+                            Document.file_hash == file_hash,
+                            Document.is_deleted == False,
+                        )
+                    )
                 )
-            )
-        )).scalar_one_or_none()
+            ).scalar_one_or_none()
 
-        if existing_doc:
-            raise HTTPException(
-                status_code=status.HTTP_409_CONFLICT,
-                detail=f"相同的文件 '{file.filename}' 已存在于此知识库中。"
-            )
+            if existing_doc:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail=f"相同的文件 '{file.filename}' 已存在于此知识库中。"
+                )
 
-        # 保存文件到存储路径
-        file_location = storage_path / f"{file_hash}_{file.filename}"
-        with open(file_location, "wb") as f:
-            f.write(contents)
+            # 去掉客户端文件名中的目录部分，避免写出存储目录
+            file_name = FilePath(file.filename).name
+            file_location = storage_path / f"{file_hash}_{file_name}"
+            await asyncio.to_thread(os.replace, temp_path, file_location)
+        except BaseException:
+            await asyncio.to_thread(temp_path.unlink, True)
+            raise
 
-        # 从文件扩展名推断文档类型
-        file_extension = FilePath(file.filename).suffix
+        file_extension = FilePath(file_name).suffix
         doc_type = DocumentType.from_extension(file_extension)
 
-        # 创建文档记录
         db_document = Document(
             title=file.filename,
             doc_type=doc_type,
             knowledge_base_id=kb_id,
             created_by_id=user_id,
             file_name=file.filename,
-            file_size=len(contents),
+            file_size=file_size,
             file_hash=file_hash,
             mime_type=file.content_type,
             storage_path=str(file_location),
-            processing_status=ProcessingStatus.PROCESSING,
+            processing_status='processing',
         )
         self.db.add(db_document)
-        # 提交一次即可，后续由异步任务更新状态
         await self.db.commit()
         await self.db.refresh(db_document)
 
-        # 提取文件内容
         try:
             extractor = ExtractProcessor()
-            extracted_content = await extractor.extract(str(file_location))
-            
-            # 更新文档内容和状态
-            db_document.content = extracted_content
-            db_document.processing_status = 'completed'
-            Logger.info(f"文件 '{file.filename}' (ID: {db_document.id}) 内容提取成功。")
-
+            asyncio.create_task(extractor.extract_and_save(db_document.id))
+            Logger.info(f"Queued extraction task for document {db_document.id}")
         except Exception as e:
             db_document.processing_status = 'failed'
-            db_document.processing_error = str(e)
-            Logger.error(f"文件 '{file.filename}' (ID: {db_document.id}) 内容提取失败: {str(e)}")
-        
-        # 提交最终状态
-        self.db.add(db_document)
-        await self.db.commit()
-        await self.db.refresh(db_document)
-
-        self.db.add(db_document)
-        await self.db.commit()
-        await self.db.refresh(db_document)
-
-        if db_document.processing_status == 'failed':
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"文件 '{file.filename}' 内容提取失败: {db_document.processing_error}"
+            db_document.processing_error = f"Failed to trigger extraction: {str(e)}"
+            self.db.add(db_document)
+            await self.db.commit()
+            Logger.error(
+                f"Failed to queue extraction for document {db_document.id}: {str(e)}"
             )
 
-        Logger.info(f"文件 '{file.filename}' 已成功上传并处理 (ID: {db_document.id})。")
         return db_document
\ No newline at end of file
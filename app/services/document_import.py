@@ -0,0 +1,606 @@
+"""文档批量导入服务
+
+从压缩包（zip/tar）或服务器本地路径清单批量创建文档：逐个文件流式写入存储目录并计算哈希，
+按哈希查重后批量创建文档记录，内容提取经提取进程池并发执行，进度保存在 Redis 中供查询。
+"""
+import asyncio
+import hashlib
+import json
+import mimetypes
+import os
+import tarfile
+import time
+import uuid
+import zipfile
+from pathlib import Path as FilePath, PurePosixPath
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from fastapi import HTTPException, UploadFile, status
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.logger import Logger
+from app.core.redis_manager import redis_manager
+from app.models.database import AsyncSessionLocal
+from app.models.document import Document, DocumentType
+from app.rag.extractor.extract_processor import ExtractProcessor
+from app.services.document import DocumentService
+
+# 支持的压缩包后缀
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+
+# 任务进度中最多保留的错误条数
+_MAX_ERRORS = 100
+
+
+class ImportEntry:
+    """从压缩包或清单中读出的一个文件"""
+
+    def __init__(
+        self,
+        name: str,
+        file_name: str,
+        temp_path: Optional[FilePath] = None,
+        file_hash: Optional[str] = None,
+        file_size: int = 0,
+        error: Optional[str] = None,
+        skipped: bool = False,
+    ):
+        """初始化
+
+        Args:
+            name: 文件在压缩包或清单中的路径
+            file_name: 文件名
+            temp_path: 已写入存储目录的临时文件
+            file_hash: 文件 sha256
+            file_size: 文件大小（字节）
+            error: 读取失败的原因
+            skipped: 是否因格式不支持而跳过
+        """
+        self.name = name
+        self.file_name = file_name
+        self.temp_path = temp_path
+        self.file_hash = file_hash
+        self.file_size = file_size
+        self.error = error
+        self.skipped = skipped
+
+
+def _copy_stream(source, directory: FilePath, max_size: int) -> Tuple[FilePath, str, int]:
+    """分块复制到存储目录中的临时文件，同时计算 sha256，超过大小上限时中止"""
+    temp_path = directory / f".import_{uuid.uuid4().hex}.tmp"
+    hasher = hashlib.sha256()
+    file_size = 0
+    try:
+        with open(temp_path, "wb") as target:
+            while True:
+                chunk = source.read(settings.DOCUMENT_UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                file_size += len(chunk)
+                if max_size > 0 and file_size > max_size:
+                    raise ValueError(f"文件超过大小上限 {settings.DOCUMENT_UPLOAD_MAX_SIZE_MB}MB")
+                hasher.update(chunk)
+                target.write(chunk)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+    return temp_path, hasher.hexdigest(), file_size
+
+
+def _read_entry(name: str, file_name: str, open_source, directory: FilePath, max_size: int) -> ImportEntry:
+    """读取单个文件为导入条目，失败时记录原因"""
+    try:
+        with open_source() as source:
+            return ImportEntry(name, file_name, *_copy_stream(source, directory, max_size))
+    except Exception as e:
+        return ImportEntry(name, file_name, error=str(e))
+
+
+def _is_importable(name: str, extensions: Set[str]) -> bool:
+    """是否为可导入的文件：跳过隐藏文件、macOS 压缩包元数据和不支持的格式"""
+    path = PurePosixPath(name.replace("\\", "/"))
+    if "__MACOSX" in path.parts or any(part.startswith(".") for part in path.parts):
+        return False
+    return path.suffix.lower() in extensions
+
+
+def _iter_zip(
+    archive_path: str, directory: FilePath, max_size: int, extensions: Set[str]
+) -> Iterator[Any]:
+    """逐个读取 zip 中的文件，首先产出文件总数"""
+    with zipfile.ZipFile(archive_path) as archive:
+        members = [member for member in archive.infolist() if not member.is_dir()]
+        yield len(members)
+        for member in members:
+            file_name = PurePosixPath(member.filename).name
+            if not _is_importable(member.filename, extensions):
+                yield ImportEntry(member.filename, file_name, skipped=True)
+            elif max_size > 0 and member.file_size > max_size:
+                yield ImportEntry(
+                    member.filename, file_name,
+                    error=f"文件超过大小上限 {settings.DOCUMENT_UPLOAD_MAX_SIZE_MB}MB",
+                )
+            else:
+                yield _read_entry(
+                    member.filename, file_name, lambda: archive.open(member), directory, max_size
+                )
+
+
+def _iter_tar(
+    archive_path: str, directory: FilePath, max_size: int, extensions: Set[str]
+) -> Iterator[Any]:
+    """以流模式逐个读取 tar 中的文件（压缩的 tar 不支持高效随机访问），总数未知时产出 None"""
+    with tarfile.open(archive_path, "r|*") as archive:
+        yield None
+        for member in archive:
+            if not member.isfile():
+                continue
+            file_name = PurePosixPath(member.name).name
+            if not _is_importable(member.name, extensions):
+                yield ImportEntry(member.name, file_name, skipped=True)
+            elif max_size > 0 and member.size > max_size:
+                yield ImportEntry(
+                    member.name, file_name,
+                    error=f"文件超过大小上限 {settings.DOCUMENT_UPLOAD_MAX_SIZE_MB}MB",
+                )
+            else:
+                yield _read_entry(
+                    member.name, file_name, lambda: archive.extractfile(member), directory, max_size
+                )
+
+
+def _iter_manifest(
+    paths: List[str], allowed_dirs: List[str], directory: FilePath, max_size: int, extensions: Set[str]
+) -> Iterator[Any]:
+    """逐个读取清单中的文件，目录递归展开，首先产出文件总数
+
+    目录中指向允许目录之外的符号链接文件不会被读取。
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, names in os.walk(path):
+                dirs.sort()
+                files.extend(
+                    (os.path.join(root, name), os.path.relpath(os.path.join(root, name), path))
+                    for name in sorted(names)
+                )
+        else:
+            files.append((path, os.path.basename(path)))
+    yield len(files)
+    for path, relative_name in files:
+        file_name = os.path.basename(path)
+        real_path = os.path.realpath(path)
+        if not _is_importable(relative_name, extensions):
+            yield ImportEntry(path, file_name, skipped=True)
+        elif not _is_allowed(real_path, allowed_dirs):
+            yield ImportEntry(path, file_name, error="路径不在允许导入的目录下")
+        else:
+            yield _read_entry(path, file_name, lambda: open(real_path, "rb"), directory, max_size)
+
+
+def _is_allowed(real_path: str, allowed_dirs: List[str]) -> bool:
+    """真实路径是否位于允许导入的目录下"""
+    return any(os.path.commonpath([real_path, directory]) == directory for directory in allowed_dirs)
+
+
+def iter_import_entries(source: Dict[str, Any]) -> Iterator[Any]:
+    """按导入来源描述创建导入条目迭代器（在工作进程中调用）
+
+    Args:
+        source: 导入来源，type 为 zip/tar 时包含 archive_path，为 manifest 时包含 paths 和 allowed_dirs
+
+    Returns:
+        Iterator[Any]: 导入条目迭代器，首个元素为文件总数（未知时为None）
+    """
+    storage_path = FilePath(settings.FILE_STORAGE_PATH)
+    max_size = settings.DOCUMENT_UPLOAD_MAX_SIZE_MB * 1024 * 1024
+    extensions = set(ExtractProcessor().extractors)
+    if source["type"] == "zip":
+        return _iter_zip(source["archive_path"], storage_path, max_size, extensions)
+    if source["type"] == "tar":
+        return _iter_tar(source["archive_path"], storage_path, max_size, extensions)
+    return _iter_manifest(source["paths"], source["allowed_dirs"], storage_path, max_size, extensions)
+
+
+class DocumentImportJob:
+    """批量导入任务进度
+
+    保存在 Redis 中，保留 DOCUMENT_IMPORT_JOB_TTL 秒；导入过程中的更新每秒最多写入一次。
+    """
+
+    STATUS_PENDING = "pending"
+    STATUS_RUNNING = "running"
+    STATUS_COMPLETED = "completed"
+    STATUS_FAILED = "failed"
+
+    def __init__(self, kb_id: int, source: str):
+        """初始化
+
+        Args:
+            kb_id: 知识库ID
+            source: 导入来源（压缩包文件名或清单）
+        """
+        self.job_id = uuid.uuid4().hex
+        self.last_saved_at = 0.0
+        self.state: Dict[str, Any] = {
+            "job_id": self.job_id,
+            "knowledge_base_id": kb_id,
+            "source": source,
+            "status": self.STATUS_PENDING,
+            "entries_total": None,
+            "entries_processed": 0,
+            "documents_created": 0,
+            "duplicates": 0,
+            "skipped": 0,
+            "failed": 0,
+            "extracted": 0,
+            "extract_failed": 0,
+            "errors": [],
+            "message": None,
+            "created_at": time.time(),
+            "finished_at": None,
+        }
+
+    @staticmethod
+    def key(job_id: str) -> str:
+        """任务进度键"""
+        return f"document_import:{job_id}"
+
+    def add_error(self, name: str, error: str) -> None:
+        """记录单个文件的错误"""
+        self.state["failed"] += 1
+        if len(self.state["errors"]) < _MAX_ERRORS:
+            self.state["errors"].append({"name": name, "error": error})
+
+    async def save(self, force: bool = True) -> None:
+        """保存进度，force 为False时按1秒间隔节流"""
+        now = time.time()
+        if not force and now - self.last_saved_at < 1.0:
+            return
+        self.last_saved_at = now
+        try:
+            redis = await redis_manager.get_redis()
+            await redis.set(
+                self.key(self.job_id),
+                json.dumps(self.state, ensure_ascii=False),
+                ex=settings.DOCUMENT_IMPORT_JOB_TTL,
+            )
+        except Exception as e:
+            Logger.warning(f"保存批量导入任务 {self.job_id} 进度失败: {str(e)}")
+
+    @classmethod
+    async def get(cls, job_id: str) -> Optional[Dict[str, Any]]:
+        """获取任务进度，不存在或已过期时返回None"""
+        payload = await redis_manager.get(cls.key(job_id))
+        return json.loads(payload) if payload else None
+
+    @classmethod
+    async def load(cls, job_id: str) -> Optional["DocumentImportJob"]:
+        """从 Redis 恢复任务，不存在或已过期时返回None"""
+        state = await cls.get(job_id)
+        if state is None:
+            return None
+        job = cls(state["knowledge_base_id"], state["source"])
+        job.job_id = job_id
+        job.state = state
+        return job
+
+
+class DocumentImporter:
+    """批量导入执行器（在后台任务中运行，使用独立的数据库会话）
+
+    读取文件在线程中进行；每 DOCUMENT_IMPORT_BATCH_SIZE 个文件查重一次并批量创建文档，
+    新文档立即交给 RAG_EXTRACT_WORKERS 个提取协程，文件读取与内容提取同时进行。
+    """
+
+    def __init__(self, job: DocumentImportJob, kb_id: int, user_id: int):
+        """初始化
+
+        Args:
+            job: 任务进度
+            kb_id: 知识库ID
+            user_id: 发起导入的用户ID
+        """
+        self.job = job
+        self.kb_id = kb_id
+        self.user_id = user_id
+        self.storage_path = FilePath(settings.FILE_STORAGE_PATH)
+        self.extractor = ExtractProcessor()
+        # 本任务中已创建文档的文件哈希
+        self.seen_hashes: Set[str] = set()
+
+    async def run(self, entries: Iterator[Any], cleanup_path: Optional[FilePath] = None) -> None:
+        """执行导入
+
+        Args:
+            entries: 导入条目迭代器，首个元素为文件总数（未知时为None）
+            cleanup_path: 导入结束后删除的文件（上传的压缩包）
+        """
+        start_time = time.time()
+        state = self.job.state
+        state["status"] = DocumentImportJob.STATUS_RUNNING
+        await self.job.save()
+
+        extract_queue: asyncio.Queue = asyncio.Queue()
+        workers = [
+            asyncio.create_task(self._extract_worker(extract_queue))
+            for _ in range(settings.RAG_EXTRACT_WORKERS)
+        ]
+        batch: List[ImportEntry] = []
+        try:
+            async with AsyncSessionLocal() as db:
+                state["entries_total"] = await asyncio.to_thread(next, entries, None)
+                while True:
+                    entry = await asyncio.to_thread(next, entries, None)
+                    if entry is None:
+                        break
+                    if state["entries_processed"] >= settings.DOCUMENT_IMPORT_MAX_ENTRIES:
+                        if entry.temp_path is not None:
+                            await asyncio.to_thread(entry.temp_path.unlink, True)
+                        state["message"] = f"文件数超过上限 {settings.DOCUMENT_IMPORT_MAX_ENTRIES}，其余文件未导入"
+                        break
+                    state["entries_processed"] += 1
+                    if entry.skipped:
+                        state["skipped"] += 1
+                    elif entry.error is not None:
+                        self.job.add_error(entry.name, entry.error)
+                    else:
+                        batch.append(entry)
+                        if len(batch) >= settings.DOCUMENT_IMPORT_BATCH_SIZE:
+                            entries_to_write, batch = batch, []
+                            await self._create_documents(db, entries_to_write, extract_queue)
+                    await self.job.save(force=False)
+                if batch:
+                    entries_to_write, batch = batch, []
+                    await self._create_documents(db, entries_to_write, extract_queue)
+
+            for _ in workers:
+                await extract_queue.put(None)
+            await asyncio.gather(*workers)
+            state["status"] = DocumentImportJob.STATUS_COMPLETED
+        except Exception as e:
+            Logger.error(f"批量导入任务 {self.job.job_id} 失败: {str(e)}")
+            state["status"] = DocumentImportJob.STATUS_FAILED
+            state["message"] = str(e)
+            for worker in workers:
+                worker.cancel()
+        finally:
+            await asyncio.to_thread(entries.close)
+            for entry in batch:
+                await asyncio.to_thread(entry.temp_path.unlink, True)
+            if cleanup_path is not None:
+                await asyncio.to_thread(cleanup_path.unlink, True)
+            state["finished_at"] = time.time()
+            await self.job.save()
+
+        Logger.rag_performance_metrics(
+            operation="document_import",
+            duration=time.time() - start_time,
+            kb_id=self.kb_id,
+            job_id=self.job.job_id,
+            entries_processed=state["entries_processed"],
+            documents_created=state["documents_created"],
+            duplicates=state["duplicates"],
+            skipped=state["skipped"],
+            failed=state["failed"],
+            extracted=state["extracted"],
+            extract_failed=state["extract_failed"],
+        )
+
+    async def _create_documents(
+        self, db: AsyncSession, entries: List[ImportEntry], extract_queue: asyncio.Queue
+    ) -> None:
+        """按哈希查重后原子重命名文件并批量创建文档，新文档送往提取队列"""
+        state = self.job.state
+        hashes = {entry.file_hash for entry in entries}
+        existing = set((await db.execute(
+            select(Document.file_hash).where(
+                Document.knowledge_base_id == self.kb_id,
+                Document.file_hash.in_(hashes),
+                Document.is_deleted == False,
+            )
+        )).scalars())
+
+        documents = []
+        moves = []
+        for entry in entries:
+            if entry.file_hash in existing or entry.file_hash in self.seen_hashes:
+                state["duplicates"] += 1
+                await asyncio.to_thread(entry.temp_path.unlink, True)
+                continue
+            self.seen_hashes.add(entry.file_hash)
+            file_location = self.storage_path / f"{entry.file_hash}_{entry.file_name}"
+            moves.append((entry.temp_path, file_location))
+            documents.append(Document(
+                title=entry.file_name,
+                doc_type=DocumentType.from_extension(FilePath(entry.file_name).suffix),
+                knowledge_base_id=self.kb_id,
+                created_by_id=self.user_id,
+                file_name=entry.file_name,
+                file_size=entry.file_size,
+                file_hash=entry.file_hash,
+                mime_type=mimetypes.guess_type(entry.file_name)[0],
+                storage_path=str(file_location),
+                processing_status='processing',
+                doc_metadata={"import_job_id": self.job.job_id, "source_path": entry.name},
+            ))
+        if not documents:
+            return
+
+        try:
+            db.add_all(documents)
+            await db.flush()
+            document_ids = [document.id for document in documents]
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            for (temp_path, _), document in zip(moves, documents):
+                await asyncio.to_thread(temp_path.unlink, True)
+                self.seen_hashes.discard(document.file_hash)
+                self.job.add_error(document.file_name, f"创建文档失败: {str(e)}")
+            return
+
+        # 文档提交成功后再把临时文件移动到正式位置，回滚时不会留下无主文件，
+        # 也不会覆盖同名的已有文件
+        state["documents_created"] += len(document_ids)
+        for (temp_path, file_location), document_id in zip(moves, document_ids):
+            try:
+                await asyncio.to_thread(os.replace, temp_path, file_location)
+            except OSError as e:
+                await asyncio.to_thread(temp_path.unlink, True)
+                await db.execute(
+                    update(Document)
+                    .where(Document.id == document_id)
+                    .values(processing_status='failed', processing_error=f"保存文件失败: {str(e)}"[:1024])
+                )
+                await db.commit()
+                state["extract_failed"] += 1
+                continue
+            await extract_queue.put(document_id)
+
+    async def _extract_worker(self, extract_queue: asyncio.Queue) -> None:
+        """提取协程：依次提取队列中的文档，提取本身在提取进程池中执行"""
+        state = self.job.state
+        while True:
+            document_id = await extract_queue.get()
+            if document_id is None:
+                return
+            try:
+                extracted = await self.extractor.extract_and_save(document_id)
+            except Exception as e:
+                # 单个文档的提取失败（包括保存结果时的数据库错误）不影响其余文档
+                Logger.error(f"批量导入任务 {self.job.job_id} 提取文档 {document_id} 失败: {str(e)}")
+                extracted = False
+            if extracted:
+                state["extracted"] += 1
+            else:
+                state["extract_failed"] += 1
+            await self.job.save(force=False)
+
+
+class DocumentImportService:
+    """文档批量导入服务
+
+    导入在 huey 工作进程中执行，API 进程重启不会中断导入；任务参数只包含可序列化的来源描述。
+    """
+
+    def __init__(self, db: AsyncSession):
+        """初始化
+
+        Args:
+            db: 数据库会话
+        """
+        self.db = db
+
+    @staticmethod
+    def _start(job: DocumentImportJob, kb_id: int, user_id: int, source: Dict[str, Any]) -> None:
+        """把导入任务交给 huey 工作进程"""
+        from app.utils.tasks import run_document_import
+        run_document_import(job.job_id, kb_id, user_id, source)
+
+    async def create_archive_job(self, kb_id: int, user_id: int, file: UploadFile) -> Dict[str, Any]:
+        """上传压缩包并创建批量导入任务
+
+        Args:
+            kb_id: 知识库ID
+            user_id: 用户ID
+            file: 上传的 zip/tar 压缩包
+
+        Returns:
+            Dict[str, Any]: 任务进度
+
+        Raises:
+            HTTPException: 压缩包格式不支持或超过大小上限时抛出
+        """
+        if not (file.filename or "").lower().endswith(ARCHIVE_SUFFIXES):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"不支持的压缩包格式，支持: {', '.join(ARCHIVE_SUFFIXES)}",
+            )
+        storage_path = FilePath(settings.FILE_STORAGE_PATH)
+        os.makedirs(storage_path, exist_ok=True)
+        archive_path, _, _ = await DocumentService(self.db).receive_upload(
+            file, storage_path, settings.DOCUMENT_IMPORT_MAX_SIZE_MB
+        )
+
+        if await asyncio.to_thread(zipfile.is_zipfile, archive_path):
+            archive_type = "zip"
+        elif await asyncio.to_thread(tarfile.is_tarfile, archive_path):
+            archive_type = "tar"
+        else:
+            await asyncio.to_thread(archive_path.unlink, True)
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"无法读取压缩包 '{file.filename}'",
+            )
+
+        job = DocumentImportJob(kb_id, file.filename)
+        await job.save()
+        self._start(job, kb_id, user_id, {"type": archive_type, "archive_path": str(archive_path)})
+        Logger.info(f"Created import job {job.job_id} for knowledge base {kb_id} from archive '{file.filename}'")
+        return job.state
+
+    async def create_manifest_job(self, kb_id: int, user_id: int, paths: List[str]) -> Dict[str, Any]:
+        """按服务器本地路径清单创建批量导入任务
+
+        只允许导入 DOCUMENT_IMPORT_ALLOWED_DIRS 下的文件，路径按解析符号链接后的真实路径检查。
+
+        Args:
+            kb_id: 知识库ID
+            user_id: 用户ID
+            paths: 文件或目录路径
+
+        Returns:
+            Dict[str, Any]: 任务进度
+
+        Raises:
+            HTTPException: 未配置允许目录、路径不存在或不在允许目录下时抛出
+        """
+        if not settings.DOCUMENT_IMPORT_ALLOWED_DIRS:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="未配置允许导入的服务器目录",
+            )
+        allowed_dirs = [os.path.realpath(directory) for directory in settings.DOCUMENT_IMPORT_ALLOWED_DIRS]
+        resolved = []
+        for path in paths:
+            real_path = os.path.realpath(path)
+            if not _is_allowed(real_path, allowed_dirs):
+                raise HTTPException(
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    detail=f"路径不在允许导入的目录下: {path}",
+                )
+            if not os.path.exists(real_path):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"路径不存在: {path}",
+                )
+            resolved.append(real_path)
+
+        os.makedirs(settings.FILE_STORAGE_PATH, exist_ok=True)
+        job = DocumentImportJob(kb_id, f"manifest ({len(paths)} paths)")
+        await job.save()
+        self._start(job, kb_id, user_id, {"type": "manifest", "paths": resolved, "allowed_dirs": allowed_dirs})
+        Logger.info(f"Created import job {job.job_id} for knowledge base {kb_id} from manifest of {len(paths)} paths")
+        return job.state
+
+    async def get_job(self, kb_id: int, job_id: str) -> Dict[str, Any]:
+        """获取批量导入任务进度
+
+        Args:
+            kb_id: 知识库ID
+            job_id: 任务ID
+
+        Returns:
+            Dict[str, Any]: 任务进度
+
+        Raises:
+            HTTPException: 任务不存在、已过期或不属于该知识库时抛出 404
+        """
+        job = await DocumentImportJob.get(job_id)
+        if not job or job.get("knowledge_base_id") != kb_id:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="导入任务不存在或已过期")
+        return job
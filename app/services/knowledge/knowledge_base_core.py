@@ -12,6 +12,7 @@ from app.models.knowledge_base import (
     KnowledgeBase,
     knowledge_base_users,
     PermissionType,
+    TrainingStatus,
 )
 from app.models.user import User
 from app.schemas.knowledge_base import (
@@ -20,7 +21,10 @@ from app.schemas.knowledge_base import (
 )
 from app.core.config import settings
 from app.core.logger import Logger
+from app.rag.keyword.keyword_index_factory import KeywordIndexFactory
+from app.rag.training.training_scheduler import TrainingScheduler
 from app.services.audit import AuditManager
+from app.utils.tasks import dispatch_training
 
 
 class KnowledgeBaseCoreService:
@@ -187,13 +191,69 @@ class KnowledgeBaseCoreService:
                 status_code=status.HTTP_404_NOT_FOUND, detail="知识库不存在"
             )
 
-        for field, value in kb.model_dump(exclude_unset=True).items():
+        update_data = kb.model_dump(exclude_unset=True)
+        rebuild_keyword_index = False
+        if kb.retrieval_config is not None:
+            update_data["retrieval_config"] = self._merge_retrieval_config(
+                db_kb.get_retrieval_config(),
+                kb.retrieval_config.model_dump(by_alias=True, exclude_unset=True),
+            )
+            new_backend = kb.retrieval_config.keyword_backend
+            if new_backend is not None and new_backend != db_kb.get_keyword_backend():
+                if db_kb.training_status == TrainingStatus.TRAINING:
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail="知识库正在训练，不能修改关键词检索后端",
+                    )
+                # 在同一事务中清空原后端的关键词索引，避免切回时残留过期数据
+                keyword_index = KeywordIndexFactory.create_keyword_index(db_kb, self.db)
+                await keyword_index.clear(self.db, kb_id)
+                rebuild_keyword_index = db_kb.training_status != TrainingStatus.INIT
+
+        for field, value in update_data.items():
             setattr(db_kb, field, value)
 
         await self.db.commit()
+
+        if rebuild_keyword_index:
+            # 新后端的关键词索引为空，全量重建后才能检索
+            Logger.info(
+                f"知识库 {kb_id} 关键词检索后端切换为 {db_kb.get_keyword_backend()}，加入全量重建队列"
+            )
+            await TrainingScheduler(self.db).enqueue(
+                kb_id, full_rebuild=True, priority=db_kb.training_priority or 0
+            )
+            await dispatch_training(self.db)
+
         await self.db.refresh(db_kb)
         return db_kb
 
+    @staticmethod
+    def _merge_retrieval_config(
+        current: Dict[str, Any], changes: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """把请求中出现的检索配置字段合并到已有配置
+
+        Args:
+            current: 已保存的检索配置
+            changes: 请求中出现的字段，值为None时移除该项，子配置递归合并
+
+        Returns:
+            Dict[str, Any]: 合并后的新配置（不修改原字典，JSON列才能检测到变化）
+        """
+        merged = dict(current)
+        for key, value in changes.items():
+            if isinstance(value, dict):
+                # 子配置（如 mmr、rerank_cascade）同样只合并出现的字段
+                value = KnowledgeBaseCoreService._merge_retrieval_config(
+                    merged[key] if isinstance(merged.get(key), dict) else {}, value
+                )
+            if value is None:
+                merged.pop(key, None)
+            else:
+                merged[key] = value
+        return merged
+
     async def delete(self, kb_id: int, user_id: int) -> None:
         """软删除知识库"""
         Logger.info(f"Attempting to delete knowledge base {kb_id} by user {user_id}")
@@ -86,9 +86,11 @@ class KnowledgeBaseService:
 
     # ==================== 训练服务方法 ====================
 
-    async def train(self, kb_id: int, user_id: int) -> KnowledgeBase:
+    async def train(
+        self, kb_id: int, user_id: int, full_rebuild: bool = False, priority: int = 0
+    ) -> KnowledgeBase:
         """训练知识库"""
-        return await self.training_service.train(kb_id, user_id)
+        return await self.training_service.train(kb_id, user_id, full_rebuild, priority)
 
     async def check_training_queue(self) -> Optional[int]:
         """检查训练队列，获取下一个要训练的知识库ID"""
@@ -126,10 +128,13 @@ class KnowledgeBaseService:
         use_rerank: bool = True,
         rerank_mode: str = "weighted_score",
         skip_permission_check: bool = False,
+        mmr_lambda: Optional[float] = None,
+        mmr_top_k: Optional[int] = None,
     ) -> dict:
         """查询知识库"""
         return await self.query_service.query(
-            kb_id, user_context, query, top_k, method, use_rerank, rerank_mode, skip_permission_check
+            kb_id, user_context, query, top_k, method, use_rerank, rerank_mode, skip_permission_check,
+            mmr_lambda=mmr_lambda, mmr_top_k=mmr_top_k
         )
 
     # ==================== 成员管理服务方法 ====================
@@ -2,7 +2,7 @@
 知识库查询服务
 负责RAG查询、查询权限检查和查询结果处理
 """
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from datetime import datetime
 from sqlalchemy.orm import Session
 from sqlalchemy import select, and_
@@ -35,6 +35,8 @@ class KnowledgeBaseQueryService:
         use_rerank: bool = False,
         rerank_mode: str = RerankMode.WEIGHTED_SCORE,
         skip_permission_check: bool = False,
+        mmr_lambda: Optional[float] = None,
+        mmr_top_k: Optional[int] = None,
     ) -> dict:
         """RAG查询知识库
 
@@ -47,6 +49,8 @@ class KnowledgeBaseQueryService:
             use_rerank: 是否使用重排序
             rerank_mode: 重排序模式
             skip_permission_check: 是否跳过权限检查
+            mmr_lambda: MMR相关性权重，提供时启用MMR多样化
+            mmr_top_k: MMR选择数量
 
         Returns:
             dict: 查询结果
@@ -157,6 +161,7 @@ class KnowledgeBaseQueryService:
             # 执行RAG查询
             Logger.debug(f"开始执行RAG查询: 知识库ID {kb_id}, 方法: {method}")
 
+            search_metadata: Dict[str, Any] = {}
             results = await self.retrieval_service.query(
                 knowledge_base=kb,
                 query=query,
@@ -166,6 +171,9 @@ class KnowledgeBaseQueryService:
                 use_rerank=use_rerank,
                 rerank_mode=rerank_mode,
                 user_id=str(user_context.user_id),
+                mmr_lambda=mmr_lambda,
+                mmr_top_k=mmr_top_k,
+                search_metadata=search_metadata,
             )
 
             # 提取结果统计信息
@@ -201,6 +209,9 @@ class KnowledgeBaseQueryService:
                 "user_type": user_context.user_type,
                 "user_id": user_context.user_id,
             }
+            # 级联重排序各阶段耗时（整次查询一份，不写入每个结果）
+            if search_metadata.get("rerank_cascade"):
+                doc_metadata["rerank_cascade"] = search_metadata["rerank_cascade"]
 
             # 计算处理时间
             process_time = time.time() - start_time
@@ -323,6 +334,8 @@ class KnowledgeBaseQueryService:
         use_rerank: bool = True,
         rerank_mode: str = RerankMode.WEIGHTED_SCORE,
         skip_permission_check: bool = False,
+        mmr_lambda: Optional[float] = None,
+        mmr_top_k: Optional[int] = None,
     ) -> dict:
         """查询知识库
 
@@ -335,6 +348,8 @@ class KnowledgeBaseQueryService:
             use_rerank: 是否使用重排序
             rerank_mode: 重排序模式
             skip_permission_check: 是否跳过权限检查
+            mmr_lambda: MMR相关性权重，提供时启用MMR多样化
+            mmr_top_k: MMR选择数量
 
         Returns:
             dict: 查询结果
@@ -352,4 +367,6 @@ class KnowledgeBaseQueryService:
             use_rerank=use_rerank,
             rerank_mode=rerank_mode,
             skip_permission_check=skip_permission_check,
+            mmr_lambda=mmr_lambda,
+            mmr_top_k=mmr_top_k,
         ) 
\ No newline at end of file
@@ -12,9 +12,11 @@ from app.models.knowledge_base import KnowledgeBase, TrainingStatus, PermissionT
 from app.models.document import Document
 from app.models.user import User
 from app.schemas.identity import UserContext, UserType
+from app.rag.training.training_estimator import TrainingEstimateJob
 from app.rag.training.training_manager import RAGTrainingManager
 from app.services.audit import AuditManager
-from app.utils.tasks import train_knowledge_base
+from app.rag.training.training_scheduler import TrainingScheduler
+from app.utils.tasks import dispatch_training, run_training_estimate
 from app.core.logger import Logger
 
 
@@ -25,8 +27,17 @@ class KnowledgeBaseTrainingService:
         self.db = db
         self.audit_manager = AuditManager(db)
 
-    async def train(self, kb_id: int, user_id: int) -> KnowledgeBase:
-        """训练知识库"""
+    async def train(
+        self, kb_id: int, user_id: int, full_rebuild: bool = False, priority: int = 0
+    ) -> KnowledgeBase:
+        """训练知识库
+
+        Args:
+            kb_id: 知识库ID
+            user_id: 用户ID
+            full_rebuild: 是否全量重建索引，默认只处理有变化的文档
+            priority: 训练优先级，数值越大越先调度
+        """
         import time
 
         start_time = time.time()
@@ -115,7 +126,7 @@ class KnowledgeBaseTrainingService:
 
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"当前状态({kb.training_status})不允许训练，只有初始状态或训练失败的知识库可以训练",
+                    detail=f"当前状态({kb.training_status})不允许训练，只有初始、已训练或训练失败的知识库可以训练",
                 )
 
             # 检查是否已经在队列中
@@ -186,50 +197,20 @@ class KnowledgeBaseTrainingService:
                 },
             )
 
-            # 创建训练管理器
-            training_manager = RAGTrainingManager(self.db)
-
-            # 检查是否启用训练队列
-            from app.core.config import settings
-            if getattr(settings, "ENABLE_TRAINING_QUEUE", False):
-                # 检查是否有其他知识库正在训练
-                training_kb = (
-                    await self.db.execute(
-                        select(KnowledgeBase).filter(
-                            KnowledgeBase.training_status == TrainingStatus.TRAINING
-                        )
-                    )
-                ).scalar_one_or_none()
-
-                if training_kb:
-                    # 如果有其他知识库在训练，将当前知识库添加到队列
-                    Logger.info(f"另一个知识库正在训练，将知识库 {kb_id} 加入队列")
-                    await training_manager.update_training_status(
-                        kb_id, TrainingStatus.QUEUED
-                    )
-
-                    # 记录审计日志
-                    await self.audit_manager.log_training(
-                        user_context=user_context,
-                        kb_id=kb_id,
-                        status="queued",
-                        document_count=len(documents),
-                    )
-
-                    await self.db.refresh(kb)
-                    return kb
-
-            # 如果没有其他知识库在训练，直接开始训练
-            Logger.info(f"开始立即训练知识库 {kb_id}")
-            await training_manager.update_training_status(
-                kb_id, TrainingStatus.TRAINING
+            # 加入训练队列，由调度器按空闲槽位、优先级和租户公平份额派发
+            scheduler = TrainingScheduler(self.db)
+            await scheduler.enqueue(kb_id, full_rebuild=full_rebuild, priority=priority)
+            dispatched = await dispatch_training(self.db)
+            Logger.info(
+                f"知识库 {kb_id} 已加入训练队列"
+                + ("，已派发训练" if kb_id in dispatched else "，等待空闲训练槽位")
             )
 
             # 记录审计日志
             await self.audit_manager.log_training(
                 user_context=user_context,
                 kb_id=kb_id,
-                status="started",
+                status="started" if kb_id in dispatched else "queued",
                 document_count=len(documents),
             )
 
@@ -240,13 +221,12 @@ class KnowledgeBaseTrainingService:
                 config={
                     "llm_config": kb.llm_config if hasattr(kb, "llm_config") else {},
                     "working_dir": kb.working_dir if hasattr(kb, "working_dir") else "",
-                    "training_mode": "immediate",
+                    "training_mode": "scheduled",
+                    "full_rebuild": full_rebuild,
+                    "priority": priority,
                 },
             )
 
-            # 启动异步训练任务
-            train_knowledge_base(kb_id)
-
             await self.db.refresh(kb)
 
             # 计算处理时间
@@ -307,31 +287,64 @@ class KnowledgeBaseTrainingService:
                 detail=f"训练知识库失败: {str(e)}",
             )
 
-    async def check_training_queue(self) -> Optional[int]:
-        """检查训练队列，获取下一个要训练的知识库ID
+    async def estimate_training(self, kb_id: int, full_rebuild: bool = False) -> Dict[str, Any]:
+        """创建训练成本和耗时的估算任务，在工作进程中试运行，不调用向量化接口
+
+        Args:
+            kb_id: 知识库ID
+            full_rebuild: 是否按全量重建估算
 
         Returns:
-            Optional[int]: 下一个要训练的知识库ID，如果没有则返回None
+            Dict[str, Any]: 估算任务状态，通过 get_training_estimate 查询结果
         """
+        kb = (
+            await self.db.execute(select(KnowledgeBase).filter(KnowledgeBase.id == kb_id))
+        ).scalar_one_or_none()
+        if not kb:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="知识库不存在")
+
+        job = TrainingEstimateJob(kb_id, full_rebuild)
         try:
-            # 创建训练管理器
-            training_manager = RAGTrainingManager(self.db)
+            await job.save()
+            run_training_estimate(job.job_id)
+        except Exception as e:
+            Logger.error(f"创建知识库 {kb_id} 训练估算任务失败: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"估算训练成本失败: {str(e)}",
+            )
+        return job.state
+
+    async def get_training_estimate(self, kb_id: int, job_id: str) -> Dict[str, Any]:
+        """获取训练估算任务状态和结果
 
-            # 检查队列
-            next_kb_id = await training_manager.check_queue()
+        Args:
+            kb_id: 知识库ID
+            job_id: 估算任务ID
 
-            if next_kb_id:
-                Logger.info(f"找到下一个要训练的知识库: {next_kb_id}")
+        Returns:
+            Dict[str, Any]: 估算任务状态，完成后 result 中为估算结果
 
-                # 更新状态为训练中
-                await training_manager.update_training_status(
-                    next_kb_id, TrainingStatus.TRAINING
-                )
+        Raises:
+            HTTPException: 任务不存在、已过期或不属于该知识库时抛出 404
+        """
+        job = await TrainingEstimateJob.get(job_id)
+        if not job or job.get("knowledge_base_id") != kb_id:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="估算任务不存在或已过期")
+        return job
 
-                # 启动训练任务
-                train_knowledge_base(next_kb_id)
+    async def check_training_queue(self) -> Optional[int]:
+        """检查训练队列，为空闲槽位派发排队中的知识库
+
+        Returns:
+            Optional[int]: 第一个被派发的知识库ID，如果没有则返回None
+        """
+        try:
+            dispatched = await dispatch_training(self.db)
+            if dispatched:
+                Logger.info(f"已派发训练的知识库: {dispatched}")
 
-            return next_kb_id
+            return dispatched[0] if dispatched else None
 
         except Exception as e:
             Logger.error(f"检查训练队列失败: {str(e)}")
@@ -81,9 +81,19 @@ class KnowledgeBaseService:
     
     # ==================== 训练相关操作 ====================
     
-    async def train(self, kb_id: int, user_id: int) -> KnowledgeBase:
+    async def train(
+        self, kb_id: int, user_id: int, full_rebuild: bool = False, priority: int = 0
+    ) -> KnowledgeBase:
         """训练知识库"""
-        return await self.training_service.train(kb_id, user_id)
+        return await self.training_service.train(kb_id, user_id, full_rebuild, priority)
+    
+    async def estimate_training(self, kb_id: int, full_rebuild: bool = False) -> Dict[str, Any]:
+        """创建知识库训练成本和耗时的估算任务"""
+        return await self.training_service.estimate_training(kb_id, full_rebuild)
+
+    async def get_training_estimate(self, kb_id: int, job_id: str) -> Dict[str, Any]:
+        """获取训练估算任务状态和结果"""
+        return await self.training_service.get_training_estimate(kb_id, job_id)
     
     async def check_training_queue(self) -> Optional[int]:
         """检查训练队列，获取下一个要训练的知识库ID"""
@@ -121,10 +131,13 @@ class KnowledgeBaseService:
         use_rerank: bool = True,
         rerank_mode: str = "weighted_score",
         skip_permission_check: bool = False,
+        mmr_lambda: Optional[float] = None,
+        mmr_top_k: Optional[int] = None,
     ) -> dict:
         """查询知识库"""
         return await self.query_service.query(
-            kb_id, user_context, query, top_k, method, use_rerank, rerank_mode, skip_permission_check
+            kb_id, user_context, query, top_k, method, use_rerank, rerank_mode, skip_permission_check,
+            mmr_lambda=mmr_lambda, mmr_top_k=mmr_top_k
         )
     
     async def check_kb_permission(
@@ -6,7 +6,12 @@ from app.models.database import AsyncSessionLocal
 from sqlalchemy import select
 from app.core.logger import Logger
 from app.core.redis_manager import redis_manager
+from app.rag.training.training_estimator import TrainingEstimateJob
 from app.rag.training.training_manager import RAGTrainingManager, TrainingResult
+from app.rag.training.training_progress import STAGE_QUEUED, TrainingProgress
+from app.rag.training.training_scheduler import LEASE_STAGE, TrainingScheduler
+from app.rag.exceptions import TrainingException
+from app.utils.worker_runtime import WorkerRuntime
 
 # 从huey导入crontab
 from huey import crontab
@@ -15,134 +20,274 @@ from huey import RedisHuey
 # 初始化Huey实例
 from app.core.config import settings
 
+# huey 使用同步 Redis 客户端，不能复用 redis_manager 的异步连接池，按配置建立自己的连接池
 huey = RedisHuey(
     'knowledge-base-training',
-    connection_pool=redis_manager._redis.connection_pool if redis_manager._redis else None
+    host=settings.REDIS_HOST,
+    port=settings.REDIS_PORT,
+    db=settings.REDIS_DB,
+    password=settings.REDIS_PASSWORD,
+    max_connections=settings.HUEY_REDIS_MAX_CONNECTIONS
 )
 
-@huey.task()
-def train_knowledge_base(kb_id: int):
-    """异步训练知识库任务
+@huey.on_startup()
+def start_worker_runtime():
+    """工作线程启动时初始化进程内共享的事件循环和连接池（只初始化一次）"""
+    WorkerRuntime.start()
+
+@huey.on_shutdown()
+def stop_worker_runtime():
+    """工作进程退出时关闭共享的事件循环和连接池"""
+    WorkerRuntime.shutdown()
+
+async def dispatch_training(db) -> list:
+    """为空闲的训练槽位派发排队中的知识库，并唤醒工作进程处理训练队列
+
+    Args:
+        db: 数据库会话
+
+    Returns:
+        list: 本次放入训练队列的知识库ID列表
+    """
+    kb_ids = await TrainingScheduler(db).dispatch()
+    workers = len(kb_ids)
+    if not workers:
+        # 没有新任务时，仍需为到期的重试和可见性超时的任务唤醒一个工作进程
+        stats = await redis_manager.get_training_queue_stats()
+        workers = 1 if stats["claimable"] else 0
+    for _ in range(workers):
+        process_training_queue()
+    return kb_ids
+
+def _retry_delay(attempts: int) -> float:
+    """第 attempts 次重试前的等待时间（指数退避）"""
+    return min(
+        settings.TRAINING_RETRY_BASE_DELAY * (2 ** (attempts - 1)),
+        settings.TRAINING_RETRY_MAX_DELAY
+    )
+
+async def _schedule_retry(db, kb_id: int, error: str) -> bool:
+    """按指数退避把训练任务放回队列，知识库恢复为排队中
 
     Args:
-        kb_id (int): 知识库ID
+        db: 数据库会话
+        kb_id: 知识库ID
+        error: 失败原因
+
+    Returns:
+        bool: 是否已安排重试，超过最大重试次数时为False且不修改任何状态
+    """
+    attempts = await redis_manager.get_training_task_attempts(kb_id) + 1
+    if attempts > settings.TRAINING_MAX_RETRIES:
+        return False
+    delay = _retry_delay(attempts)
+    await redis_manager.retry_training_task(kb_id, delay)
+    Logger.warning(f"知识库 {kb_id} 将在 {delay:.0f} 秒后第 {attempts} 次重试")
+    kb = (await db.execute(
+        select(KnowledgeBase).filter(KnowledgeBase.id == kb_id)
+    )).scalar_one_or_none()
+    if kb:
+        kb.training_status = TrainingStatus.QUEUED
+        kb.training_error = f"训练失败，将在 {delay:.0f} 秒后重试: {error}"
+        await db.commit()
+        await TrainingProgress(kb_id).update(stage=STAGE_QUEUED, message=kb.training_error)
+    return True
+
+async def _train_claimed(db, kb_id: int) -> bool:
+    """训练从队列取出的知识库
+
+    取得训练租约（槽位 + 知识库互斥锁）后训练，训练期间续期租约和队列任务的可见性超时；
+    训练结束后确认队列任务。暂时性错误导致的训练失败（向量化接口、数据库连接）和意外错误
+    按指数退避重试，超过最大重试次数后标记为失败。
+
+    Args:
+        db: 数据库会话
+        kb_id: 知识库ID
+
+    Returns:
+        bool: 是否取得了训练槽位（为False时任务已放回队列）
+    """
+    lease = await TrainingScheduler(db).acquire(kb_id)
+    if lease is None:
+        Logger.info(f"知识库 {kb_id} 没有空闲训练槽位或正在其他进程中训练，放回队列")
+        await redis_manager.release_training_task(kb_id)
+        return False
+    try:
+        kb = (await db.execute(
+            select(KnowledgeBase).filter(KnowledgeBase.id == kb_id)
+        )).scalar_one_or_none()
+        # 训练中状态说明处理该任务的工作进程已退出（互斥锁已由本进程持有），从检查点恢复
+        if not kb or kb.training_status not in (TrainingStatus.QUEUED, TrainingStatus.TRAINING):
+            Logger.info(f"知识库 {kb_id} 不在训练队列中，跳过")
+            await redis_manager.ack_training_task(kb_id)
+            return True
+        full_rebuild = kb.training_full_rebuild
+
+        # 创建训练管理器
+        training_manager = RAGTrainingManager(db)
+        
+        # 执行训练
+        result = await lease.run(training_manager.train(kb_id, full_rebuild=full_rebuild))
+        if not result.success and result.retryable:
+            Logger.error(f"训练知识库 {kb_id} 失败（可重试）: {result.error_message}")
+            if await _schedule_retry(db, kb_id, result.error_message):
+                return True
+        
+        # 创建审计管理器
+        from app.services.audit import AuditManager
+        from app.schemas.identity import UserContext, UserType
+        
+        audit_manager = AuditManager(db)
+        
+        # 创建系统用户上下文
+        system_context = UserContext(
+            user_type=UserType.SYSTEM,
+            user_id=0,
+            identity_id=None,
+            client_id=None
+        )
+        
+        # 计算训练时间
+        kb = (await db.execute(
+            select(KnowledgeBase).filter(KnowledgeBase.id == kb_id)
+        )).scalar_one_or_none()
+        
+        training_duration = None
+        if kb and kb.training_started_at:
+            training_duration = (datetime.now() - kb.training_started_at).total_seconds()
+        
+        if not result.success:
+            Logger.error(f"训练知识库 {kb_id} 失败: {result.error_message}")
+            # 更新知识库状态
+            await training_manager.update_training_status(
+                kb_id, 
+                TrainingStatus.FAILED, 
+                result.error_message
+            )
+            
+            # 记录审计日志
+            await audit_manager.log_training(
+                user_context=system_context,
+                kb_id=kb_id,
+                status="failed",
+                document_count=result.document_count,
+                chunk_count=result.chunk_count,
+                embedding_count=result.embedding_count,
+                duration=training_duration,
+                error=result.error_message
+            )
+        else:
+            Logger.info(f"知识库 {kb_id} 训练成功，处理了 {result.document_count} 个文档，"
+                       f"生成了 {result.chunk_count} 个分块和 {result.embedding_count} 个向量，"
+                       f"跳过 {result.skipped_count} 个未变化文档，从检查点恢复 {result.resumed_count} 个文档，"
+                       f"复用 {result.reused_chunk_count} 个分块，"
+                       f"数据库写入速度 {result.rows_per_second:.1f} 行/秒")
+            
+            # 记录审计日志
+            await audit_manager.log_training(
+                user_context=system_context,
+                kb_id=kb_id,
+                status="completed",
+                document_count=result.document_count,
+                chunk_count=result.chunk_count,
+                embedding_count=result.embedding_count,
+                duration=training_duration
+            )
+            
+        await redis_manager.ack_training_task(kb_id)
+
+    except Exception as e:
+        if isinstance(e, TrainingException) and e.stage == LEASE_STAGE:
+            # 租约已丢失，知识库可能已由其他进程接管，不修改其状态和队列任务
+            Logger.warning(e.message)
+            return True
+        Logger.error(f"训练知识库 {kb_id} 时发生意外错误: {str(e)}")
+        await db.rollback()
+        if not await _schedule_retry(db, kb_id, str(e)):
+            await redis_manager.ack_training_task(kb_id)
+            kb = (await db.execute(
+                select(KnowledgeBase).filter(KnowledgeBase.id == kb_id)
+            )).scalar_one_or_none()
+            if kb:
+                kb.training_status = TrainingStatus.FAILED
+                kb.training_error = f"训练失败: {str(e)}"
+                await db.commit()
+    finally:
+        await lease.release()
+    return True
+
+@huey.task()
+def process_training_queue():
+    """处理训练队列
+
+    原子地从训练队列取出知识库并训练；一个任务完成后阻塞等待下一个入队通知，
+    队列持续为空或没有空闲槽位时退出。
     """
-    Logger.info(f"train_knowledge_base: {kb_id}")
-    
-    async def _train():
-        Logger.info(f"开始异步训练任务，知识库ID: {kb_id}")
+    async def _process():
         async with AsyncSessionLocal() as db:
-            try:
-                # 创建训练管理器
-                training_manager = RAGTrainingManager(db)
-                
-                # 执行训练
-                result = await training_manager.train(kb_id)
-                
-                # 创建审计管理器
-                from app.services.audit import AuditManager
-                from app.schemas.identity import UserContext, UserType
-                
-                audit_manager = AuditManager(db)
-                
-                # 创建系统用户上下文
-                system_context = UserContext(
-                    user_type=UserType.SYSTEM,
-                    user_id=0,
-                    identity_id=None,
-                    client_id=None
+            while True:
+                kb_id = await redis_manager.wait_training_task(
+                    settings.TRAINING_LEASE_TTL,
+                    settings.TRAINING_QUEUE_BLOCK_TIMEOUT
                 )
-                
-                # 计算训练时间
-                kb = (await db.execute(
-                    select(KnowledgeBase).filter(KnowledgeBase.id == kb_id)
-                )).scalar_one_or_none()
-                
-                training_duration = None
-                if kb and kb.training_started_at:
-                    training_duration = (datetime.now() - kb.training_started_at).total_seconds()
-                
-                if not result.success:
-                    Logger.error(f"训练知识库 {kb_id} 失败: {result.error_message}")
-                    # 更新知识库状态
-                    await training_manager.update_training_status(
-                        kb_id, 
-                        TrainingStatus.FAILED, 
-                        result.error_message
-                    )
-                    
-                    # 记录审计日志
-                    await audit_manager.log_training(
-                        user_context=system_context,
-                        kb_id=kb_id,
-                        status="failed",
-                        document_count=result.document_count,
-                        chunk_count=result.chunk_count,
-                        embedding_count=result.embedding_count,
-                        duration=training_duration,
-                        error=result.error_message
-                    )
-                else:
-                    Logger.info(f"知识库 {kb_id} 训练成功，处理了 {result.document_count} 个文档，"
-                               f"生成了 {result.chunk_count} 个分块和 {result.embedding_count} 个向量")
-                    
-                    # 记录审计日志
-                    await audit_manager.log_training(
-                        user_context=system_context,
-                        kb_id=kb_id,
-                        status="completed",
-                        document_count=result.document_count,
-                        chunk_count=result.chunk_count,
-                        embedding_count=result.embedding_count,
-                        duration=training_duration
-                    )
-                    
-            except Exception as e:
-                Logger.error(f"训练知识库 {kb_id} 时发生意外错误: {str(e)}")
-                # 更新知识库状态
-                kb = (await db.execute(
-                    select(KnowledgeBase).filter(KnowledgeBase.id == kb_id)
-                )).scalar_one_or_none()
-                
-                if kb:
-                    kb.training_status = TrainingStatus.FAILED
-                    kb.training_error = f"训练失败: {str(e)}"
-                    await db.commit()
-
-    import asyncio
-    Logger.info(f"启动知识库 {kb_id} 的训练任务")
-    asyncio.run(_train())
+                if kb_id is None:
+                    return
+                Logger.info(f"开始异步训练任务，知识库ID: {kb_id}")
+                if not await _train_claimed(db, kb_id):
+                    return
+                try:
+                    await dispatch_training(db)
+                except Exception as e:
+                    Logger.error(f"派发下一个训练任务失败: {str(e)}")
+                    await db.rollback()
+
+    WorkerRuntime.run(_process())
+
+@huey.task()
+def run_training_estimate(job_id: str):
+    """在工作进程中执行训练成本估算，结果写入估算任务状态"""
+    async def _run():
+        job = await TrainingEstimateJob.load(job_id)
+        if job is None:
+            Logger.warning(f"训练估算任务 {job_id} 不存在或已过期，跳过")
+            return
+        async with AsyncSessionLocal() as db:
+            await job.run(db)
+
+    WorkerRuntime.run(_run())
+
+@huey.task()
+def run_document_import(job_id: str, kb_id: int, user_id: int, source: dict):
+    """在工作进程中执行文档批量导入，进度写入导入任务状态"""
+    from pathlib import Path
+    from app.services.document_import import DocumentImporter, DocumentImportJob, iter_import_entries
+
+    archive_path = Path(source["archive_path"]) if source.get("archive_path") else None
+
+    async def _run():
+        job = await DocumentImportJob.load(job_id)
+        if job is None:
+            Logger.warning(f"批量导入任务 {job_id} 不存在或已过期，跳过")
+            if archive_path is not None:
+                archive_path.unlink(missing_ok=True)
+            return
+        await DocumentImporter(job, kb_id, user_id).run(iter_import_entries(source), archive_path)
+
+    WorkerRuntime.run(_run())
 
 @huey.periodic_task(crontab(minute='*/1'))
 def check_queued_knowledge_bases():
-    """定期检查排队中的知识库，并启动训练"""
+    """定期恢复租约到期的训练，并为空闲槽位派发排队中的知识库"""
     async def _check():
         Logger.info("检查排队中的知识库")
         async with AsyncSessionLocal() as db:
             try:
-                # 创建训练管理器
-                training_manager = RAGTrainingManager(db)
-                
-                # 检查队列
-                next_kb_id = await training_manager.check_queue()
-                
-                if next_kb_id:
-                    Logger.info(f"找到下一个要训练的知识库: {next_kb_id}")
-                    
-                    # 更新状态为训练中
-                    await training_manager.update_training_status(
-                        next_kb_id,
-                        TrainingStatus.TRAINING
-                    )
-                    
-                    # 启动训练任务
-                    train_knowledge_base(next_kb_id)
-                else:
-                    Logger.info("没有排队中的知识库")
+                kb_ids = await dispatch_training(db)
+                if not kb_ids:
+                    Logger.info("没有可派发的知识库")
 
             except Exception as e:
                 Logger.error(f"检查训练队列时发生错误: {str(e)}")
                 await db.rollback()
 
-    import asyncio
-    asyncio.run(_check())
\ No newline at end of file
+    WorkerRuntime.run(_check())
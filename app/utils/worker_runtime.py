@@ -0,0 +1,99 @@
+"""huey 工作进程的异步运行时"""
+import asyncio
+import threading
+from typing import Any, Coroutine, Optional
+
+from app.core.http_client import HttpClientManager
+from app.core.logger import Logger
+from app.core.redis_manager import redis_manager
+from app.models.database import engine
+
+
+class WorkerRuntime:
+    """工作进程内长期运行的事件循环
+
+    事件循环运行在独立线程中，huey 的各个工作线程把协程提交到这个循环执行并等待结果。
+    数据库连接池、Redis 连接池和共享 HTTP 客户端的连接都绑定在创建它们的事件循环上，
+    进程内只保留一个循环，它们才能在不同任务之间复用；工作进程启动时初始化一次，退出时统一关闭。
+    """
+
+    _loop: Optional[asyncio.AbstractEventLoop] = None
+    _thread: Optional[threading.Thread] = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def start(cls) -> asyncio.AbstractEventLoop:
+        """启动事件循环并初始化共享资源，重复调用直接返回已启动的循环
+
+        Returns:
+            asyncio.AbstractEventLoop: 事件循环
+        """
+        with cls._lock:
+            if cls._loop is None:
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+                thread = threading.Thread(
+                    target=cls._run_loop, args=(loop, ready), name="worker-runtime", daemon=True
+                )
+                thread.start()
+                ready.wait()
+                asyncio.run_coroutine_threadsafe(cls._initialize(), loop).result()
+                cls._loop, cls._thread = loop, thread
+                Logger.info("工作进程运行时已启动")
+        return cls._loop
+
+    @staticmethod
+    def _run_loop(loop: asyncio.AbstractEventLoop, ready: threading.Event) -> None:
+        """事件循环线程入口"""
+        asyncio.set_event_loop(loop)
+        loop.call_soon(ready.set)
+        loop.run_forever()
+
+    @staticmethod
+    async def _initialize() -> None:
+        """初始化共享资源"""
+        await redis_manager.initialize()
+        HttpClientManager.get_client()
+
+    @staticmethod
+    async def _close() -> None:
+        """关闭共享资源"""
+        from app.rag.extractor.extract_pool import ExtractPool
+
+        ExtractPool.shutdown()
+        await HttpClientManager.close()
+        try:
+            await redis_manager.close()
+        except Exception as e:
+            Logger.warning(f"关闭 Redis 连接失败: {str(e)}")
+        await engine.dispose()
+
+    @classmethod
+    def run(cls, coro: Coroutine[Any, Any, Any]) -> Any:
+        """在运行时的事件循环中执行协程并等待结果（在 huey 工作线程中调用）
+
+        Args:
+            coro: 协程
+
+        Returns:
+            Any: 协程的返回值
+        """
+        loop = cls.start()
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+    @classmethod
+    def shutdown(cls) -> None:
+        """关闭共享资源并停止事件循环"""
+        with cls._lock:
+            if cls._loop is None:
+                return
+            loop, thread = cls._loop, cls._thread
+            cls._loop, cls._thread = None, None
+        try:
+            asyncio.run_coroutine_threadsafe(cls._close(), loop).result(timeout=30)
+        except Exception as e:
+            Logger.warning(f"关闭工作进程运行时资源失败: {str(e)}")
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=30)
+        loop.close()
+        Logger.info("工作进程运行时已停止")
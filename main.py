@@ -22,6 +22,10 @@ from contextlib import asynccontextmanager
 import uvicorn
 from app.models import *  # 导入所有模型
 from app.core.ws import connection_manager, start_monitoring_connections
+from app.rag.keyword.tokenizer_service import TokenizerService
+from app.rag.rerank.cross_encoder_rerank import CrossEncoderRerankRunner
+from app.rag.extractor.extract_pool import ExtractPool
+from app.core.http_client import HttpClientManager
 from fastapi.responses import JSONResponse
 import logging
 
@@ -35,6 +39,10 @@ async def lifespan(app: FastAPI):
     yield
     # 关闭时执行
     Logger.info("应用程序关闭中...")
+    TokenizerService.get_instance().shutdown()
+    CrossEncoderRerankRunner.shutdown()
+    ExtractPool.shutdown()
+    await HttpClientManager.close()
 
 # 2. 在创建 FastAPI 实例时指定 lifespan
 app = FastAPI(
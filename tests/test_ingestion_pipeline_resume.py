@@ -0,0 +1,164 @@
+"""摄取流水线从检查点恢复的回归测试"""
+from types import SimpleNamespace
+
+import pytest
+
+from app.models.training_checkpoint import TrainingCheckpoint
+from app.rag.index_processor.chunk_bulk_writer import compute_content_hash
+from app.rag.training.ingestion_pipeline import IngestionPipeline, PipelineItem
+
+
+class _Result:
+    def __init__(self, values):
+        self.values = values
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return self.values
+
+
+class _FakeSession:
+    """只返回固定查询结果的数据库会话"""
+
+    def __init__(self, values):
+        self.values = values
+        self.statements = []
+
+    async def execute(self, statement, *args, **kwargs):
+        self.statements.append(statement)
+        return _Result(self.values)
+
+
+def _make_pipeline(existing_chunks, partial_ids=(), db=None):
+    """跳过构造函数（需要向量存储和关键词索引），只设置判断未变化所需的属性"""
+    pipeline = IngestionPipeline.__new__(IngestionPipeline)
+    pipeline.db = db
+    pipeline.knowledge_base = SimpleNamespace(id=1)
+    pipeline.incremental = True
+    pipeline.writer = SimpleNamespace(embedding_model="text-embedding-3-small")
+    pipeline.existing_chunks = existing_chunks
+    pipeline.partial_ids = set(partial_ids)
+    return pipeline
+
+
+def _make_item(document_id=10, file_hash="f" * 64, indexed_file_hash="f" * 64, content=None, content_hash=None):
+    document = SimpleNamespace(
+        id=document_id,
+        title="doc",
+        content=content,
+        storage_path="/tmp/doc.pdf" if file_hash else None,
+        doc_type="file",
+        file_hash=file_hash,
+        indexed_file_hash=indexed_file_hash,
+        content_hash=content_hash,
+    )
+    return PipelineItem(0, document)
+
+
+def _embedded_chunks(document_id, count):
+    return {
+        document_id: {
+            chunk_id: SimpleNamespace(
+                id=chunk_id, document_id=document_id, chunk_index=chunk_id,
+                content_hash=f"h{chunk_id}", embedding_id=chunk_id,
+            )
+            for chunk_id in range(count)
+        }
+    }
+
+
+def test_unchanged_fully_indexed_document_is_skipped():
+    pipeline = _make_pipeline(_embedded_chunks(10, 3))
+    assert pipeline._is_unchanged(_make_item())
+
+
+def test_partially_checkpointed_document_is_not_skipped():
+    """中断前只提交了部分分块的文档：残留分块向量齐全、文件哈希未变，也必须重新处理"""
+    pipeline = _make_pipeline(_embedded_chunks(10, 3), partial_ids=[10])
+    item = _make_item()
+    assert not pipeline._is_fully_embedded(item.document_id)
+    assert not pipeline._is_unchanged(item)
+
+
+def test_partially_checkpointed_text_document_is_not_skipped():
+    content = "hello world"
+    pipeline = _make_pipeline(_embedded_chunks(10, 2), partial_ids=[10])
+    item = _make_item(file_hash=None, indexed_file_hash=None, content=content,
+                      content_hash=compute_content_hash(content))
+    assert not pipeline._is_unchanged(item)
+
+
+def test_document_with_cleared_index_hash_is_not_skipped():
+    """全量重建清空索引后文档的已索引哈希为空，重试时按增量方式运行也会重新处理"""
+    pipeline = _make_pipeline(_embedded_chunks(10, 3))
+    assert not pipeline._is_unchanged(_make_item(indexed_file_hash=None))
+
+
+def test_document_missing_current_model_vectors_is_not_skipped():
+    existing = _embedded_chunks(10, 3)
+    existing[10][1].embedding_id = None
+    pipeline = _make_pipeline(existing)
+    assert not pipeline._is_unchanged(_make_item())
+
+
+@pytest.mark.asyncio
+async def test_load_partial_documents_reads_partial_checkpoints():
+    db = _FakeSession([10, 11])
+    pipeline = _make_pipeline({}, db=db)
+    await pipeline._load_partial_documents()
+    assert pipeline.partial_ids == {10, 11}
+    where = str(db.statements[0].whereclause.compile(compile_kwargs={"literal_binds": True}))
+    assert TrainingCheckpoint.STATUS_PARTIAL in where
+
+
+class _RecordingSession:
+    def __init__(self):
+        self.calls = []
+
+    async def execute(self, statement, params=None, **kwargs):
+        self.calls.append((statement, params))
+        return _Result([])
+
+
+@pytest.mark.asyncio
+async def test_partial_checkpoint_records_committed_chunks():
+    db = _RecordingSession()
+    pipeline = _make_pipeline({}, db=db)
+    item = _make_item()
+    item.chunks = ["a", "b", "c", "d"]
+
+    await pipeline._save_checkpoints([item], TrainingCheckpoint.STATUS_PARTIAL, 3)
+
+    delete_statement, _ = db.calls[0]
+    assert delete_statement.is_delete
+    _, rows = db.calls[1]
+    assert rows == [{
+        "knowledge_base_id": 1,
+        "document_id": 10,
+        "status": TrainingCheckpoint.STATUS_PARTIAL,
+        "chunk_total": 4,
+        "chunk_completed": 3,
+    }]
+
+
+@pytest.mark.asyncio
+async def test_completed_checkpoint_counts_all_chunks():
+    db = _RecordingSession()
+    pipeline = _make_pipeline({}, db=db)
+    item = _make_item()
+    item.chunks = ["a", "b"]
+
+    await pipeline._save_checkpoints([item], TrainingCheckpoint.STATUS_COMPLETED)
+
+    _, rows = db.calls[1]
+    assert rows[0]["status"] == TrainingCheckpoint.STATUS_COMPLETED
+    assert rows[0]["chunk_completed"] == 2
+
+
+@pytest.mark.asyncio
+async def test_no_checkpoint_written_for_empty_batch():
+    db = _RecordingSession()
+    await _make_pipeline({}, db=db)._save_checkpoints([], TrainingCheckpoint.STATUS_COMPLETED)
+    assert db.calls == []
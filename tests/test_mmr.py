@@ -0,0 +1,30 @@
+"""MMR 多样化选择的测试"""
+import numpy as np
+
+from app.rag.retrieval.mmr import mmr_select
+
+
+def test_lambda_one_keeps_relevance_order():
+    vectors = np.array([[1.0, 0.0], [1.0, 0.0], [0.0, 1.0]])
+    relevance = np.array([0.2, 1.0, 0.5])
+    assert mmr_select(vectors, relevance, 1.0, 3) == [1, 2, 0]
+
+
+def test_near_duplicate_is_demoted():
+    # 候选0和1几乎相同，多样性权重足够时第二个选中的是方向不同的候选2
+    vectors = np.array([[1.0, 0.0], [0.99, 0.01], [0.0, 1.0]])
+    relevance = np.array([1.0, 0.95, 0.6])
+    assert mmr_select(vectors, relevance, 0.5, 2) == [0, 2]
+
+
+def test_zero_vectors_are_not_penalized():
+    vectors = np.array([[1.0, 0.0], [0.0, 0.0], [1.0, 0.0]])
+    relevance = np.array([1.0, 0.8, 0.9])
+    assert mmr_select(vectors, relevance, 0.5, 3) == [0, 1, 2]
+
+
+def test_top_k_is_bounded_by_candidates():
+    vectors = np.eye(2)
+    relevance = np.array([0.3, 0.7])
+    assert mmr_select(vectors, relevance, 0.7, 5) == [1, 0]
+    assert mmr_select(vectors, relevance, 0.7, 0) == []
@@ -0,0 +1,86 @@
+"""递归字符分块器流式分块的测试"""
+import asyncio
+import random
+
+import pytest
+
+from app.rag.splitter.recursive_character_text_splitter import RecursiveCharacterTextSplitter
+
+WORDS = "alpha beta gamma delta epsilon zeta eta theta iota kappa lambda mu".split()
+
+
+def _paragraph(rng: random.Random, sentences: int) -> str:
+    parts = []
+    for _ in range(sentences):
+        parts.append(" ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 15))) + ". ")
+        if rng.random() < 0.2:
+            parts.append("\n")
+    return "".join(parts).strip()
+
+
+def _paragraphs(seed: int, count: int = 60):
+    rng = random.Random(seed)
+    # 混合短段落和超过分块大小的长段落（触发递归分块）
+    return [_paragraph(rng, rng.randint(1, 25)) for _ in range(count)]
+
+
+def _blocks(text: str, size: int):
+    return [text[start:start + size] for start in range(0, len(text), size)]
+
+
+def _stream(splitter, blocks):
+    async def source():
+        for block in blocks:
+            yield block
+
+    async def collect():
+        return [chunk async for chunk in splitter.split_text_stream(source())]
+
+    return asyncio.run(collect())
+
+
+def _split_whole(splitter, text):
+    # split_text 只在 _split_text 的结果外记录统计日志
+    return splitter._split_text(text, splitter._separators)
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("block_count", [1, 6, 60])
+def test_stream_by_paragraph_blocks_matches_whole_text(seed, block_count):
+    paragraphs = _paragraphs(seed)
+    text = "\n\n".join(paragraphs)
+    splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
+    per_block = len(paragraphs) // block_count
+    blocks = [
+        "\n\n".join(paragraphs[start:start + per_block]) + ("\n\n" if start + per_block < len(paragraphs) else "")
+        for start in range(0, len(paragraphs), per_block)
+    ]
+    assert "".join(blocks) == text
+    assert _stream(splitter, blocks) == _split_whole(splitter, text)
+
+
+@pytest.mark.parametrize("block_size", [1, 7, 333, 4096])
+@pytest.mark.parametrize("chunk_size,chunk_overlap", [(100, 0), (300, 20), (500, 50)])
+def test_stream_by_arbitrary_blocks_matches_whole_text(block_size, chunk_size, chunk_overlap):
+    text = "\n\n".join(_paragraphs(42, count=30))
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    assert _stream(splitter, _blocks(text, block_size)) == _split_whole(splitter, text)
+
+
+def test_stream_without_keep_separator_matches_whole_text():
+    text = "\n\n".join(_paragraphs(7, count=30))
+    splitter = RecursiveCharacterTextSplitter(chunk_size=300, chunk_overlap=30, keep_separator=False)
+    assert _stream(splitter, _blocks(text, 97)) == _split_whole(splitter, text)
+
+
+def test_stream_without_top_level_separator_matches_whole_text():
+    text = "\n".join(_paragraphs(3, count=20))
+    splitter = RecursiveCharacterTextSplitter(chunk_size=300, chunk_overlap=30)
+    assert _stream(splitter, _blocks(text, 128)) == _split_whole(splitter, text)
+
+
+def test_stream_skips_empty_blocks():
+    splitter = RecursiveCharacterTextSplitter(chunk_size=300, chunk_overlap=30)
+    assert _stream(splitter, ["", ""]) == []
+    text = "\n\n".join(_paragraphs(9, count=10))
+    assert _stream(splitter, ["", text, ""]) == _split_whole(splitter, text)
@@ -0,0 +1,45 @@
+"""知识库检索配置部分更新的测试"""
+from app.schemas.knowledge_base import KnowledgeBaseUpdate
+from app.services.knowledge.knowledge_base_core import KnowledgeBaseCoreService
+
+CURRENT = {
+    "keyword_backend": "fulltext",
+    "rerank_cascade": {"enabled": True, "top_m": 30},
+    "mmr": {"enabled": False, "lambda": 0.5},
+}
+
+
+def _changes(payload):
+    update = KnowledgeBaseUpdate.model_validate({"retrieval_config": payload})
+    return update.retrieval_config, update.retrieval_config.model_dump(by_alias=True, exclude_unset=True)
+
+
+def test_unsent_keyword_backend_is_not_defaulted():
+    config, changes = _changes({"mmr": {"enabled": True}})
+    assert config.keyword_backend is None
+    assert "keyword_backend" not in changes
+
+
+def test_partial_update_keeps_other_settings():
+    _, changes = _changes({"mmr": {"enabled": True}})
+    merged = KnowledgeBaseCoreService._merge_retrieval_config(CURRENT, changes)
+    assert merged == {
+        "keyword_backend": "fulltext",
+        "rerank_cascade": {"enabled": True, "top_m": 30},
+        "mmr": {"enabled": True, "lambda": 0.5},
+    }
+    # 原配置不被修改
+    assert CURRENT["mmr"]["enabled"] is False
+
+
+def test_explicit_null_removes_setting():
+    _, changes = _changes({"rerank_cascade": None, "keyword_backend": "inverted_index"})
+    merged = KnowledgeBaseCoreService._merge_retrieval_config(CURRENT, changes)
+    assert "rerank_cascade" not in merged
+    assert merged["keyword_backend"] == "inverted_index"
+
+
+def test_lambda_alias_is_stored_by_alias():
+    _, changes = _changes({"mmr": {"lambda": 0.9}})
+    merged = KnowledgeBaseCoreService._merge_retrieval_config({}, changes)
+    assert merged == {"mmr": {"lambda": 0.9}}
@@ -0,0 +1,134 @@
+"""训练队列（Redis Lua 脚本）的测试
+
+需要可连接的 Redis，使用 TEST_REDIS_DB（默认15）号库，只读写训练队列的键；连接不上时跳过。
+"""
+import os
+
+import aioredis
+import pytest
+import pytest_asyncio
+
+from app.core.config import settings
+from app.core.redis_manager import RedisManager
+
+
+@pytest_asyncio.fixture
+async def queue():
+    client = aioredis.from_url(
+        f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}",
+        db=int(os.environ.get("TEST_REDIS_DB", 15)),
+        password=settings.REDIS_PASSWORD,
+        encoding="utf-8",
+        decode_responses=True,
+    )
+    try:
+        await client.ping()
+    except Exception as e:
+        pytest.skip(f"Redis 不可用: {e}")
+
+    previous = RedisManager._redis
+    RedisManager._redis = client
+    await RedisManager.clear_training_queue()
+    try:
+        yield RedisManager
+    finally:
+        await RedisManager.clear_training_queue()
+        RedisManager._redis = previous
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_claim_in_score_order(queue):
+    assert await queue.add_training_task(2, score=2)
+    assert await queue.add_training_task(1, score=1)
+    assert await queue.claim_training_task(60) == 1
+    assert await queue.claim_training_task(60) == 2
+    assert await queue.claim_training_task(60) is None
+
+
+@pytest.mark.asyncio
+async def test_enqueue_is_idempotent_and_skips_processing(queue):
+    assert await queue.add_training_task(1)
+    assert not await queue.add_training_task(1)
+    assert await queue.claim_training_task(60) == 1
+    # 处理中的任务不会再次入队
+    assert not await queue.add_training_task(1)
+    assert await queue.claim_training_task(60) is None
+
+
+@pytest.mark.asyncio
+async def test_claimed_task_is_invisible_until_timeout(queue):
+    await queue.add_training_task(1)
+    assert await queue.claim_training_task(60) == 1
+    assert await queue.claim_training_task(60) is None
+    assert await queue.get_queued_training_tasks([1, 2]) == [1]
+
+
+@pytest.mark.asyncio
+async def test_expired_claim_is_redelivered(queue):
+    await queue.add_training_task(1)
+    # 可见性超时为0：工作进程未确认即视为已退出，下一次取任务时重新投递
+    assert await queue.claim_training_task(0) == 1
+    assert await queue.claim_training_task(60) == 1
+
+
+@pytest.mark.asyncio
+async def test_extend_keeps_task_invisible(queue):
+    await queue.add_training_task(1)
+    assert await queue.claim_training_task(0) == 1
+    assert await queue.extend_training_task(1, 60)
+    assert await queue.claim_training_task(60) is None
+    assert not await queue.extend_training_task(2, 60)
+
+
+@pytest.mark.asyncio
+async def test_ack_removes_task_and_attempts(queue):
+    await queue.add_training_task(1)
+    await queue.claim_training_task(60)
+    await queue.retry_training_task(1, 0)
+    await queue.claim_training_task(60)
+    await queue.ack_training_task(1)
+    assert await queue.get_training_task_attempts(1) == 0
+    assert await queue.get_queued_training_tasks([1]) == []
+    assert not await queue.extend_training_task(1, 60)
+
+
+@pytest.mark.asyncio
+async def test_retry_delays_and_counts_attempts(queue):
+    await queue.add_training_task(1)
+    await queue.claim_training_task(60)
+    assert await queue.retry_training_task(1, 3600) == 1
+    # 延迟期间不可取出，但仍算在队列中
+    assert await queue.claim_training_task(60) is None
+    assert await queue.get_queued_training_tasks([1]) == [1]
+    stats = await queue.get_training_queue_stats()
+    assert stats["delayed"] == 1 and stats["claimable"] == 0
+
+
+@pytest.mark.asyncio
+async def test_due_retry_is_claimable_again(queue):
+    await queue.add_training_task(1)
+    await queue.claim_training_task(60)
+    assert await queue.retry_training_task(1, 0) == 1
+    assert await queue.claim_training_task(60) == 1
+    assert await queue.retry_training_task(1, 0) == 2
+    assert await queue.get_training_task_attempts(1) == 2
+
+
+@pytest.mark.asyncio
+async def test_enqueue_moves_delayed_task_back_to_ready(queue):
+    await queue.add_training_task(1)
+    await queue.claim_training_task(60)
+    await queue.retry_training_task(1, 3600)
+    # 用户重新触发训练时不再等待退避
+    assert await queue.add_training_task(1)
+    assert await queue.claim_training_task(60) == 1
+
+
+@pytest.mark.asyncio
+async def test_release_does_not_count_attempt(queue):
+    await queue.add_training_task(1)
+    assert await queue.claim_training_task(60) == 1
+    await queue.release_training_task(1)
+    assert await queue.get_training_task_attempts(1) == 0
+    assert await queue.claim_training_task(60) == 1
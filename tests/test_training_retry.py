@@ -0,0 +1,166 @@
+"""训练失败重试的测试"""
+from types import SimpleNamespace
+
+import pytest
+
+from app.models.knowledge_base import TrainingStatus
+from app.rag.exceptions import DocumentProcessingException, EmbeddingException
+from app.rag.training.training_manager import TrainingResult, is_transient_error
+from app.utils import tasks
+
+
+class _Result:
+    def __init__(self, value):
+        self.value = value
+
+    def scalar_one_or_none(self):
+        return self.value
+
+
+class _FakeSession:
+    def __init__(self, kb):
+        self.kb = kb
+        self.commits = 0
+
+    async def execute(self, statement, *args, **kwargs):
+        return _Result(self.kb)
+
+    async def commit(self):
+        self.commits += 1
+
+    async def rollback(self):
+        pass
+
+
+class _FakeLease:
+    released = False
+
+    async def run(self, coro):
+        return await coro
+
+    async def release(self):
+        self.released = True
+
+
+class _FakeRedis:
+    def __init__(self, attempts):
+        self.attempts = attempts
+        self.retried = []
+        self.acked = []
+
+    async def get_training_task_attempts(self, kb_id):
+        return self.attempts
+
+    async def retry_training_task(self, kb_id, delay):
+        self.retried.append((kb_id, delay))
+
+    async def ack_training_task(self, kb_id):
+        self.acked.append(kb_id)
+
+    async def release_training_task(self, kb_id):
+        pass
+
+
+class _FakeProgress:
+    def __init__(self, kb_id):
+        pass
+
+    async def update(self, **kwargs):
+        pass
+
+
+def _patch(monkeypatch, result, attempts):
+    lease = _FakeLease()
+    redis = _FakeRedis(attempts)
+
+    class _Scheduler:
+        def __init__(self, db):
+            pass
+
+        async def acquire(self, kb_id):
+            return lease
+
+    class _Manager:
+        def __init__(self, db):
+            self.statuses = []
+
+        async def train(self, kb_id, full_rebuild=False):
+            return result
+
+        async def update_training_status(self, kb_id, status, error_message=None):
+            pass
+
+    audit_calls = []
+
+    class _Audit:
+        def __init__(self, db):
+            pass
+
+        async def log_training(self, **kwargs):
+            audit_calls.append(kwargs)
+
+    monkeypatch.setattr(tasks, "TrainingScheduler", _Scheduler)
+    monkeypatch.setattr(tasks, "RAGTrainingManager", _Manager)
+    monkeypatch.setattr(tasks, "redis_manager", redis)
+    monkeypatch.setattr(tasks, "TrainingProgress", _FakeProgress)
+    monkeypatch.setattr("app.services.audit.AuditManager", _Audit)
+    return lease, redis, audit_calls
+
+
+def _kb():
+    return SimpleNamespace(
+        id=1, training_status=TrainingStatus.QUEUED, training_full_rebuild=False,
+        training_started_at=None, training_error=None,
+    )
+
+
+def test_transient_errors():
+    assert is_transient_error(EmbeddingException(message="接口超时"))
+    assert is_transient_error(ConnectionError())
+    assert not is_transient_error(DocumentProcessingException(message="文件损坏"))
+    assert not is_transient_error(ValueError())
+
+
+@pytest.mark.asyncio
+async def test_retryable_failure_is_requeued(monkeypatch):
+    result = TrainingResult(success=False, error_message="向量化接口超时", retryable=True)
+    lease, redis, audit_calls = _patch(monkeypatch, result, attempts=0)
+    kb = _kb()
+
+    assert await tasks._train_claimed(_FakeSession(kb), 1)
+
+    assert len(redis.retried) == 1
+    assert redis.acked == []
+    assert kb.training_status == TrainingStatus.QUEUED
+    assert audit_calls == []
+    assert lease.released
+
+
+@pytest.mark.asyncio
+async def test_retryable_failure_fails_after_max_retries(monkeypatch):
+    result = TrainingResult(success=False, error_message="向量化接口超时", retryable=True)
+    _, redis, audit_calls = _patch(monkeypatch, result, attempts=tasks.settings.TRAINING_MAX_RETRIES)
+
+    assert await tasks._train_claimed(_FakeSession(_kb()), 1)
+
+    assert redis.retried == []
+    assert redis.acked == [1]
+    assert audit_calls[0]["status"] == "failed"
+
+
+@pytest.mark.asyncio
+async def test_permanent_failure_is_not_retried(monkeypatch):
+    result = TrainingResult(success=False, error_message="所有文档处理失败: 文件损坏")
+    _, redis, audit_calls = _patch(monkeypatch, result, attempts=0)
+
+    assert await tasks._train_claimed(_FakeSession(_kb()), 1)
+
+    assert redis.retried == []
+    assert redis.acked == [1]
+    assert audit_calls[0]["status"] == "failed"
+
+
+def test_retry_delay_backs_off_exponentially(monkeypatch):
+    monkeypatch.setattr(tasks.settings, "TRAINING_RETRY_BASE_DELAY", 10)
+    monkeypatch.setattr(tasks.settings, "TRAINING_RETRY_MAX_DELAY", 60)
+    assert [tasks._retry_delay(attempt) for attempt in (1, 2, 3, 4)] == [10, 20, 40, 60]